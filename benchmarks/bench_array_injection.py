@@ -0,0 +1,70 @@
+"""Time seeded array fault injection against the per-element ``random()`` helpers.
+
+Run with ``python -m benchmarks.bench_array_injection``. The legacy helpers
+(``apply_noise_series``, ``jitter_series``) are timed on a ``--legacy`` slice
+and extrapolated; :class:`ArrayInjector` works on ``--size`` float64 values
+in place. The last line checks that two injectors with the same seed agree.
+"""
+import argparse
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from fault_detection.fault_injection.array_injection import ArrayInjector
+from fault_detection.fault_injection.granularity_injection import (
+    Granularity,
+    apply_noise_series,
+    jitter_series,
+)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000_000)
+    parser.add_argument("--legacy", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    sample = [0.5] * args.legacy
+    scale = args.size / args.legacy
+    for name, func in (
+        ("apply_noise_series", lambda: apply_noise_series(sample, Granularity.FINE)),
+        ("jitter_series", lambda: jitter_series(sample)),
+    ):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        print(f"legacy {name:<24} {elapsed * scale:8.3f} s  (extrapolated to {args.size:,})")
+
+    values = np.ones(args.size)
+    injector = ArrayInjector(args.seed)
+    cases = (
+        ("noise (fine)", lambda: injector.noise(values, out=values)),
+        ("jitter", lambda: injector.jitter(values, out=values)),
+        ("scale", lambda: injector.scale(values, 1.01, out=values)),
+        ("drop mask, rate 1e-3", lambda: injector.drop_mask(values.shape, 1e-3)),
+        ("burst mask, rate 1e-4", lambda: injector.burst_mask(values.shape, 1e-4, 50.0)),
+        (
+            "stuck-at under bursts",
+            lambda: injector.stuck_at(
+                values, 0.0, mask=injector.burst_mask(values.shape, 1e-4, 50.0), out=values
+            ),
+        ),
+        ("intermittent mask", lambda: injector.intermittent_mask(values.shape, 1000, 0.1)),
+    )
+    for name, func in cases:
+        started = time.perf_counter()
+        func()
+        print(f"ArrayInjector {name:<24} {time.perf_counter() - started:8.3f} s")
+    del values
+
+    check = np.zeros(1_000_000)
+    first = ArrayInjector(args.seed).jitter(check)
+    second = ArrayInjector(args.seed, block_size=1000).jitter(check)
+    print(f"same seed, different block size -> identical: {np.array_equal(first, second)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
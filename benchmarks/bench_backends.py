@@ -0,0 +1,134 @@
+"""Compare inference backends on the same model, batches and client load.
+
+Run with ``python -m benchmarks.bench_backends``. The ONNX backend runs a
+graph exported from the shipped ``MainModel`` weights to a temporary file,
+so both backends compute the same function; the maximum output difference
+is printed first. Each backend (``--backends``) is loaded through
+``ModelLoader.for_backend`` and fed inputs in its native dtype (``float64``
+for the Python model, ``float32`` for ONNX Runtime). The throughput table
+times ``predict_batch`` into a reused output buffer for each of
+``--batch-sizes``; the latency table sends single rows from ``--clients``
+threads, directly and through a :class:`MicroBatcher`, and reports requests
+per second and per-request latency percentiles. ``--pool-size``,
+``--intra-op-threads`` and ``--inter-op-threads`` configure the ONNX session
+pool.
+"""
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.main_model.batching import MicroBatcher
+from models.main_model.model import MainModel
+from models.onnx_models.export import export_main_model
+from utils.model_utils.model_loader import INFERENCE_BACKENDS, ModelLoader
+
+_WEIGHTS = Path(__file__).resolve().parents[1] / "models" / "main_model" / "model_weights.h5"
+
+
+def _clients(
+    call: Callable[[np.ndarray], object], rows: np.ndarray, clients: int
+) -> Tuple[float, np.ndarray]:
+    """Wall time and per-request latencies with ``clients`` threads sharing ``rows``."""
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+
+    def _worker(index: int) -> None:
+        record = latencies[index].append
+        for row in rows[index::clients]:
+            started = time.perf_counter()
+            call(row)
+            record(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=_worker, args=(idx,)) for idx in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, np.concatenate([np.asarray(part) for part in latencies])
+
+
+def _throughput(model: Any, inputs: np.ndarray, batch: int, budget: int) -> float:
+    """Rows per second of ``predict_batch`` over ``batch``-row slices."""
+    rows = inputs[:batch]
+    out = np.empty_like(rows)
+    model.predict_batch(rows, out=out)
+    repeats = max(3, budget // batch)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        model.predict_batch(rows, out=out)
+    return repeats * batch / (time.perf_counter() - started)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(INFERENCE_BACKENDS))
+    parser.add_argument("--features", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 1024])
+    parser.add_argument("--rows-per-size", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=None)
+    parser.add_argument("--intra-op-threads", type=int, default=1)
+    parser.add_argument("--inter-op-threads", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    reference = MainModel(_WEIGHTS)
+    reference.load_weights()
+    inputs = np.random.default_rng(0).random((max(args.batch_sizes + [args.requests]), args.features))
+    expected = reference.predict_batch(inputs)
+
+    with tempfile.TemporaryDirectory(prefix="bench_backends_") as tmp:
+        sources: Dict[str, Tuple[Path, Dict[str, Any]]] = {
+            "python": (_WEIGHTS, {}),
+            "onnxruntime": (
+                export_main_model(reference, Path(tmp) / "main_model.onnx"),
+                {
+                    "pool_size": args.pool_size,
+                    "intra_op_threads": args.intra_op_threads,
+                    "inter_op_threads": args.inter_op_threads,
+                },
+            ),
+        }
+        models = {}
+        for backend in args.backends:
+            weights, options = sources[backend]
+            model = models[backend] = ModelLoader.for_backend(backend, weights, **options).load()
+            error = np.abs(model.predict_batch(inputs) - expected).max()
+            print(f"{backend:<12} max |output - python| = {error:.3g}")
+
+        print()
+        print(f"{'rows/s':<12} " + " ".join(f"{f'batch {size}':>14}" for size in args.batch_sizes))
+        for backend, model in models.items():
+            native = inputs.astype(getattr(model, "input_dtype", inputs.dtype))
+            rates = [_throughput(model, native, size, args.rows_per_size) for size in args.batch_sizes]
+            print(f"{backend:<12} " + " ".join(f"{rate:>14,.0f}" for rate in rates))
+
+        print()
+        print(f"{args.clients} client threads, one row per request")
+        print(f"{'backend':<12} {'path':<9} {'req/s':>9} {'p50 us':>8} {'p99 us':>8} {'batch':>6}")
+        for backend, model in models.items():
+            dtype = getattr(model, "input_dtype", inputs.dtype)
+            requests = inputs[: args.requests].astype(dtype)
+            wall, latency = _clients(lambda row: model.predict_batch(row[None, :]), requests, args.clients)
+            p50, p99 = np.percentile(latency, [50, 99]) * 1e6
+            print(f"{backend:<12} {'direct':<9} {len(requests) / wall:>9.0f} {p50:>8.0f} {p99:>8.0f} {1:>6}")
+            with MicroBatcher(model, args.features, dtype=dtype) as batcher:
+                wall, latency = _clients(batcher.predict, requests, args.clients)
+            p50, p99 = np.percentile(latency, [50, 99]) * 1e6
+            print(
+                f"{backend:<12} {'batcher':<9} {len(requests) / wall:>9.0f} {p50:>8.0f} {p99:>8.0f}"
+                f" {batcher.stats.mean_batch:>6.1f}"
+            )
+        for model in models.values():
+            if hasattr(model, "close"):
+                model.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
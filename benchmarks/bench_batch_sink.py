@@ -0,0 +1,76 @@
+"""Compare per-sample JSON files against the batched compressed sink.
+
+Run with ``python -m benchmarks.bench_batch_sink``. Samples are lightweight
+payloads parsed from a synthetic 8-device ``npu-smi info`` table.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+from benchmarks.bench_npu_smi_parse import synthetic_npu_smi_output
+from monitoring.data_collection.batch_sink import BatchedPayloadWriter, iter_batched_payloads
+from monitoring.data_collection.collect_npu import build_npu_payload
+
+# open + write + close per JSON file (fsync not included).
+_SYSCALLS_PER_JSON_FILE = 3
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=3600)
+    parser.add_argument("--devices", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--fsync", default="batch", choices=("never", "batch", "close"))
+    args = parser.parse_args(argv)
+
+    template = build_npu_payload(synthetic_npu_smi_output(args.devices), "", lightweight=True)
+    rng = random.Random(0)
+    payloads = []
+    for idx in range(args.samples):
+        # Jitter every reading so compression is not unrealistically good.
+        metrics = {
+            name: round(value + rng.uniform(-2.0, 2.0), 1)
+            for name, value in template["metrics"].items()
+        }
+        timestamp = f"2024-01-01T{idx // 3600 % 24:02d}:{idx // 60 % 60:02d}:{idx % 60:02d}Z"
+        payloads.append({"collector": "npu-smi", "timestamp": timestamp, "metrics": metrics})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir = Path(tmp) / "json"
+        json_dir.mkdir()
+        began = time.perf_counter()
+        json_bytes = 0
+        for idx, payload in enumerate(payloads):
+            text = json.dumps(payload, indent=2)
+            (json_dir / f"npu_{idx:06d}.json").write_text(text)
+            json_bytes += len(text.encode("utf-8"))
+        json_s = time.perf_counter() - began
+
+        batch_path = Path(tmp) / "npu.npb"
+        began = time.perf_counter()
+        with BatchedPayloadWriter(batch_path, max_samples=args.batch, fsync=args.fsync) as writer:
+            for payload in payloads:
+                writer.write(payload)
+        batch_s = time.perf_counter() - began
+        batch_bytes = batch_path.stat().st_size
+        restored = list(iter_batched_payloads(batch_path))
+        assert restored == payloads, "round trip mismatch"
+
+    json_calls = args.samples * _SYSCALLS_PER_JSON_FILE
+    print(f"samples={args.samples} devices={args.devices} batch={args.batch} fsync={args.fsync}")
+    print(f"{'':14}{'bytes/sample':>14}{'syscalls/sample':>17}{'us/sample':>11}")
+    print(f"{'json files':14}{json_bytes / args.samples:>14.1f}{json_calls / args.samples:>17.3f}"
+          f"{json_s / args.samples * 1e6:>11.1f}")
+    print(f"{'batched':14}{batch_bytes / args.samples:>14.1f}{writer.syscalls / args.samples:>17.3f}"
+          f"{batch_s / args.samples * 1e6:>11.1f}")
+    print(f"reduction: {json_bytes / batch_bytes:.1f}x bytes, "
+          f"{json_calls / max(writer.syscalls, 1):.1f}x syscalls")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
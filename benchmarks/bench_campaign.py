@@ -0,0 +1,51 @@
+"""Measure fault-campaign throughput as the worker count grows.
+
+Run with ``python -m benchmarks.bench_campaign``. The same sweep (every
+layer x five fault kinds x ``--repeats``) is run from scratch into a
+temporary directory once per ``--workers`` value; the table reports trials
+per second and the speed-up over the first entry. Speed-up is bounded by the
+number of CPU cores.
+"""
+import argparse
+import os
+import tempfile
+from typing import Optional, Sequence
+
+from fault_detection.fault_injection.campaign import SweepSpec, run_campaign
+
+_FAULTS = {
+    "scale": [0.5, 2.0, 10.0],
+    "stuck_at": [0.0, 1.0],
+    "bit_flip": [0, 2, 4],
+    "noise": [0.01, 0.1],
+    "jitter": [0.05],
+}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-size", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    spec = SweepSpec(faults=_FAULTS, repeats=args.repeats)
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'workers':>7} {'trials':>8} {'seconds':>9} {'trials/s':>10} {'speed-up':>9}")
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as root:
+            result = run_campaign(
+                spec, root, workers=workers, chunk_size=args.chunk_size, resume=False
+            )
+        rate = result.trials_per_second
+        baseline = baseline or rate
+        print(
+            f"{workers:>7} {result.completed:>8} {result.elapsed_seconds:>9.2f}"
+            f" {rate:>10.0f} {rate / baseline:>8.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
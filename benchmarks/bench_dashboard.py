@@ -0,0 +1,73 @@
+"""Time dashboard views over a large telemetry store against drawing every sample.
+
+Run with ``python -m benchmarks.bench_dashboard``. A store of ``--samples``
+one-second samples is written to a temporary directory; the baseline reads the
+whole metric and renders it at full resolution, the dashboard path reduces
+each view to ``--width`` points (cold, then from the cache) before rendering.
+"""
+import argparse
+import tempfile
+import time
+from typing import Optional, Sequence
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+from matplotlib.figure import Figure
+
+from monitoring.analysis.dashboard import DashboardData
+from monitoring.analysis.visualize import render_dashboard_figure
+from monitoring.storage.telemetry_store import TelemetryStore
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=10_000_000)
+    parser.add_argument("--width", type=int, default=1200)
+    parser.add_argument("--method", choices=("lttb", "minmax"), default="lttb")
+    parser.add_argument("--skip-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    timestamps = 1.7e9 + np.arange(args.samples, dtype=np.float64)
+    values = 60.0 + rng.normal(0.0, 1.0, args.samples).cumsum() * 0.01
+    values[rng.integers(0, args.samples, 20)] += 40.0
+
+    with tempfile.TemporaryDirectory() as root:
+        TelemetryStore(root).append_many(timestamps, {"temperature": values})
+        del timestamps, values
+
+        if not args.skip_baseline:
+            started = time.perf_counter()
+            ts, series = TelemetryStore(root).read("temperature")
+            fig = Figure(figsize=(12, 4))
+            fig.add_subplot().plot(ts, series, linewidth=1)
+            fig.savefig(f"{root}/full.png")
+            print(f"full resolution read + render: {time.perf_counter() - started:8.3f} s")
+
+        data = DashboardData(store=root, method=args.method)
+        views = [("all", None), ("last 24 h", 86400.0)]
+        for label, last_seconds in views:
+            started = time.perf_counter()
+            x, _ = data.series("temperature", width=args.width, last_seconds=last_seconds)
+            cold = time.perf_counter() - started
+            started = time.perf_counter()
+            data.series("temperature", width=args.width, last_seconds=last_seconds)
+            warm = time.perf_counter() - started
+            started = time.perf_counter()
+            render_dashboard_figure(
+                data, "temperature", width=args.width, last_seconds=last_seconds
+            ).savefig(f"{root}/view.png")
+            render = time.perf_counter() - started
+            print(
+                f"{label:<10} {x.size:5d} points  cold {cold * 1e3:8.1f} ms"
+                f"  cached {warm * 1e3:6.3f} ms  render {render * 1e3:7.1f} ms"
+            )
+        data.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
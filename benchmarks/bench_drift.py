@@ -0,0 +1,44 @@
+"""Measure DriftDetector update cost as the number of series grows.
+
+Run with ``python -m benchmarks.bench_drift``. For each ``--series`` count a
+seeded standard-normal stream (with a one-sigma shift injected into every
+tenth series halfway through) is fed to a detector running ``--tests``; the
+table reports microseconds per update (one sample of every series), series
+samples per second and the drift episodes found.
+"""
+import argparse
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from fault_detection.fault_analysis.drift import DRIFT_TESTS, DriftDetector
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--series", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--tests", nargs="+", choices=DRIFT_TESTS, default=list(DRIFT_TESTS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'series':>7} {'us/update':>10} {'samples/s':>12} {'episodes':>9}")
+    for count in args.series:
+        rng = np.random.default_rng(args.seed)
+        values = rng.standard_normal((args.samples, count))
+        values[args.samples // 2 :, ::10] += 1.0
+        detector = DriftDetector(count, tests=args.tests, warmup=min(200, args.samples // 4))
+        start = time.perf_counter()
+        detector.run(values)
+        elapsed = time.perf_counter() - start
+        episodes = len(detector.close())
+        print(
+            f"{count:>7} {elapsed / args.samples * 1e6:>10.1f}"
+            f" {args.samples * count / elapsed:>12.0f} {episodes:>9}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
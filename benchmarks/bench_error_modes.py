@@ -0,0 +1,72 @@
+"""Measure anomaly-window classification throughput against the mode catalog.
+
+Run with ``python -m benchmarks.bench_error_modes``. A seeded fleet frame
+(``--devices`` NPUs reporting temperature, HBM and utilization) gets one
+anomaly span per device, and the frame's column layout is resolved once up
+front, as ``ErrorModeClassifier.classify_frame`` does; the table reports microseconds per window for
+window extraction, feature computation and index lookup, and windows per
+second end to end, for each ``--batch`` size of spans classified per call.
+"""
+import argparse
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from fault_detection.error_modes.signatures import (
+    ErrorModeClassifier,
+    device_columns,
+    frame_windows,
+)
+from monitoring.analysis.timeseries import TimeSeriesFrame
+
+
+def _fleet(devices: int, samples: int, seed: int) -> TimeSeriesFrame:
+    rng = np.random.default_rng(seed)
+    names = []
+    columns = []
+    for device in range(devices):
+        prefix = f"npu{device}_chip0"
+        names += [f"{prefix}_temp_c", f"{prefix}_hbm_used_mb", f"{prefix}_aicore_pct"]
+        columns += [
+            60.0 + rng.normal(0.0, 0.5, samples),
+            4096.0 + np.linspace(0.0, rng.uniform(0.0, 4000.0), samples),
+            70.0 + rng.normal(0.0, 3.0, samples),
+        ]
+    return TimeSeriesFrame(np.arange(float(samples)), np.column_stack(columns), names)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=300)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 64, 2000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    frame = _fleet(args.devices, args.samples, args.seed)
+    classifier = ErrorModeClassifier()
+    columns = device_columns(frame, classifier.library)
+    spans = [(f"npu{device}_chip0", 50.0, 250.0) for device in range(args.devices)]
+    print(f"{'batch':>6} {'extract us':>11} {'features us':>12} {'lookup us':>10} {'windows/s':>10}")
+    for batch in args.batch:
+        timing = np.zeros(3)
+        for offset in range(0, len(spans), batch):
+            chunk = spans[offset : offset + batch]
+            start = time.perf_counter()
+            windows = frame_windows(frame, chunk, classifier.library, columns=columns)
+            extracted = time.perf_counter()
+            features = classifier.features(windows)
+            computed = time.perf_counter()
+            classifier.index.classify(features)
+            timing += [extracted - start, computed - extracted, time.perf_counter() - computed]
+        per_window = timing / len(spans) * 1e6
+        print(
+            f"{batch:>6} {per_window[0]:>11.1f} {per_window[1]:>12.1f} {per_window[2]:>10.1f}"
+            f" {len(spans) / timing.sum():>10.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+"""Measure cold import time of package entry points and which heavy modules they load.
+
+Run with ``python -m benchmarks.bench_import_time``. Every target is imported
+in a fresh interpreter ``--repeat`` times; the table reports the best import
+time, the best wall time of the whole process, and whether NumPy, matplotlib
+or Gradio ended up in ``sys.modules``. ``pkg:attr`` targets also resolve one
+attribute through the package facade.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from typing import List, Optional, Sequence
+
+_HEAVY = ("numpy", "matplotlib", "gradio")
+_TARGETS = (
+    "monitoring",
+    "monitoring.data_collection.__main__",
+    "monitoring.data_collection.sampler",
+    "monitoring.analysis",
+    "monitoring.analysis:TimeSeriesFrame",
+    "monitoring.analysis.visualize",
+    "monitoring.analysis:plot_metric_timeseries",
+    "monitoring.analysis.report",
+    "matplotlib.pyplot",
+)
+_PROBE = """
+import importlib, json, sys, time
+module, _, attr = sys.argv[1].partition(":")
+started = time.perf_counter()
+value = importlib.import_module(module)
+if attr:
+    getattr(value, attr)
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [n for n in sys.argv[2:] if n in sys.modules]}))
+"""
+
+
+def _measure(target: str, repeat: int) -> dict:
+    best_import = best_wall = float("inf")
+    loaded: List[str] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE, target, *_HEAVY],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        best_wall = min(best_wall, time.perf_counter() - started)
+        result = json.loads(output)
+        best_import = min(best_import, result["seconds"])
+        loaded = result["loaded"]
+    return {"import": best_import, "wall": best_wall, "loaded": loaded}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("targets", nargs="*", default=list(_TARGETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    baseline = _measure("sys", args.repeat)["wall"]
+    print(f"interpreter startup: {baseline * 1e3:7.1f} ms")
+    print(f"{'target':<44} {'import':>9} {'process':>9}  heavy modules")
+    for target in args.targets:
+        result = _measure(target, args.repeat)
+        print(
+            f"{target:<44} {result['import'] * 1e3:7.1f}ms {result['wall'] * 1e3:7.1f}ms"
+            f"  {', '.join(result['loaded']) or '-'}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
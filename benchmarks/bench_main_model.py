@@ -0,0 +1,131 @@
+"""Compare MainModel.predict lists with predict_batch arrays and micro-batching.
+
+Run with ``python -m benchmarks.bench_main_model``. The throughput table
+scores ``--rows`` x ``--features`` inputs through the list path (one
+``predict`` call per row, and one call over the flattened list), through
+``predict_batch`` into a new array and into a reused output buffer. The
+latency table sends one row per request from ``--clients`` threads, first
+straight to ``predict`` and then through a :class:`MicroBatcher` for each
+``--delay`` budget (0 dispatches whatever is queued as soon as the worker is
+free), and reports requests per second, per-request latency percentiles and
+the mean batch size. The placeholder model costs microseconds per call, less
+than a thread hand-off, so the latency table adds ``--call-overhead``
+seconds of fixed cost to every model call, one call at a time like launches
+on a single device; pass 0 to measure the bare model.
+"""
+import argparse
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from models.main_model.batching import MicroBatcher
+from models.main_model.model import MainModel
+
+_WEIGHTS = Path(__file__).resolve().parents[1] / "models" / "main_model" / "model_weights.h5"
+
+
+class _OverheadModel(MainModel):
+    """MainModel whose calls pay a fixed overhead on one serialized device."""
+
+    def __init__(self, weights_path: Path, overhead: float) -> None:
+        super().__init__(weights_path)
+        self.overhead = overhead
+        self._device = threading.Lock()
+
+    def predict(self, inputs):  # type: ignore[no-untyped-def]
+        with self._device:
+            time.sleep(self.overhead)
+            return super().predict(inputs)
+
+    def predict_batch(self, inputs, out=None):  # type: ignore[no-untyped-def]
+        with self._device:
+            time.sleep(self.overhead)
+            return super().predict_batch(inputs, out)
+
+
+def _best(run: Callable[[], object], repeats: int = 3) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def _clients(
+    call: Callable[[np.ndarray], object], rows: np.ndarray, clients: int
+) -> Tuple[float, np.ndarray]:
+    """Wall time and per-request latencies with ``clients`` threads sharing ``rows``."""
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+
+    def _worker(index: int) -> None:
+        record = latencies[index].append
+        for row in rows[index::clients]:
+            started = time.perf_counter()
+            call(row)
+            record(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=_worker, args=(idx,)) for idx in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, np.concatenate([np.asarray(part) for part in latencies])
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--features", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--delay", type=float, nargs="+", default=[0.0, 0.0005, 0.002])
+    parser.add_argument("--call-overhead", type=float, default=0.0002)
+    parser.add_argument("--max-batch", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    model = MainModel(_WEIGHTS)
+    model.load_weights()
+    inputs = np.random.default_rng(0).random((args.rows, args.features))
+    values = inputs.size
+    as_lists = inputs.tolist()
+    flat = inputs.ravel().tolist()
+    out = np.empty_like(inputs)
+    throughput = [
+        ("predict per row", _best(lambda: [model.predict(row) for row in as_lists], 1)),
+        ("predict flattened", _best(lambda: model.predict(flat), 1)),
+        ("predict_batch", _best(lambda: model.predict_batch(inputs))),
+        ("predict_batch out=", _best(lambda: model.predict_batch(inputs, out=out))),
+    ]
+    baseline = throughput[0][1]
+    print(f"{'path':<20} {'seconds':>9} {'Mvalues/s':>10} {'speed-up':>9}")
+    for name, seconds in throughput:
+        print(f"{name:<20} {seconds:>9.4f} {values / seconds / 1e6:>10.1f} {baseline / seconds:>8.1f}x")
+
+    requests = inputs[: args.requests]
+    model = _OverheadModel(_WEIGHTS, args.call_overhead)
+    model.load_weights()
+    print()
+    print(f"per-call overhead: {args.call_overhead * 1e6:.0f} us, {args.clients} client threads")
+    print(f"{'path':<22} {'req/s':>9} {'p50 us':>8} {'p99 us':>8} {'batch':>6}")
+    wall, latency = _clients(lambda row: model.predict(row.tolist()), requests, args.clients)
+    p50, p99 = np.percentile(latency, [50, 99]) * 1e6
+    print(f"{'predict per request':<22} {len(requests) / wall:>9.0f} {p50:>8.0f} {p99:>8.0f} {1:>6}")
+    for delay in args.delay:
+        with MicroBatcher(model, args.features, args.max_batch, delay) as batcher:
+            wall, latency = _clients(batcher.predict, requests, args.clients)
+        p50, p99 = np.percentile(latency, [50, 99]) * 1e6
+        name = f"batcher {delay * 1e3:g} ms"
+        print(
+            f"{name:<22} {len(requests) / wall:>9.0f} {p50:>8.0f} {p99:>8.0f}"
+            f" {batcher.stats.mean_batch:>6.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
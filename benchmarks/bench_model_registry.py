@@ -0,0 +1,78 @@
+"""Compare ModelLoader.load with shared ModelRegistry lookups.
+
+Run with ``python -m benchmarks.bench_model_registry``. Writes a
+``--size-mb`` placeholder weights file to a temporary directory and times a
+fresh ``ModelLoader.load`` (read, hash and derive the weights every call)
+against the registry: a cold miss, a warm hit (one ``os.stat``), a hit after
+the file's mtime changed but its contents did not (re-hash, no reload), and
+``--threads`` threads asking for a cold key at once (one load between them).
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+from utils.model_utils.model_loader import ModelLoader
+from utils.model_utils.registry import ModelRegistry
+
+
+def _timed(run: Callable[[], object], repeats: int = 1) -> float:
+    """Mean seconds per call over ``repeats`` calls."""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        run()
+    return (time.perf_counter() - started) / repeats
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=32.0)
+    parser.add_argument("--hits", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench_registry_") as tmp:
+        weights = Path(tmp) / "model_weights.h5"
+        line = "placeholder weights for the registry benchmark\n"
+        weights.write_text(line * max(1, int(args.size_mb * (1 << 20)) // len(line)))
+        loader = ModelLoader("models.main_model.model", "MainModel", weights)
+        registry = ModelRegistry()
+        shared = ModelLoader(loader.module_path, loader.class_name, weights, registry=registry)
+
+        rows = [
+            ("ModelLoader.load", _timed(loader.load, 3)),
+            ("registry miss", _timed(shared.shared)),
+            ("registry hit", _timed(shared.shared, args.hits)),
+        ]
+        stamp = time.time_ns()
+        os.utime(weights, ns=(stamp, stamp))
+        rows.append(("hit after touch", _timed(shared.shared)))
+
+        registry.invalidate()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(shared.shared()))
+            for _ in range(args.threads)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rows.append((f"{args.threads} threads cold", time.perf_counter() - started))
+
+    baseline = rows[0][1]
+    print(f"weights file: {args.size_mb:g} MB")
+    print(f"{'path':<20} {'ms/call':>10} {'speed-up':>10}")
+    for name, seconds in rows:
+        print(f"{name:<20} {seconds * 1e3:>10.4f} {baseline / seconds:>9.0f}x")
+    print(f"distinct instances from threads: {len({id(model) for model in results})}")
+    print(registry.stats.as_dict())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
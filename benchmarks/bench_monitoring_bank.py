@@ -0,0 +1,85 @@
+"""Compare one MonitoringModel per stream against a single MonitoringBank.
+
+Run with ``python -m benchmarks.bench_monitoring_bank``. Each tick carries one
+sample for every stream; per-model timings use the first ``--legacy-ticks``
+ticks because they are a Python call per sample. An accuracy table then
+compares the bank's scores and ``flag_anomalies`` output with one
+``MonitoringModel`` per stream on a large common offset with a tiny spread,
+huge magnitudes whose squares overflow, and level shifts. The exit status is 1
+if any score differs by more than ``--tolerance`` or any flag differs.
+"""
+import argparse
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from models.monitoring_model.bank import MonitoringBank
+from models.monitoring_model.model import MonitoringModel
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=4096)
+    parser.add_argument("--ticks", type=int, default=2000)
+    parser.add_argument("--legacy-ticks", type=int, default=100)
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--tolerance", type=float, default=1e-3)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    ticks = rng.normal(60.0, 5.0, (args.ticks, args.streams))
+
+    models = [MonitoringModel(args.window) for _ in range(args.streams)]
+    started = time.perf_counter()
+    for tick in ticks[: args.legacy_ticks]:
+        for model, value in zip(models, tick.tolist()):
+            model.update(value)
+    legacy = (time.perf_counter() - started) / args.legacy_ticks
+
+    bank = MonitoringBank(
+        (f"stream{idx}" for idx in range(args.streams)),
+        window_size=args.window,
+        capacity=args.streams,
+    )
+    started = time.perf_counter()
+    bank.bulk_score(ticks)
+    batched = (time.perf_counter() - started) / args.ticks
+
+    print(f"{args.streams} streams, window {args.window}")
+    print(f"  MonitoringModel per stream: {legacy * 1e3:8.2f} ms/tick")
+    print(f"  MonitoringBank:             {batched * 1e3:8.2f} ms/tick ({legacy / batched:.0f}x)")
+
+    streams = 8
+    cases = [
+        ("offset 1e8, spread 1e-3", 1e8 + rng.uniform(0.0, 1e-3, (3000, streams)), 2),
+        ("offset 1e8, spread 1e-3", 1e8 + rng.uniform(0.0, 1e-3, (3000, streams)), 32),
+        ("mixed +-1e307", rng.choice([1e307, -1e307, 1.0], (3000, streams)) * rng.random((3000, streams)), 8),
+        (
+            "level shifts 1e9",
+            np.where((np.arange(3000) // 100 % 2)[:, None] == 1, 1e9, 0.0) + rng.normal(0.0, 1.0, (3000, streams)),
+            16,
+        ),
+    ]
+    print()
+    print(f"{'input':<24} {'window':>7} {'max |score - model score|':>26} {'flag diffs':>11}")
+    failed = False
+    for name, values, window in cases:
+        names = [f"stream{idx}" for idx in range(streams)]
+        bank_scores = MonitoringBank(names, window_size=window).bulk_score(values)
+        bank_flags = MonitoringBank(names, window_size=window, anomaly_z=1.5).flag_anomalies(values)
+        error = 0.0
+        flag_diffs = 0
+        for idx, stream in enumerate(names):
+            column = values[:, idx].tolist()
+            model_scores = np.asarray(MonitoringModel(window).bulk_score(column))
+            error = max(error, float(np.max(np.abs(bank_scores[:, idx] - model_scores))))
+            model_flags = MonitoringModel(window, anomaly_z=1.5).flag_anomalies(column)
+            flag_diffs += len(set(model_flags) ^ set(bank_flags[stream]))
+        failed |= error > args.tolerance or flag_diffs > 0
+        print(f"{name:<24} {window:>7} {error:>26.3g} {flag_diffs:>11}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,73 @@
+"""Benchmark `npu-smi info` table parsing on synthetic multi-device hosts.
+
+Run with ``python -m benchmarks.bench_npu_smi_parse``. Parse cost is reported
+as a fraction of the 1 Hz sampling interval.
+"""
+import argparse
+import timeit
+from typing import List, Optional, Sequence
+
+from monitoring.data_collection.collect_npu import parse_npu_smi_output, parse_npu_smi_table
+
+_SEPARATOR = "+===========================+===============+====================================================+"
+
+
+def synthetic_npu_smi_output(devices: int) -> str:
+    """Render an `npu-smi info` table (910B layout) for ``devices`` NPUs."""
+    lines: List[str] = [
+        "+------------------------------------------------------------------------------------------------+",
+        "| npu-smi 23.0.rc2                 Version: 23.0.rc2                                             |",
+        "+---------------------------+---------------+----------------------------------------------------+",
+        "| NPU   Name                | Health        | Power(W)    Temp(C)           Hugepages-Usage(page)|",
+        "| Chip                      | Bus-Id        | AICore(%)   Memory-Usage(MB)  HBM-Usage(MB)        |",
+        _SEPARATOR,
+    ]
+    for idx in range(devices):
+        health = "OK" if idx % 17 else "Warning"
+        power = "NA" if idx % 97 == 96 else f"{60 + idx % 30:.1f}"
+        lines.append(
+            f"| {idx:<5} 910B                | {health:<13} | {power:<11} {30 + idx % 40:<17} 0    / 0             |"
+        )
+        bus = f"0000:{(idx // 256) % 256:02X}:{idx % 256:02X}.0"
+        lines.append(
+            f"| 0                         | {bus:<13} | {idx % 101:<11} {1000 + idx:<5}/ 15039      {2000 + idx:<5}/ 32768         |"
+        )
+        lines.append(_SEPARATOR)
+    lines.extend(
+        [
+            "+---------------------------+---------------+----------------------------------------------------+",
+            "| NPU     Chip              | Process id    | Process name             | Process memory(MB)      |",
+            _SEPARATOR,
+            "| No running processes found in NPU 0                                                            |",
+            _SEPARATOR,
+        ]
+    )
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 64, 1024])
+    parser.add_argument("--interval", type=float, default=1.0, help="sampling interval in seconds")
+    args = parser.parse_args(argv)
+
+    print(f"{'devices':>8} {'table_ms':>10} {'full_ms':>10} {'% of interval':>14}")
+    for size in args.sizes:
+        output = synthetic_npu_smi_output(size)
+        table = parse_npu_smi_table(output)
+        assert len(table["device_id"]) == size, "fixture/parser mismatch"
+        timer = timeit.Timer(lambda: parse_npu_smi_table(output))
+        loops, _ = timer.autorange()
+        table_s = min(timer.repeat(repeat=5, number=loops)) / loops
+        timer = timeit.Timer(lambda: parse_npu_smi_output(output))
+        loops, _ = timer.autorange()
+        full_s = min(timer.repeat(repeat=5, number=loops)) / loops
+        print(
+            f"{size:>8} {table_s * 1e3:>10.3f} {full_s * 1e3:>10.3f} "
+            f"{100.0 * full_s / args.interval:>13.3f}%"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,75 @@
+"""Measure PropagationGraph build, propagation and root-cause ranking times.
+
+Run with ``python -m benchmarks.bench_propagation_graph``. A seeded random
+chip -> HBM -> operator -> layer -> metric DAG is built at each ``--scale``
+(operators, layers and metrics grow with it); for every graph the table
+reports the build time, the one-off per-node reach counts, one full ``max``
+propagation and the mean time to rank root causes for the anomalous metrics
+of a random operator.
+"""
+import argparse
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fault_detection.fault_analysis.propagation_graph import PropagationGraph
+
+
+def _topology(scale: int, seed: int) -> List[Tuple[str, str, float]]:
+    rng = np.random.default_rng(seed)
+    tiers = [
+        [f"chip{i}" for i in range(max(1, scale // 128))],
+        [f"hbm{i}" for i in range(max(1, scale // 16))],
+        [f"op{i}" for i in range(scale)],
+        [f"layer{i}" for i in range(2 * scale)],
+        [f"metric{i}" for i in range(3 * scale)],
+    ]
+    edges = []
+    for parents, children in zip(tiers, tiers[1:]):
+        fan_in = min(len(parents), 1 if parents is tiers[0] else 3)
+        for child in children:
+            for parent in rng.choice(len(parents), fan_in, replace=False):
+                edges.append((parents[parent], child, float(rng.uniform(0.3, 1.0))))
+    return edges
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    print(
+        f"{'nodes':>8} {'edges':>8} {'build ms':>9} {'reach ms':>9}"
+        f" {'prop ms':>8} {'rank ms':>8}"
+    )
+    for scale in args.scale:
+        edges = _topology(scale, args.seed)
+        start = time.perf_counter()
+        graph = PropagationGraph(edges)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        graph.reach_counts
+        reach = time.perf_counter() - start
+        start = time.perf_counter()
+        graph.propagate(["chip0"])
+        prop = time.perf_counter() - start
+        queries = [
+            graph.reachable_metrics(f"op{idx}") for idx in rng.integers(0, scale, args.queries)
+        ]
+        start = time.perf_counter()
+        for anomalous in queries:
+            graph.rank_root_causes(anomalous, top=5)
+        rank = (time.perf_counter() - start) / len(queries)
+        print(
+            f"{len(graph):>8} {graph.sources.size:>8} {build * 1e3:>9.1f} {reach * 1e3:>9.1f}"
+            f" {prop * 1e3:>8.2f} {rank * 1e3:>8.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+"""Compare the rolling-window engine against the legacy per-sample recomputation.
+
+Run with ``python -m benchmarks.bench_rolling``. For each window size the
+streaming monitor (``MonitoringModel.update``) and the batch rolling average
+(``rolling_average``) are timed against their previous implementations, which
+recomputed ``statistics.mean``/``pstdev`` over the whole window every sample.
+Legacy timings use a prefix of the series, since they are O(n * window).
+An accuracy table then compares the streaming scores with the legacy
+``pstdev`` scores on inputs that stress the sliding update: a large common
+offset with a tiny spread, huge magnitudes whose squares overflow, and level
+shifts. The exit status is 1 if any score differs by more than ``--tolerance``.
+"""
+import argparse
+import random
+import time
+from collections import deque
+from statistics import mean, pstdev
+from typing import Callable, List, Optional, Sequence
+
+from fault_detection.fault_analysis.analysis import rolling_average
+from models.monitoring_model.model import MonitoringModel
+
+
+def _legacy_update_scores(metrics: Sequence[float], window_size: int) -> List[float]:
+    window: deque = deque(maxlen=window_size)
+    scores: List[float] = []
+    for metric in metrics:
+        window.append(metric)
+        if len(window) < window_size:
+            scores.append(0.0)
+            continue
+        sigma = pstdev(window) or 1.0
+        scores.append(abs(metric - mean(window)) / sigma)
+    return scores
+
+
+def _legacy_rolling_average(metrics: Sequence[float], window: int) -> List[float]:
+    return [mean(metrics[max(0, idx - window + 1) : idx + 1]) for idx in range(len(metrics))]
+
+
+def _per_sample_us(func: Callable[[], object], samples: int) -> float:
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) / samples * 1e6
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=200_000)
+    parser.add_argument("--legacy-samples", type=int, default=5_000)
+    parser.add_argument("--windows", type=int, nargs="+", default=[5, 600, 3600])
+    parser.add_argument("--tolerance", type=float, default=1e-3)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    series = [60.0 + rng.gauss(0.0, 5.0) for _ in range(args.samples)]
+    legacy = series[: args.legacy_samples]
+
+    print(f"{'window':>7} {'path':>9} {'legacy us':>10} {'engine us':>10} {'speedup':>8}")
+    for window in args.windows:
+        legacy_us = _per_sample_us(lambda: _legacy_update_scores(legacy, window), len(legacy))
+        engine_us = _per_sample_us(lambda: MonitoringModel(window).bulk_score(series), len(series))
+        print(f"{window:>7} {'stream':>9} {legacy_us:>10.2f} {engine_us:>10.2f} {legacy_us / engine_us:>7.0f}x")
+        legacy_us = _per_sample_us(lambda: _legacy_rolling_average(legacy, window), len(legacy))
+        engine_us = _per_sample_us(lambda: rolling_average(series, window), len(series))
+        print(f"{window:>7} {'batch':>9} {legacy_us:>10.2f} {engine_us:>10.3f} {legacy_us / engine_us:>7.0f}x")
+
+    cases = [
+        ("offset 1e8, spread 1e-3", [1e8 + rng.uniform(0.0, 1e-3) for _ in range(3000)], 2),
+        ("offset 1e8, spread 1e-3", [1e8 + rng.uniform(0.0, 1e-3) for _ in range(3000)], 32),
+        ("0.3 then 1e307", [0.3] * 32 + [1e307] * 3, 32),
+        ("mixed +-1e307", [rng.choice([1e307, -1e307, 1.0]) * rng.random() for _ in range(3000)], 8),
+        ("level shifts 1e9", [(1e9 if (i // 100) % 2 else 0.0) + rng.gauss(0.0, 1.0) for i in range(3000)], 16),
+    ]
+    print()
+    print(f"{'input':<24} {'window':>7} {'max |score - pstdev score|':>27}")
+    failed = False
+    for name, values, window in cases:
+        engine = MonitoringModel(window).bulk_score(values)
+        error = max(abs(a - b) for a, b in zip(engine, _legacy_update_scores(values, window)))
+        failed |= error > args.tolerance
+        print(f"{name:<24} {window:>7} {error:>27.3g}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+"""Benchmark range reads from the chunked telemetry store.
+
+Run with ``python -m benchmarks.bench_telemetry_store``. Builds a week of 1 Hz
+samples in a temporary store and compares metric reads against parsing the
+same data as one JSON file per sample (extrapolated from a small sample).
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from monitoring.storage.telemetry_store import TelemetryStore
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=7.0)
+    parser.add_argument("--metrics", type=int, default=16)
+    parser.add_argument("--json-sample", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    rows = int(args.days * 86400)
+    rng = np.random.default_rng(0)
+    start = 1.7e9
+    ts = start + np.arange(rows, dtype=np.float64)
+    names = [f"metric_{idx}" for idx in range(args.metrics)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "store"
+        store = TelemetryStore(root)
+        began = time.perf_counter()
+        store.append_many(ts, {name: rng.normal(size=rows) for name in names})
+        write_s = time.perf_counter() - began
+
+        reopened = TelemetryStore(root)
+        began = time.perf_counter()
+        _, values = reopened.read("metric_3")
+        full_s = time.perf_counter() - began
+        assert values.size == rows
+        began = time.perf_counter()
+        _, hour = reopened.read("metric_3", start + rows / 2, start + rows / 2 + 3600)
+        hour_s = time.perf_counter() - began
+
+        json_dir = Path(tmp) / "json"
+        json_dir.mkdir()
+        for idx in range(args.json_sample):
+            payload = {
+                "collector": "npu-smi",
+                "timestamp": float(ts[idx]),
+                "metrics": {name: float(idx) for name in names},
+            }
+            (json_dir / f"npu_{idx:07d}.json").write_text(json.dumps(payload, indent=2))
+        began = time.perf_counter()
+        for path in sorted(json_dir.iterdir()):
+            json.loads(path.read_text())["metrics"]["metric_3"]
+        json_s = (time.perf_counter() - began) / args.json_sample * rows
+
+    print(f"rows={rows} metrics={args.metrics}")
+    print(f"bulk write                : {write_s * 1e3:10.1f} ms")
+    print(f"read one metric, all rows : {full_s * 1e3:10.2f} ms")
+    print(f"read one metric, one hour : {hour_s * 1e3:10.2f} ms ({hour.size} rows)")
+    print(f"JSON-per-sample (extrap.) : {json_s * 1e3:10.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
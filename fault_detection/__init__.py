@@ -0,0 +1,7 @@
+"""Fault injection and fault analysis."""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["error_modes", "fault_analysis", "fault_injection"],
+)
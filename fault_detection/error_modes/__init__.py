@@ -0,0 +1,28 @@
+"""Error-mode catalog, signatures and anomaly-window classification (imported lazily).
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "signatures": [
+            "FEATURES",
+            "MODE_STATUSES",
+            "WINDOW_POINTS",
+            "SIGNATURES_PATH",
+            "KNOWN_MODES_PATH",
+            "UNKNOWN_MODES_PATH",
+            "ErrorModeSignature",
+            "SignatureLibrary",
+            "SignatureIndex",
+            "ModeMatch",
+            "UnknownModeLog",
+            "ErrorModeClassifier",
+            "read_mode_catalog",
+            "window_features",
+            "device_columns",
+            "frame_windows",
+            "anomaly_spans",
+        ],
+    },
+)
@@ -0,0 +1,564 @@
+"""
+Error-mode signatures and a nearest-prototype classifier for anomaly windows.
+
+``known_error_modes.txt`` names the failure modes; ``signatures.json`` (next to
+it) describes each one as a feature vector over a few device metrics
+(``temperature_c``, ``hbm_usage_mb``, ``npu_utilization``, with the
+``npu-smi`` spellings as aliases). Every window is resampled to
+``WINDOW_POINTS`` samples and described per metric, in units of the metric's
+``scale``, by:
+
+* ``level``: mean of the second half minus mean of the first half;
+* ``slope``: least-squares change across the window;
+* ``spread``: standard deviation around that trend;
+* ``spikes``: share of samples more than two scales off the trend;
+* ``dropouts``: share of missing (NaN) samples.
+
+A metric the device does not report at all (no such column) is not a
+dropout: its features are NaN and left out of every distance.
+
+:class:`SignatureIndex` keeps the weighted prototypes in one matrix, so a
+batch of windows is classified with a single matrix product (a few
+microseconds per window). A window close to no change is ``"nominal"``; one
+within a mode's radius is ``"known"``; anything else is ``"unknown"`` and is
+appended, once per distinct signature, to an :class:`UnknownModeLog` in the
+one-line-per-entry style of ``unknown_error_modes.txt`` for review.
+"""
+import json
+import weakref
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from monitoring.analysis.timeseries import TimeSeriesFrame
+from monitoring.data_collection.collect_npu import split_device_metric
+
+__all__ = [
+    "FEATURES",
+    "MODE_STATUSES",
+    "WINDOW_POINTS",
+    "SIGNATURES_PATH",
+    "KNOWN_MODES_PATH",
+    "UNKNOWN_MODES_PATH",
+    "ErrorModeSignature",
+    "SignatureLibrary",
+    "SignatureIndex",
+    "ModeMatch",
+    "UnknownModeLog",
+    "ErrorModeClassifier",
+    "read_mode_catalog",
+    "window_features",
+    "device_columns",
+    "frame_windows",
+    "anomaly_spans",
+]
+
+FEATURES = ("level", "slope", "spread", "spikes", "dropouts")
+MODE_STATUSES = ("known", "nominal", "unknown")
+WINDOW_POINTS = 32
+SIGNATURES_PATH = Path(__file__).with_name("signatures.json")
+KNOWN_MODES_PATH = Path(__file__).with_name("known_error_modes.txt")
+UNKNOWN_MODES_PATH = Path(__file__).with_name("unknown_error_modes.txt")
+
+_SPIKE_SCALES = 2.0
+# Features that are shares of the window, in [0, 1].
+_SHARE_FEATURES = ("spikes", "dropouts")
+# Features are rounded to this step when deciding whether an unknown
+# signature was already logged.
+_DEDUPE_STEP = 0.5
+
+Span = Tuple[str, float, float]
+
+
+def read_mode_catalog(path: Union[Path, str] = KNOWN_MODES_PATH) -> List[str]:
+    """Mode names listed one per line (blank lines ignored)."""
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+def window_features(
+    windows: np.ndarray, scales: np.ndarray, present: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Feature matrix of ``(windows, points, metrics)`` values.
+
+    Returns ``(windows, metrics * len(FEATURES))``, metric-major
+    (``metric0.level, metric0.slope, ..., metric1.level, ...``). ``present``
+    is an optional ``(windows, metrics)`` mask; the features of metrics it
+    marks absent are NaN rather than a total dropout.
+    """
+    windows = np.asarray(windows, dtype=np.float64)
+    if windows.ndim == 2:
+        windows = windows[None]
+    count, points, metrics = windows.shape
+    scales = np.asarray(scales, dtype=np.float64).reshape(1, metrics)
+    missing = np.isnan(windows)
+    dropouts = missing.mean(axis=1)
+    observed = np.maximum(points - missing.sum(axis=1), 1)
+    mean = np.where(missing, 0.0, windows).sum(axis=1) / observed
+    filled = np.where(missing, mean[:, None, :], windows)
+    half = points // 2
+    level = filled[:, half:].mean(axis=1) - filled[:, :half].mean(axis=1)
+    ramp = np.linspace(-1.0, 1.0, points)[None, :, None]
+    coefficient = (ramp * (filled - mean[:, None, :])).sum(axis=1) / float((ramp**2).sum())
+    residual = filled - mean[:, None, :] - coefficient[:, None, :] * ramp
+    spread = residual.std(axis=1)
+    spikes = (np.abs(residual) > _SPIKE_SCALES * scales[:, None, :]).mean(axis=1)
+    features = np.stack(
+        [level / scales, 2.0 * coefficient / scales, spread / scales, spikes, dropouts], axis=2
+    )
+    if present is not None:
+        features[~np.asarray(present, dtype=bool).reshape(count, metrics)] = np.nan
+    return features.reshape(count, metrics * len(FEATURES))
+
+
+@dataclass
+class ErrorModeSignature:
+    """One catalogued mode: a sparse ``{"metric.feature": value}`` prototype."""
+
+    name: str
+    signature: Dict[str, float]
+    description: str = ""
+    radius: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"name": self.name, "description": self.description}
+        data["signature"] = dict(self.signature)
+        if self.radius is not None:
+            data["radius"] = self.radius
+        return data
+
+
+@dataclass
+class SignatureLibrary:
+    """The metrics, feature weights, radii and mode prototypes of a catalog."""
+
+    metrics: List[str]
+    scales: List[float]
+    modes: List[ErrorModeSignature]
+    aliases: Dict[str, List[str]] = field(default_factory=dict)
+    weights: Dict[str, float] = field(default_factory=dict)
+    radius: float = 1.5
+    nominal_radius: float = 0.75
+    severities: List[float] = field(default_factory=lambda: [1.0])
+
+    def __post_init__(self) -> None:
+        if len(self.scales) != len(self.metrics) or min(self.scales, default=1.0) <= 0:
+            raise ValueError("need one positive scale per metric")
+        if not self.severities or min(self.severities) <= 0:
+            raise ValueError("severities must be positive")
+        unknown = set(self.weights) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"unknown feature weights {sorted(unknown)}")
+        for mode in self.modes:
+            self.vector(mode.signature)
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "SignatureLibrary":
+        metrics = data["metrics"]
+        return cls(
+            metrics=list(metrics),
+            scales=[float(spec["scale"]) for spec in metrics.values()],
+            aliases={name: list(spec.get("aliases", ())) for name, spec in metrics.items()},
+            weights={name: float(value) for name, value in data.get("weights", {}).items()},
+            radius=float(data.get("radius", 1.5)),
+            nominal_radius=float(data.get("nominal_radius", 0.75)),
+            severities=[float(value) for value in data.get("severities", (1.0,))],
+            modes=[
+                ErrorModeSignature(
+                    mode["name"],
+                    {key: float(value) for key, value in mode["signature"].items()},
+                    mode.get("description", ""),
+                    mode.get("radius"),
+                )
+                for mode in data.get("modes", ())
+            ],
+        )
+
+    @classmethod
+    def load(cls, path: Union[Path, str] = SIGNATURES_PATH) -> "SignatureLibrary":
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "metrics": {
+                name: {"scale": scale, "aliases": list(self.aliases.get(name, ()))}
+                for name, scale in zip(self.metrics, self.scales)
+            },
+            "weights": dict(self.weights),
+            "radius": self.radius,
+            "nominal_radius": self.nominal_radius,
+            "severities": list(self.severities),
+            "modes": [mode.as_dict() for mode in self.modes],
+        }
+
+    def save(self, path: Union[Path, str] = SIGNATURES_PATH) -> Path:
+        path = Path(path)
+        path.write_text(json.dumps(self.as_dict(), indent=2) + "\n", encoding="utf-8")
+        return path
+
+    @property
+    def feature_names(self) -> List[str]:
+        return [f"{metric}.{feature}" for metric in self.metrics for feature in FEATURES]
+
+    @property
+    def feature_weights(self) -> np.ndarray:
+        per_feature = [self.weights.get(feature, 1.0) for feature in FEATURES]
+        return np.tile(np.asarray(per_feature, dtype=np.float64), len(self.metrics))
+
+    def vector(self, signature: Mapping[str, float]) -> np.ndarray:
+        """Dense feature vector of a sparse signature (absent features are 0)."""
+        index = {name: pos for pos, name in enumerate(self.feature_names)}
+        vector = np.zeros(len(index))
+        for name, value in signature.items():
+            if name not in index:
+                raise ValueError(f"unknown signature feature {name!r}")
+            vector[index[name]] = value
+        return vector
+
+    def metric_of(self, name: str) -> Optional[str]:
+        """Catalog metric a (device-less) column name stands for, if any."""
+        if name in self.metrics:
+            return name
+        for metric, aliases in self.aliases.items():
+            if name in aliases:
+                return metric
+        return None
+
+    def add_mode(
+        self,
+        name: str,
+        features: Union[np.ndarray, Mapping[str, float]],
+        description: str = "",
+        radius: Optional[float] = None,
+    ) -> ErrorModeSignature:
+        """Catalog a new mode, e.g. a reviewed unknown window's features."""
+        if isinstance(features, Mapping):
+            signature = {key: float(value) for key, value in features.items()}
+        else:
+            signature = {
+                key: round(float(value), 3)
+                for key, value in zip(self.feature_names, features)
+                if value and np.isfinite(value)
+            }
+        mode = ErrorModeSignature(name, signature, description, radius)
+        self.vector(mode.signature)
+        self.modes.append(mode)
+        return mode
+
+
+class SignatureIndex:
+    """Nearest-prototype index over a library's modes (plus labelled examples).
+
+    Each mode contributes one prototype per library severity: its signature
+    scaled by the severity (shares capped at 1) with the radius scaled by the
+    severity's square root, so a large leak matches as well as a small one.
+    Distances are Euclidean after multiplying each feature by the square root
+    of its weight; prototypes and their squared entries are precomputed.
+    NaN features (metrics a device does not report) are left out of the
+    distances and of the nominal magnitude.
+    """
+
+    def __init__(self, library: SignatureLibrary) -> None:
+        self.library = library
+        self._root_weights = np.sqrt(library.feature_weights)
+        self.labels: List[str] = []
+        self._prototypes = np.empty((0, self._root_weights.size))
+        self._radii = np.empty(0)
+        shares = np.tile([feature in _SHARE_FEATURES for feature in FEATURES], len(library.metrics))
+        for mode in library.modes:
+            vector = library.vector(mode.signature)
+            radius = library.radius if mode.radius is None else mode.radius
+            for severity in library.severities:
+                scaled = np.where(shares, np.minimum(vector * severity, 1.0), vector * severity)
+                self.add(scaled[None], [mode.name], radius * np.sqrt(severity))
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def add(self, features: np.ndarray, labels: Sequence[str], radius: Optional[float] = None) -> None:
+        """Add labelled feature vectors as extra prototypes (k=1 nearest neighbour)."""
+        features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        if features.shape != (len(labels), self._root_weights.size):
+            raise ValueError("need one feature vector per label")
+        scaled = features * self._root_weights
+        self._prototypes = np.vstack([self._prototypes, scaled])
+        self._squares = self._prototypes**2
+        self._norms = self._squares.sum(axis=1)
+        radius = self.library.radius if radius is None else radius
+        self._radii = np.concatenate([self._radii, np.full(len(labels), radius)])
+        self.labels.extend(labels)
+
+    def distances(self, features: np.ndarray) -> np.ndarray:
+        """``(windows, prototypes)`` weighted distances over each window's non-NaN features."""
+        features = np.atleast_2d(features)
+        missing = np.isnan(features)
+        scaled = np.where(missing, 0.0, features) * self._root_weights
+        if missing.any():
+            norms = (~missing).astype(np.float64) @ self._squares.T
+        else:
+            norms = self._norms
+        squared = (scaled**2).sum(axis=1)[:, None] - 2.0 * scaled @ self._prototypes.T + norms
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def classify(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(nearest, distance, status)`` per window.
+
+        ``nearest`` indexes :attr:`labels`; ``status`` indexes
+        :data:`MODE_STATUSES`.
+        """
+        features = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        magnitude = np.sqrt(np.nansum((features * self._root_weights) ** 2, axis=1))
+        if not self.labels:
+            nearest = np.zeros(len(features), dtype=np.int64)
+            distance = np.full(len(features), np.inf)
+            known = np.zeros(len(features), dtype=bool)
+        else:
+            table = self.distances(features)
+            nearest = table.argmin(axis=1)
+            distance = table[np.arange(len(features)), nearest]
+            known = distance <= self._radii[nearest]
+        status = np.where(
+            magnitude <= self.library.nominal_radius, 1, np.where(known, 0, 2)
+        ).astype(np.int8)
+        return nearest, distance, status
+
+
+@dataclass
+class ModeMatch:
+    """Classification of one anomaly window."""
+
+    device: str
+    start: float
+    end: float
+    status: str
+    nearest: Optional[str]
+    distance: float
+
+    @property
+    def mode(self) -> Optional[str]:
+        """The matched mode, or ``None`` unless the status is ``"known"``."""
+        return self.nearest if self.status == "known" else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "device": self.device,
+            "start": self.start,
+            "end": self.end,
+            "status": self.status,
+            "mode": self.mode,
+            "nearest": self.nearest,
+            "distance": self.distance,
+        }
+
+
+class UnknownModeLog:
+    """Append unmatched windows, one line each, for review.
+
+    Windows whose features round to an already logged signature (in steps of
+    0.5) are counted but not written again. Lines are buffered and appended
+    every ``flush_every`` entries and on :meth:`flush`/:meth:`close`.
+    """
+
+    def __init__(
+        self, path: Union[Path, str] = UNKNOWN_MODES_PATH, flush_every: int = 64, top: int = 4
+    ) -> None:
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self.top = top
+        self.seen: Set[bytes] = set()
+        self.suppressed = 0
+        self._pending: List[str] = []
+
+    def record(self, match: ModeMatch, features: np.ndarray, names: Sequence[str]) -> bool:
+        """Queue ``match`` unless its signature was logged before; returns whether it was."""
+        features = np.asarray(features)
+        missing = np.isnan(features)
+        rounded = np.round(np.where(missing, 0.0, features) / _DEDUPE_STEP).astype(np.int64)
+        key = rounded.tobytes() + np.packbits(missing).tobytes()
+        if key in self.seen:
+            self.suppressed += 1
+            return False
+        self.seen.add(key)
+        strength = np.where(missing, 0.0, np.abs(features))
+        strongest = np.argsort(-strength, kind="stable")[: self.top]
+        described = " ".join(
+            f"{names[idx]}={features[idx]:+.2f}" for idx in strongest if strength[idx]
+        )
+        self._pending.append(
+            f"Unclassified window {match.device} {match.start:.0f}-{match.end:.0f}:"
+            f" nearest {match.nearest} (distance {match.distance:.2f}); {described}"
+        )
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+        return True
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write("".join(line + "\n" for line in self._pending))
+        self._pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+
+
+def device_columns(frame: TimeSeriesFrame, library: SignatureLibrary) -> Dict[str, np.ndarray]:
+    """Per device, the frame column of each catalog metric (-1 when absent)."""
+    columns: Dict[str, np.ndarray] = {}
+    for position, name in enumerate(frame.columns):
+        device, metric = split_device_metric(name)
+        metric = library.metric_of(metric)
+        if metric is None:
+            continue
+        slots = columns.setdefault(device, np.full(len(library.metrics), -1, dtype=np.int64))
+        slots[library.metrics.index(metric)] = position
+    return columns
+
+
+def frame_windows(
+    frame: TimeSeriesFrame,
+    spans: Sequence[Span],
+    library: SignatureLibrary,
+    points: int = WINDOW_POINTS,
+    columns: Optional[Dict[str, np.ndarray]] = None,
+    return_present: bool = False,
+) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+    """``(spans, points, metrics)`` windows of a frame's catalog metrics.
+
+    Each ``(device, start, end)`` span selects the samples in
+    ``[start, end]`` of that device's columns (``npu0_chip1_temp_c``, or
+    unprefixed names for ``"host"``) and picks ``points`` of them evenly;
+    missing metrics and empty spans are NaN. ``columns`` is the frame's
+    :func:`device_columns`, when already computed. With ``return_present``
+    the ``(spans, metrics)`` mask of metrics the device has a column for is
+    returned too, for :func:`window_features`.
+    """
+    shape = (len(spans), points, len(library.metrics))
+    by_device = device_columns(frame, library) if columns is None else columns
+    cols = np.full((len(spans), len(library.metrics)), -1, dtype=np.int64)
+    for row, (device, _start, _end) in enumerate(spans):
+        if device in by_device:
+            cols[row] = by_device[device]
+    if not spans or not len(frame):
+        windows = np.full(shape, np.nan)
+        return (windows, cols >= 0) if return_present else windows
+    starts = np.searchsorted(frame.timestamps, [span[1] for span in spans], side="left")
+    stops = np.searchsorted(frame.timestamps, [span[2] for span in spans], side="right")
+    lengths = stops - starts
+    steps = np.linspace(0.0, 1.0, points)
+    rows = starts[:, None] + np.rint(steps * np.maximum(lengths - 1, 0)[:, None]).astype(np.int64)
+    rows = np.minimum(rows, len(frame) - 1)
+    windows = frame.values[rows[:, :, None], np.maximum(cols, 0)[:, None, :]]
+    windows[np.broadcast_to((cols < 0)[:, None, :], shape)] = np.nan
+    windows[lengths == 0] = np.nan
+    return (windows, cols >= 0) if return_present else windows
+
+
+def anomaly_spans(frame: TimeSeriesFrame, intervals: np.ndarray, pad: float = 0.0) -> List[Span]:
+    """Merge ``(metric, start, stop)`` anomaly runs into per-device time spans.
+
+    ``intervals`` is the output of ``BatchAnomalyDetector.detect(frame.values.T)
+    .intervals()`` (or ``mask_to_intervals`` on a ``(metrics, time)`` mask).
+    Runs of any metric of the same device that overlap once widened by
+    ``pad`` seconds become one span.
+    """
+    intervals = np.asarray(intervals, dtype=np.int64).reshape(-1, 3)
+    if not intervals.size:
+        return []
+    devices = np.array([split_device_metric(name)[0] for name in frame.columns])[intervals[:, 0]]
+    names, codes = np.unique(devices, return_inverse=True)
+    starts = frame.timestamps[intervals[:, 1]] - pad
+    ends = frame.timestamps[intervals[:, 2] - 1] + pad
+    order = np.lexsort((starts, codes))
+    codes, starts, ends = codes[order], starts[order], ends[order]
+    # Offset each device past the previous one so one running maximum
+    # handles every device.
+    shift = codes * (ends.max() - starts.min() + 1.0)
+    reach = np.maximum.accumulate(ends + shift)
+    heads = np.flatnonzero(
+        np.r_[True, (codes[1:] != codes[:-1]) | (starts[1:] + shift[1:] > reach[:-1])]
+    )
+    span_ends = np.maximum.reduceat(ends, heads)
+    return [
+        (str(names[codes[head]]), float(starts[head]), float(end))
+        for head, end in zip(heads, span_ends)
+    ]
+
+
+class ErrorModeClassifier:
+    """Feature extraction, index lookup and unknown logging for anomaly windows."""
+
+    def __init__(
+        self,
+        library: Optional[SignatureLibrary] = None,
+        unknown_log: Union[None, UnknownModeLog, Path, str] = None,
+        points: int = WINDOW_POINTS,
+    ) -> None:
+        self.library = library or SignatureLibrary.load()
+        self.index = SignatureIndex(self.library)
+        if unknown_log is not None and not isinstance(unknown_log, UnknownModeLog):
+            unknown_log = UnknownModeLog(unknown_log)
+        self.unknown_log = unknown_log
+        self.points = points
+        self._scales = np.asarray(self.library.scales, dtype=np.float64)
+        self._columns: "weakref.WeakKeyDictionary[TimeSeriesFrame, Dict[str, np.ndarray]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def features(self, windows: np.ndarray, present: Optional[np.ndarray] = None) -> np.ndarray:
+        return window_features(windows, self._scales, present)
+
+    def classify_windows(
+        self, windows: np.ndarray, spans: Sequence[Span], present: Optional[np.ndarray] = None
+    ) -> List[ModeMatch]:
+        """Classify ``(windows, points, metrics)`` values described by ``spans``.
+
+        ``present`` masks the metrics each device reports (all by default).
+        """
+        features = self.features(windows, present)
+        nearest, distance, status = self.index.classify(features)
+        labels = self.index.labels
+        matches = [
+            ModeMatch(
+                device,
+                start,
+                end,
+                MODE_STATUSES[code],
+                labels[near] if labels else None,
+                float(dist),
+            )
+            for (device, start, end), near, dist, code in zip(spans, nearest, distance, status)
+        ]
+        if self.unknown_log is not None:
+            names = self.library.feature_names
+            for row in np.flatnonzero(status == 2):
+                self.unknown_log.record(matches[row], features[row], names)
+        return matches
+
+    def classify_frame(self, frame: TimeSeriesFrame, spans: Sequence[Span]) -> List[ModeMatch]:
+        """Classify ``(device, start, end)`` spans of ``frame``.
+
+        The frame's device/column layout is resolved once and reused while
+        the frame is alive, so small batches from a live stream stay cheap.
+        """
+        columns = self._columns.get(frame)
+        if columns is None:
+            columns = self._columns[frame] = device_columns(frame, self.library)
+        windows, present = frame_windows(
+            frame, spans, self.library, self.points, columns, return_present=True
+        )
+        return self.classify_windows(windows, spans, present)
+
+    def classify_anomalies(
+        self, frame: TimeSeriesFrame, intervals: np.ndarray, pad: float = 0.0
+    ) -> List[ModeMatch]:
+        """Classify every device span of a frame's anomaly intervals."""
+        return self.classify_frame(frame, anomaly_spans(frame, intervals, pad))
+
+    def close(self) -> None:
+        if self.unknown_log is not None:
+            self.unknown_log.close()
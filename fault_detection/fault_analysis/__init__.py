@@ -0,0 +1,28 @@
+"""Fault detection, rollups and propagation analysis (imported lazily).
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "analysis": ["load_metrics", "compute_rollup", "rolling_average"],
+        "detection": ["detect_spikes", "detect_drift"],
+        "drift": [
+            "DRIFT_TESTS",
+            "ALIGN_METHODS",
+            "DriftInterval",
+            "DriftDetector",
+            "align_series",
+            "align_frames",
+            "detect_drift_intervals",
+        ],
+        "propagation": [
+            "PropagationLink",
+            "PropagationResult",
+            "build_propagation",
+            "summarize_propagation",
+            "render_ascii_graph",
+        ],
+        "propagation_graph": ["PROPAGATION_MODES", "RootCause", "PropagationGraph"],
+    },
+)
@@ -1,9 +1,11 @@
 """Fault analysis helpers used by detection routines."""
 import json
 from pathlib import Path
-from statistics import mean
 from typing import Dict, Iterable, List, Sequence
 
+from utils.stream_stats.accumulator import StreamingStats
+from utils.stream_stats.rolling import rolling_mean
+
 
 def load_metrics(path: Path) -> List[float]:
     data = json.loads(Path(path).read_text())
@@ -13,20 +15,13 @@ def load_metrics(path: Path) -> List[float]:
 
 
 def compute_rollup(metrics: Iterable[float]) -> Dict[str, float]:
-    values = list(metrics)
-    return {
-        "average": mean(values) if values else 0.0,
-        "max": max(values, default=0.0),
-        "min": min(values, default=0.0),
-    }
+    """One-pass rollup shared with ``monitoring.analysis.analyze.compute_rollup``."""
+    return StreamingStats().extend(metrics).as_rollup()
 
 
 def rolling_average(metrics: Sequence[float], window: int = 5) -> List[float]:
-    """Compute a simple rolling average for visualization or detection."""
-    window = max(1, window)
-    averages: List[float] = []
-    for idx in range(len(metrics)):
-        start = max(0, idx - window + 1)
-        window_slice = metrics[start : idx + 1]
-        averages.append(mean(window_slice))
-    return averages
+    """Compute a simple rolling average for visualization or detection.
+
+    The first ``window - 1`` averages cover the shorter prefix available.
+    """
+    return rolling_mean(metrics, window).tolist()
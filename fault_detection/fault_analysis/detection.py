@@ -1,5 +1,7 @@
 """Fault detection helpers built on top of computed metrics."""
-from typing import Iterable, List, Sequence
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
 
 
 def detect_spikes(metrics: Iterable[float], threshold: float = 0.2) -> List[int]:
@@ -8,12 +10,33 @@ def detect_spikes(metrics: Iterable[float], threshold: float = 0.2) -> List[int]
 
 
 def detect_drift(
-    baseline: Sequence[float], current: Sequence[float], tolerance: float = 0.1
+    baseline: Sequence[float],
+    current: Sequence[float],
+    tolerance: float = 0.1,
+    baseline_times: Optional[Sequence[float]] = None,
+    current_times: Optional[Sequence[float]] = None,
+    method: str = "asof",
 ) -> List[int]:
-    """Compare current metrics against a baseline and flag drifted positions."""
-    limit = min(len(baseline), len(current))
-    flagged: List[int] = []
-    for idx in range(limit):
-        if abs(current[idx] - baseline[idx]) > tolerance:
-            flagged.append(idx)
-    return flagged
+    """Compare current metrics against a baseline and flag drifted positions.
+
+    Without timestamps the series are compared position by position. With
+    ``baseline_times`` and ``current_times`` the baseline is first aligned
+    onto the current timestamps (``method`` is ``"asof"`` or ``"linear"``,
+    see :func:`~fault_detection.fault_analysis.drift.align_series`), so the
+    two may be sampled at different rates; positions without a baseline
+    value are never flagged. For sequential tests and drift intervals see
+    :class:`~fault_detection.fault_analysis.drift.DriftDetector`.
+    """
+    if (baseline_times is None) != (current_times is None):
+        raise ValueError("pass both baseline_times and current_times, or neither")
+    if baseline_times is None:
+        limit = min(len(baseline), len(current))
+        reference = np.asarray(baseline[:limit], dtype=np.float64)
+        values = np.asarray(current[:limit], dtype=np.float64)
+    else:
+        from fault_detection.fault_analysis.drift import align_series
+
+        values = np.asarray(current, dtype=np.float64)
+        reference = align_series(baseline_times, baseline, current_times, method)
+    with np.errstate(invalid="ignore"):
+        return np.flatnonzero(np.abs(values - reference) > tolerance).tolist()
@@ -0,0 +1,501 @@
+"""
+Timestamp-aligned, incremental drift detection over many series at once.
+
+``detect_drift`` compares two lists position by position, which is only
+meaningful when both were sampled at the same instants. This module:
+
+* aligns a baseline onto the current timestamps, per metric and with gaps,
+  either as-of (last baseline sample at or before each timestamp, optionally
+  no older than ``tolerance``) or by linear interpolation
+  (:func:`align_series`, :func:`align_frames`);
+* runs sequential drift tests on every metric with one vectorized update per
+  sample (:class:`DriftDetector`), each O(1) in the length of the stream:
+
+  - ``cusum``: two-sided CUSUM of the standardized deviation from the
+    reference (or from the aligned baseline sample);
+  - ``page_hinkley``: two-sided Page-Hinkley test against the running mean
+    since warm-up, so it flags changes rather than sustained offsets;
+  - ``ks``: Kolmogorov-Smirnov distance between a sliding window and the
+    reference distribution, over ``ks_bins`` reference-quantile bins whose
+    counts are updated as samples enter and leave the window;
+
+* reports drift as :class:`DriftInterval` records (onset estimate, detection
+  time, end and peak statistic) instead of index lists.
+
+The statistics saturate at twice their threshold so an alarm clears within a
+bounded number of samples once the drift ends.
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from monitoring.analysis.timeseries import TimeSeriesFrame
+
+__all__ = [
+    "DRIFT_TESTS",
+    "ALIGN_METHODS",
+    "DriftInterval",
+    "DriftDetector",
+    "align_series",
+    "align_frames",
+    "detect_drift_intervals",
+]
+
+DRIFT_TESTS = ("cusum", "page_hinkley", "ks")
+ALIGN_METHODS = ("asof", "linear")
+
+_STAT_LIMIT = 2.0
+# Automatic warm-up waits up to this many times ``warmup`` samples for every
+# series to see two values before fitting the series that have.
+_WARMUP_PATIENCE = 4
+
+
+def _last_valid(valid: np.ndarray) -> np.ndarray:
+    """Row of the last valid sample at or before each row (-1 when none)."""
+    rows = np.where(valid, np.arange(valid.shape[0])[:, None], -1)
+    return np.maximum.accumulate(rows, axis=0)
+
+
+def _next_valid(valid: np.ndarray) -> np.ndarray:
+    """Row of the first valid sample at or after each row (n when none)."""
+    count = valid.shape[0]
+    rows = np.where(valid, np.arange(count)[:, None], count)
+    return np.minimum.accumulate(rows[::-1], axis=0)[::-1]
+
+
+def align_series(
+    times: np.ndarray,
+    values: np.ndarray,
+    at: np.ndarray,
+    method: str = "asof",
+    tolerance: Optional[float] = None,
+) -> np.ndarray:
+    """Values of ``(times, values)`` at the instants ``at``.
+
+    ``times`` must be ascending; ``values`` is ``(samples,)`` or
+    ``(samples, metrics)`` with NaN gaps, which are skipped per metric.
+    ``"asof"`` takes the last sample at or before each instant; ``"linear"``
+    interpolates between the valid samples around it and leaves instants
+    outside a metric's span as NaN. ``tolerance`` bounds how old the as-of
+    sample may be, or how far apart the two interpolated samples may be.
+    """
+    if method not in ALIGN_METHODS:
+        raise ValueError(f"method must be one of {ALIGN_METHODS}")
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    at = np.asarray(at, dtype=np.float64)
+    flat = values.ndim == 1
+    matrix = values[:, None] if flat else values
+    if matrix.shape[0] != times.size:
+        raise ValueError("values must have one row per timestamp")
+    cols = np.arange(matrix.shape[1])
+    valid = ~np.isnan(matrix)
+    pos = np.searchsorted(times, at, side="right") - 1
+    before = _last_valid(valid)[np.maximum(pos, 0)]
+    before[pos < 0] = -1
+    found = before >= 0
+    left = np.where(found, before, 0)
+    out = np.where(found, matrix[left, cols], np.nan)
+    if method == "asof":
+        if tolerance is not None:
+            out[found & (at[:, None] - times[left] > tolerance)] = np.nan
+        return out[:, 0] if flat else out
+    after = _next_valid(valid)[np.minimum(pos + 1, times.size - 1)]
+    after[pos + 1 >= times.size] = times.size
+    exact = found & (times[left] == at[:, None])
+    bracket = found & (after < times.size) & ~exact
+    right = np.where(bracket, after, 0)
+    span = times[right] - times[left]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight = (at[:, None] - times[left]) / span
+        interpolated = matrix[left, cols] + weight * (matrix[right, cols] - matrix[left, cols])
+    out = np.where(exact, out, np.where(bracket, interpolated, np.nan))
+    if tolerance is not None:
+        out[bracket & (span > tolerance)] = np.nan
+    return out[:, 0] if flat else out
+
+
+def align_frames(
+    baseline: TimeSeriesFrame,
+    current: TimeSeriesFrame,
+    method: str = "asof",
+    tolerance: Optional[float] = None,
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Metrics present in both frames, with the baseline aligned to ``current``.
+
+    Returns ``(columns, baseline_values, current_values)``; both matrices are
+    ``(len(current), len(columns))``.
+    """
+    columns = [name for name in current.columns if name in set(baseline.columns)]
+    base = baseline.select(columns) if columns else baseline
+    aligned = align_series(
+        base.timestamps, base.values[:, : len(columns)], current.timestamps, method, tolerance
+    )
+    ours = current.select(columns).values if columns else current.values[:, :0]
+    return columns, aligned, ours
+
+
+@dataclass
+class DriftInterval:
+    """One drift episode of one metric under one test.
+
+    ``start`` is the estimated onset (the last time the statistic was at rest,
+    or the oldest sample of the KS window), ``detected`` the first alarming
+    sample and ``end`` the first sample after the alarm cleared (the last
+    sample seen when the episode was still open).
+    """
+
+    column: str
+    test: str
+    start: float
+    detected: float
+    end: float
+    peak: float
+
+    @property
+    def delay(self) -> float:
+        return self.detected - self.start
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "column": self.column,
+            "test": self.test,
+            "start": self.start,
+            "detected": self.detected,
+            "end": self.end,
+            "peak": self.peak,
+        }
+
+
+class DriftDetector:
+    """Sequential drift tests applied to every series on every :meth:`update`.
+
+    ``columns`` names the series (or gives their count). The reference
+    distribution comes from :meth:`fit` or, failing that, from the first
+    ``warmup`` samples; warm-up runs on while a series has fewer than two
+    values, and a series still short after four times ``warmup`` samples is
+    left unfitted (``fitted_series``) and never tested. CUSUM and
+    Page-Hinkley consume the deviation ``(x - reference) / scale``, where the
+    reference is the fitted mean or the aligned baseline sample passed to
+    :meth:`update`; KS compares raw values with the fitted distribution. An
+    alarm is raised when a statistic crosses its threshold and cleared when
+    it falls below ``release`` times the threshold. NaN samples leave a
+    series' state untouched.
+
+    With the defaults, CUSUM and Page-Hinkley raise a false alarm about once
+    every few thousand in-control samples per series.
+    """
+
+    def __init__(
+        self,
+        columns: Union[int, Sequence[str]],
+        tests: Sequence[str] = ("cusum",),
+        warmup: int = 30,
+        cusum_drift: float = 0.5,
+        cusum_threshold: float = 8.0,
+        ph_delta: float = 0.5,
+        ph_threshold: float = 8.0,
+        ks_window: int = 64,
+        ks_bins: int = 16,
+        ks_alpha: float = 1e-4,
+        release: float = 0.5,
+        min_scale: float = 1e-9,
+    ) -> None:
+        unknown = set(tests) - set(DRIFT_TESTS)
+        if unknown:
+            raise ValueError(f"unknown tests {sorted(unknown)}; expected a subset of {DRIFT_TESTS}")
+        if warmup < 2 or ks_window < 2 or ks_bins < 2:
+            raise ValueError("warmup, ks_window and ks_bins must be at least 2")
+        if not 0.0 < ks_alpha < 1.0:
+            raise ValueError("ks_alpha must be in (0, 1)")
+        if not 0.0 < release <= 1.0:
+            raise ValueError("release must be in (0, 1]")
+        self.columns = [str(idx) for idx in range(columns)] if isinstance(columns, int) else list(columns)
+        self.tests = [name for name in DRIFT_TESTS if name in tests]
+        self.warmup = warmup
+        self.cusum_drift = cusum_drift
+        self.ph_delta = ph_delta
+        self.ks_window = ks_window
+        self.ks_bins = ks_bins
+        self.ks_alpha = ks_alpha
+        self.release = release
+        self.min_scale = min_scale
+        self.thresholds = {
+            "cusum": cusum_threshold,
+            "page_hinkley": ph_threshold,
+            "ks": 0.0,
+        }
+        self.fitted = False
+        self.fitted_series = np.zeros(len(self.columns), dtype=bool)
+        self.samples = 0
+        self.last_time = math.nan
+        self.intervals: List[DriftInterval] = []
+        self._warm: List[np.ndarray] = []
+        self._reset()
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    # ------------------------------------------------------------- reference
+    def fit(self, reference: np.ndarray, scale: Union[None, float, np.ndarray] = None) -> "DriftDetector":
+        """Take the reference from ``(samples, series)`` values and reset the tests.
+
+        ``scale`` overrides the per-series standard deviation used to
+        standardize deviations.
+        """
+        return self._fit(reference, scale, partial=False)
+
+    def _fit(
+        self, reference: np.ndarray, scale: Union[None, float, np.ndarray], partial: bool
+    ) -> "DriftDetector":
+        # ``partial`` leaves series with fewer than two reference samples
+        # unfitted (NaN reference) instead of refusing the whole reference.
+        reference = np.asarray(reference, dtype=np.float64)
+        if reference.ndim != 2 or reference.shape[1] != len(self):
+            raise ValueError(f"reference must have shape (samples, {len(self)})")
+        missing = np.isnan(reference)
+        present = np.count_nonzero(~missing, axis=0)
+        fitted = present >= 2
+        if not partial and not fitted.all():
+            raise ValueError("every series needs at least two reference samples")
+        filled = np.where(missing, 0.0, reference)
+        count = np.maximum(present, 1)
+        self.mean = np.where(fitted, filled.sum(axis=0) / count, math.nan)
+        if scale is None:
+            spread = np.sqrt(np.where(missing, 0.0, (filled - self.mean) ** 2).sum(axis=0) / count)
+        else:
+            spread = np.broadcast_to(scale, self.mean.shape)
+        self.scale = np.maximum(np.asarray(spread, dtype=np.float64), self.min_scale)
+        self.fitted_series = fitted
+        if "ks" in self.tests:
+            quantiles = np.linspace(0.0, 1.0, self.ks_bins + 1)[1:-1]
+            self._edges = np.full((len(self), len(quantiles)), math.nan)
+            if fitted.any():
+                self._edges[fitted] = np.nanquantile(reference[:, fitted], quantiles, axis=0).T
+            counts = np.zeros((len(self), self.ks_bins), dtype=np.int64)
+            for row in reference:
+                valid = ~np.isnan(row)
+                counts[np.flatnonzero(valid), self._bin(row)[valid]] += 1
+            self._ks_reference = np.cumsum(counts, axis=1)[:, :-1] / count[:, None]
+            critical = math.sqrt(-0.5 * math.log(self.ks_alpha / 2.0))
+            self._ks_threshold = critical * np.sqrt((self.ks_window + count) / (self.ks_window * count))
+        self.fitted = True
+        self._warm = []
+        self._reset()
+        return self
+
+    def _bin(self, row: np.ndarray) -> np.ndarray:
+        """Reference-quantile bin of each series' value (NaN lands in bin 0)."""
+        return np.count_nonzero(self._edges < row[:, None], axis=1)
+
+    def _reset(self) -> None:
+        count = len(self)
+        zeros = np.zeros(count)
+        self._cusum_up, self._cusum_down = zeros.copy(), zeros.copy()
+        self._cusum_rest_up = np.full(count, math.nan)
+        self._cusum_rest_down = np.full(count, math.nan)
+        self._ph_seen = np.zeros(count, dtype=np.int64)
+        self._ph_mean = zeros.copy()
+        self._ph_up, self._ph_down = zeros.copy(), zeros.copy()
+        self._ph_min, self._ph_max = zeros.copy(), zeros.copy()
+        self._ph_min_time = np.full(count, math.nan)
+        self._ph_max_time = np.full(count, math.nan)
+        self._ks_ring = np.zeros((count, self.ks_window), dtype=np.int64)
+        self._ks_times = np.full((count, self.ks_window), math.nan)
+        self._ks_pos = np.zeros(count, dtype=np.int64)
+        self._ks_filled = np.zeros(count, dtype=np.int64)
+        self._ks_counts = np.zeros((count, self.ks_bins), dtype=np.int64)
+        self.statistics = {name: zeros.copy() for name in self.tests}
+        self.active = {name: np.zeros(count, dtype=bool) for name in self.tests}
+        self._onset = {name: np.full(count, math.nan) for name in self.tests}
+        self._detected = {name: np.full(count, math.nan) for name in self.tests}
+        self._peak = {name: zeros.copy() for name in self.tests}
+
+    # ------------------------------------------------------------------ tests
+    def _cusum(self, z: np.ndarray, valid: np.ndarray, now: float) -> Tuple[np.ndarray, np.ndarray]:
+        limit = _STAT_LIMIT * self.thresholds["cusum"]
+        up = np.clip(self._cusum_up + z - self.cusum_drift, 0.0, limit)
+        down = np.clip(self._cusum_down - z - self.cusum_drift, 0.0, limit)
+        self._cusum_up = np.where(valid, up, self._cusum_up)
+        self._cusum_down = np.where(valid, down, self._cusum_down)
+        self._cusum_rest_up[valid & (up == 0.0)] = now
+        self._cusum_rest_down[valid & (down == 0.0)] = now
+        rising = self._cusum_up >= self._cusum_down
+        onset = np.where(rising, self._cusum_rest_up, self._cusum_rest_down)
+        return np.maximum(self._cusum_up, self._cusum_down), onset
+
+    def _page_hinkley(self, z: np.ndarray, valid: np.ndarray, now: float) -> Tuple[np.ndarray, np.ndarray]:
+        limit = _STAT_LIMIT * self.thresholds["page_hinkley"]
+        self._ph_seen += valid
+        step = np.where(valid, (z - self._ph_mean) / np.maximum(self._ph_seen, 1), 0.0)
+        self._ph_mean += step
+        deviation = np.where(valid, z - self._ph_mean, 0.0)
+        self._ph_up += np.where(valid, deviation - self.ph_delta, 0.0)
+        self._ph_down += np.where(valid, deviation + self.ph_delta, 0.0)
+        lower = self._ph_up < self._ph_min
+        self._ph_min = np.maximum(np.minimum(self._ph_min, self._ph_up), self._ph_up - limit)
+        self._ph_min_time[lower] = now
+        higher = self._ph_down > self._ph_max
+        self._ph_max = np.minimum(np.maximum(self._ph_max, self._ph_down), self._ph_down + limit)
+        self._ph_max_time[higher] = now
+        up = self._ph_up - self._ph_min
+        down = self._ph_max - self._ph_down
+        return np.maximum(up, down), np.where(up >= down, self._ph_min_time, self._ph_max_time)
+
+    def _ks(self, x: np.ndarray, valid: np.ndarray, now: float) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.flatnonzero(valid)
+        pos = self._ks_pos[rows]
+        full = self._ks_filled[rows] == self.ks_window
+        self._ks_counts[rows[full], self._ks_ring[rows[full], pos[full]]] -= 1
+        bins = self._bin(x)[rows]
+        self._ks_counts[rows, bins] += 1
+        self._ks_ring[rows, pos] = bins
+        self._ks_times[rows, pos] = now
+        self._ks_pos[rows] = (pos + 1) % self.ks_window
+        self._ks_filled[rows] = np.minimum(self._ks_filled[rows] + 1, self.ks_window)
+        window = np.cumsum(self._ks_counts[:, :-1], axis=1) / self.ks_window
+        distance = np.abs(window - self._ks_reference).max(axis=1)
+        ready = self._ks_filled == self.ks_window
+        # Scale so the alarm threshold is 1.0 whatever the reference size.
+        statistic = np.where(ready, distance / self._ks_threshold, 0.0)
+        oldest = self._ks_times[np.arange(len(self)), self._ks_pos]
+        return statistic, oldest
+
+    # ----------------------------------------------------------------- update
+    def update(
+        self,
+        values: np.ndarray,
+        timestamp: Optional[float] = None,
+        baseline: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Feed one sample per series; returns the series currently drifting.
+
+        ``timestamp`` defaults to the sample count. ``baseline`` holds the
+        aligned baseline value per series; CUSUM and Page-Hinkley then test
+        ``x - baseline`` instead of ``x - mean`` (NaN baselines skip the
+        series).
+        """
+        x = np.asarray(values, dtype=np.float64)
+        if x.shape != (len(self),):
+            raise ValueError(f"expected {len(self)} values")
+        now = float(self.samples if timestamp is None else timestamp)
+        self.samples += 1
+        self.last_time = now
+        if not self.fitted:
+            self._warm.append(x.copy())
+            if len(self._warm) >= self.warmup:
+                reference = np.stack(self._warm)
+                short = np.count_nonzero(~np.isnan(reference), axis=0) < 2
+                if not short.any() or len(self._warm) >= _WARMUP_PATIENCE * self.warmup:
+                    self._fit(reference, None, partial=True)
+            return np.zeros(len(self), dtype=bool)
+
+        valid = ~np.isnan(x) & self.fitted_series
+        centre = self.mean if baseline is None else np.asarray(baseline, dtype=np.float64)
+        paired = valid & ~np.isnan(centre)
+        z = np.where(paired, (x - centre) / self.scale, 0.0)
+        drifting = np.zeros(len(self), dtype=bool)
+        for name in self.tests:
+            if name == "cusum":
+                statistic, onset = self._cusum(z, paired, now)
+                threshold = self.thresholds[name]
+            elif name == "page_hinkley":
+                statistic, onset = self._page_hinkley(z, paired, now)
+                threshold = self.thresholds[name]
+            else:
+                statistic, onset = self._ks(x, valid, now)
+                threshold = 1.0
+            self.statistics[name] = statistic
+            alarm = statistic > threshold
+            # Hysteresis: an episode lasts until the statistic falls below
+            # ``release`` x threshold, so noise around the threshold does not
+            # split it.
+            alarm |= self.active[name] & (statistic > self.release * threshold)
+            drifting |= self._track(name, alarm, statistic, onset, now)
+        return drifting
+
+    def _track(
+        self, name: str, alarm: np.ndarray, statistic: np.ndarray, onset: np.ndarray, now: float
+    ) -> np.ndarray:
+        active = self.active[name]
+        for idx in np.flatnonzero(active & ~alarm):
+            self._close(name, int(idx), now)
+        started = alarm & ~active
+        self._onset[name][started] = np.where(np.isnan(onset[started]), now, onset[started])
+        self._detected[name][started] = now
+        self._peak[name] = np.where(started, statistic, np.maximum(self._peak[name], statistic))
+        self.active[name] = alarm
+        return alarm
+
+    def _close(self, name: str, idx: int, end: float) -> None:
+        self.intervals.append(
+            DriftInterval(
+                self.columns[idx],
+                name,
+                float(self._onset[name][idx]),
+                float(self._detected[name][idx]),
+                end,
+                float(self._peak[name][idx]),
+            )
+        )
+
+    def run(
+        self,
+        values: np.ndarray,
+        timestamps: Optional[np.ndarray] = None,
+        baseline: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Feed ``(samples, series)`` values row by row; returns the drift mask."""
+        values = np.asarray(values, dtype=np.float64)
+        mask = np.zeros(values.shape, dtype=bool)
+        for row in range(values.shape[0]):
+            mask[row] = self.update(
+                values[row],
+                None if timestamps is None else timestamps[row],
+                None if baseline is None else baseline[row],
+            )
+        return mask
+
+    def close(self) -> List[DriftInterval]:
+        """End every open episode at the last sample and return all intervals."""
+        for name in self.tests:
+            for idx in np.flatnonzero(self.active[name]):
+                self._close(name, int(idx), self.last_time)
+            self.active[name][:] = False
+        self.intervals.sort(key=lambda interval: (interval.start, interval.column, interval.test))
+        return self.intervals
+
+
+def detect_drift_intervals(
+    baseline: TimeSeriesFrame,
+    current: TimeSeriesFrame,
+    tests: Sequence[str] = ("cusum",),
+    method: str = "asof",
+    tolerance: Optional[float] = None,
+    paired: bool = True,
+    **params: float,
+) -> List[DriftInterval]:
+    """Drift episodes of ``current`` against ``baseline`` on shared metrics.
+
+    The reference distribution is the baseline frame. With ``paired`` the
+    baseline is also aligned onto the current timestamps (``method``,
+    ``tolerance``; see :func:`align_series`) and CUSUM/Page-Hinkley test the
+    sample-by-sample difference, scaled by the spread of the baseline's
+    successive differences (its short-term noise, insensitive to trends and
+    cycles both series share); otherwise they test the deviation from the
+    baseline mean in baseline standard deviations. ``params`` go to
+    :class:`DriftDetector`.
+    """
+    columns, aligned, values = align_frames(baseline, current, method, tolerance)
+    detector = DriftDetector(columns, tests=tests, **params)  # type: ignore[arg-type]
+    reference = baseline.select(columns).values
+    scale = None
+    if paired:
+        steps = np.diff(reference, axis=0)
+        with np.errstate(invalid="ignore"):
+            scale = np.nanstd(steps, axis=0) if steps.shape[0] > 1 else None
+    detector.fit(reference, scale=scale)
+    detector.run(values, current.timestamps, aligned if paired else None)
+    return detector.close()
@@ -0,0 +1,406 @@
+"""
+Indexed fault-propagation DAG with attenuation and root-cause ranking.
+
+``build_propagation`` lays faults out as one chain with every monitor hanging
+off the last injection. :class:`PropagationGraph` models the real topology
+(chip -> HBM -> operator -> layer -> metric, thousands of nodes) as a DAG
+stored in compact index arrays:
+
+* edges live in CSR order (``indptr``/``targets``/``weights``, one
+  ``float64`` attenuation per edge) plus a copy grouped by topological level,
+  so :meth:`PropagationGraph.propagate` pushes signal strength through the
+  whole graph with one vectorized reduction per level (strongest path by
+  default, or the sum over paths);
+* :meth:`PropagationGraph.rank_root_causes` marks which anomalous metrics
+  (sink nodes) each node reaches as packed bits, filled upwards one height
+  at a time, and scores every candidate with a popcount; how many metrics
+  each node reaches in total is computed once, lazily, in column blocks;
+* :meth:`PropagationGraph.explain` and :meth:`PropagationGraph.links` return
+  ordinary :class:`PropagationLink` lists for a subgraph, so
+  ``render_ascii_graph`` and :class:`PropagationResult` keep working.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from fault_detection.fault_analysis.propagation import (
+    PropagationLink,
+    PropagationResult,
+    summarize_propagation,
+)
+
+__all__ = ["PROPAGATION_MODES", "RootCause", "PropagationGraph"]
+
+PROPAGATION_MODES = ("max", "sum")
+# Set bits per byte, for popcounts over packed reachability rows.
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+# Metric columns per block when counting how many metrics each node reaches.
+_REACH_BLOCK = 2048
+
+Edge = Union[Tuple[str, str], Tuple[str, str, float], Tuple[str, str, float, str]]
+
+
+@dataclass
+class RootCause:
+    """One ranked root-cause candidate.
+
+    ``coverage`` is the share of the anomalous metrics the node reaches and
+    ``precision`` the share of the metrics it reaches that are anomalous;
+    ``score`` is their product.
+    """
+
+    node: str
+    score: float
+    coverage: float
+    precision: float
+    explained: List[str]
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "node": self.node,
+            "score": self.score,
+            "coverage": self.coverage,
+            "precision": self.precision,
+            "explained": list(self.explained),
+        }
+
+
+def _group_starts(keys: np.ndarray) -> np.ndarray:
+    """Start offsets of the runs of equal values in sorted ``keys``."""
+    if keys.size == 0:
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+class PropagationGraph:
+    """Immutable propagation DAG over named nodes.
+
+    ``edges`` are ``(source, target)``, ``(source, target, attenuation)`` or
+    ``(source, target, attenuation, signal)`` tuples; attenuation defaults to
+    ``attenuation`` and the signal label to ``"propagate"``. ``nodes`` may
+    add isolated nodes and fixes the index order. Metrics are the nodes
+    without outgoing edges unless ``metrics`` names them. Cycles raise
+    :class:`ValueError`.
+    """
+
+    def __init__(
+        self,
+        edges: Iterable[Edge],
+        nodes: Sequence[str] = (),
+        metrics: Optional[Sequence[str]] = None,
+        attenuation: float = 0.8,
+    ) -> None:
+        self.nodes: List[str] = list(dict.fromkeys(nodes))
+        self.index: Dict[str, int] = {name: idx for idx, name in enumerate(self.nodes)}
+        sources: List[int] = []
+        targets: List[int] = []
+        weights: List[float] = []
+        signals: List[str] = []
+        for edge in edges:
+            for name in edge[:2]:
+                if name not in self.index:
+                    self.index[name] = len(self.nodes)
+                    self.nodes.append(name)
+            sources.append(self.index[edge[0]])
+            targets.append(self.index[edge[1]])
+            weights.append(float(edge[2]) if len(edge) > 2 else attenuation)  # type: ignore[misc]
+            signals.append(str(edge[3]) if len(edge) > 3 else "propagate")  # type: ignore[misc]
+        count = len(self.nodes)
+        src = np.asarray(sources, dtype=np.int64)
+        dst = np.asarray(targets, dtype=np.int64)
+        weight = np.asarray(weights, dtype=np.float64)
+
+        # CSR by source, for traversals and link listings.
+        order = np.lexsort((dst, src))
+        self.indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=count), out=self.indptr[1:])
+        self.sources = src[order]
+        self.targets = dst[order]
+        self.weights = weight[order]
+        self.signals = [signals[idx] for idx in order]
+        self._edge_index = {
+            (int(s), int(t)): pos for pos, (s, t) in enumerate(zip(self.sources, self.targets))
+        }
+
+        self.level = self._levels(count)
+        self.height = self._heights(count)
+        # Edges grouped by target level, then target: propagation order.
+        by_level = np.lexsort((self.targets, self.level[self.targets]))
+        self._down_src = self.sources[by_level]
+        self._down_dst = self.targets[by_level]
+        self._down_weight = self.weights[by_level]
+        self._down_levels = self._slices(self.level[self._down_dst])
+        # Edges grouped by source height, then source: reachability order.
+        by_height = np.lexsort((self.sources, self.height[self.sources]))
+        self._up_src = self.sources[by_height]
+        self._up_dst = self.targets[by_height]
+        self._up_heights = self._slices(self.height[self._up_src])
+
+        out_degree = np.diff(self.indptr)
+        if metrics is None:
+            metric_ids = np.flatnonzero(out_degree == 0)
+        else:
+            metric_ids = np.array([self.index[name] for name in metrics], dtype=np.int64)
+        self.metric_ids = metric_ids
+        self._metric_column = np.full(count, -1, dtype=np.int64)
+        self._metric_column[metric_ids] = np.arange(metric_ids.size)
+        self._reach_counts: Optional[np.ndarray] = None
+
+    # ---------------------------------------------------------------- build
+    def _levels(self, count: int) -> np.ndarray:
+        """Longest distance from a node without parents (Kahn, frontier at a time)."""
+        in_degree = np.bincount(self.targets, minlength=count)
+        level = np.zeros(count, dtype=np.int64)
+        frontier = np.flatnonzero(in_degree == 0)
+        seen = frontier.size
+        depth = 0
+        while frontier.size:
+            children = self._children(frontier)
+            np.subtract.at(in_degree, children, 1)
+            depth += 1
+            level[children] = depth
+            frontier = np.unique(children[in_degree[children] == 0])
+            seen += frontier.size
+        if seen != count:
+            raise ValueError("propagation graph has a cycle")
+        return level
+
+    def _children(self, frontier: np.ndarray) -> np.ndarray:
+        """Targets of every outgoing edge of the ``frontier`` nodes."""
+        starts = self.indptr[frontier]
+        lengths = self.indptr[frontier + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.targets[offsets + np.arange(offsets.size)]
+
+    def _heights(self, count: int) -> np.ndarray:
+        """Longest distance to a node without children, one level at a time."""
+        height = np.zeros(count, dtype=np.int64)
+        by_level = np.lexsort((self.sources, self.level[self.sources]))
+        src, dst = self.sources[by_level], self.targets[by_level]
+        for start, stop in reversed(self._slices(self.level[src])):
+            groups = _group_starts(src[start:stop])
+            height[src[start:stop][groups]] = np.maximum.reduceat(height[dst[start:stop]], groups) + 1
+        return height
+
+    @staticmethod
+    def _slices(keys: np.ndarray) -> List[Tuple[int, int]]:
+        starts = _group_starts(keys)
+        stops = np.r_[starts[1:], keys.size]
+        return [(int(a), int(b)) for a, b in zip(starts, stops)]
+
+    @classmethod
+    def from_links(cls, links: Iterable[PropagationLink], **kwargs: object) -> "PropagationGraph":
+        """Graph from ``build_propagation``-style links (intensity as attenuation)."""
+        return cls(
+            ((link.source, link.target, link.intensity, link.signal) for link in links),
+            **kwargs,  # type: ignore[arg-type]
+        )
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def metrics(self) -> List[str]:
+        return [self.nodes[idx] for idx in self.metric_ids]
+
+    def _ids(self, names: Iterable[str]) -> np.ndarray:
+        try:
+            return np.array([self.index[name] for name in names], dtype=np.int64)
+        except KeyError as exc:
+            raise ValueError(f"unknown node {exc.args[0]!r}") from None
+
+    # ---------------------------------------------------------- propagation
+    def propagate(
+        self,
+        sources: Union[Mapping[str, float], Sequence[str]],
+        mode: str = "max",
+        return_parents: bool = False,
+    ) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """Signal strength at every node (indexed like :attr:`nodes`).
+
+        ``sources`` maps injected nodes to their strength (a plain sequence
+        means strength 1.0). Each edge multiplies by its attenuation; with
+        ``mode="max"`` a node keeps its strongest incoming path, with
+        ``"sum"`` the sum over incoming edges. ``return_parents`` also returns,
+        for ``"max"``, the predecessor on each node's strongest path (-1 when
+        none).
+        """
+        if mode not in PROPAGATION_MODES:
+            raise ValueError(f"mode must be one of {PROPAGATION_MODES}")
+        if not isinstance(sources, Mapping):
+            sources = dict.fromkeys(sources, 1.0)
+        signal = np.zeros(len(self.nodes))
+        signal[self._ids(sources)] = list(sources.values())
+        parents = np.full(len(self.nodes), -1, dtype=np.int64)
+        for start, stop in self._down_levels:
+            src = self._down_src[start:stop]
+            dst = self._down_dst[start:stop]
+            values = signal[src] * self._down_weight[start:stop]
+            groups = _group_starts(dst)
+            nodes = dst[groups]
+            if mode == "sum":
+                signal[nodes] += np.add.reduceat(values, groups)
+                continue
+            incoming = np.maximum.reduceat(values, groups)
+            if return_parents:
+                # First edge per target carrying its maximum, where it beats
+                # the strength the target already had (an injected source).
+                group_of = np.repeat(np.arange(groups.size), np.diff(np.r_[groups, values.size]))
+                best = np.flatnonzero(values == incoming[group_of])
+                best = best[_group_starts(group_of[best])]
+                wins = incoming > signal[nodes]
+                parents[nodes[wins]] = src[best[wins]]
+            np.maximum(signal[nodes], incoming, out=incoming)
+            signal[nodes] = incoming
+        if return_parents:
+            return signal, parents
+        return signal
+
+    def path(self, parents: np.ndarray, node: str) -> List[str]:
+        """Node names from the injected source to ``node`` following ``parents``."""
+        current = self.index[node]
+        chain = [current]
+        while parents[current] >= 0:
+            current = int(parents[current])
+            chain.append(current)
+        return [self.nodes[idx] for idx in reversed(chain)]
+
+    # --------------------------------------------------------- reachability
+    def _reach_bits(self, metric_ids: np.ndarray) -> np.ndarray:
+        """Packed bits: row ``i`` marks which of ``metric_ids`` node ``i`` reaches.
+
+        Filled from the sinks upwards with one vectorized OR per height, so
+        the cost is one pass over the edges per byte column.
+        """
+        columns = metric_ids.size
+        reach = np.zeros((len(self.nodes), max(1, (columns + 7) // 8)), dtype=np.uint8)
+        if columns:
+            reach[metric_ids] = np.packbits(np.eye(columns, dtype=bool), axis=1)
+        for start, stop in self._up_heights:
+            src = self._up_src[start:stop]
+            groups = _group_starts(src)
+            reach[src[groups]] |= np.bitwise_or.reduceat(
+                reach[self._up_dst[start:stop]], groups, axis=0
+            )
+        return reach
+
+    @property
+    def reach_counts(self) -> np.ndarray:
+        """Number of metrics each node reaches (itself included); cached.
+
+        Computed in blocks of metric columns so memory stays at one block
+        per node however many metrics the graph has.
+        """
+        if self._reach_counts is None:
+            counts = np.zeros(len(self.nodes), dtype=np.int64)
+            for block in range(0, self.metric_ids.size, _REACH_BLOCK):
+                bits = self._reach_bits(self.metric_ids[block : block + _REACH_BLOCK])
+                counts += _POPCOUNT[bits].sum(axis=1, dtype=np.int64)
+            self._reach_counts = counts
+        return self._reach_counts
+
+    def descendants(self, node: str) -> np.ndarray:
+        """Indices of every node reachable from ``node`` (itself included)."""
+        seen = np.zeros(len(self.nodes), dtype=bool)
+        frontier = self._ids([node])
+        seen[frontier] = True
+        while frontier.size:
+            children = self._children(frontier)
+            frontier = np.unique(children[~seen[children]])
+            seen[frontier] = True
+        return np.flatnonzero(seen)
+
+    def reachable_metrics(self, node: str) -> List[str]:
+        """Metrics downstream of ``node``, in metric order."""
+        member = np.zeros(len(self.nodes), dtype=bool)
+        member[self.descendants(node)] = True
+        return [self.nodes[idx] for idx in self.metric_ids[member[self.metric_ids]]]
+
+    def rank_root_causes(
+        self,
+        anomalous: Iterable[str],
+        candidates: Optional[Sequence[str]] = None,
+        top: int = 10,
+    ) -> List[RootCause]:
+        """Rank nodes by how well their downstream metrics match ``anomalous``.
+
+        ``candidates`` defaults to every node that is not a metric. Ties go
+        to the deepest node, the most specific explanation of the same
+        metrics. Only the anomalous columns are propagated per query; the
+        per-node reach counts come from :attr:`reach_counts`.
+        """
+        metric_ids = np.unique(self._ids(anomalous))
+        if np.any(self._metric_column[metric_ids] < 0):
+            raise ValueError("anomalous nodes must be metrics")
+        if candidates is None:
+            ids = np.flatnonzero(self._metric_column < 0)
+        else:
+            ids = self._ids(candidates)
+        rows = self._reach_bits(metric_ids)[ids]
+        hits = _POPCOUNT[rows].sum(axis=1, dtype=np.int64)
+        reached = self.reach_counts[ids]
+        coverage = hits / max(1, metric_ids.size)
+        precision = np.divide(hits, reached, out=np.zeros(hits.size), where=reached > 0)
+        score = coverage * precision
+        order = np.lexsort((-self.level[ids], -score))[:top]
+        ranked = []
+        for pos in order:
+            if hits[pos] == 0:
+                break
+            row = np.unpackbits(rows[pos])[: metric_ids.size].astype(bool)
+            ranked.append(
+                RootCause(
+                    self.nodes[ids[pos]],
+                    float(score[pos]),
+                    float(coverage[pos]),
+                    float(precision[pos]),
+                    [self.nodes[idx] for idx in metric_ids[row]],
+                )
+            )
+        return ranked
+
+    # ----------------------------------------------------------- subgraphs
+    def links(self, nodes: Optional[Iterable[str]] = None) -> List[PropagationLink]:
+        """Edges of the subgraph induced by ``nodes`` (all edges by default)."""
+        if nodes is None:
+            keep = np.ones(self.sources.size, dtype=bool)
+        else:
+            member = np.zeros(len(self.nodes), dtype=bool)
+            member[self._ids(nodes)] = True
+            keep = member[self.sources] & member[self.targets]
+        return [
+            PropagationLink(
+                self.nodes[self.sources[pos]],
+                self.nodes[self.targets[pos]],
+                self.signals[pos],
+                float(self.weights[pos]),
+            )
+            for pos in np.flatnonzero(keep)
+        ]
+
+    def explain(
+        self, root: str, metrics: Optional[Sequence[str]] = None, strength: float = 1.0
+    ) -> PropagationResult:
+        """Strongest paths from ``root`` to ``metrics`` as a :class:`PropagationResult`.
+
+        Link intensities are the signal strength arriving at each link's
+        target; ``impacted_metrics`` holds the strength at each metric.
+        ``metrics`` defaults to every metric ``root`` reaches.
+        """
+        signal, parents = self.propagate({root: strength}, return_parents=True)  # type: ignore[misc]
+        names = list(metrics) if metrics is not None else self.reachable_metrics(root)
+        links: Dict[Tuple[int, int], PropagationLink] = {}
+        for name in names:
+            chain = self.path(parents, name)
+            for source, target in zip(chain, chain[1:]):
+                key = (self.index[source], self.index[target])
+                if key not in links:
+                    edge = self._edge_index[key]
+                    links[key] = PropagationLink(
+                        source, target, self.signals[edge], float(signal[key[1]])
+                    )
+        ordered = sorted(links.values(), key=lambda link: self.level[self.index[link.target]])
+        return summarize_propagation(
+            ordered, {name: float(signal[self.index[name]]) for name in names}
+        )
@@ -0,0 +1,68 @@
+"""Layer, granularity and system level fault injection (imported lazily).
+
+``stuck_at_fault`` and ``jitter_series`` exist in both ``granularity_injection``
+and ``system_injection``; the package exposes the granularity versions.
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "array_injection": ["FAULT_KINDS", "NOISE_FACTORS", "ArrayInjector"],
+        "campaign": [
+            "CAMPAIGN_FAULTS",
+            "RESULT_DTYPE",
+            "SweepSpec",
+            "CampaignResult",
+            "SensitivityMatrix",
+            "read_campaign_results",
+            "sensitivity_matrix",
+            "run_campaign",
+        ],
+        "float_bits": [
+            "BIT_FIELDS",
+            "FLOAT_FORMATS",
+            "FloatFormat",
+            "float_format",
+            "bit_view",
+            "to_bfloat16",
+            "from_bfloat16",
+            "xor_bits",
+            "flip_bits",
+            "random_bit_masks",
+            "inject_bit_flips",
+            "flip_float_bit",
+            "BitSweep",
+            "iter_exhaustive_bit_sweep",
+            "exhaustive_bit_sweep",
+            "stratified_bit_sweep",
+        ],
+        "granularity_injection": [
+            "Granularity",
+            "apply_noise",
+            "apply_noise_series",
+            "stuck_at_fault",
+            "jitter_series",
+        ],
+        "layer_injection": [
+            "LayerFault",
+            "inject_fault",
+            "apply_faults",
+            "bit_flip_fault",
+            "float_bit_flip_fault",
+            "scale_fault",
+        ],
+        "system_injection": ["simulate_outage", "induce_throttle", "drop_packets"],
+        "timeline": [
+            "TIMELINE_FAULTS",
+            "FaultWindow",
+            "FaultEvent",
+            "RealClock",
+            "VirtualClock",
+            "FaultTimeline",
+            "DetectionScore",
+            "outage_handler",
+            "score_detections",
+        ],
+    },
+)
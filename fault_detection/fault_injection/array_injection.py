@@ -0,0 +1,321 @@
+"""
+Seeded, vectorized fault injection over NumPy arrays.
+
+``apply_noise_series`` and ``jitter_series`` draw from the global ``random()``
+once per element in a Python loop: slow on long captures, and impossible to
+replay because there is no seed. :class:`ArrayInjector` owns a
+``numpy.random.Generator`` built from an explicit seed and applies the same
+fault kinds to whole arrays, block by block, either into a new array or in
+place (``out=values``). Random numbers are drawn in a fixed order, so the same
+seed and the same calls always give the same result, whatever the block size.
+
+Where a fault hits is described by boolean masks: independent drops
+(:meth:`ArrayInjector.drop_mask`), sparse bursts of consecutive samples
+(:meth:`ArrayInjector.burst_mask`) and periodic on/off windows
+(:meth:`ArrayInjector.intermittent_mask`). Every fault method accepts such a
+``mask``; masks follow the array's shape and bursts never cross rows of a 2-D
+``(series, time)`` array.
+"""
+from typing import Callable, Optional, Tuple, Union
+
+import numpy as np
+
+from fault_detection.fault_injection.granularity_injection import Granularity
+
+__all__ = ["FAULT_KINDS", "NOISE_FACTORS", "ArrayInjector"]
+
+FAULT_KINDS = ("noise", "jitter", "stuck_at", "scale", "drop")
+# Noise amplitude per granularity, as in ``apply_noise``.
+NOISE_FACTORS = {Granularity.COARSE: 0.1, Granularity.FINE: 0.01}
+
+# Values per block: large enough to amortize NumPy call overhead, small
+# enough that the random scratch buffer stays in cache.
+_BLOCK = 1 << 14
+# Below this rate, Bernoulli masks are drawn as geometric gaps between hits
+# (work proportional to the hits) instead of one uniform per element.
+_SPARSE_RATE = 0.05
+
+Seed = Union[None, int, np.random.SeedSequence, np.random.Generator]
+Shape = Union[int, Tuple[int, ...]]
+
+
+def _shape(shape: Shape) -> Tuple[int, ...]:
+    return (shape,) if isinstance(shape, (int, np.integer)) else tuple(shape)
+
+
+class ArrayInjector:
+    """Apply faults to NumPy arrays with a reproducible random stream.
+
+    ``seed`` is an int, a ``SeedSequence`` or an existing ``Generator``
+    (used as is). Integer and ``None`` seeds use the PCG64DXSM bit generator.
+    Fault methods return ``out``, a new floating array unless ``out`` is
+    given (pass ``out=values`` to modify in place). Elements outside
+    ``mask`` are copied unchanged.
+    """
+
+    def __init__(self, seed: Seed = None, block_size: int = _BLOCK) -> None:
+        if block_size <= 0:
+            raise ValueError("block_size must be positive")
+        if isinstance(seed, np.random.Generator):
+            self.rng = seed
+        else:
+            self.rng = np.random.Generator(np.random.PCG64DXSM(seed))
+        self.block_size = block_size
+
+    # ---------------------------------------------------------------- helpers
+    @staticmethod
+    def _output(values: np.ndarray, out: Optional[np.ndarray]) -> np.ndarray:
+        if out is None:
+            dtype = values.dtype if np.issubdtype(values.dtype, np.floating) else np.float64
+            return np.empty(values.shape, dtype=dtype)
+        if out.shape != values.shape:
+            raise ValueError(f"out has shape {out.shape}, expected {values.shape}")
+        if not out.flags.c_contiguous:
+            raise ValueError("out must be C-contiguous")
+        return out
+
+    @staticmethod
+    def _check_mask(mask: Optional[np.ndarray], values: np.ndarray) -> Optional[np.ndarray]:
+        if mask is None:
+            return None
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != values.shape:
+            raise ValueError(f"mask has shape {mask.shape}, expected {values.shape}")
+        return mask.reshape(-1)
+
+    def _additive(
+        self,
+        values: np.ndarray,
+        scale: float,
+        offset: float,
+        mask: Optional[np.ndarray],
+        out: Optional[np.ndarray],
+    ) -> np.ndarray:
+        """``out = values + (U[0, 1) + offset) * scale``, optionally only under ``mask``.
+
+        One uniform is drawn per element (masked or not), so the stream does
+        not depend on the mask.
+        """
+        values = np.asarray(values)
+        out = self._output(values, out)
+        flat_in = values.reshape(-1)
+        flat_out = out.reshape(-1)
+        flat_mask = self._check_mask(mask, values)
+        draw_dtype = np.float32 if out.dtype == np.float32 else np.float64
+        scratch = np.empty(min(self.block_size, flat_in.size), dtype=draw_dtype)
+        for start in range(0, flat_in.size, self.block_size):
+            stop = min(start + self.block_size, flat_in.size)
+            block = scratch[: stop - start]
+            self.rng.random(out=block, dtype=draw_dtype)
+            if offset:
+                block += offset
+            block *= scale
+            if flat_mask is None:
+                np.add(flat_in[start:stop], block, out=flat_out[start:stop], casting="unsafe")
+            else:
+                if out is not values:
+                    flat_out[start:stop] = flat_in[start:stop]
+                hit = flat_mask[start:stop]
+                flat_out[start:stop][hit] += block[hit]
+        return out
+
+    # ----------------------------------------------------------------- faults
+    def noise(
+        self,
+        values: np.ndarray,
+        granularity: Granularity = Granularity.FINE,
+        mask: Optional[np.ndarray] = None,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Add ``U[0, 1) * factor`` noise, ``factor`` set by ``granularity`` (see ``apply_noise``)."""
+        return self._additive(values, NOISE_FACTORS[granularity], 0.0, mask, out)
+
+    def jitter(
+        self,
+        values: np.ndarray,
+        amplitude: float = 0.02,
+        mask: Optional[np.ndarray] = None,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Add bounded ``(U[0, 1) - 0.5) * amplitude`` jitter (see ``jitter_series``)."""
+        return self._additive(values, amplitude, -0.5, mask, out)
+
+    def stuck_at(
+        self,
+        values: np.ndarray,
+        stuck_value: float = 0.0,
+        mask: Optional[np.ndarray] = None,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Force elements to ``stuck_value``; ones already equal to it move by ``1e-3``.
+
+        This is ``stuck_at_fault`` applied element-wise (to all elements, or
+        those under ``mask``). It draws no random numbers.
+        """
+        def _stick(selected: np.ndarray) -> np.ndarray:
+            return np.where(selected == stuck_value, selected + 1e-3, stuck_value)
+
+        return self._apply(values, _stick, mask, out)
+
+    def scale(
+        self,
+        values: np.ndarray,
+        factor: float,
+        mask: Optional[np.ndarray] = None,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Multiply elements by ``factor`` (see ``scale_fault``)."""
+        return self._apply(values, lambda selected: selected * factor, mask, out)
+
+    def drop(
+        self,
+        values: np.ndarray,
+        rate: float = 0.1,
+        fill: float = np.nan,
+        mask: Optional[np.ndarray] = None,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Replace dropped samples with ``fill`` (NaN by default).
+
+        Without ``mask``, each sample is dropped independently with
+        probability ``rate`` (:meth:`drop_mask`); with one, exactly the masked
+        samples are dropped.
+        """
+        values = np.asarray(values)
+        if mask is None:
+            mask = self.drop_mask(values.shape, rate)
+        out = self._output(values, out)
+        flat_mask = self._check_mask(mask, values)
+        if out is not values:
+            out[...] = values
+        out.reshape(-1)[flat_mask] = fill
+        return out
+
+    def _apply(
+        self,
+        values: np.ndarray,
+        fault: Callable[[np.ndarray], np.ndarray],
+        mask: Optional[np.ndarray],
+        out: Optional[np.ndarray],
+    ) -> np.ndarray:
+        """Write ``fault(values)`` to ``out``; with a mask, only masked elements are computed."""
+        values = np.asarray(values)
+        out = self._output(values, out)
+        flat_in = values.reshape(-1)
+        flat_out = out.reshape(-1)
+        if mask is None:
+            for start in range(0, flat_in.size, self.block_size):
+                stop = min(start + self.block_size, flat_in.size)
+                flat_out[start:stop] = fault(flat_in[start:stop])
+            return out
+        hits = np.flatnonzero(self._check_mask(mask, values))
+        faulted = fault(flat_in[hits])
+        if out is not values:
+            out[...] = values
+        flat_out[hits] = faulted
+        return out
+
+    # ------------------------------------------------------------------ masks
+    def drop_mask(self, shape: Shape, rate: float) -> np.ndarray:
+        """Independent Bernoulli(``rate``) mask, like ``drop_packets`` per sample."""
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError("rate must be in [0, 1]")
+        shape = _shape(shape)
+        size = int(np.prod(shape))
+        if rate == 0.0:
+            return np.zeros(shape, dtype=bool)
+        if rate < _SPARSE_RATE:
+            mask = np.zeros(size, dtype=bool)
+            mask[self._bernoulli_positions(size, rate)] = True
+            return mask.reshape(shape)
+        mask = np.empty(size, dtype=bool)
+        scratch = np.empty(min(self.block_size, size))
+        for start in range(0, size, self.block_size):
+            stop = min(start + self.block_size, size)
+            block = scratch[: stop - start]
+            self.rng.random(out=block)
+            np.less(block, rate, out=mask[start:stop])
+        return mask.reshape(shape)
+
+    def _bernoulli_positions(self, size: int, rate: float) -> np.ndarray:
+        """Sorted positions of a Bernoulli(``rate``) process over ``size`` trials."""
+        if rate == 0.0 or size == 0:
+            return np.empty(0, dtype=np.int64)
+        chunks = []
+        position = -1
+        expected = int(size * rate * 1.1) + 16
+        while True:
+            gaps = self.rng.geometric(rate, size=expected)
+            hits = position + np.cumsum(gaps)
+            inside = hits[hits < size]
+            chunks.append(inside)
+            if inside.size < hits.size:
+                break
+            position = int(hits[-1])
+        return np.concatenate(chunks)
+
+    def burst_mask(self, shape: Shape, rate: float, mean_length: float = 10.0) -> np.ndarray:
+        """Sparse bursts: each sample starts a burst with probability ``rate``.
+
+        Burst lengths are geometric with mean ``mean_length``; overlapping
+        bursts merge, and a burst stops at the end of its row (last axis).
+        """
+        if mean_length < 1.0:
+            raise ValueError("mean_length must be at least 1")
+        shape = _shape(shape)
+        size = int(np.prod(shape))
+        row = shape[-1] if shape else 1
+        starts = self._bernoulli_positions(size, rate)
+        lengths = self.rng.geometric(1.0 / mean_length, size=starts.size)
+        lengths = np.minimum(lengths, (starts // row + 1) * row - starts)
+        # Expand (start, length) pairs into indices without a Python loop:
+        # work is proportional to the covered samples, not to ``size``.
+        offsets = np.cumsum(lengths) - lengths
+        covered = np.arange(int(lengths.sum())) + np.repeat(starts - offsets, lengths)
+        mask = np.zeros(size, dtype=bool)
+        mask[covered] = True
+        return mask.reshape(shape)
+
+    def intermittent_mask(
+        self,
+        shape: Shape,
+        period: int,
+        duty: float = 0.5,
+        phase: Optional[int] = None,
+    ) -> np.ndarray:
+        """Periodic on/off fault: active for ``duty`` of every ``period`` samples.
+
+        Each row (last axis) gets its own random phase unless ``phase`` is
+        given, so intermittent faults on different series do not line up.
+        """
+        if period <= 0:
+            raise ValueError("period must be positive")
+        if not 0.0 <= duty <= 1.0:
+            raise ValueError("duty must be in [0, 1]")
+        shape = _shape(shape)
+        rows = int(np.prod(shape[:-1])) if len(shape) > 1 else 1
+        row = shape[-1] if shape else 1
+        if phase is None:
+            phases = self.rng.integers(0, period, size=rows)
+        else:
+            phases = np.full(rows, phase)
+        cycle = np.arange(period) < int(round(duty * period))
+        mask = np.empty((rows, row), dtype=bool)
+        for index, offset in enumerate(phases):
+            # Sample j is active when (j + phase) % period falls in the on part.
+            mask[index] = np.resize(np.roll(cycle, -int(offset)), row)
+        return mask.reshape(shape)
+
+    # --------------------------------------------------------------- dispatch
+    def inject(
+        self,
+        values: np.ndarray,
+        kind: str,
+        mask: Optional[np.ndarray] = None,
+        out: Optional[np.ndarray] = None,
+        **params: float,
+    ) -> np.ndarray:
+        """Apply the fault named ``kind`` (one of :data:`FAULT_KINDS`) with ``params``."""
+        if kind not in FAULT_KINDS:
+            raise ValueError(f"kind must be one of {FAULT_KINDS}")
+        return getattr(self, kind)(values, mask=mask, out=out, **params)
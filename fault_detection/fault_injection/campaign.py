@@ -0,0 +1,477 @@
+"""
+Parallel fault-injection campaigns over ``MainModel`` layers.
+
+``apply_faults`` applies one fixed list of :class:`LayerFault` objects once.
+A campaign instead sweeps every combination of layer x fault kind x magnitude
+(x repeat) described by a :class:`SweepSpec`, runs ``MainModel.predict`` on a
+fixed input batch for each trial, and scores the faulty outputs with a
+:class:`MonitoringModel` warmed up on the pristine outputs.
+
+Trials are identified by their index in the sweep, so the spec alone maps an
+index back to its layer, fault and repeat. Worker processes attach to the
+pristine weights through one read-only :mod:`multiprocessing.shared_memory`
+block (a pickled copy each on Python 3.7) and run trials in chunks; the parent appends each chunk's fixed-size
+records to ``results.bin`` as it completes. Re-running the same spec into the
+same directory skips the trials already on disk, so an interrupted campaign
+resumes where it stopped. :func:`sensitivity_matrix` reduces the records to
+a layer x fault table of mean output deviation and detection rate.
+
+Run ``python -m fault_detection.fault_injection.campaign SPEC.json --output DIR``.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: no cover - Python 3.7; workers get pickled weights
+    shared_memory = None  # type: ignore[assignment]
+
+from fault_detection.fault_injection.granularity_injection import stuck_at_fault
+from fault_detection.fault_injection.layer_injection import (
+    LayerFault,
+    bit_flip_fault,
+    float_bit_flip_fault,
+    inject_fault,
+    scale_fault,
+)
+from models.main_model.model import MainModel
+from models.monitoring_model.model import MonitoringModel
+from utils.model_utils.model_loader import ModelLoader
+
+__all__ = [
+    "CAMPAIGN_FAULTS",
+    "RUNAWAY_FACTOR",
+    "RESULT_DTYPE",
+    "SweepSpec",
+    "CampaignResult",
+    "SensitivityMatrix",
+    "read_campaign_results",
+    "sensitivity_matrix",
+    "run_campaign",
+]
+
+# Fault kinds a sweep may use; each magnitude is the kind's single parameter
+# (factor, stuck value, bit position, noise or jitter amplitude).
+# ``float_bit_flip`` flips a bit of the weight's float64 encoding.
+CAMPAIGN_FAULTS = ("scale", "stuck_at", "bit_flip", "float_bit_flip", "noise", "jitter")
+# One record per trial, appended to ``results.bin`` (25 bytes, unpadded).
+RESULT_DTYPE = np.dtype(
+    [("trial", "<i8"), ("sensitivity", "<f8"), ("max_score", "<f8"), ("detected", "u1")]
+)
+# Outputs this many times larger than the largest clean output (e.g. an
+# exponent bit flip giving ~1e307) count as detected whatever the monitor says.
+RUNAWAY_FACTOR = 1e6
+DEFAULT_WEIGHTS = Path(__file__).resolve().parents[2] / "models" / "main_model" / "model_weights.h5"
+
+_SPEC_FILE = "spec.json"
+_RESULTS_FILE = "results.bin"
+_MATRIX_FILE = "matrix.json"
+# Per-process campaign state, set up once by ``_init_worker``.
+_WORKER: Dict[str, Any] = {}
+
+
+@dataclass
+class SweepSpec:
+    """Declarative description of a campaign.
+
+    ``faults`` maps each kind in :data:`CAMPAIGN_FAULTS` to the magnitudes to
+    sweep. An empty ``layers`` list means every layer of the model (resolved
+    by :func:`run_campaign`). Each trial feeds the same ``n_inputs`` values,
+    drawn from ``seed``, to the model; ``noise`` and ``jitter`` trials draw
+    their perturbation from ``(seed, trial)`` so results do not depend on
+    which worker ran them.
+    """
+
+    faults: Dict[str, List[float]]
+    layers: List[str] = field(default_factory=list)
+    repeats: int = 1
+    seed: int = 0
+    n_inputs: int = 64
+    window_size: int = 32
+    anomaly_z: float = 3.0
+    weights_path: str = str(DEFAULT_WEIGHTS)
+
+    def __post_init__(self) -> None:
+        unknown = set(self.faults) - set(CAMPAIGN_FAULTS)
+        if unknown:
+            raise ValueError(f"unknown fault kinds {sorted(unknown)}; expected {CAMPAIGN_FAULTS}")
+        if not any(self.faults.values()):
+            raise ValueError("faults must list at least one magnitude")
+        if self.repeats <= 0 or self.n_inputs <= 0 or self.window_size <= 0:
+            raise ValueError("repeats, n_inputs and window_size must be positive")
+        self.faults = {kind: [float(m) for m in mags] for kind, mags in self.faults.items()}
+        self.layers = list(self.layers)
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "SweepSpec":
+        return cls(**dict(data))
+
+    @classmethod
+    def from_file(cls, path: Union[Path, str]) -> "SweepSpec":
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def fingerprint(self) -> str:
+        """Stable hash of the spec; results are only resumed under the same one."""
+        encoded = json.dumps(self.as_dict(), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def columns(self) -> List[Tuple[str, float]]:
+        """``(kind, magnitude)`` pairs in sweep order: the matrix columns."""
+        return [(kind, magnitude) for kind, mags in self.faults.items() for magnitude in mags]
+
+    def __len__(self) -> int:
+        return len(self.layers) * len(self.columns) * self.repeats
+
+    def decode(self, trials: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Split trial indices into ``(layer, column, repeat)`` indices.
+
+        Layers vary slowest and repeats fastest:
+        ``trial = (layer * len(columns) + column) * repeats + repeat``.
+        """
+        trials = np.asarray(trials, dtype=np.int64)
+        repeat = trials % self.repeats
+        column = (trials // self.repeats) % len(self.columns)
+        layer = trials // (self.repeats * len(self.columns))
+        return layer, column, repeat
+
+
+@dataclass
+class SensitivityMatrix:
+    """Layer x fault summary of a campaign; cells with no trials are NaN."""
+
+    layers: List[str]
+    faults: List[str]
+    sensitivity: np.ndarray
+    detection_rate: np.ndarray
+    trials: np.ndarray
+
+    def as_dict(self) -> Dict[str, Any]:
+        def _cells(matrix: np.ndarray) -> List[List[Optional[float]]]:
+            return [[None if np.isnan(v) else float(v) for v in row] for row in matrix]
+
+        return {
+            "layers": self.layers,
+            "faults": self.faults,
+            "sensitivity": _cells(self.sensitivity),
+            "detection_rate": _cells(self.detection_rate),
+            "trials": self.trials.astype(int).tolist(),
+        }
+
+    def format_table(self) -> str:
+        """Plain-text table, one cell per layer and fault: ``sensitivity / detection rate``."""
+        width = max([len(name) for name in self.faults] + [15])
+        header = f"{'layer':<12}" + "".join(f" {name:>{width}}" for name in self.faults)
+        lines = [header]
+        for row, layer in enumerate(self.layers):
+            cells = []
+            for column in range(len(self.faults)):
+                sensitivity = self.sensitivity[row, column]
+                rate = self.detection_rate[row, column]
+                text = "-" if np.isnan(sensitivity) else f"{sensitivity:.3g} / {rate:.0%}"
+                cells.append(f" {text:>{width}}")
+            lines.append(f"{layer:<12}" + "".join(cells))
+        return "\n".join(lines)
+
+
+@dataclass
+class CampaignResult:
+    """Where a campaign was written and what this run did."""
+
+    output_dir: Path
+    results_path: Path
+    trials: int
+    completed: int
+    resumed: int
+    elapsed_seconds: float
+    matrix: SensitivityMatrix
+
+    @property
+    def trials_per_second(self) -> float:
+        return self.completed / (self.elapsed_seconds or 1.0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "output_dir": str(self.output_dir),
+            "results": str(self.results_path),
+            "trials": self.trials,
+            "completed": self.completed,
+            "resumed": self.resumed,
+            "elapsed_seconds": self.elapsed_seconds,
+            "trials_per_second": self.trials_per_second,
+        }
+
+
+def _perturbation(kind: str, magnitude: float, rng: Optional[np.random.Generator]) -> Callable[[float], float]:
+    if kind == "scale":
+        return scale_fault("", magnitude).perturbation
+    if kind == "stuck_at":
+        return lambda value: stuck_at_fault(value, magnitude)
+    if kind == "bit_flip":
+        return bit_flip_fault(int(magnitude)).perturbation
+    if kind == "float_bit_flip":
+        return float_bit_flip_fault("", int(magnitude)).perturbation
+    assert rng is not None
+    if kind == "noise":
+        offset = rng.random() * magnitude
+    else:  # jitter
+        offset = (rng.random() - 0.5) * magnitude
+    return lambda value: value + offset
+
+
+def _init_worker(
+    shm_name: Optional[str],
+    weights: Optional[np.ndarray],
+    layer_names: Sequence[str],
+    spec: Dict[str, Any],
+) -> None:
+    if shm_name is not None:
+        block = shared_memory.SharedMemory(name=shm_name)
+        _WORKER["shm"] = block
+        weights = np.ndarray((len(layer_names),), dtype=np.float64, buffer=block.buf)
+    assert weights is not None
+    sweep = SweepSpec.from_dict(spec)
+    pristine = dict(zip(layer_names, weights.tolist()))
+    model = MainModel(sweep.weights_path)
+    model.weights = dict(pristine)
+    model.is_loaded = True
+    inputs = np.random.default_rng(sweep.seed).random(sweep.n_inputs).tolist()
+    clean = model.predict(inputs)
+    _WORKER.update(
+        spec=sweep,
+        pristine=pristine,
+        model=model,
+        inputs=inputs,
+        clean=np.asarray(clean),
+        clean_scale=float(np.mean(np.abs(clean))) or 1.0,
+        runaway=RUNAWAY_FACTOR * (float(np.max(np.abs(clean), initial=0.0)) or 1.0),
+        # The monitor only keeps ``window_size`` samples, so warming it up on
+        # the tail of the clean outputs is the same as on all of them.
+        warmup=clean[-sweep.window_size :],
+        columns=sweep.columns,
+    )
+
+
+def _run_trials(trials: np.ndarray) -> np.ndarray:
+    spec: SweepSpec = _WORKER["spec"]
+    model: MainModel = _WORKER["model"]
+    pristine = _WORKER["pristine"]
+    columns = _WORKER["columns"]
+    records = np.empty(trials.size, dtype=RESULT_DTYPE)
+    layers, cols, _repeats = spec.decode(trials)
+    for row, (trial, layer, column) in enumerate(zip(trials.tolist(), layers.tolist(), cols.tolist())):
+        kind, magnitude = columns[column]
+        rng = None
+        if kind in ("noise", "jitter"):
+            rng = np.random.Generator(np.random.PCG64DXSM([spec.seed, trial]))
+        fault = LayerFault(spec.layers[layer], _perturbation(kind, magnitude, rng), kind)
+        model.weights = inject_fault(pristine, fault)
+        faulty = model.predict(_WORKER["inputs"])
+        monitor = MonitoringModel(spec.window_size, spec.anomaly_z)
+        monitor.bulk_score(_WORKER["warmup"])
+        outputs = np.asarray(faulty)
+        if np.isfinite(outputs).all():
+            max_score = max(monitor.bulk_score(faulty))
+        else:
+            # Overflowed or NaN outputs (e.g. exponent bit flips) always count as detected.
+            max_score = math.inf
+        with np.errstate(over="ignore", invalid="ignore"):
+            deviation = float(np.mean(np.abs(outputs - _WORKER["clean"])))
+            runaway = bool(np.abs(outputs).max() > _WORKER["runaway"]) if outputs.size else False
+        # Finite but runaway outputs can overflow the monitor's statistics, so
+        # they (and any non-finite deviation or score) are detected outright.
+        detected = (
+            max_score > spec.anomaly_z
+            or runaway
+            or not math.isfinite(deviation)
+            or not math.isfinite(max_score)
+        )
+        records[row] = (trial, deviation / _WORKER["clean_scale"], max_score, detected)
+    model.weights = dict(pristine)
+    return records
+
+
+def read_campaign_results(output_dir: Union[Path, str]) -> np.ndarray:
+    """Records in ``output_dir/results.bin``, ignoring a torn trailing record."""
+    path = Path(output_dir) / _RESULTS_FILE
+    if not path.exists():
+        return np.empty(0, dtype=RESULT_DTYPE)
+    data = path.read_bytes()
+    usable = len(data) - len(data) % RESULT_DTYPE.itemsize
+    return np.frombuffer(data[:usable], dtype=RESULT_DTYPE).copy()
+
+
+def sensitivity_matrix(spec: SweepSpec, records: np.ndarray) -> SensitivityMatrix:
+    """Mean sensitivity and detection rate per layer and fault column."""
+    shape = (len(spec.layers), len(spec.columns))
+    totals = np.zeros(shape)
+    detected = np.zeros(shape)
+    counts = np.zeros(shape)
+    layers, columns, _repeats = spec.decode(records["trial"])
+    np.add.at(totals, (layers, columns), records["sensitivity"])
+    np.add.at(detected, (layers, columns), records["detected"])
+    np.add.at(counts, (layers, columns), 1.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sensitivity = totals / counts
+        rate = detected / counts
+    labels = [f"{kind}={magnitude:g}" for kind, magnitude in spec.columns]
+    return SensitivityMatrix(list(spec.layers), labels, sensitivity, rate, counts)
+
+
+def _prepare_output(output_dir: Path, spec: SweepSpec, resume: bool) -> np.ndarray:
+    """Check or write ``spec.json`` and return a done-flag per trial."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    spec_path = output_dir / _SPEC_FILE
+    results_path = output_dir / _RESULTS_FILE
+    header = {"fingerprint": spec.fingerprint(), "trials": len(spec), "spec": spec.as_dict()}
+    done = np.zeros(len(spec), dtype=bool)
+    if resume and spec_path.exists():
+        existing = json.loads(spec_path.read_text())
+        if existing.get("fingerprint") != header["fingerprint"]:
+            raise ValueError(f"{output_dir} holds results for a different sweep spec")
+        records = read_campaign_results(output_dir)
+        # Drop a torn trailing record so new records stay aligned.
+        with results_path.open("a+b") as handle:
+            handle.truncate(records.size * RESULT_DTYPE.itemsize)
+        done[records["trial"]] = True
+        return done
+    spec_path.write_text(json.dumps(header, indent=2) + "\n")
+    results_path.write_bytes(b"")
+    return done
+
+
+def run_campaign(
+    spec: SweepSpec,
+    output_dir: Union[Path, str],
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    resume: bool = True,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> CampaignResult:
+    """Run every trial of ``spec`` not yet recorded in ``output_dir``.
+
+    ``workers`` defaults to the CPU count; ``0`` or ``1`` runs in this
+    process. Trials go to the workers ``chunk_size`` at a time, and each
+    finished chunk is appended to ``results.bin`` before the next is
+    collected, so at most the chunks in flight are lost if the run is
+    interrupted. ``resume=False`` discards earlier results. ``progress`` is
+    called with ``(done, total)`` after every chunk. The sensitivity matrix
+    is also written to ``matrix.json``.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    # Read-only here, so the shared registry instance avoids reloading the file.
+    model = ModelLoader(MainModel.__module__, MainModel.__name__, spec.weights_path).shared()
+    if not spec.layers:
+        spec = SweepSpec.from_dict({**spec.as_dict(), "layers": list(model.weights)})
+    missing = set(spec.layers) - set(model.weights)
+    if missing:
+        raise ValueError(f"layers not in the model: {sorted(missing)}")
+    output_dir = Path(output_dir)
+    started = time.perf_counter()
+    done = _prepare_output(output_dir, spec, resume)
+    resumed = int(done.sum())
+    pending = np.flatnonzero(~done)
+    chunks = [pending[offset : offset + chunk_size] for offset in range(0, pending.size, chunk_size)]
+    workers = (os.cpu_count() or 1) if workers is None else max(1, workers)
+    workers = min(workers, max(1, len(chunks)))
+
+    layer_names = list(model.weights)
+    values = np.array([model.weights[name] for name in layer_names], dtype=np.float64)
+    completed = resumed
+    with (output_dir / _RESULTS_FILE).open("ab") as sink:
+
+        def _store(records: np.ndarray) -> None:
+            nonlocal completed
+            sink.write(records.tobytes())
+            sink.flush()
+            completed += records.size
+            if progress is not None:
+                progress(completed, len(spec))
+
+        if workers <= 1:
+            _init_worker(None, values, layer_names, spec.as_dict())
+            try:
+                for chunk in chunks:
+                    _store(_run_trials(chunk))
+            finally:
+                _WORKER.clear()
+        else:
+            block = None
+            initargs: Tuple[Any, ...] = (None, values, layer_names, spec.as_dict())
+            if shared_memory is not None:
+                block = shared_memory.SharedMemory(create=True, size=values.nbytes)
+                np.ndarray(values.shape, dtype=np.float64, buffer=block.buf)[:] = values
+                initargs = (block.name, None, layer_names, spec.as_dict())
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=initargs,
+                ) as pool:
+                    # Keep a couple of chunks per worker in flight so results
+                    # stream to disk instead of piling up in the parent.
+                    queue: Deque[np.ndarray] = deque(chunks)
+                    running: "set[Future[np.ndarray]]" = set()
+                    while queue or running:
+                        while queue and len(running) < workers * 2:
+                            running.add(pool.submit(_run_trials, queue.popleft()))
+                        finished, running = wait(running, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            _store(future.result())
+            finally:
+                if block is not None:
+                    block.close()
+                    block.unlink()
+    elapsed = time.perf_counter() - started
+
+    matrix = sensitivity_matrix(spec, read_campaign_results(output_dir))
+    (output_dir / _MATRIX_FILE).write_text(json.dumps(matrix.as_dict(), indent=2) + "\n")
+    return CampaignResult(
+        output_dir,
+        output_dir / _RESULTS_FILE,
+        len(spec),
+        completed - resumed,
+        resumed,
+        elapsed,
+        matrix,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a layer fault-injection campaign.")
+    parser.add_argument("spec", help="JSON sweep spec (see SweepSpec)")
+    parser.add_argument("--output", default="data/campaigns/latest", help="results directory")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="trials per task")
+    parser.add_argument("--restart", action="store_true", help="discard results already on disk")
+    args = parser.parse_args(argv)
+
+    result = run_campaign(
+        SweepSpec.from_file(args.spec),
+        args.output,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        resume=not args.restart,
+    )
+    print(result.matrix.format_table())
+    print(json.dumps(result.as_dict(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,400 @@
+"""
+IEEE-754 bit-flip injection for float16, bfloat16, float32 and float64 arrays.
+
+``bit_flip_fault`` truncates a weight with ``int(value)`` and XORs the
+integer, so a weight in ``[0, 1)`` always becomes ``2 ** bit``; it never
+touches the float encoding. The helpers here reinterpret an array as
+unsigned integers of the same width (:func:`bit_view`, a view, not a copy)
+and XOR masks into chosen elements, so a flip hits exactly one sign,
+exponent or mantissa bit, as a silent data corruption would.
+
+NumPy has no bfloat16 dtype: bfloat16 tensors are stored as ``uint16`` bit
+patterns and passed with ``fmt="bfloat16"`` (:func:`to_bfloat16` and
+:func:`from_bfloat16` convert from and to float32).
+
+:func:`exhaustive_bit_sweep` flips every bit of every selected element and
+:func:`stratified_bit_sweep` draws the same number of elements for each bit
+position; both build the flipped values with one broadcast XOR per chunk and
+summarize the damage per bit (:meth:`BitSweep.by_bit`) or per field.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from fault_detection.fault_injection.array_injection import ArrayInjector, Seed
+
+__all__ = [
+    "BIT_FIELDS",
+    "FLOAT_FORMATS",
+    "FloatFormat",
+    "float_format",
+    "bit_view",
+    "to_bfloat16",
+    "from_bfloat16",
+    "xor_bits",
+    "flip_bits",
+    "random_bit_masks",
+    "inject_bit_flips",
+    "flip_float_bit",
+    "BitSweep",
+    "iter_exhaustive_bit_sweep",
+    "exhaustive_bit_sweep",
+    "stratified_bit_sweep",
+]
+
+BIT_FIELDS = ("all", "sign", "exponent", "mantissa")
+
+
+@dataclass(frozen=True)
+class FloatFormat:
+    """Bit layout of one floating-point format (sign, exponent, mantissa from the top)."""
+
+    name: str
+    uint_dtype: np.dtype
+    exponent_bits: int
+    mantissa_bits: int
+
+    @property
+    def width(self) -> int:
+        return 1 + self.exponent_bits + self.mantissa_bits
+
+    def field_bits(self, field: str = "all") -> np.ndarray:
+        """Bit positions (0 = least significant) of ``field``, one of :data:`BIT_FIELDS`."""
+        if field == "all":
+            return np.arange(self.width)
+        if field == "sign":
+            return np.array([self.width - 1])
+        if field == "exponent":
+            return np.arange(self.mantissa_bits, self.width - 1)
+        if field == "mantissa":
+            return np.arange(self.mantissa_bits)
+        raise ValueError(f"field must be one of {BIT_FIELDS}")
+
+    def field_of(self, bits: np.ndarray) -> np.ndarray:
+        """Field name of each bit position."""
+        bits = np.asarray(bits)
+        return np.where(
+            bits == self.width - 1,
+            "sign",
+            np.where(bits >= self.mantissa_bits, "exponent", "mantissa"),
+        )
+
+    def decode(self, patterns: np.ndarray) -> np.ndarray:
+        """Bit patterns (``uint_dtype``) to float64 values."""
+        patterns = np.asarray(patterns, dtype=self.uint_dtype)
+        if self.name == "bfloat16":
+            return from_bfloat16(patterns).astype(np.float64)
+        with np.errstate(invalid="ignore"):
+            return patterns.view(np.dtype(self.name)).astype(np.float64)
+
+
+FLOAT_FORMATS: Dict[str, FloatFormat] = {
+    "float16": FloatFormat("float16", np.dtype(np.uint16), 5, 10),
+    "bfloat16": FloatFormat("bfloat16", np.dtype(np.uint16), 8, 7),
+    "float32": FloatFormat("float32", np.dtype(np.uint32), 8, 23),
+    "float64": FloatFormat("float64", np.dtype(np.uint64), 11, 52),
+}
+
+
+def float_format(array: np.ndarray, fmt: Optional[str] = None) -> FloatFormat:
+    """The :class:`FloatFormat` of ``array``, or of ``fmt`` when given."""
+    if fmt is not None:
+        try:
+            layout = FLOAT_FORMATS[fmt]
+        except KeyError:
+            raise ValueError(f"fmt must be one of {tuple(FLOAT_FORMATS)}") from None
+        dtype = np.asarray(array).dtype
+        if dtype != layout.uint_dtype and dtype.name != fmt:
+            raise ValueError(f"{fmt} data must be {fmt} values or {layout.uint_dtype} bit patterns, got {dtype}")
+        return layout
+    dtype = np.asarray(array).dtype
+    if dtype.name in FLOAT_FORMATS:
+        return FLOAT_FORMATS[dtype.name]
+    if dtype == np.uint16:
+        raise ValueError("uint16 data is ambiguous; pass fmt='bfloat16' (or 'float16')")
+    raise ValueError(f"unsupported dtype {dtype}; expected one of {tuple(FLOAT_FORMATS)}")
+
+
+def bit_view(array: np.ndarray, fmt: Optional[str] = None) -> np.ndarray:
+    """Same-width unsigned-integer view of ``array`` (shares memory, no copy)."""
+    layout = float_format(array, fmt)
+    return array if array.dtype == layout.uint_dtype else array.view(layout.uint_dtype)
+
+
+def to_bfloat16(values: np.ndarray) -> np.ndarray:
+    """Round float32 values to bfloat16 bit patterns (``uint16``, round to nearest even)."""
+    bits = np.asarray(values, dtype=np.float32).view(np.uint32)
+    rounding = ((bits >> 16) & 1) + 0x7FFF
+    rounded = ((bits + rounding) >> 16).astype(np.uint16)
+    # Keep NaNs NaN (rounding could carry a NaN payload into infinity).
+    nan = np.isnan(np.asarray(values, dtype=np.float32))
+    rounded[nan] = ((bits[nan] >> 16) | 0x0040).astype(np.uint16)
+    return rounded
+
+
+def from_bfloat16(patterns: np.ndarray) -> np.ndarray:
+    """bfloat16 bit patterns (``uint16``) to float32 values (exact)."""
+    return (np.asarray(patterns, dtype=np.uint16).astype(np.uint32) << 16).view(np.float32)
+
+
+def _writable_bits(
+    array: np.ndarray, fmt: Optional[str], out: Optional[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, FloatFormat]:
+    layout = float_format(array, fmt)
+    if out is None:
+        out = np.array(array, copy=True, order="C")
+    elif out.shape != array.shape or out.dtype != array.dtype:
+        raise ValueError("out must have the shape and dtype of the array")
+    elif out is not array:
+        out[...] = array
+    if not out.flags.c_contiguous:
+        raise ValueError("out must be C-contiguous")
+    return out, bit_view(out, layout.name).reshape(-1), layout
+
+
+def xor_bits(
+    array: np.ndarray,
+    indices: np.ndarray,
+    masks: np.ndarray,
+    fmt: Optional[str] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """XOR ``masks`` into the elements at flat ``indices``.
+
+    Returns ``out``, a copy of ``array`` unless given (pass ``out=array`` to
+    corrupt in place). Repeated indices accumulate (two flips of the same bit
+    cancel out).
+    """
+    out, flat, layout = _writable_bits(array, fmt, out)
+    indices = np.asarray(indices, dtype=np.intp)
+    masks = np.broadcast_to(np.asarray(masks, dtype=layout.uint_dtype), indices.shape)
+    np.bitwise_xor.at(flat, indices, masks)
+    return out
+
+
+def _masks(bits: np.ndarray, layout: FloatFormat) -> np.ndarray:
+    bits = np.asarray(bits)
+    if bits.size and (bits.min() < 0 or bits.max() >= layout.width):
+        raise ValueError(f"bit positions must be in [0, {layout.width})")
+    return np.left_shift(layout.uint_dtype.type(1), bits.astype(layout.uint_dtype))
+
+
+def flip_bits(
+    array: np.ndarray,
+    indices: np.ndarray,
+    bits: Union[int, np.ndarray],
+    fmt: Optional[str] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Flip bit ``bits`` (a position, or one per index) of the elements at flat ``indices``."""
+    layout = float_format(array, fmt)
+    return xor_bits(array, indices, _masks(bits, layout), layout.name, out)
+
+
+def random_bit_masks(
+    rng: np.random.Generator,
+    count: int,
+    fmt: str,
+    field: str = "all",
+    bits_per_element: int = 1,
+) -> np.ndarray:
+    """``count`` masks, each with ``bits_per_element`` distinct bits drawn from ``field``."""
+    layout = FLOAT_FORMATS[fmt]
+    positions = layout.field_bits(field)
+    if not 1 <= bits_per_element <= positions.size:
+        raise ValueError(f"bits_per_element must be in [1, {positions.size}] for {field}")
+    if bits_per_element == 1:
+        return _masks(positions[rng.integers(0, positions.size, count)], layout)
+    # The ``bits_per_element`` smallest of per-bit random keys pick a uniform
+    # random subset for every element at once.
+    keys = rng.random((count, positions.size))
+    chosen = np.argpartition(keys, bits_per_element - 1, axis=1)[:, :bits_per_element]
+    return np.bitwise_or.reduce(_masks(positions[chosen], layout), axis=1)
+
+
+def inject_bit_flips(
+    array: np.ndarray,
+    count: Optional[int] = None,
+    rate: Optional[float] = None,
+    field: str = "all",
+    bits_per_element: int = 1,
+    seed: Seed = None,
+    fmt: Optional[str] = None,
+    out: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Flip random bits of randomly chosen elements; returns ``(out, indices, masks)``.
+
+    Give either ``count`` (that many distinct elements) or ``rate`` (each
+    element independently). ``field`` restricts the flipped bits to the sign,
+    exponent or mantissa; ``seed`` is handled as in :class:`ArrayInjector`.
+    """
+    layout = float_format(array, fmt)
+    if (count is None) == (rate is None):
+        raise ValueError("give exactly one of count and rate")
+    injector = ArrayInjector(seed)
+    size = int(np.asarray(array).size)
+    if count is not None:
+        if not 0 <= count <= size:
+            raise ValueError("count must be in [0, array size]")
+        indices = np.sort(injector.rng.choice(size, count, replace=False))
+    else:
+        indices = np.flatnonzero(injector.drop_mask(size, rate))
+    masks = random_bit_masks(injector.rng, indices.size, layout.name, field, bits_per_element)
+    return xor_bits(array, indices, masks, layout.name, out), indices, masks
+
+
+def flip_float_bit(value: float, bit: int, fmt: str = "float64") -> float:
+    """``value`` with bit ``bit`` of its ``fmt`` encoding flipped (for scalar weights)."""
+    if fmt == "bfloat16":
+        array = to_bfloat16(np.array([value], dtype=np.float32))
+    else:
+        array = np.array([value], dtype=np.dtype(fmt))
+    flipped = flip_bits(array, np.array([0]), bit, fmt=fmt)
+    return float(FLOAT_FORMATS[fmt].decode(bit_view(flipped, fmt))[0])
+
+
+@dataclass
+class BitSweep:
+    """Flat list of single-bit flips: element ``indices[i]``, bit ``bits[i]``.
+
+    ``original`` and ``flipped`` are float64 copies of the values before and
+    after the flip.
+    """
+
+    fmt: str
+    indices: np.ndarray
+    bits: np.ndarray
+    original: np.ndarray
+    flipped: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.indices.size)
+
+    @property
+    def abs_error(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", over="ignore"):
+            return np.abs(self.flipped - self.original)
+
+    @property
+    def nonfinite(self) -> np.ndarray:
+        """Flips that produced an infinity or NaN from a finite value."""
+        return ~np.isfinite(self.flipped) & np.isfinite(self.original)
+
+    @classmethod
+    def concatenate(cls, sweeps: Sequence["BitSweep"]) -> "BitSweep":
+        if not sweeps:
+            raise ValueError("nothing to concatenate")
+        return cls(
+            sweeps[0].fmt,
+            *(np.concatenate([getattr(s, name) for s in sweeps]) for name in ("indices", "bits", "original", "flipped")),
+        )
+
+    def by_bit(self) -> Dict[str, np.ndarray]:
+        """Per bit position: flips, mean and max finite absolute error, non-finite rate."""
+        layout = FLOAT_FORMATS[self.fmt]
+        width = layout.width
+        error = self.abs_error
+        finite = np.isfinite(error)
+        counts = np.bincount(self.bits, minlength=width).astype(np.float64)
+        finite_counts = np.bincount(self.bits[finite], minlength=width)
+        totals = np.bincount(self.bits[finite], weights=error[finite], minlength=width)
+        maxima = np.full(width, np.nan)
+        order = np.argsort(self.bits[finite], kind="stable")
+        if order.size:
+            sorted_bits = self.bits[finite][order]
+            starts = np.flatnonzero(np.r_[True, np.diff(sorted_bits) != 0])
+            maxima[sorted_bits[starts]] = np.maximum.reduceat(error[finite][order], starts)
+        nonfinite = np.bincount(self.bits, weights=self.nonfinite, minlength=width)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return {
+                "bit": np.arange(width),
+                "field": layout.field_of(np.arange(width)),
+                "flips": counts,
+                "mean_abs_error": totals / finite_counts,
+                "max_abs_error": maxima,
+                "nonfinite_rate": nonfinite / counts,
+            }
+
+    def by_field(self) -> Dict[str, Dict[str, float]]:
+        """Flips, mean finite absolute error and non-finite rate per sign/exponent/mantissa."""
+        fields = FLOAT_FORMATS[self.fmt].field_of(self.bits)
+        error = self.abs_error
+        summary: Dict[str, Dict[str, float]] = {}
+        for name in BIT_FIELDS[1:]:
+            selected = fields == name
+            finite = selected & np.isfinite(error)
+            summary[name] = {
+                "flips": float(selected.sum()),
+                "mean_abs_error": float(error[finite].mean()) if finite.any() else float("nan"),
+                "nonfinite_rate": float(self.nonfinite[selected].mean()) if selected.any() else float("nan"),
+            }
+        return summary
+
+
+def _sweep(layout: FloatFormat, flat: np.ndarray, indices: np.ndarray, bits: np.ndarray) -> BitSweep:
+    patterns = flat[indices]
+    flipped = patterns ^ _masks(bits, layout)
+    return BitSweep(layout.name, indices, bits, layout.decode(patterns), layout.decode(flipped))
+
+
+def iter_exhaustive_bit_sweep(
+    array: np.ndarray,
+    indices: Optional[np.ndarray] = None,
+    bits: Optional[Sequence[int]] = None,
+    fmt: Optional[str] = None,
+    chunk_elements: int = 1 << 16,
+) -> Iterator[BitSweep]:
+    """Every (element, bit) flip, ``chunk_elements`` elements at a time.
+
+    ``indices`` (flat, default all elements) and ``bits`` (default every bit
+    of the format) restrict the sweep. ``array`` is never modified.
+    """
+    layout = float_format(array, fmt)
+    flat = bit_view(np.ascontiguousarray(array), layout.name).reshape(-1)
+    element_ids = np.arange(flat.size) if indices is None else np.asarray(indices, dtype=np.intp)
+    positions = layout.field_bits() if bits is None else np.asarray(bits)
+    for start in range(0, element_ids.size, chunk_elements):
+        chunk = element_ids[start : start + chunk_elements]
+        yield _sweep(
+            layout, flat, np.repeat(chunk, positions.size), np.tile(positions, chunk.size)
+        )
+
+
+def exhaustive_bit_sweep(
+    array: np.ndarray,
+    indices: Optional[np.ndarray] = None,
+    bits: Optional[Sequence[int]] = None,
+    fmt: Optional[str] = None,
+) -> BitSweep:
+    """All of :func:`iter_exhaustive_bit_sweep` as one :class:`BitSweep`."""
+    layout = float_format(array, fmt)
+    sweeps: List[BitSweep] = list(iter_exhaustive_bit_sweep(array, indices, bits, fmt))
+    if not sweeps:
+        empty = np.empty(0, dtype=np.intp)
+        return BitSweep(layout.name, empty, empty, np.empty(0), np.empty(0))
+    return BitSweep.concatenate(sweeps)
+
+
+def stratified_bit_sweep(
+    array: np.ndarray,
+    samples_per_bit: int,
+    bits: Optional[Sequence[int]] = None,
+    seed: Seed = None,
+    fmt: Optional[str] = None,
+) -> BitSweep:
+    """Flip each bit position in ``samples_per_bit`` randomly chosen elements.
+
+    Every bit gets the same number of trials however large the layer is;
+    elements are drawn with replacement, independently per bit.
+    """
+    if samples_per_bit <= 0:
+        raise ValueError("samples_per_bit must be positive")
+    layout = float_format(array, fmt)
+    flat = bit_view(np.ascontiguousarray(array), layout.name).reshape(-1)
+    if flat.size == 0:
+        raise ValueError("cannot sample from an empty array")
+    positions = layout.field_bits() if bits is None else np.asarray(bits)
+    rng = ArrayInjector(seed).rng
+    indices = rng.integers(0, flat.size, size=positions.size * samples_per_bit)
+    return _sweep(layout, flat, indices, np.repeat(positions, samples_per_bit))
@@ -2,6 +2,8 @@
 from dataclasses import dataclass
 from typing import Callable, Dict, Iterable, List, Tuple
 
+from fault_detection.fault_injection.float_bits import flip_float_bit
+
 
 @dataclass
 class LayerFault:
@@ -39,7 +41,11 @@ def apply_faults(
 
 
 def bit_flip_fault(bit_position: int) -> LayerFault:
-    """Create a deterministic bit-flip perturbation for a layer."""
+    """Create a deterministic bit-flip perturbation for a layer.
+
+    The flip applies to ``int(value)``, not to the float encoding; use
+    :func:`float_bit_flip_fault` to flip a real IEEE-754 bit.
+    """
 
     def _flip(value: float) -> float:
         as_int = int(value)
@@ -63,3 +69,16 @@ def scale_fault(layer_name: str, factor: float) -> LayerFault:
         perturbation=_scale,
         description=f"scaled by {factor}",
     )
+
+
+def float_bit_flip_fault(layer_name: str, bit_position: int, fmt: str = "float64") -> LayerFault:
+    """Flip bit ``bit_position`` of the layer weight's ``fmt`` encoding (sign, exponent or mantissa)."""
+
+    def _flip(value: float) -> float:
+        return flip_float_bit(value, bit_position, fmt)
+
+    return LayerFault(
+        layer_name=layer_name,
+        perturbation=_flip,
+        description=f"{fmt} bit flip at position {bit_position}",
+    )
@@ -0,0 +1,371 @@
+"""
+Scheduled, non-blocking system-level fault timelines.
+
+``simulate_outage`` and ``induce_throttle`` hold the calling thread in
+``time.sleep`` for the whole fault, so a thousand one-second outages take a
+thousand seconds and nothing else (collection included) runs meanwhile. A
+:class:`FaultTimeline` is a list of possibly overlapping :class:`FaultWindow`
+objects (outage, throttle, drop, jitter, stuck-at) on a timeline measured in
+seconds from its origin:
+
+* :meth:`FaultTimeline.run` is a coroutine that emits a :class:`FaultEvent`
+  at every window start and stop, calling per-kind handlers, so it runs
+  beside the collectors on the same event loop. With a :class:`RealClock` it
+  waits in ``asyncio.sleep``; with a :class:`VirtualClock` it jumps straight
+  to the next event, so hours of schedule play out in milliseconds.
+* :meth:`FaultTimeline.apply_to_frame` applies the schedule to recorded
+  telemetry (a :class:`TimeSeriesFrame`) with seeded, vectorized
+  :class:`ArrayInjector` operations.
+* :func:`score_detections` scores detector timestamps against the windows.
+"""
+import asyncio
+import fnmatch
+import inspect
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from fault_detection.fault_injection.array_injection import ArrayInjector, Seed
+from monitoring.analysis.timeseries import TimeSeriesFrame
+
+__all__ = [
+    "TIMELINE_FAULTS",
+    "FaultWindow",
+    "FaultEvent",
+    "RealClock",
+    "VirtualClock",
+    "FaultTimeline",
+    "DetectionScore",
+    "outage_handler",
+    "score_detections",
+]
+
+# Kinds and the parameters their recorded-telemetry effect reads:
+# outage (samples missing), drop (``rate``), jitter (``amplitude``),
+# stuck_at (``value``, default: hold the last value before the window) and
+# throttle (``factor`` applied to the values).
+TIMELINE_FAULTS = ("outage", "throttle", "drop", "jitter", "stuck_at")
+_DEFAULT_PARAMS: Dict[str, Dict[str, float]] = {
+    "outage": {},
+    "throttle": {"factor": 0.5},
+    "drop": {"rate": 0.5},
+    "jitter": {"amplitude": 0.02},
+    "stuck_at": {},
+}
+
+Handler = Callable[["FaultEvent"], Any]
+
+
+@dataclass
+class FaultWindow:
+    """One fault active on ``target`` from ``start`` for ``duration`` seconds.
+
+    ``target`` is a metric name or a glob over metric names (``"npu0_chip0_*"``,
+    ``"*"`` for everything); live handlers may read it as a host or device id.
+    """
+
+    kind: str
+    start: float
+    duration: float
+    target: str = "*"
+    params: Dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if self.kind not in TIMELINE_FAULTS:
+            raise ValueError(f"kind must be one of {TIMELINE_FAULTS}")
+        if self.duration <= 0:
+            raise ValueError("duration must be positive")
+        self.params = {**_DEFAULT_PARAMS[self.kind], **self.params}
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "start": self.start,
+            "duration": self.duration,
+            "target": self.target,
+            "params": dict(self.params),
+        }
+
+
+@dataclass
+class FaultEvent:
+    """A window starting or stopping; ``timestamp`` is epoch seconds."""
+
+    phase: str
+    time: float
+    timestamp: float
+    window_id: int
+    window: FaultWindow
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "phase": self.phase,
+            "time": self.time,
+            "timestamp": self.timestamp,
+            "window_id": self.window_id,
+            **self.window.as_dict(),
+        }
+
+
+class RealClock:
+    """Wall-clock time; ``sleep_until`` yields to the event loop."""
+
+    def __init__(self) -> None:
+        self._origin = time.monotonic()
+        self.origin_epoch = time.time()
+
+    def now(self) -> float:
+        return time.monotonic() - self._origin
+
+    async def sleep_until(self, when: float) -> None:
+        delay = when - self.now()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class VirtualClock:
+    """Simulated time that jumps to each deadline instead of waiting for it.
+
+    ``origin_epoch`` stamps events, e.g. with the first timestamp of the
+    recorded telemetry a schedule is replayed against.
+    """
+
+    def __init__(self, origin_epoch: float = 0.0) -> None:
+        self.origin_epoch = origin_epoch
+        self._now = 0.0
+
+    def now(self) -> float:
+        return self._now
+
+    async def sleep_until(self, when: float) -> None:
+        self._now = max(self._now, when)
+        # Still yield, so other tasks on the loop get to run between events.
+        await asyncio.sleep(0)
+
+
+Clock = Union[RealClock, VirtualClock]
+
+
+def outage_handler(
+    recovery_callback: Callable[[], None],
+    on_outage: Optional[Callable[[float], None]] = None,
+) -> Handler:
+    """``simulate_outage`` as a timeline handler: ``on_outage`` at start, recovery at stop."""
+
+    def _handle(event: FaultEvent) -> None:
+        if event.phase == "start":
+            if on_outage is not None:
+                on_outage(event.window.duration)
+        else:
+            recovery_callback()
+
+    return _handle
+
+
+class FaultTimeline:
+    """A schedule of possibly overlapping fault windows."""
+
+    def __init__(self, windows: Sequence[FaultWindow] = ()) -> None:
+        self.windows: List[FaultWindow] = sorted(windows, key=lambda window: window.start)
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    @classmethod
+    def random(
+        cls,
+        duration: float,
+        rate_per_hour: float,
+        mean_duration: float = 60.0,
+        kinds: Sequence[str] = TIMELINE_FAULTS,
+        targets: Sequence[str] = ("*",),
+        seed: Seed = None,
+    ) -> "FaultTimeline":
+        """Poisson arrivals (``rate_per_hour``) over ``duration`` seconds.
+
+        Kinds and targets are drawn uniformly; window lengths are exponential
+        with mean ``mean_duration`` (at least one millisecond).
+        """
+        rng = ArrayInjector(seed).rng
+        expected = duration * rate_per_hour / 3600.0
+        count = int(rng.poisson(expected)) if expected > 0 else 0
+        starts = np.sort(rng.uniform(0.0, duration, count))
+        lengths = np.maximum(rng.exponential(mean_duration, count), 1e-3)
+        kind_ids = rng.integers(0, len(kinds), count)
+        target_ids = rng.integers(0, len(targets), count)
+        return cls(
+            [
+                FaultWindow(kinds[k], float(s), float(d), targets[t])
+                for s, d, k, t in zip(starts, lengths, kind_ids, target_ids)
+            ]
+        )
+
+    def events(self, origin_epoch: float = 0.0) -> List[FaultEvent]:
+        """Every start and stop in time order (stops first on ties)."""
+        events = []
+        for window_id, window in enumerate(self.windows):
+            events.append(FaultEvent("start", window.start, origin_epoch + window.start, window_id, window))
+            events.append(FaultEvent("stop", window.end, origin_epoch + window.end, window_id, window))
+        events.sort(key=lambda event: (event.time, event.phase == "start", event.window_id))
+        return events
+
+    def active(self, at: float) -> List[FaultWindow]:
+        """Windows active at timeline time ``at`` (``start <= at < end``)."""
+        return [window for window in self.windows if window.start <= at < window.end]
+
+    async def run(
+        self,
+        clock: Optional[Clock] = None,
+        handlers: Optional[Mapping[str, Handler]] = None,
+        on_event: Optional[Handler] = None,
+    ) -> List[FaultEvent]:
+        """Emit every event at its time and return them.
+
+        ``handlers`` maps a fault kind to a callable receiving that kind's
+        events; ``on_event`` receives all of them. Either may be a coroutine
+        function. Defaults to a :class:`RealClock` started now.
+        """
+        clock = clock if clock is not None else RealClock()
+        emitted = []
+        for event in self.events(clock.origin_epoch):
+            await clock.sleep_until(event.time)
+            for callback in ((handlers or {}).get(event.window.kind), on_event):
+                if callback is None:
+                    continue
+                result = callback(event)
+                if inspect.isawaitable(result):
+                    await result
+            emitted.append(event)
+        return emitted
+
+    def simulate(
+        self,
+        origin_epoch: float = 0.0,
+        handlers: Optional[Mapping[str, Handler]] = None,
+        on_event: Optional[Handler] = None,
+    ) -> List[FaultEvent]:
+        """Run the whole schedule on a :class:`VirtualClock` (no waiting)."""
+        return asyncio.run(self.run(VirtualClock(origin_epoch), handlers, on_event))
+
+    def apply_to_frame(
+        self,
+        frame: TimeSeriesFrame,
+        origin_epoch: Optional[float] = None,
+        seed: Seed = None,
+    ) -> TimeSeriesFrame:
+        """Copy of ``frame`` with every window's effect applied to its rows and columns.
+
+        The timeline starts at ``origin_epoch`` (default: the first sample).
+        Outages blank samples (NaN, like a missed poll), drops blank each one
+        with probability ``rate``, jitter adds ``(U - 0.5) * amplitude``,
+        stuck-at windows repeat ``value`` (or the last value before the
+        window), and throttles multiply by ``factor``. Later windows act on
+        the result of earlier overlapping ones.
+        """
+        values = frame.values.copy()
+        timestamps = frame.timestamps
+        if origin_epoch is None:
+            origin_epoch = float(timestamps[0]) if timestamps.size else 0.0
+        injector = ArrayInjector(seed)
+        column_cache: Dict[str, np.ndarray] = {}
+        for window in self.windows:
+            columns = column_cache.get(window.target)
+            if columns is None:
+                columns = column_cache[window.target] = np.array(
+                    [idx for idx, name in enumerate(frame.columns) if fnmatch.fnmatchcase(name, window.target)],
+                    dtype=np.intp,
+                )
+            lo = int(np.searchsorted(timestamps, origin_epoch + window.start, side="left"))
+            hi = int(np.searchsorted(timestamps, origin_epoch + window.end, side="left"))
+            if lo >= hi or columns.size == 0:
+                continue
+            block = np.ascontiguousarray(values[lo:hi, columns])
+            params = window.params
+            if window.kind == "outage":
+                block[:] = math.nan
+            elif window.kind == "drop":
+                injector.drop(block, params["rate"], out=block)
+            elif window.kind == "jitter":
+                injector.jitter(block, params["amplitude"], out=block)
+            elif window.kind == "throttle":
+                injector.scale(block, params["factor"], out=block)
+            elif "value" in params:
+                block[:] = params["value"]
+            else:
+                held = values[lo - 1, columns] if lo > 0 else block[0].copy()
+                block[:] = held
+            values[lo:hi, columns] = block
+        return TimeSeriesFrame(timestamps, values, frame.columns, frame.labels)
+
+
+@dataclass
+class DetectionScore:
+    """How detector firings line up with fault windows."""
+
+    windows: int
+    detected_windows: int
+    detections: int
+    true_detections: int
+    latencies: np.ndarray
+
+    @property
+    def recall(self) -> float:
+        return self.detected_windows / self.windows if self.windows else math.nan
+
+    @property
+    def precision(self) -> float:
+        return self.true_detections / self.detections if self.detections else math.nan
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "windows": float(self.windows),
+            "detected_windows": float(self.detected_windows),
+            "detections": float(self.detections),
+            "true_detections": float(self.true_detections),
+            "recall": self.recall,
+            "precision": self.precision,
+            "mean_latency_seconds": float(np.mean(self.latencies)) if self.latencies.size else math.nan,
+            "max_latency_seconds": float(np.max(self.latencies)) if self.latencies.size else math.nan,
+        }
+
+
+def score_detections(
+    timeline: FaultTimeline,
+    detections: Sequence[float],
+    origin_epoch: float = 0.0,
+    tolerance: float = 0.0,
+) -> DetectionScore:
+    """Score detector firing times (epoch seconds) against ``timeline``.
+
+    A window counts as detected when a firing falls in ``[start, end +
+    tolerance)``; its latency is the first such firing minus ``start``. A
+    firing is a true detection when it falls in any (extended) window.
+    """
+    fired = np.sort(np.asarray(detections, dtype=np.float64)) - origin_epoch
+    starts = np.array([window.start for window in timeline.windows], dtype=np.float64)
+    ends = np.array([window.end for window in timeline.windows], dtype=np.float64) + tolerance
+    first = np.searchsorted(fired, starts, side="left")
+    hit = first < fired.size
+    hit[hit] = fired[first[hit]] < ends[hit]
+    latencies = fired[first[hit]] - starts[hit]
+    # A firing is explained if some window started at or before it and the
+    # furthest end among those windows lies after it.
+    order = np.argsort(starts, kind="stable")
+    reach = np.maximum.accumulate(ends[order]) if order.size else ends
+    opened = np.searchsorted(starts[order], fired, side="right")
+    explained = opened > 0
+    explained[explained] = fired[explained] < reach[opened[explained] - 1]
+    return DetectionScore(
+        windows=len(timeline.windows),
+        detected_windows=int(hit.sum()),
+        detections=int(fired.size),
+        true_detections=int(explained.sum()),
+        latencies=latencies,
+    )
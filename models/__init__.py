@@ -0,0 +1,7 @@
+"""Main and monitoring models."""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["main_model", "monitoring_model", "onnx_models"],
+)
@@ -0,0 +1,11 @@
+"""Deterministic placeholder main model (imported lazily).
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "model": ["MainModel"],
+        "batching": ["BatcherStats", "MicroBatcher"],
+    },
+)
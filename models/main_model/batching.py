@@ -0,0 +1,192 @@
+"""
+Micro-batching front end for :meth:`MainModel.predict_batch`.
+
+Shadow-traffic callers score one input row at a time from many threads (or
+asyncio tasks). :class:`MicroBatcher` queues those rows and a single worker
+thread packs them into a preallocated ``(max_batch, features)`` buffer: a
+batch is dispatched as soon as it is full or when the oldest queued request
+has waited ``max_delay`` seconds, whichever comes first, so the latency a
+request pays for batching is bounded by the budget. With the default budget
+of 0 the worker takes whatever queued up while the previous batch ran, which
+is usually best; a positive budget grows batches when requests arrive too
+sparsely to overlap.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from models.main_model.model import MainModel
+from utils.stream_stats.sketch import QuantileSketch
+
+__all__ = ["BatcherStats", "MicroBatcher"]
+
+_STOP = object()
+
+
+@dataclass
+class BatcherStats:
+    """Request and batch counts plus the time requests spent queued."""
+
+    requests: int = 0
+    batches: int = 0
+    largest_batch: int = 0
+    queued: QuantileSketch = field(default_factory=QuantileSketch)
+
+    @property
+    def mean_batch(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch": self.mean_batch,
+            "largest_batch": self.largest_batch,
+            "queued_ms": {
+                name: (value * 1e3 if value is not None else None)
+                for name, value in (
+                    ("p50", self.queued.quantile(0.5)),
+                    ("p99", self.queued.quantile(0.99)),
+                )
+            },
+        }
+
+
+class MicroBatcher:
+    """Group concurrent single-row requests into ``predict_batch`` calls.
+
+    ``submit`` returns a :class:`concurrent.futures.Future`; ``predict``
+    blocks on it and ``apredict`` awaits it. Results are ``(features,)``
+    arrays owned by the caller. ``model`` may be any inference backend
+    with ``predict_batch(inputs, out=...)`` (see ``ModelLoader.for_backend``);
+    ``dtype`` should match its input dtype. Use as a context manager, or call
+    :meth:`close` to drain the queue and stop the worker.
+    """
+
+    def __init__(
+        self,
+        model: Union[MainModel, Any],
+        features: int,
+        max_batch: int = 256,
+        max_delay: float = 0.0,
+        dtype: Any = np.float64,
+    ) -> None:
+        if features < 1 or max_batch < 1:
+            raise ValueError("features and max_batch must be positive")
+        if max_delay < 0:
+            raise ValueError("max_delay must be non-negative")
+        self.model = model
+        self.features = features
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.dtype = np.dtype(dtype)
+        self.stats = BatcherStats()
+        self._inputs = np.empty((max_batch, features), dtype=self.dtype)
+        self._outputs = np.empty_like(self._inputs)
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="main-model-batcher", daemon=True)
+        self._worker.start()
+
+    def __enter__(self) -> "MicroBatcher":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    # --------------------------------------------------------------- requests
+    def submit(self, row: Any) -> "Future[np.ndarray]":
+        """Queue one ``(features,)`` input row."""
+        row = np.asarray(row, dtype=self.dtype)
+        if row.shape != (self.features,):
+            raise ValueError(f"expected a row of {self.features} features")
+        future: "Future[np.ndarray]" = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("batcher is closed")
+            self._queue.put((row, future, time.perf_counter()))
+        return future
+
+    def predict(self, row: Any, timeout: Optional[float] = None) -> np.ndarray:
+        return self.submit(row).result(timeout)
+
+    async def apredict(self, row: Any) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(row))
+
+    def close(self) -> None:
+        """Finish the queued requests and stop the worker thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._worker.join()
+
+    # ----------------------------------------------------------------- worker
+    def _collect(self, first: Tuple[np.ndarray, Future, float]) -> Tuple[List[Any], bool]:
+        """The batch started by ``first``; also whether the stop marker was seen."""
+        batch = [first]
+        deadline = first[2] + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _dispatch(self, batch: List[Tuple[np.ndarray, Future, float]]) -> None:
+        # Requests cancelled while queued (e.g. an ``apredict`` that timed out)
+        # are dropped; the rest can no longer be cancelled once running.
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        count = len(batch)
+        if not count:
+            return
+        try:
+            started = time.perf_counter()
+            inputs, outputs = self._inputs[:count], self._outputs[:count]
+            for slot, (row, _future, queued_at) in enumerate(batch):
+                inputs[slot] = row
+                self.stats.queued.add(started - queued_at)
+            self.model.predict_batch(inputs, out=outputs)
+            results = [outputs[slot].copy() for slot in range(count)]
+        except Exception as exc:  # the callers get the error, the worker keeps going
+            for _row, future, _queued_at in batch:
+                future.set_exception(exc)
+            return
+        for (_row, future, _queued_at), result in zip(batch, results):
+            future.set_result(result)
+        self.stats.requests += count
+        self.stats.batches += 1
+        self.stats.largest_batch = max(self.stats.largest_batch, count)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch, stopping = self._collect(item)
+            try:
+                self._dispatch(batch)
+            except Exception as exc:  # never let one batch stop the worker
+                for _row, future, _queued_at in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+        # Requests queued behind the stop marker cannot exist (submit checks
+        # ``_closed`` under the lock), so the queue is empty here.
@@ -2,7 +2,10 @@
 import hashlib
 import json
 from pathlib import Path
-from typing import Any, Dict, List, Union
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
 
 
 class MainModel:
@@ -11,8 +14,68 @@ class MainModel:
     def __init__(self, weights_path: Union[Path, str]) -> None:
         self.weights_path = Path(weights_path)
         self.is_loaded = False
-        self.metadata: Dict[str, Any] = {}
-        self.weights: Dict[str, float] = {}
+        self.metadata: Mapping[str, Any] = {}
+        self._frozen = False
+        self.weights = {}
+
+    @property
+    def weights(self) -> Mapping[str, float]:
+        return self._weights
+
+    @weights.setter
+    def weights(self, weights: Dict[str, float]) -> None:
+        # Assigning new weights (e.g. a fault-injected copy) drops the
+        # derived tensors; edit the dict in place only with invalidate_cache().
+        if self._frozen:
+            raise RuntimeError("model is frozen; load a private instance to change its weights")
+        self._weights = weights
+        self.invalidate_cache()
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def freeze(self) -> None:
+        """Make the loaded model read-only so one instance can be shared.
+
+        ``weights`` and ``metadata`` become read-only mappings and assigning
+        new weights raises; inference is unaffected. Used by
+        :class:`~utils.model_utils.registry.ModelRegistry`.
+        """
+        if not self.is_loaded:
+            raise RuntimeError("Weights must be loaded before freezing")
+        self._weights = MappingProxyType(dict(self._weights))
+        self.metadata = MappingProxyType(dict(self.metadata))
+        self._frozen = True
+
+    def invalidate_cache(self) -> None:
+        """Forget the derived scale and weight tensors after editing ``weights`` in place."""
+        self._loaded_stamp: Optional[Tuple[int, int, int]] = None
+        self._scale: Optional[float] = None
+        self._scale_tensors: Dict[np.dtype, np.ndarray] = {}
+        self._weight_tensor: Optional[np.ndarray] = None
+
+    @property
+    def weight_tensor(self) -> np.ndarray:
+        """Layer weights as a read-only ``float64`` vector, in layer order (cached)."""
+        if self._weight_tensor is None:
+            self._weight_tensor = self._build_weight_tensor()
+        return self._weight_tensor
+
+    def _build_weight_tensor(self) -> np.ndarray:
+        tensor = np.fromiter(self._weights.values(), dtype=np.float64, count=len(self._weights))
+        tensor.flags.writeable = False
+        return tensor
+
+    def scale_tensor(self, dtype: Any = np.float64) -> np.ndarray:
+        """The output scale as a 0-d array of ``dtype`` (cached per dtype)."""
+        dtype = np.dtype(dtype)
+        tensor = self._scale_tensors.get(dtype)
+        if tensor is None:
+            tensor = np.array(self._score(), dtype=dtype)
+            tensor.flags.writeable = False
+            self._scale_tensors[dtype] = tensor
+        return tensor
 
     def _derive_weights(self, contents: str) -> Dict[str, float]:
         """Create deterministic pseudo-weights from the file contents."""
@@ -29,21 +92,33 @@ class MainModel:
 
         In real deployments this would use a deep-learning framework.
         Here we only record basic metadata and derive deterministic pseudo-weights
-        to keep the repository lightweight.
+        to keep the repository lightweight. Calling it again is a no-op while
+        the file is unchanged on disk and the weights have not been replaced.
         """
         if not self.weights_path.exists():
             raise FileNotFoundError(self.weights_path)
+        stat = self.weights_path.stat()
+        stamp = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if self.is_loaded and stamp == self._loaded_stamp:
+            return
         contents = self.weights_path.read_text()
         self.weights = self._derive_weights(contents)
-        self.metadata["source"] = str(self.weights_path)
-        self.metadata["size_bytes"] = self.weights_path.stat().st_size
-        self.metadata["layers"] = list(self.weights.keys())
+        self.metadata = {
+            "source": str(self.weights_path),
+            "size_bytes": stat.st_size,
+            "layers": list(self.weights.keys()),
+        }
         self.is_loaded = True
+        self._loaded_stamp = stamp
+        # Derive the batch-path tensors once, up front.
+        self._weight_tensor = self._build_weight_tensor()
+        self.scale_tensor()
 
     def _score(self) -> float:
-        if not self.weights:
-            return 1.0
-        return sum(self.weights.values()) / float(len(self.weights))
+        if self._scale is None:
+            weights = self._weights
+            self._scale = sum(weights.values()) / float(len(weights)) if weights else 1.0
+        return self._scale
 
     def predict(self, inputs: List[float]) -> List[float]:
         """Produce a deterministic pseudo-prediction for demos."""
@@ -52,13 +127,31 @@ class MainModel:
         scale = self._score()
         return [value * scale for value in inputs]
 
+    def predict_batch(self, inputs: Any, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Vectorized :meth:`predict` over a ``(batch, features)`` array.
+
+        Floating inputs keep their dtype (others are computed in ``float64``);
+        results match :meth:`predict` element for element in ``float64``.
+        ``out`` may be a preallocated array of the same shape to write into,
+        including ``inputs`` itself.
+        """
+        if not self.is_loaded:
+            raise RuntimeError("Weights must be loaded before inference")
+        inputs = np.asarray(inputs)
+        if inputs.ndim != 2:
+            raise ValueError("inputs must have shape (batch, features)")
+        dtype = inputs.dtype if inputs.dtype.kind == "f" else np.dtype(np.float64)
+        if out is not None and out.shape != inputs.shape:
+            raise ValueError(f"out must have shape {inputs.shape}")
+        return np.multiply(inputs, self.scale_tensor(dtype), out=out, dtype=dtype, casting="same_kind")
+
     def export_metadata(self, destination: Union[Path, str]) -> None:
         """Persist simple model metadata for inspection."""
         destination = Path(destination)
-        destination.write_text(json.dumps(self.metadata, indent=2))
+        destination.write_text(json.dumps(dict(self.metadata), indent=2))
 
     def save_activation_trace(self, inputs: List[float], destination: Union[Path, str]) -> None:
         """Store a lightweight activation trace for debugging."""
         outputs = self.predict(inputs)
-        record = {"inputs": inputs, "outputs": outputs, "metadata": self.metadata}
+        record = {"inputs": inputs, "outputs": outputs, "metadata": dict(self.metadata)}
         Path(destination).write_text(json.dumps(record, indent=2))
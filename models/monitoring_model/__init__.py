@@ -0,0 +1,11 @@
+"""Z-score supervision of model outputs (imported lazily).
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "model": ["MonitoringModel"],
+        "bank": ["MonitoringBank"],
+    },
+)
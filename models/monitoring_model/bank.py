@@ -0,0 +1,325 @@
+"""
+Array-backed supervision of many metric streams at once.
+
+:class:`MonitoringModel` keeps one ``deque`` per stream and is updated one
+sample at a time, so watching every (device, metric) pair means thousands of
+Python objects and calls per tick. :class:`MonitoringBank` keeps every
+stream's window in one preallocated ``(window_size, streams)`` ring buffer
+that shares a single write position, and scores a whole tick of samples with
+a handful of vectorized operations. Each stream is scored exactly like its own
+:class:`MonitoringModel`: 0.0 until its window is full, then
+``|x - mean| / (pstdev or 1.0)`` over the window including ``x``. As in
+:class:`~utils.stream_stats.rolling.RollingWindow`, the moments are kept on
+samples shifted by a recent exact window mean, and streams whose window holds
+magnitudes above ``1e150`` are scored from the window itself, scaled by its
+largest magnitude, until those samples leave it.
+"""
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+__all__ = ["MonitoringBank"]
+
+# Exact recompute cadence, in windows' worth of ticks, the collapse ratio
+# that forces an early recompute and the magnitude above which squares may
+# overflow (see utils.stream_stats.rolling).
+_REFRESH_WINDOWS = 8
+_CANCELLATION_RATIO = 1e-6
+_HUGE = 1e150
+
+
+class MonitoringBank:
+    """Z-score monitor for many streams sharing one ring buffer.
+
+    Streams are identified by name; :attr:`streams` gives the order in which
+    :meth:`update` expects values and returns scores. Removing a stream moves
+    the last stream into its slot, so the order changes; pass a mapping to
+    :meth:`update` to avoid depending on it.
+    """
+
+    def __init__(
+        self,
+        streams: Iterable[str] = (),
+        window_size: int = 5,
+        anomaly_z: float = 3.0,
+        capacity: int = 64,
+    ) -> None:
+        if window_size <= 0:
+            raise ValueError("window_size must be positive")
+        self.window_size = window_size
+        self.anomaly_z = anomaly_z
+        self.streams: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._allocate(max(1, capacity))
+        self._head = 0
+        self._ticks_since_refresh = 0
+        for name in streams:
+            self.add_stream(name)
+
+    # ---------------------------------------------------------------- storage
+    def _allocate(self, capacity: int) -> None:
+        self._buffer = np.zeros((self.window_size, capacity))
+        self._count = np.zeros(capacity, dtype=np.int64)
+        # _mean is the window mean of (value - _shift); _m2 its sum of squared
+        # deviations. _huge counts the window's samples beyond +-_HUGE (or NaN).
+        self._shift = np.zeros(capacity)
+        self._mean = np.zeros(capacity)
+        self._m2 = np.zeros(capacity)
+        self._m2_peak = np.zeros(capacity)
+        # Consecutive ticks whose value equalled the previous one; a window is
+        # constant (zero deviation, exactly) when this reaches count - 1.
+        self._repeats = np.zeros(capacity, dtype=np.int64)
+        self._huge = np.zeros(capacity, dtype=np.int64)
+
+    def _states(self) -> Tuple[np.ndarray, ...]:
+        return (
+            self._buffer,
+            self._count,
+            self._shift,
+            self._mean,
+            self._m2,
+            self._m2_peak,
+            self._repeats,
+            self._huge,
+        )
+
+    def _grow(self, capacity: int) -> None:
+        size = len(self.streams)
+        old = self._states()
+        self._allocate(capacity)
+        for target, source in zip(self._states(), old):
+            target[..., :size] = source[..., :size]
+
+    @property
+    def capacity(self) -> int:
+        return self._buffer.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.streams)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._index
+
+    def add_stream(self, name: str) -> int:
+        """Start watching ``name`` with an empty window; returns its position."""
+        if name in self._index:
+            raise ValueError(f"stream {name!r} already exists")
+        size = len(self.streams)
+        if size == self.capacity:
+            self._grow(self.capacity * 2)
+        for state in self._states():
+            state[..., size] = 0
+        self.streams.append(name)
+        self._index[name] = size
+        return size
+
+    def remove_stream(self, name: str) -> None:
+        """Stop watching ``name``; the last stream takes over its position."""
+        position = self._index.pop(name)
+        last = len(self.streams) - 1
+        if position != last:
+            moved = self.streams[last]
+            for state in self._states():
+                state[..., position] = state[..., last]
+            self.streams[position] = moved
+            self._index[moved] = position
+        self.streams.pop()
+
+    # ---------------------------------------------------------------- scoring
+    def _as_tick(self, values: Union[Mapping[str, float], Sequence[float], np.ndarray]) -> np.ndarray:
+        if isinstance(values, Mapping):
+            tick = np.empty(len(self.streams))
+            for name, position in self._index.items():
+                tick[position] = values[name]
+            return tick
+        tick = np.asarray(values, dtype=np.float64)
+        if tick.shape != (len(self.streams),):
+            raise ValueError(f"expected {len(self.streams)} values, got shape {tick.shape}")
+        return tick
+
+    def _refresh(self, rows: np.ndarray) -> None:
+        """Recompute moments of full windows ``rows`` exactly, re-centring their shift."""
+        window = self._buffer[:, rows]
+        shift = window.mean(axis=0)
+        # The rounded mean is only the new origin; the shifted mean keeps the
+        # digits it lost.
+        shifted = window - shift
+        mean = shifted.mean(axis=0)
+        self._shift[rows] = shift
+        self._mean[rows] = mean
+        self._m2[rows] = self._m2_peak[rows] = np.square(shifted - mean).sum(axis=0)
+
+    def _exact_scores(self, rows: np.ndarray, tick: np.ndarray) -> np.ndarray:
+        """Scores of full windows ``rows`` computed from the windows, scaled against overflow."""
+        window = self._buffer[:, rows]
+        scale = np.abs(window).max(axis=0)
+        scale = np.where(np.isfinite(scale), scale, 1.0)
+        scaled = window / scale
+        mean = scaled.mean(axis=0)
+        sigma = np.sqrt(np.square(scaled - mean).mean(axis=0)) * scale
+        sigma[(self._repeats[rows] >= self.window_size - 1) | (sigma == 0.0)] = 1.0
+        return np.abs(tick - mean * scale) / sigma
+
+    def update(self, values: Union[Mapping[str, float], Sequence[float], np.ndarray]) -> np.ndarray:
+        """Push one sample per stream and return every stream's anomaly score.
+
+        ``values`` is either aligned with :attr:`streams` or a mapping from
+        stream name to value (every stream must be present).
+        """
+        tick = self._as_tick(values)
+        if not self.streams:
+            return np.zeros(0)
+        # Huge and non-finite samples overflow in the sliding update by design;
+        # those streams are scored by _exact_scores.
+        with np.errstate(over="ignore", invalid="ignore"):
+            return self._update(tick)
+
+    def _update(self, tick: np.ndarray) -> np.ndarray:
+        size = len(self.streams)
+        window = self.window_size
+        column = self._head
+        previous = self._buffer[column - 1, :size]
+        evicted = self._buffer[column, :size].copy()
+        count = self._count[:size]
+        shift = self._shift[:size]
+        mean = self._mean[:size]
+        m2 = self._m2[:size]
+        repeats = self._repeats[:size]
+        huge = self._huge[:size]
+
+        full = count == window
+        repeats[:] = np.where((count > 0) & (tick == previous), repeats + 1, 0)
+        outsized = ~(np.abs(tick) <= _HUGE)
+        # A stream starts at its first sample, so a large offset does not eat
+        # the digits of a small spread.
+        fresh = count == 0
+        if fresh.any():
+            shift[fresh] = np.where(outsized[fresh], 0.0, tick[fresh])
+        was_huge = huge > 0
+        tracking = was_huge.any()
+        if tracking or outsized.any():
+            huge += outsized
+            huge -= full & ~(np.abs(evicted) <= _HUGE)
+        np.minimum(count + 1, window, out=count)
+        shifted = tick - shift
+        old_mean = mean.copy()
+        # Sliding Welford for full windows, plain Welford while filling.
+        removed = np.where(full, evicted - shift, old_mean)
+        mean += (shifted - removed) / count
+        m2 += (shifted - removed) * (shifted - mean + np.where(full, removed - old_mean, 0.0))
+        self._buffer[column, :size] = tick
+        self._head = (column + 1) % window
+
+        ready = count == window
+        inside = huge == 0
+        peak = self._m2_peak[:size]
+        np.maximum(peak, m2, out=peak)
+        self._ticks_since_refresh += 1
+        if self._ticks_since_refresh >= _REFRESH_WINDOWS * window:
+            self._refresh(np.flatnonzero(ready & inside))
+            self._ticks_since_refresh = 0
+        else:
+            # Moments are stale while a window holds huge samples; rebuild them
+            # once the last one leaves, and wherever the update lost its digits.
+            redo = ready & inside & (
+                ~(m2 < np.inf)
+                | (m2 < peak * _CANCELLATION_RATIO)
+                | (mean * mean * window * _CANCELLATION_RATIO > m2)
+            )
+            if tracking:
+                redo |= ready & inside & was_huge
+            if redo.any():
+                self._refresh(np.flatnonzero(redo))
+
+        sigma = np.sqrt(np.maximum(m2, 0.0) / window)
+        sigma[(repeats >= window - 1) | (sigma == 0.0)] = 1.0
+        scores = np.abs(tick - (shift + mean)) / sigma
+        if tracking or not inside.all():
+            exact = np.flatnonzero(ready & ~inside)
+            if exact.size:
+                scores[exact] = self._exact_scores(exact, tick[exact])
+        scores[~ready] = 0.0
+        return scores
+
+    def bulk_score(self, ticks: Union[Sequence[Sequence[float]], np.ndarray]) -> np.ndarray:
+        """Score a ``(time, streams)`` block of ticks; returns an array of the same shape."""
+        block = np.asarray(ticks, dtype=np.float64).reshape(-1, len(self.streams))
+        scores = np.empty_like(block)
+        for idx, tick in enumerate(block):
+            scores[idx] = self.update(tick)
+        return scores
+
+    def flag_anomalies(
+        self, ticks: Union[Sequence[Sequence[float]], np.ndarray]
+    ) -> Dict[str, List[int]]:
+        """Per stream, the tick indices whose score exceeds ``anomaly_z``.
+
+        Equivalent to calling ``MonitoringModel.flag_anomalies`` on each
+        stream's column of ``ticks``.
+        """
+        scores = self.bulk_score(ticks)
+        tick_index, stream_index = np.nonzero(scores > self.anomaly_z)
+        flagged: Dict[str, List[int]] = {name: [] for name in self.streams}
+        for tick, stream in zip(tick_index.tolist(), stream_index.tolist()):
+            flagged[self.streams[stream]].append(tick)
+        return flagged
+
+    def window(self, name: str) -> List[float]:
+        """Current window of ``name``, oldest first (like ``MonitoringModel.window``)."""
+        position = self._index[name]
+        count = int(self._count[position])
+        order = (self._head - count + np.arange(count)) % self.window_size
+        return self._buffer[order, position].tolist()
+
+    # ------------------------------------------------------------ persistence
+    def save(self, path: Union[Path, str]) -> Path:
+        """Write the bank's complete state to an ``.npz`` file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size = len(self.streams)
+        with path.open("wb") as handle:
+            np.savez(
+                handle,
+                streams=np.asarray(self.streams, dtype=str),
+                buffer=self._buffer[:, :size],
+                count=self._count[:size],
+                shift=self._shift[:size],
+                mean=self._mean[:size],
+                m2=self._m2[:size],
+                m2_peak=self._m2_peak[:size],
+                repeats=self._repeats[:size],
+                config=np.asarray(
+                    [self.window_size, self._head, self._ticks_since_refresh], dtype=np.int64
+                ),
+                anomaly_z=np.asarray(self.anomaly_z),
+            )
+        return path
+
+    @classmethod
+    def load(cls, path: Union[Path, str], capacity: Optional[int] = None) -> "MonitoringBank":
+        """Restore a bank written by :meth:`save`."""
+        with np.load(Path(path), allow_pickle=False) as state:
+            window_size, head, ticks_since_refresh = (int(value) for value in state["config"])
+            names = [str(name) for name in state["streams"]]
+            bank = cls(
+                window_size=window_size,
+                anomaly_z=float(state["anomaly_z"]),
+                capacity=max(capacity or 0, len(names), 1),
+            )
+            size = len(names)
+            bank.streams = names
+            bank._index = {name: idx for idx, name in enumerate(names)}
+            bank._buffer[:, :size] = state["buffer"]
+            bank._count[:size] = state["count"]
+            # Banks saved before the shift existed kept unshifted moments.
+            if "shift" in state.files:
+                bank._shift[:size] = state["shift"]
+            bank._mean[:size] = state["mean"]
+            bank._m2[:size] = state["m2"]
+            bank._m2_peak[:size] = state["m2_peak"]
+            bank._repeats[:size] = state["repeats"]
+            bank._huge[:size] = np.count_nonzero(~(np.abs(state["buffer"]) <= _HUGE), axis=0)
+        bank._head = head
+        bank._ticks_since_refresh = ticks_since_refresh
+        return bank
@@ -1,10 +1,10 @@
 """
 Monitoring model responsible for anomaly detection and system health scoring.
 """
-from collections import deque
-from statistics import mean, pstdev
 from typing import Deque, Iterable, List, Sequence
 
+from utils.stream_stats.rolling import RollingWindow
+
 
 class MonitoringModel:
     """Simple moving-average based monitor."""
@@ -12,16 +12,20 @@ class MonitoringModel:
     def __init__(self, window_size: int = 5, anomaly_z: float = 3.0) -> None:
         self.window_size = window_size
         self.anomaly_z = anomaly_z
-        self.window: Deque[float] = deque(maxlen=window_size)
+        self._rolling = RollingWindow(window_size)
+        self.window: Deque[float] = self._rolling.values
 
     def update(self, metric: float) -> float:
-        """Update the rolling window and return an anomaly score."""
-        self.window.append(metric)
-        if len(self.window) < self.window.maxlen:
+        """Update the rolling window and return an anomaly score.
+
+        Mean and deviation are maintained incrementally, so each update is
+        O(1) regardless of ``window_size``.
+        """
+        self._rolling.push(metric)
+        if not self._rolling.full:
             return 0.0
-        mu = mean(self.window)
-        sigma = pstdev(self.window) or 1.0
-        return abs(metric - mu) / sigma
+        sigma = self._rolling.std or 1.0
+        return abs(metric - self._rolling.mean) / sigma
 
     def bulk_score(self, metrics: Iterable[float]) -> List[float]:
         """Score a series of metrics for batch processing."""
@@ -0,0 +1,11 @@
+"""ONNX Runtime backend and MainModel exporter (imported lazily).
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "model": ["OnnxModel"],
+        "export": ["export_main_model"],
+    },
+)
@@ -0,0 +1,84 @@
+"""
+Export :class:`MainModel` as an ONNX graph for the ONNX Runtime backend.
+
+The graph computes the same function as ``MainModel.predict_batch``: a
+``(batch, features)`` ``float32`` input multiplied by the model's output
+scale, with both dimensions symbolic. The weights file digest is stored in
+the model metadata so the graph can be traced back to its source.
+
+Run ``python -m models.onnx_models.export`` to regenerate
+``models/onnx_models/model.onnx`` from the shipped main-model weights.
+"""
+import argparse
+import hashlib
+from pathlib import Path
+from typing import Any, Optional, Sequence, Union
+
+import numpy as np
+
+from models.main_model.model import MainModel
+
+__all__ = ["export_main_model"]
+
+_ROOT = Path(__file__).resolve().parents[1]
+_DEFAULT_WEIGHTS = _ROOT / "main_model" / "model_weights.h5"
+_DEFAULT_OUTPUT = _ROOT / "onnx_models" / "model.onnx"
+
+
+def _require_onnx() -> Any:
+    try:
+        import onnx  # type: ignore
+    except ImportError as exc:  # pragma: no cover - runtime availability guard
+        raise ImportError("onnx is not installed. Please `pip install onnx` to export models.") from exc
+    return onnx
+
+
+def export_main_model(
+    model: MainModel, destination: Union[Path, str], opset: int = 13
+) -> Path:
+    """Write ``model`` as an ONNX graph to ``destination`` and return the path."""
+    if not model.is_loaded:
+        raise RuntimeError("Weights must be loaded before exporting")
+    onnx = _require_onnx()
+    helper = onnx.helper
+    scale = onnx.numpy_helper.from_array(
+        np.asarray(model.scale_tensor(np.float32)), name="scale"
+    )
+    graph = helper.make_graph(
+        [helper.make_node("Mul", ["inputs", "scale"], ["outputs"], name="apply_scale")],
+        "main_model",
+        [helper.make_tensor_value_info("inputs", onnx.TensorProto.FLOAT, ["batch", "features"])],
+        [helper.make_tensor_value_info("outputs", onnx.TensorProto.FLOAT, ["batch", "features"])],
+        initializer=[scale],
+    )
+    # Pick the IR version from the opset so older runtimes accept the file.
+    exported = helper.make_model_gen_version(
+        graph,
+        producer_name="models.onnx_models.export",
+        opset_imports=[helper.make_opsetid("", opset)],
+    )
+    digest = hashlib.sha256(model.weights_path.read_bytes()).hexdigest()
+    helper.set_model_props(
+        exported, {"source": model.weights_path.name, "source_sha256": digest}
+    )
+    onnx.checker.check_model(exported)
+    destination = Path(destination)
+    destination.write_bytes(exported.SerializeToString())
+    return destination
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export MainModel as an ONNX graph.")
+    parser.add_argument("--weights", default=str(_DEFAULT_WEIGHTS), help="MainModel weights file")
+    parser.add_argument("--output", default=str(_DEFAULT_OUTPUT), help="ONNX file to write")
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args(argv)
+
+    model = MainModel(args.weights)
+    model.load_weights()
+    print(export_main_model(model, args.output, args.opset))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,214 @@
+"""
+ONNX Runtime CPU backend with the :class:`MainModel` inference interface.
+
+:class:`OnnxModel` loads an ONNX graph (see :mod:`models.onnx_models.export`)
+into a pool of ``onnxruntime.InferenceSession`` objects built from one read
+of the file, each with explicit intra- and inter-op thread counts and its
+own IO binding. A request borrows a session from the pool, binds the input
+array and the output buffer in place (no staging copies), runs, and returns
+the session, so concurrent callers each run on their own session while the
+pool bounds how many run at once. ``onnxruntime`` is only needed once
+``load_weights`` is called.
+"""
+import os
+import queue
+from contextlib import contextmanager
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+__all__ = ["OnnxModel"]
+
+_ORT_TYPES = {
+    "tensor(float)": np.float32,
+    "tensor(double)": np.float64,
+    "tensor(float16)": np.float16,
+}
+
+
+def _require_onnxruntime() -> Any:
+    try:
+        import onnxruntime  # type: ignore
+    except ImportError as exc:  # pragma: no cover - runtime availability guard
+        raise ImportError(
+            "onnxruntime is not installed. Please `pip install onnxruntime` to use the ONNX backend."
+        ) from exc
+    return onnxruntime
+
+
+class OnnxModel:
+    """Single-input, single-output ONNX graph served from a CPU session pool.
+
+    ``pool_size`` defaults to the CPU count divided by ``intra_op_threads``.
+    ``inter_op_threads`` above 1 switches the sessions to parallel
+    execution of independent graph nodes. ``spin=False`` stops idle
+    intra-op threads from busy-waiting, which matters once several sessions
+    share the cores.
+    """
+
+    def __init__(
+        self,
+        weights_path: Union[Path, str],
+        pool_size: Optional[int] = None,
+        intra_op_threads: int = 1,
+        inter_op_threads: int = 1,
+        spin: bool = False,
+    ) -> None:
+        if intra_op_threads < 1 or inter_op_threads < 1:
+            raise ValueError("intra_op_threads and inter_op_threads must be positive")
+        if pool_size is None:
+            pool_size = max(1, (os.cpu_count() or 1) // intra_op_threads)
+        if pool_size < 1:
+            raise ValueError("pool_size must be positive")
+        self.weights_path = Path(weights_path)
+        self.pool_size = pool_size
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.spin = spin
+        self.is_loaded = False
+        self.metadata: Mapping[str, Any] = {}
+        self.nbytes = 0
+        self._frozen = False
+        self._pool: "queue.LifoQueue[Tuple[Any, Any]]" = queue.LifoQueue()
+        self._input_name = self._output_name = ""
+        self._input_dtype = self._output_dtype = np.dtype(np.float32)
+        self._input_dims: List[Any] = []
+        self._output_dims: List[Any] = []
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    @property
+    def input_dtype(self) -> np.dtype:
+        return self._input_dtype
+
+    def freeze(self) -> None:
+        """Mark the model shared; sessions are immutable, so only reloading is refused."""
+        if not self.is_loaded:
+            raise RuntimeError("Weights must be loaded before freezing")
+        self.metadata = MappingProxyType(dict(self.metadata))
+        self._frozen = True
+
+    def load_weights(self) -> None:
+        """Build the session pool from the ONNX file."""
+        if self._frozen:
+            raise RuntimeError("model is frozen; load a private instance to reload it")
+        if not self.weights_path.exists():
+            raise FileNotFoundError(self.weights_path)
+        ort = _require_onnxruntime()
+        model_bytes = self.weights_path.read_bytes()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = (
+            ort.ExecutionMode.ORT_PARALLEL
+            if self.inter_op_threads > 1
+            else ort.ExecutionMode.ORT_SEQUENTIAL
+        )
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        spin = "1" if self.spin else "0"
+        options.add_session_config_entry("session.intra_op.allow_spinning", spin)
+        options.add_session_config_entry("session.inter_op.allow_spinning", spin)
+        sessions = [
+            ort.InferenceSession(model_bytes, options, providers=["CPUExecutionProvider"])
+            for _ in range(self.pool_size)
+        ]
+        inputs, outputs = sessions[0].get_inputs(), sessions[0].get_outputs()
+        if len(inputs) != 1 or len(outputs) != 1:
+            raise ValueError("the ONNX graph must have exactly one input and one output")
+        for node in (inputs[0], outputs[0]):
+            if node.type not in _ORT_TYPES:
+                raise ValueError(f"unsupported tensor type {node.type} for {node.name!r}")
+        self._input_name, self._output_name = inputs[0].name, outputs[0].name
+        self._input_dtype = np.dtype(_ORT_TYPES[inputs[0].type])
+        self._output_dtype = np.dtype(_ORT_TYPES[outputs[0].type])
+        self._input_dims, self._output_dims = list(inputs[0].shape), list(outputs[0].shape)
+        self._pool = queue.LifoQueue()
+        for session in sessions:
+            self._pool.put((session, session.io_binding()))
+        self.nbytes = len(model_bytes) * self.pool_size
+        self.metadata = {
+            "source": str(self.weights_path),
+            "size_bytes": len(model_bytes),
+            "backend": "onnxruntime",
+            "pool_size": self.pool_size,
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "input": {"name": self._input_name, "type": inputs[0].type, "shape": self._input_dims},
+            "output": {"name": self._output_name, "type": outputs[0].type, "shape": self._output_dims},
+        }
+        self.is_loaded = True
+
+    def close(self) -> None:
+        """Release the sessions; ``load_weights`` builds them again."""
+        self._pool = queue.LifoQueue()
+        self.is_loaded = False
+
+    @contextmanager
+    def _session(self) -> Iterator[Tuple[Any, Any]]:
+        if not self.is_loaded:
+            raise RuntimeError("Weights must be loaded before inference")
+        pool = self._pool
+        pair = pool.get()
+        try:
+            yield pair
+        finally:
+            pool.put(pair)
+
+    def _output_shape(self, inputs: np.ndarray) -> Optional[Tuple[int, ...]]:
+        """Concrete output shape for ``inputs``; ``None`` if the graph does not say."""
+        sizes: Dict[Any, int] = {}
+        for dim, size in zip(self._input_dims, inputs.shape):
+            if not isinstance(dim, int):
+                sizes[dim] = size
+        shape = []
+        for dim in self._output_dims:
+            if isinstance(dim, int):
+                shape.append(dim)
+            elif dim in sizes:
+                shape.append(sizes[dim])
+            else:
+                return None
+        return tuple(shape)
+
+    def predict_batch(self, inputs: Any, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Run the graph on a ``(batch, features)`` array.
+
+        Inputs are converted to the graph's input dtype (``float32`` for
+        exported models) only if needed. ``out`` must be a C-contiguous array
+        of the output shape and dtype; it is bound as the output buffer, so
+        ONNX Runtime writes into it directly.
+        """
+        inputs = np.asarray(inputs)
+        if inputs.ndim != 2:
+            raise ValueError("inputs must have shape (batch, features)")
+        inputs = np.ascontiguousarray(inputs, dtype=self._input_dtype)
+        shape = self._output_shape(inputs)
+        if out is not None:
+            if shape is None or out.shape != shape:
+                raise ValueError(f"out must have shape {shape}")
+            if out.dtype != self._output_dtype or not out.flags.c_contiguous:
+                raise ValueError(f"out must be a C-contiguous {self._output_dtype} array")
+        elif shape is not None:
+            out = np.empty(shape, dtype=self._output_dtype)
+        with self._session() as (session, binding):
+            binding.bind_cpu_input(self._input_name, inputs)
+            if out is not None:
+                binding.bind_output(
+                    self._output_name, "cpu", 0, self._output_dtype, out.shape, out.ctypes.data
+                )
+            else:
+                binding.bind_output(self._output_name, "cpu")
+            session.run_with_iobinding(binding)
+            if out is None:
+                out = binding.copy_outputs_to_cpu()[0]
+            binding.clear_binding_inputs()
+            binding.clear_binding_outputs()
+        return out
+
+    def predict(self, inputs: List[float]) -> List[float]:
+        """Score one feature vector, as :meth:`MainModel.predict` does."""
+        return self.predict_batch(np.asarray(inputs, dtype=self._input_dtype)[None, :])[0].tolist()
@@ -0,0 +1,11 @@
+"""NPU telemetry collection, storage and analysis.
+
+Subpackages are imported on first attribute access (see :mod:`utils.lazy_import`),
+so ``python -m monitoring.data_collection`` never loads the analysis stack.
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["analysis", "data_collection", "pipeline", "storage"],
+)
@@ -0,0 +1,45 @@
+"""Metric analysis, anomaly screening and plotting (imported lazily).
+
+Matplotlib and Gradio are only imported when a plot or the dashboard is built.
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "analyze": [
+            "load_metrics",
+            "iter_metrics",
+            "compute_rollup",
+            "summarize_record",
+            "export_metrics_csv",
+        ],
+        "anomaly_detection": ["zscore_anomalies", "threshold_anomalies"],
+        "batch_anomaly": ["RULES", "AnomalyReport", "BatchAnomalyDetector", "mask_to_intervals"],
+        "dashboard": ["RANGE_PRESETS", "PayloadTailer", "RefreshResult", "DashboardData"],
+        "downsample": ["DOWNSAMPLE_METHODS", "minmax_indices", "lttb_indices"],
+        "metrics_csv": [
+            "TIMESTAMP_FORMATS",
+            "MetricsCsvWriter",
+            "export_metrics_stream",
+            "frames_from_payloads",
+            "iter_metrics_csv",
+        ],
+        "report": [
+            "REPORT_FORMATS",
+            "split_device_metric",
+            "ReportResult",
+            "render_metric_report",
+            "load_report_frame",
+        ],
+        "timeseries": ["numeric_metrics", "TimeSeriesFrame"],
+        "visualize": [
+            "load_npu_payloads",
+            "build_numeric_timeseries",
+            "plot_metric_timeseries",
+            "draw_metric_series",
+            "render_dashboard_figure",
+            "launch_npu_dashboard",
+        ],
+    },
+)
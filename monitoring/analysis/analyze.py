@@ -1,12 +1,15 @@
 
-import csv
 import json
 from pathlib import Path
-from statistics import mean
-from typing import Dict, Iterable, List, Mapping, Sequence, Union
+from typing import Dict, Iterable, Iterator, List, Mapping, Sequence, Union
+
+from monitoring.analysis.metrics_csv import MetricsCsvWriter
+from utils.data_preprocessing.json_stream import iter_json_array
+from utils.stream_stats.accumulator import StreamingStats
 
 __all__ = [
     "load_metrics",
+    "iter_metrics",
     "compute_rollup",
     "summarize_record",
     "export_metrics_csv",
@@ -24,20 +27,40 @@ def load_metrics(path: Union[Path, str]) -> List[float]:
     return []
 
 
+def iter_metrics(path: Union[Path, str]) -> Iterator[float]:
+    """Stream the values :func:`load_metrics` would return, without loading the file.
+
+    Top-level arrays and ``{"metrics": [...]}`` documents are decoded one
+    element at a time; ``summary`` records are small and read whole.
+    """
+    with Path(path).open("r", encoding="utf-8") as handle:
+        first = handle.read(1)
+        while first.isspace():
+            first = handle.read(1)
+        handle.seek(0)
+        if first == "[":
+            for item in iter_json_array(handle):
+                yield float(item)
+            return
+    try:
+        for value in iter_json_array(path, key="metrics", missing_ok=False):
+            yield float(value)
+    except KeyError:
+        yield from load_metrics(path)
+
+
 def compute_rollup(metrics: Iterable[float]) -> Dict[str, float]:
-    values = list(metrics)
-    return {
-        "average": mean(values) if values else 0.0,
-        "max": max(values, default=0.0),
-        "min": min(values, default=0.0),
-        "count": float(len(values)),
-    }
+    """Summarize metrics in one pass: average/min/max/count, variance and p50/p95/p99.
+
+    Accepts any iterable (including generators and NumPy arrays) without
+    materializing it; percentiles are approximate (1% relative error).
+    """
+    return StreamingStats().extend(metrics).as_rollup()
 
 
 def summarize_record(path: Union[Path, str]) -> Dict[str, float]:
     """Convenience wrapper for downstream dashboards."""
-    metrics = load_metrics(path)
-    return compute_rollup(metrics)
+    return compute_rollup(iter_metrics(path))
 
 
 def export_metrics_csv(
@@ -49,26 +72,14 @@ def export_metrics_csv(
     inside notebooks or MindSpore 1.7.0 monitoring scripts. It also creates the
     parent directory for the destination file to avoid `FileNotFoundError`
     surprises when exporting health indicators during fault-injection runs.
+    Timestamps are row indices; use
+    :func:`monitoring.analysis.metrics_csv.export_metrics_stream` for real
+    timestamps, appends, gzip or series that do not fit in memory.
     """
 
     if not metrics:
         raise ValueError("No metrics provided for CSV export")
 
-    destination = Path(destination)
-    destination.parent.mkdir(parents=True, exist_ok=True)
-
-    fieldnames = ["timestamp"] + list(metrics.keys())
-    max_len = max((len(series) for series in metrics.values()), default=0)
-    with destination.open("w", newline="") as handle:
-        writer = csv.DictWriter(handle, fieldnames=fieldnames)
-        writer.writeheader()
-        for idx in range(max_len):
-            row = {"timestamp": idx}
-            for name, series in metrics.items():
-                if idx < len(series):
-                    row[name] = series[idx]
-            writer.writerow(row)
-
-    return destination
-
-
+    with MetricsCsvWriter(destination, columns=list(metrics), timestamp_format="index") as writer:
+        writer.write_columns(metrics)
+    return writer.path
@@ -0,0 +1,500 @@
+"""Vectorized anomaly screening over metric x time matrices.
+
+``zscore_anomalies`` and ``threshold_anomalies`` take one Python iterable and
+return index lists, so screening every metric on every card means a Python
+loop per series. :class:`BatchAnomalyDetector` runs the same rules, plus a
+robust median/MAD score and an EWMA control band, over a whole
+``(metrics, time)`` or ``(devices, metrics, time)`` array in one call and
+returns boolean masks that convert to run-length-encoded intervals.
+
+Rules, applied independently along the time axis of every series:
+
+* ``zscore``: ``|x - mean| > z_threshold * std`` over the whole series (a zero
+  deviation counts as 1.0, as in ``zscore_anomalies``).
+* ``mad``: the modified z-score ``0.6745 * |x - median| / MAD`` exceeds
+  ``mad_threshold``; if the MAD is zero the mean absolute deviation is used.
+* ``ewma``: ``|x - m| > ewma_threshold * s`` where ``m`` and ``s`` are the
+  exponentially weighted mean and deviation up to the previous sample; the
+  first ``ewma_warmup`` samples of each series are never flagged.
+* ``threshold``: ``x > upper`` or ``x < lower``, scalars or one bound per metric
+  (NaN disables a bound).
+
+NaN samples (gaps in a :class:`~monitoring.analysis.timeseries.TimeSeriesFrame`,
+whose ``values.T`` is a valid input) are ignored by the statistics, carried
+forward by the EWMA and never flagged. :meth:`BatchAnomalyDetector.detect_chunked`
+processes arrays that do not fit in memory (``np.memmap``, ``np.load(...,
+mmap_mode="r")``) in time slices; there the median and MAD are estimated with
+:class:`~utils.stream_stats.sketch.QuantileSketch`.
+"""
+import math
+import warnings
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from utils.stream_stats.sketch import QuantileSketch
+
+__all__ = [
+    "RULES",
+    "AnomalyReport",
+    "BatchAnomalyDetector",
+    "mask_to_intervals",
+]
+
+RULES = ("zscore", "mad", "ewma", "threshold")
+
+_MAD_SCALE = 0.6745
+_MEAN_AD_SCALE = 0.7979
+# EWMA blocks are sized so the in-block reweighting factor stays below 1e6.
+_EWMA_DYNAMIC_RANGE = 1e6
+_VARIANCE_NOISE = 1e-10
+# Samples per row tile in detect(): a few float64 temporaries stay in cache.
+_TILE_POINTS = 1 << 16
+
+Bound = Union[None, float, Sequence[Optional[float]]]
+
+
+def mask_to_intervals(mask: np.ndarray) -> np.ndarray:
+    """Run-length encode a boolean mask along its last axis.
+
+    Returns an ``int64`` array with one row per run of ``True`` values: the
+    leading index columns (``metric`` or ``device, metric``) followed by the
+    run's ``start`` and exclusive ``stop`` sample positions.
+    """
+    mask = np.atleast_1d(np.asarray(mask, dtype=bool))
+    rows = mask.reshape(-1, mask.shape[-1])
+    padded = np.zeros((rows.shape[0], rows.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = rows
+    edges = np.diff(padded, axis=1)
+    start_rows, starts = np.nonzero(edges == 1)
+    _stop_rows, stops = np.nonzero(edges == -1)
+    leading = np.unravel_index(start_rows, mask.shape[:-1]) if mask.ndim > 1 else ()
+    columns = leading + (starts, stops)
+    return np.stack(columns, axis=1).astype(np.int64, copy=False)
+
+
+@contextmanager
+def _quiet_nan_warnings() -> Iterator[None]:
+    """Silence "mean of empty slice" warnings for all-NaN series."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        yield
+
+
+def _missing(rows: np.ndarray) -> Optional[np.ndarray]:
+    """NaN mask of ``rows``, or ``None`` when every sample is present."""
+    missing = np.isnan(rows)
+    return missing if missing.any() else None
+
+
+def _merge_intervals(pieces: List[np.ndarray], width: int) -> np.ndarray:
+    """Concatenate per-chunk intervals and join runs that touch across chunks."""
+    if not pieces:
+        return np.empty((0, width), dtype=np.int64)
+    intervals = np.concatenate(pieces)
+    if not intervals.size:
+        return intervals
+    order = np.lexsort(tuple(intervals[:, col] for col in range(width - 2, -1, -1)))
+    intervals = intervals[order]
+    same_series = np.all(intervals[1:, :-2] == intervals[:-1, :-2], axis=1)
+    continues = same_series & (intervals[1:, -2] == intervals[:-1, -1])
+    heads = np.concatenate(([True], ~continues))
+    group = np.cumsum(heads) - 1
+    merged = intervals[heads].copy()
+    np.maximum.at(merged[:, -1], group, intervals[:, -1])
+    return merged
+
+
+@dataclass
+class AnomalyReport:
+    """Per-rule anomaly masks (or intervals, for chunked runs) of one input.
+
+    ``shape`` is the input's shape; masks share it. Reports from
+    :meth:`BatchAnomalyDetector.detect_chunked` carry intervals only.
+    """
+
+    shape: Tuple[int, ...]
+    masks: Dict[str, np.ndarray] = field(default_factory=dict)
+    _intervals: Dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    @property
+    def rules(self) -> List[str]:
+        return [name for name in (self.masks or self._intervals) if name != "any"]
+
+    @property
+    def combined(self) -> np.ndarray:
+        """Mask of samples flagged by at least one rule."""
+        if not self.masks:
+            raise ValueError("chunked reports carry intervals only")
+        return np.logical_or.reduce(list(self.masks.values()))
+
+    def intervals(self, rule: Optional[str] = None) -> np.ndarray:
+        """Anomalous runs for ``rule`` (any rule when omitted); see :func:`mask_to_intervals`."""
+        name = rule or "any"
+        if name not in self._intervals:
+            mask = self.combined if name == "any" else self.masks[name]
+            self._intervals[name] = mask_to_intervals(mask)
+        return self._intervals[name]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of flagged samples per rule."""
+        if self.masks:
+            return {name: int(np.count_nonzero(mask)) for name, mask in self.masks.items()}
+        return {
+            name: int((runs[:, -1] - runs[:, -2]).sum())
+            for name, runs in self._intervals.items()
+            if name != "any"
+        }
+
+
+@dataclass
+class _EwmaState:
+    shift: np.ndarray
+    mean: np.ndarray
+    square: np.ndarray
+    # Last observed value (minus ``shift``) and whether the series has any yet.
+    last: np.ndarray
+    started: np.ndarray
+    seen: int = 0
+
+
+class BatchAnomalyDetector:
+    """Apply several anomaly rules to every series of a 2-D or 3-D array at once."""
+
+    def __init__(
+        self,
+        rules: Sequence[str] = RULES,
+        z_threshold: float = 3.0,
+        mad_threshold: float = 3.5,
+        ewma_alpha: float = 0.1,
+        ewma_threshold: float = 3.0,
+        ewma_warmup: Optional[int] = None,
+        upper: Bound = None,
+        lower: Bound = None,
+        sketch_accuracy: float = 0.005,
+    ) -> None:
+        unknown = set(rules) - set(RULES)
+        if unknown:
+            raise ValueError(f"unknown rules {sorted(unknown)}; expected a subset of {RULES}")
+        if not 0.0 < ewma_alpha <= 1.0:
+            raise ValueError("ewma_alpha must be in (0, 1]")
+        self.rules = [name for name in RULES if name in rules]
+        self.z_threshold = z_threshold
+        self.mad_threshold = mad_threshold
+        self.ewma_alpha = ewma_alpha
+        self.ewma_threshold = ewma_threshold
+        self.ewma_warmup = (
+            int(math.ceil(2.0 / ewma_alpha)) if ewma_warmup is None else ewma_warmup
+        )
+        self.upper = upper
+        self.lower = lower
+        self.sketch_accuracy = sketch_accuracy
+
+    # ----------------------------------------------------------------- helpers
+    @staticmethod
+    def _check_shape(shape: Tuple[int, ...]) -> None:
+        if len(shape) not in (2, 3):
+            raise ValueError("expected a (metrics, time) or (devices, metrics, time) array")
+
+    @staticmethod
+    def _bound(bound: Bound, shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+        """Per-row column vector for a scalar or per-metric bound."""
+        if bound is None:
+            return None
+        metrics = shape[-2]
+        values = np.asarray(
+            [np.nan if item is None else item for item in np.atleast_1d(np.asarray(bound, dtype=object))],
+            dtype=np.float64,
+        )
+        if values.size == 1:
+            values = np.repeat(values, metrics)
+        if values.size != metrics:
+            raise ValueError(f"expected one bound per metric ({metrics}), got {values.size}")
+        rows = int(np.prod(shape[:-1]))
+        return np.broadcast_to(values, shape[:-1]).reshape(rows, 1)
+
+    def _ewma_init(self, rows: np.ndarray) -> _EwmaState:
+        with np.errstate(invalid="ignore"):
+            finite = ~np.isnan(rows)
+            started = finite.any(axis=1)
+            first = np.where(started, rows[np.arange(rows.shape[0]), finite.argmax(axis=1)], 0.0)
+        zeros = np.zeros(rows.shape[0])
+        return _EwmaState(
+            shift=first, mean=zeros, square=zeros.copy(), last=zeros.copy(), started=started
+        )
+
+    def _ewma_block(self, length: int) -> int:
+        if self.ewma_alpha >= 1.0:
+            return 1
+        limit = math.log(_EWMA_DYNAMIC_RANGE) / -math.log(1.0 - self.ewma_alpha)
+        return int(max(1, min(length, limit)))
+
+    def _ewma(self, values: np.ndarray, initial: np.ndarray, block: int) -> np.ndarray:
+        """Exponentially weighted means of ``values`` along axis 1.
+
+        ``values`` has a multiple of ``block`` columns. The result is one
+        column wider: column ``t`` holds the average of the samples *before*
+        ``t``, starting from ``initial``, so ``y[t + 1] = (1 - a) * y[t] + a * x[t]``.
+        Each block is solved in closed form with a cumulative sum, then the
+        carry from earlier blocks is added back.
+        """
+        rows, width = values.shape
+        out = np.empty((rows, width + 1))
+        out[:, 0] = initial
+        alpha = self.ewma_alpha
+        if alpha >= 1.0:
+            out[:, 1:] = values
+            return out
+        decay = 1.0 - alpha
+        blocks = width // block
+        steps = np.arange(block)
+        local = out[:, 1:].reshape(rows, blocks, block)
+        np.multiply(values.reshape(rows, blocks, block), decay ** -steps, out=local)
+        np.cumsum(local, axis=2, out=local)
+        local *= alpha * decay ** steps
+        # The value carried into block b is sum_k span**k * ends[b - 1 - k] plus
+        # the decayed initial value; span = decay**block <= 1e-6, so only the
+        # first few terms are representable and the sum is truncated there.
+        ends = local[:, :, -1].copy()
+        span = decay ** block
+        carries = np.zeros((rows, blocks))
+        carries[:, 1:] = ends[:, :-1]
+        terms = min(blocks, int(math.ceil(math.log(1e-17) / math.log(span))) if span > 0 else 1)
+        for k in range(1, terms):
+            carries[:, k + 1 :] += span ** k * ends[:, : -(k + 1)]
+        carries += out[:, :1] * span ** np.arange(blocks)
+        local += carries[:, :, None] * decay ** (steps + 1)
+        return out
+
+    def _ewma_mask(self, rows: np.ndarray, state: _EwmaState, missing: Optional[np.ndarray]) -> np.ndarray:
+        length = rows.shape[1]
+        block = self._ewma_block(length)
+        centred = np.zeros((rows.shape[0], -(-length // block) * block))
+        observed = centred[:, :length]
+        if not state.started.all():
+            fresh = ~state.started
+            if missing is not None:
+                fresh &= ~missing.all(axis=1)
+            if fresh.any():
+                # A series seen for the first time in a later chunk has only
+                # held zeros so far; centre it on its first value, as a single
+                # pass would have.
+                state.shift[fresh] = self._ewma_init(rows[fresh]).shift
+                state.started |= fresh
+        np.subtract(rows, state.shift[:, None], out=observed)
+        if missing is not None:
+            # Carry the last observed value through gaps, including those
+            # opening a chunk.
+            positions = np.where(missing, -1, np.arange(length))
+            np.maximum.accumulate(positions, axis=1, out=positions)
+            gaps = positions < 0
+            observed[...] = np.take_along_axis(observed, np.maximum(positions, 0), axis=1)
+            observed[gaps] = np.broadcast_to(state.last[:, None], observed.shape)[gaps]
+        if state.seen == 0:
+            state.mean = observed[:, 0].copy()
+            state.square = state.mean * state.mean
+        means = self._ewma(centred, state.mean, block)
+        squares = self._ewma(centred * centred, state.square, block)
+        previous_mean = means[:, :length]
+        previous_square = squares[:, :length]
+        variance = previous_mean * previous_mean
+        np.subtract(previous_square, variance, out=variance)
+        # A zero (or rounding-noise) deviation counts as 1.0, as in zscore_anomalies.
+        np.copyto(variance, 1.0, where=variance <= _VARIANCE_NOISE * previous_square)
+        deviation = observed - previous_mean
+        deviation *= deviation
+        variance *= self.ewma_threshold * self.ewma_threshold
+        mask = deviation > variance
+        warm = self.ewma_warmup - state.seen
+        if warm > 0:
+            mask[:, :warm] = False
+        state.mean = means[:, length].copy()
+        state.square = squares[:, length].copy()
+        state.last = observed[:, -1].copy()
+        state.seen += length
+        return mask
+
+    def _masks(
+        self,
+        rows: np.ndarray,
+        stats: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        state: Optional[_EwmaState],
+        missing: Optional[np.ndarray],
+        bounds: Tuple[Optional[np.ndarray], Optional[np.ndarray]],
+    ) -> Dict[str, np.ndarray]:
+        masks: Dict[str, np.ndarray] = {}
+        for name, (centre, scale) in stats.items():
+            deviation = np.abs(rows - centre[:, None])
+            limit = (self.z_threshold if name == "zscore" else self.mad_threshold) * scale
+            masks[name] = deviation > limit[:, None]
+        if "ewma" in self.rules and state is not None:
+            masks["ewma"] = self._ewma_mask(rows, state, missing)
+        if "threshold" in self.rules:
+            mask = np.zeros(rows.shape, dtype=bool)
+            upper, lower = bounds
+            with np.errstate(invalid="ignore"):
+                if upper is not None:
+                    mask |= rows > upper
+                if lower is not None:
+                    mask |= rows < lower
+            masks["threshold"] = mask
+        if missing is not None:
+            for mask in masks.values():
+                mask[missing] = False
+        return {name: masks[name] for name in self.rules}
+
+    @staticmethod
+    def _robust_scale(mad: np.ndarray, mean_ad: np.ndarray) -> np.ndarray:
+        scale = mad / _MAD_SCALE
+        fallback = mean_ad / _MEAN_AD_SCALE
+        scale = np.where(scale > 0, scale, fallback)
+        return np.where(scale > 0, scale, 1.0)
+
+    def _exact_stats(
+        self, rows: np.ndarray, missing: Optional[np.ndarray]
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Per-series centre and scale for the ``zscore`` and ``mad`` rules."""
+        has_nan = missing is not None
+        stats: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        if "zscore" in self.rules:
+            mean = np.nanmean(rows, axis=1) if has_nan else rows.mean(axis=1)
+            std = np.nanstd(rows, axis=1) if has_nan else rows.std(axis=1)
+            stats["zscore"] = (mean, np.where(std > 0, std, 1.0))
+        if "mad" in self.rules:
+            median_fn = np.nanmedian if has_nan else np.median
+            median = median_fn(rows, axis=1)
+            spread = np.abs(rows - median[:, None])
+            mean_ad = np.nanmean(spread, axis=1) if has_nan else spread.mean(axis=1)
+            mad = median_fn(spread, axis=1, overwrite_input=True)
+            stats["mad"] = (median, self._robust_scale(mad, mean_ad))
+        return stats
+
+    # ------------------------------------------------------------------ public
+    def detect(self, values: Any) -> AnomalyReport:
+        """Screen an in-memory ``(metrics, time)`` or ``(devices, metrics, time)`` array."""
+        array = np.asarray(values, dtype=np.float64)
+        self._check_shape(array.shape)
+        rows = array.reshape(-1, array.shape[-1])
+        upper = self._bound(self.upper, array.shape)
+        lower = self._bound(self.lower, array.shape)
+        masks = {name: np.empty(rows.shape, dtype=bool) for name in self.rules}
+        # Series are independent, so work through them a cache-sized tile at a time.
+        tile = max(1, _TILE_POINTS // max(1, rows.shape[1]))
+        with np.errstate(invalid="ignore", divide="ignore"), _quiet_nan_warnings():
+            for lo in range(0, rows.shape[0], tile):
+                part = rows[lo : lo + tile]
+                missing = _missing(part)
+                state = self._ewma_init(part) if "ewma" in self.rules else None
+                part_masks = self._masks(
+                    part,
+                    self._exact_stats(part, missing),
+                    state,
+                    missing,
+                    (
+                        upper[lo : lo + tile] if upper is not None else None,
+                        lower[lo : lo + tile] if lower is not None else None,
+                    ),
+                )
+                for name, mask in part_masks.items():
+                    masks[name][lo : lo + tile] = mask
+        return AnomalyReport(
+            shape=array.shape,
+            masks={name: mask.reshape(array.shape) for name, mask in masks.items()},
+        )
+
+    def detect_chunked(
+        self,
+        source: Any,
+        chunk_size: int = 1 << 16,
+        out: Optional[np.ndarray] = None,
+    ) -> AnomalyReport:
+        """Screen an array that need not fit in memory, ``chunk_size`` samples at a time.
+
+        ``source`` is anything with ``shape`` and ``[..., start:stop]`` slicing.
+        Global statistics take one extra pass (two with ``mad``); the median
+        and MAD are sketch estimates within ``sketch_accuracy``. The returned
+        report holds intervals, identical across chunk boundaries to a single
+        :meth:`detect` call apart from the MAD estimate. When ``out`` (a
+        boolean array of ``source``'s shape, e.g. a writable memmap) is given,
+        the combined mask is written into it.
+        """
+        shape = tuple(source.shape)
+        self._check_shape(shape)
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        length = shape[-1]
+        series = int(np.prod(shape[:-1]))
+        bounds = (self._bound(self.upper, shape), self._bound(self.lower, shape))
+
+        def chunks():
+            for start in range(0, length, chunk_size):
+                block = np.asarray(source[..., start : start + chunk_size], dtype=np.float64)
+                yield start, block.reshape(series, -1)
+
+        stats: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        with np.errstate(invalid="ignore", divide="ignore"), _quiet_nan_warnings():
+            if "zscore" in self.rules or "mad" in self.rules:
+                count = np.zeros(series)
+                mean = np.zeros(series)
+                m2 = np.zeros(series)
+                sketches = (
+                    [QuantileSketch(self.sketch_accuracy) for _ in range(series)]
+                    if "mad" in self.rules
+                    else []
+                )
+                for _start, rows in chunks():
+                    batch_count = np.count_nonzero(~np.isnan(rows), axis=1).astype(np.float64)
+                    batch_mean = np.where(batch_count > 0, np.nanmean(rows, axis=1), 0.0)
+                    batch_m2 = np.nansum((rows - batch_mean[:, None]) ** 2, axis=1)
+                    total = count + batch_count
+                    safe_total = np.where(total > 0, total, 1.0)
+                    delta = batch_mean - mean
+                    mean = mean + delta * batch_count / safe_total
+                    m2 = m2 + batch_m2 + delta * delta * count * batch_count / safe_total
+                    count = total
+                    for sketch, row in zip(sketches, rows):
+                        sketch.add_array(row)
+                if "zscore" in self.rules:
+                    std = np.sqrt(m2 / np.where(count > 0, count, 1.0))
+                    stats["zscore"] = (mean, np.where(std > 0, std, 1.0))
+                if "mad" in self.rules:
+                    median = np.array(
+                        [sketch.quantile(0.5) if sketch.count else 0.0 for sketch in sketches]
+                    )
+                    spread_sketches = [QuantileSketch(self.sketch_accuracy) for _ in range(series)]
+                    spread_sum = np.zeros(series)
+                    for _start, rows in chunks():
+                        spread = np.abs(rows - median[:, None])
+                        spread_sum += np.nansum(spread, axis=1)
+                        for sketch, row in zip(spread_sketches, spread):
+                            sketch.add_array(row)
+                    mad = np.array(
+                        [sketch.quantile(0.5) if sketch.count else 0.0 for sketch in spread_sketches]
+                    )
+                    mean_ad = spread_sum / np.where(count > 0, count, 1.0)
+                    stats["mad"] = (median, self._robust_scale(mad, mean_ad))
+
+            state: Optional[_EwmaState] = None
+            pieces: Dict[str, List[np.ndarray]] = {name: [] for name in self.rules + ["any"]}
+            for start, rows in chunks():
+                if "ewma" in self.rules and state is None:
+                    state = self._ewma_init(rows)
+                masks = self._masks(rows, stats, state, _missing(rows), bounds)
+                combined = np.logical_or.reduce(list(masks.values()))
+                masks["any"] = combined
+                for name, mask in masks.items():
+                    runs = mask_to_intervals(mask.reshape(shape[:-1] + (mask.shape[-1],)))
+                    runs[:, -2:] += start
+                    pieces[name].append(runs)
+                if out is not None:
+                    out[..., start : start + rows.shape[1]] = combined.reshape(
+                        shape[:-1] + (rows.shape[1],)
+                    )
+        width = len(shape) + 1
+        return AnomalyReport(
+            shape=shape,
+            _intervals={name: _merge_intervals(runs, width) for name, runs in pieces.items()},
+        )
+
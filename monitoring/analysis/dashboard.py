@@ -0,0 +1,320 @@
+"""
+Incremental data layer behind the NPU metrics dashboard.
+
+The first dashboard loaded every payload into memory up front and redrew the
+full series on every interaction, which stops being usable long before a
+capture reaches millions of samples. :class:`DashboardData` instead keeps the
+samples in a :class:`TelemetryStore` (memory-mapped, chunked by time), lets a
+:class:`PayloadTailer` append only what was written since the last refresh,
+and answers each view with at most a few points per pixel, downsampled chunk
+by chunk and cached per metric, time range and width.
+"""
+import glob
+import json
+import math
+import tempfile
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from monitoring.analysis.downsample import DOWNSAMPLE_METHODS, lttb_indices, minmax_indices
+from monitoring.data_collection.batch_sink import BATCH_SUFFIX, tail_batched_payloads
+from monitoring.storage.telemetry_store import TelemetryStore, append_payloads, to_epoch_seconds
+
+__all__ = ["RANGE_PRESETS", "PayloadTailer", "RefreshResult", "DashboardData"]
+
+# Relative time ranges offered by the dashboard, in seconds before the newest sample.
+RANGE_PRESETS: Dict[str, Optional[float]] = {
+    "all": None,
+    "last 15 min": 15 * 60.0,
+    "last hour": 3600.0,
+    "last 24 h": 86400.0,
+    "last 7 days": 7 * 86400.0,
+}
+
+# Min/max candidates gathered per output point before the final LTTB pass.
+_CANDIDATES_PER_POINT = 4
+_GLOB_CHARS = frozenset("*?[")
+
+
+def _payload_kind(path: Path) -> Optional[str]:
+    if path.suffix == BATCH_SUFFIX:
+        return "batch"
+    if path.suffix == ".jsonl" or (path.suffix[1:].isdigit() and path.stem.endswith(".jsonl")):
+        return "log"
+    if path.suffix == ".json":
+        return "json"
+    return None
+
+
+class PayloadTailer:
+    """Follow payload files and return only what was appended since the last poll.
+
+    ``sources`` are files, directories (every payload file directly inside)
+    or glob patterns, re-expanded on each :meth:`poll` so new files are picked
+    up. Sampler logs (``.jsonl`` and their ``RollingLog`` rotations) and
+    ``.npb`` batch files are read from the last complete line or frame;
+    one-sample ``.json`` files are read when they first appear (or change
+    size). Read positions are keyed by inode, so a log rotated to
+    ``npu.jsonl.1`` continues where it left off instead of being re-read.
+    """
+
+    def __init__(self, sources: Iterable[Union[Path, str]] = ()) -> None:
+        self.sources: List[Union[Path, str]] = []
+        for source in sources:
+            self.add_source(source)
+        self._offsets: Dict[Tuple[int, int], int] = {}
+
+    def add_source(self, source: Union[Path, str]) -> None:
+        text = str(source)
+        self.sources.append(text if _GLOB_CHARS.intersection(text) else Path(text))
+
+    def _candidates(self) -> List[Path]:
+        found: Dict[str, Path] = {}
+        for source in self.sources:
+            if isinstance(source, str):
+                paths = [Path(match) for match in glob.glob(source, recursive=True)]
+            elif source.is_dir():
+                paths = list(source.iterdir())
+            else:
+                paths = [source]
+                if source.suffix == ".jsonl":
+                    paths.extend(source.parent.glob(f"{source.name}.*"))
+            for path in paths:
+                if _payload_kind(path) is not None:
+                    found[str(path)] = path
+        candidates = []
+        for path in found.values():
+            try:
+                candidates.append((path.stat().st_mtime, str(path), path))
+            except OSError:
+                continue
+        # Oldest first: rotated log segments and per-sample files then arrive
+        # roughly in time order, which is the order the store accepts.
+        return [path for _mtime, _name, path in sorted(candidates)]
+
+    def _read_log(self, path: Path, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+        payloads: List[Dict[str, Any]] = []
+        with path.open("rb") as handle:
+            handle.seek(offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    payloads.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return payloads, offset
+
+    def poll(self) -> Iterator[List[Dict[str, Any]]]:
+        """Yield the new payloads of each changed file, oldest file first.
+
+        Files are ordered by mtime, not by the timestamps inside them; callers
+        feeding an append-only store should merge a whole poll before importing.
+        """
+        for path in self._candidates():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            key = (stat.st_dev, stat.st_ino)
+            offset = self._offsets.get(key, 0)
+            if stat.st_size == offset:
+                continue
+            if stat.st_size < offset:
+                offset = 0  # truncated, or a new file reusing the inode
+            kind = _payload_kind(path)
+            try:
+                if kind == "batch":
+                    payloads, offset = tail_batched_payloads(path, offset)
+                elif kind == "log":
+                    payloads, offset = self._read_log(path, offset)
+                else:
+                    payloads = [json.loads(path.read_text())]
+                    offset = stat.st_size
+            except (OSError, ValueError):
+                # Partially written JSON documents are retried on the next poll.
+                continue
+            self._offsets[key] = offset
+            if payloads:
+                yield payloads
+
+
+@dataclass
+class RefreshResult:
+    """Samples one :meth:`DashboardData.refresh` appended, and those it had to drop.
+
+    ``late`` samples were older than the store's newest one (a file that
+    arrived late, a lagging source) and cannot be inserted into it.
+    """
+
+    imported: int = 0
+    late: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class DashboardData:
+    """Telemetry store fed by a :class:`PayloadTailer`, with cached downsampled views.
+
+    ``store`` is a :class:`TelemetryStore` or its directory; by default a
+    temporary store is created and removed with this object. Samples are
+    append-only and never older than what the store already holds, so a view
+    whose range resolves to the same bounds only changes if it ends at the
+    newest timestamp; those cached entries are dropped when samples arrive.
+    """
+
+    def __init__(
+        self,
+        sources: Iterable[Union[Path, str]] = (),
+        store: Optional[Union[TelemetryStore, Path, str]] = None,
+        method: str = "lttb",
+        cache_size: int = 64,
+    ) -> None:
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"method must be one of {DOWNSAMPLE_METHODS}")
+        self._tmpdir: Optional[tempfile.TemporaryDirectory] = None
+        if store is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="npu_dashboard_")
+            store = TelemetryStore(self._tmpdir.name)
+        elif not isinstance(store, TelemetryStore):
+            store = TelemetryStore(store)
+        self.store = store
+        self.tailer = PayloadTailer(sources)
+        self.method = method
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, float, float, int], Tuple[np.ndarray, np.ndarray]]" = (
+            OrderedDict()
+        )
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.late_samples = 0
+
+    def refresh(self) -> RefreshResult:
+        """Import what the sources gained since the last call."""
+        # The store only accepts samples no older than its last timestamp, so
+        # the payloads of all changed files are merged (append_payloads sorts
+        # them by timestamp) instead of being imported file by file in mtime
+        # order. What still arrives too late is counted, not silently lost.
+        payloads = [payload for batch in self.tailer.poll() for payload in batch]
+        if not payloads:
+            return RefreshResult()
+        before = self.store.time_range()
+        result = RefreshResult(*append_payloads(payloads, self.store, flush=False))
+        self.late_samples += result.late
+        if result.imported and before is not None:
+            # Samples tied with the old newest timestamp extend views ending there.
+            for key in [key for key in self._cache if key[2] >= before[1]]:
+                del self._cache[key]
+        return result
+
+    def close(self) -> None:
+        self.store.close()
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+    def __enter__(self) -> "DashboardData":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def metrics(self) -> List[str]:
+        return sorted(self.store.metrics)
+
+    def resolve_range(
+        self,
+        start: Optional[Any] = None,
+        end: Optional[Any] = None,
+        last_seconds: Optional[float] = None,
+    ) -> Optional[Tuple[float, float]]:
+        """Clamp a requested range to the data; ``None`` when nothing overlaps.
+
+        ``start``/``end`` are epoch seconds or ISO-8601 strings (blank means
+        unbounded). ``last_seconds`` selects a window ending at the newest
+        sample and applies when ``start`` is not given.
+        """
+        available = self.store.time_range()
+        if available is None:
+            return None
+        first, last = available
+        upper = last if end in (None, "") else min(last, to_epoch_seconds(end))
+        if start not in (None, ""):
+            lower = max(first, to_epoch_seconds(start))
+        elif last_seconds is not None:
+            lower = max(first, upper - last_seconds)
+        else:
+            lower = first
+        if lower > upper:
+            return None
+        return lower, upper
+
+    def series(
+        self,
+        metric: str,
+        start: Optional[Any] = None,
+        end: Optional[Any] = None,
+        width: int = 1200,
+        last_seconds: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Epoch-second timestamps and values of ``metric``, reduced to about ``width`` points.
+
+        Chunks are read from the memory-mapped store one at a time and reduced
+        to their per-bucket minima and maxima against buckets spanning the
+        whole range, so memory stays proportional to ``width``. With the
+        ``lttb`` method the candidates are then thinned to ``width`` points.
+        """
+        if width < 3:
+            raise ValueError("width must be at least 3")
+        bounds = self.resolve_range(start, end, last_seconds)
+        if bounds is None:
+            return np.empty(0), np.empty(0)
+        key = (metric, bounds[0], bounds[1], width)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return cached
+        self.cache_misses += 1
+
+        per_point = _CANDIDATES_PER_POINT if self.method == "lttb" else 2
+        buckets = max(1, width * per_point // 2)
+        xs: List[np.ndarray] = []
+        ys: List[np.ndarray] = []
+        for timestamps, columns in self.store.iter_range([metric], bounds[0], bounds[1]):
+            values = columns[metric]
+            keep = minmax_indices(timestamps, values, buckets, bounds=bounds)
+            xs.append(np.asarray(timestamps[keep], dtype=np.float64))
+            ys.append(np.asarray(values[keep], dtype=np.float64))
+        x = np.concatenate(xs) if xs else np.empty(0)
+        y = np.concatenate(ys) if ys else np.empty(0)
+        if self.method == "lttb" and x.size > width:
+            keep = lttb_indices(x, y, width)
+            x, y = x[keep], y[keep]
+
+        self._cache[key] = (x, y)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return x, y
+
+    def describe(self) -> str:
+        """One-line summary (sample count and time span) for status displays."""
+        available = self.store.time_range()
+        if available is None:
+            return "no samples yet"
+        first, last = (
+            np.datetime64(int(math.floor(value)), "s").astype(str) for value in available
+        )
+        summary = f"{len(self.store):,} samples, {first} to {last} UTC"
+        if self.late_samples:
+            summary += f" ({self.late_samples:,} late samples dropped)"
+        return summary
@@ -0,0 +1,156 @@
+"""Shape-preserving downsampling of long metric series for plotting.
+
+A line chart cannot show more than one point per horizontal pixel, so drawing
+millions of samples only costs time. Averaging buckets would hide exactly the
+spikes operators look for; the reducers here keep real samples instead:
+
+* ``minmax`` keeps the smallest and largest sample of each time bucket (plus
+  the series' first and last point), so every excursion survives.
+* ``lttb`` (Largest-Triangle-Three-Buckets, Steinarsson 2013) keeps one
+  sample per bucket, picking the one forming the largest triangle with its
+  neighbours. Long inputs are first reduced with ``minmax`` to a few points
+  per output bucket (MinMaxLTTB, Van Der Donckt et al. 2023), which keeps the
+  sequential part of the algorithm proportional to the output size.
+
+Inputs must be sorted by ``x``. Points whose ``x`` or ``y`` is NaN are
+ignored.
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+__all__ = ["DOWNSAMPLE_METHODS", "minmax_indices", "lttb_indices", "downsample"]
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+# Points per output bucket kept by the min/max pre-selection ahead of LTTB.
+_PRESELECT_RATIO = 4
+
+
+def _finite_positions(x: np.ndarray, y: np.ndarray) -> Optional[np.ndarray]:
+    finite = np.isfinite(y) & np.isfinite(x)
+    if finite.all():
+        return None
+    return np.flatnonzero(finite)
+
+
+def _segment_extreme(y: np.ndarray, starts: np.ndarray, reduce: np.ufunc) -> np.ndarray:
+    """Index of the first minimum (``np.minimum``) or maximum of each segment."""
+    extreme = reduce.reduceat(y, starts)
+    lengths = np.diff(np.append(starts, y.size))
+    hits = np.flatnonzero(y == np.repeat(extreme, lengths))
+    segment = np.searchsorted(starts, hits, side="right") - 1
+    return hits[np.flatnonzero(np.diff(segment, prepend=-1))]
+
+
+def minmax_indices(
+    x: np.ndarray,
+    y: np.ndarray,
+    n_buckets: int,
+    bounds: Optional[Tuple[float, float]] = None,
+) -> np.ndarray:
+    """Sorted indices of the min and max sample in each of ``n_buckets`` time buckets.
+
+    Buckets split ``bounds`` (default ``(x[0], x[-1])``) into equal spans, so
+    irregular sampling does not skew them; empty buckets contribute nothing.
+    The first and last finite samples are always included. Passing the same
+    ``bounds`` for consecutive slices of one series selects the same buckets
+    as a single call over the whole series would.
+    """
+    if n_buckets <= 0:
+        raise ValueError("n_buckets must be positive")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.shape != y.shape or x.ndim != 1:
+        raise ValueError("x and y must be 1-D arrays of the same length")
+    positions = _finite_positions(x, y)
+    if positions is not None:
+        return positions[minmax_indices(x[positions], y[positions], n_buckets, bounds)]
+    if x.size <= 2 * n_buckets:
+        return np.arange(x.size)
+    lo, hi = bounds if bounds is not None else (x[0], x[-1])
+    edges = np.linspace(lo, hi, n_buckets + 1)[1:-1]
+    starts = np.unique(np.concatenate(([0], np.searchsorted(x, edges, side="left"))))
+    starts = starts[starts < x.size]
+    selected = np.concatenate(
+        (
+            [0, x.size - 1],
+            _segment_extreme(y, starts, np.minimum),
+            _segment_extreme(y, starts, np.maximum),
+        )
+    )
+    return np.unique(selected)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Sorted indices of the ``n_out`` samples Largest-Triangle-Three-Buckets keeps.
+
+    Buckets hold equal numbers of samples; the first and last samples are
+    always kept. This is the plain algorithm: its loop runs once per output
+    point and touches every input sample, so use :func:`downsample` for
+    series much longer than ``n_out``.
+    """
+    if n_out < 3:
+        raise ValueError("n_out must be at least 3")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.shape != y.shape or x.ndim != 1:
+        raise ValueError("x and y must be 1-D arrays of the same length")
+    positions = _finite_positions(x, y)
+    if positions is not None:
+        return positions[lttb_indices(x[positions], y[positions], n_out)]
+    size = x.size
+    if size <= n_out:
+        return np.arange(size)
+    # Work relative to the first sample: epoch-second x values are ~1e9 and
+    # would swamp the triangle areas otherwise.
+    x = x - x[0]
+    edges = np.linspace(1, size - 1, n_out - 1).astype(np.int64)
+    x_means = np.add.reduceat(x[: size - 1], edges[:-1]) / np.diff(edges)
+    y_means = np.add.reduceat(y[: size - 1], edges[:-1]) / np.diff(edges)
+    # The last bucket's "next bucket" is the final sample alone.
+    x_means = np.append(x_means[1:], x[-1])
+    y_means = np.append(y_means[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = size - 1
+    anchor = 0
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        ax, ay = x[anchor], y[anchor]
+        areas = np.abs(
+            (ax - x_means[bucket]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (y_means[bucket] - ay)
+        )
+        anchor = lo + int(np.argmax(areas))
+        selected[bucket + 1] = anchor
+    return selected
+
+
+def downsample(
+    x: np.ndarray, y: np.ndarray, n_out: int, method: str = "lttb"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Reduce ``(x, y)`` to at most about ``n_out`` representative samples.
+
+    ``method="lttb"`` returns at most ``n_out`` points; ``"minmax"`` uses
+    ``n_out // 2`` buckets and returns at most ``n_out + 2``. Series that are
+    already short enough are returned with NaN samples dropped.
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"method must be one of {DOWNSAMPLE_METHODS}")
+    if n_out < 3:
+        raise ValueError("n_out must be at least 3")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if method == "minmax":
+        indices = minmax_indices(x, y, max(1, n_out // 2))
+    else:
+        positions = _finite_positions(x, y)
+        if positions is not None:
+            x, y = x[positions], y[positions]
+        if x.size > n_out * _PRESELECT_RATIO:
+            candidates = minmax_indices(x, y, n_out * _PRESELECT_RATIO // 2)
+            indices = candidates[lttb_indices(x[candidates], y[candidates], n_out)]
+        else:
+            indices = lttb_indices(x, y, n_out)
+    return x[indices], y[indices]
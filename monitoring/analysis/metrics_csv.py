@@ -0,0 +1,346 @@
+"""Streaming CSV export and chunked import of health metrics.
+
+``export_metrics_csv`` needs every series in memory as a mapping, builds one
+dict per row and rewrites the file on every call. :class:`MetricsCsvWriter`
+keeps the file open, accepts :class:`~monitoring.analysis.timeseries.TimeSeriesFrame`
+chunks (or columnar mappings) as they are produced and hands each chunk to
+a single bulk write, so exporting any number of rows needs
+memory for one chunk only. Files may be appended to and are gzip-compressed
+when the destination ends in ``.gz``. :func:`iter_metrics_csv` reads files
+shaped like ``data/collected_data/health_metrics_sample.csv`` back as frames,
+one chunk at a time.
+
+Timestamps are written as ISO-8601 UTC strings (``timestamp_format="iso"``),
+epoch seconds (``"epoch"``) or running row numbers (``"index"``, the
+``export_metrics_csv`` layout). ``"auto"`` keeps the frame's original labels
+when it has them and falls back to ISO-8601.
+"""
+import csv
+import gzip
+from itertools import islice, zip_longest
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from monitoring.analysis.timeseries import TimeSeriesFrame
+from monitoring.storage.telemetry_store import to_epoch_seconds
+
+__all__ = [
+    "TIMESTAMP_FORMATS",
+    "MetricsCsvWriter",
+    "export_metrics_stream",
+    "frames_from_payloads",
+    "iter_metrics_csv",
+]
+
+TIMESTAMP_FORMATS = ("auto", "iso", "epoch", "index")
+_GZIP_MAGIC = b"\x1f\x8b"
+_DEFAULT_CHUNK_ROWS = 1 << 16
+_LINE_TERMINATOR = "\r\n"
+_SPECIAL_CHARS = (",", '"', "\r", "\n")
+
+
+def _is_gzip(path: Path) -> bool:
+    with path.open("rb") as handle:
+        return handle.read(2) == _GZIP_MAGIC
+
+
+def _open_text(path: Path, mode: str, compress: bool, compresslevel: int = 6) -> IO[str]:
+    if compress:
+        return gzip.open(  # type: ignore[return-value]
+            path, mode + "t", compresslevel=compresslevel, encoding="utf-8", newline=""
+        )
+    return path.open(mode, encoding="utf-8", newline="")
+
+
+def _existing_header(path: Path) -> Optional[List[str]]:
+    if not path.exists() or path.stat().st_size == 0:
+        return None
+    with _open_text(path, "r", _is_gzip(path)) as handle:
+        return next(csv.reader(handle), None)
+
+
+def _count_data_rows(path: Path) -> int:
+    with _open_text(path, "r", _is_gzip(path)) as handle:
+        return max(0, sum(1 for _ in csv.reader(handle)) - 1)
+
+
+def _format_iso_timestamps(timestamps: np.ndarray) -> List[str]:
+    """Epoch seconds to ISO-8601 UTC strings, at the coarsest exact precision."""
+    micros = np.round(np.asarray(timestamps, dtype=np.float64) * 1e6).astype(np.int64)
+    if not np.any(micros % 1_000_000):
+        unit = "s"
+    elif not np.any(micros % 1_000):
+        unit = "ms"
+    else:
+        unit = "us"
+    return np.datetime_as_string(micros.astype("datetime64[us]"), unit=unit, timezone="UTC").tolist()
+
+
+def _column_cells(values: np.ndarray) -> List[str]:
+    """Format a float column the way ``csv.writer`` would; NaN gaps become empty cells."""
+    cells = list(map(float.__repr__, values.tolist()))
+    if np.isnan(values).any():
+        return [cell if cell != "nan" else "" for cell in cells]
+    return cells
+
+
+def _needs_quoting(cells: Sequence[str]) -> bool:
+    joined = "".join(cells)
+    return any(char in joined for char in _SPECIAL_CHARS)
+
+
+class MetricsCsvWriter:
+    """Append metric chunks to a CSV (optionally gzip) file in bulk.
+
+    The column set is fixed by ``columns``, by the header of the file being
+    appended to, or by the first chunk written. Later chunks may omit columns
+    (their cells stay empty) but may not introduce new ones.
+    """
+
+    def __init__(
+        self,
+        destination: Union[Path, str],
+        columns: Optional[Sequence[str]] = None,
+        append: bool = False,
+        compress: Optional[bool] = None,
+        compresslevel: int = 6,
+        timestamp_format: str = "auto",
+    ) -> None:
+        if timestamp_format not in TIMESTAMP_FORMATS:
+            raise ValueError(f"timestamp_format must be one of {TIMESTAMP_FORMATS}")
+        self.path = Path(destination)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compress = self.path.suffix == ".gz" if compress is None else compress
+        self.timestamp_format = timestamp_format
+        self.rows_written = 0
+        self._next_index = 0
+        header = _existing_header(self.path) if append else None
+        if header is not None:
+            if not header or header[0] != "timestamp":
+                raise ValueError(f"{self.path} does not start with a timestamp column")
+            if columns is not None and list(columns) != header[1:]:
+                raise ValueError(f"columns {list(columns)} do not match {self.path}: {header[1:]}")
+            if self.compress != _is_gzip(self.path):
+                raise ValueError(f"compression setting does not match existing {self.path}")
+            columns = header[1:]
+            if timestamp_format == "index":
+                self._next_index = _count_data_rows(self.path)
+        self.columns: Optional[List[str]] = list(columns) if columns is not None else None
+        self._handle: Optional[IO[str]] = _open_text(
+            self.path, "a" if append else "w", self.compress, compresslevel
+        )
+        self._writer = csv.writer(self._handle)
+        self._header_written = header is not None
+        if self.columns is not None:
+            self._write_header()
+
+    def _write_header(self) -> None:
+        if not self._header_written:
+            assert self.columns is not None
+            self._writer.writerow(["timestamp"] + self.columns)
+            self._header_written = True
+
+    def _resolve_columns(self, names: Sequence[str]) -> None:
+        if self._handle is None:
+            raise ValueError("write to closed MetricsCsvWriter")
+        if self.columns is None:
+            self.columns = list(names)
+            self._write_header()
+            return
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise ValueError(
+                f"chunk has columns {unknown} not in the CSV header; pass columns= up front"
+            )
+
+    def _index_timestamps(self, count: int) -> List[int]:
+        start = self._next_index
+        self._next_index += count
+        return list(range(start, start + count))
+
+    def _timestamps(
+        self, count: int, epochs: Optional[np.ndarray], labels: Optional[Sequence[Any]]
+    ) -> List[Any]:
+        fmt = self.timestamp_format
+        if fmt == "index" or (epochs is None and labels is None):
+            return self._index_timestamps(count)
+        self._next_index += count
+        if labels is not None and (fmt == "auto" or epochs is None):
+            return list(labels)
+        assert epochs is not None
+        if fmt == "epoch":
+            return epochs.tolist()
+        return _format_iso_timestamps(epochs)
+
+    def write_frame(self, frame: Any) -> int:
+        """Write a ``TimeSeriesFrame``-like chunk (``timestamps``, ``values``, ``columns``)."""
+        self._resolve_columns(frame.columns)
+        assert self.columns is not None
+        count = len(frame.timestamps)
+        positions = {name: idx for idx, name in enumerate(frame.columns)}
+        stamps = self._timestamps(
+            count, np.asarray(frame.timestamps), getattr(frame, "labels", None)
+        )
+        stamp_cells = list(map(str, stamps))
+        empty = [""] * count
+        columns = [stamp_cells]
+        for name in self.columns:
+            idx = positions.get(name)
+            columns.append(empty if idx is None else _column_cells(frame.values[:, idx]))
+        if _needs_quoting(stamp_cells):
+            # Labels with separators or quotes: let the csv module quote them.
+            self._writer.writerows(zip(*columns))
+        else:
+            # The chunk is formatted column by column and written in one call.
+            assert self._handle is not None
+            self._handle.write(_LINE_TERMINATOR.join(map(",".join, zip(*columns))))
+            self._handle.write(_LINE_TERMINATOR)
+        self.rows_written += count
+        return count
+
+    def write_columns(
+        self,
+        columns: Mapping[str, Sequence[Any]],
+        timestamps: Optional[Sequence[Any]] = None,
+    ) -> int:
+        """Write a columnar mapping; shorter series leave trailing cells empty.
+
+        Values are written as given (ints stay ints). Without ``timestamps``
+        rows are numbered, continuing across calls.
+        """
+        self._resolve_columns(list(columns))
+        assert self.columns is not None
+        count = max((len(series) for series in columns.values()), default=0)
+        if timestamps is not None:
+            count = max(count, len(timestamps))
+        if self.timestamp_format == "index" or timestamps is None:
+            stamps: List[Any] = self._index_timestamps(count)
+        elif self.timestamp_format in ("iso", "epoch"):
+            epochs = np.asarray([to_epoch_seconds(value) for value in timestamps])
+            stamps = self._timestamps(count, epochs, None)
+        else:
+            self._next_index += count
+            stamps = list(timestamps)
+        series = [columns.get(name, ()) for name in self.columns]
+        rows = zip_longest(stamps, *series)
+        self._writer.writerows(rows)
+        self.rows_written += count
+        return count
+
+    def write(self, chunk: Any) -> int:
+        """Write a frame-like chunk or a columnar mapping (``"timestamp"`` key optional)."""
+        if hasattr(chunk, "values") and hasattr(chunk, "columns"):
+            return self.write_frame(chunk)
+        if isinstance(chunk, Mapping):
+            columns = {name: series for name, series in chunk.items() if name != "timestamp"}
+            return self.write_columns(columns, chunk.get("timestamp"))
+        raise TypeError(f"cannot write chunk of type {type(chunk).__name__}")
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def __enter__(self) -> "MetricsCsvWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def export_metrics_stream(
+    chunks: Iterable[Any],
+    destination: Union[Path, str],
+    columns: Optional[Sequence[str]] = None,
+    append: bool = False,
+    compress: Optional[bool] = None,
+    timestamp_format: str = "auto",
+) -> Path:
+    """Write an iterable of frames or columnar mappings to one CSV file.
+
+    Only one chunk is held at a time; pair with :func:`frames_from_payloads`
+    or :meth:`TelemetryStore.iter_range`-backed frames for long exports.
+    """
+    with MetricsCsvWriter(
+        destination,
+        columns=columns,
+        append=append,
+        compress=compress,
+        timestamp_format=timestamp_format,
+    ) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    return writer.path
+
+
+def frames_from_payloads(
+    payloads: Iterable[Mapping[str, Any]], chunk_rows: int = _DEFAULT_CHUNK_ROWS
+) -> Iterator[TimeSeriesFrame]:
+    """Group collector payloads into frames of at most ``chunk_rows`` samples."""
+    if chunk_rows <= 0:
+        raise ValueError("chunk_rows must be positive")
+    iterator = iter(payloads)
+    while True:
+        chunk = list(islice(iterator, chunk_rows))
+        if not chunk:
+            return
+        yield TimeSeriesFrame.from_iterator(chunk)
+
+
+def _parse_floats(cells: Sequence[str]) -> np.ndarray:
+    try:
+        return np.array(cells, dtype=np.float64)
+    except ValueError:
+        return np.array([cell if cell else "nan" for cell in cells], dtype=np.float64)
+
+
+def _parse_timestamps(cells: Sequence[str]) -> np.ndarray:
+    try:
+        return np.array(cells, dtype=np.float64)
+    except ValueError:
+        pass
+    try:
+        naive = [cell[:-1] if cell.endswith("Z") else cell for cell in cells]
+        return np.array(naive, dtype="datetime64[us]").astype(np.int64) / 1e6
+    except ValueError:
+        return np.array([to_epoch_seconds(cell) for cell in cells], dtype=np.float64)
+
+
+def iter_metrics_csv(
+    path: Union[Path, str],
+    chunk_rows: int = _DEFAULT_CHUNK_ROWS,
+    columns: Optional[Sequence[str]] = None,
+) -> Iterator[TimeSeriesFrame]:
+    """Yield a metrics CSV (plain or gzip) as frames of up to ``chunk_rows`` rows.
+
+    Empty cells become NaN. Frame timestamps are epoch seconds (or the raw
+    numbers of index-stamped files) and ``labels`` keep the original strings.
+    ``columns`` restricts which metrics are parsed.
+    """
+    if chunk_rows <= 0:
+        raise ValueError("chunk_rows must be positive")
+    path = Path(path)
+    with _open_text(path, "r", _is_gzip(path)) as handle:
+        reader = csv.reader(handle)
+        header = next(reader, None)
+        if not header:
+            return
+        names = header[1:] if columns is None else list(columns)
+        missing = [name for name in names if name not in header[1:]]
+        if missing:
+            raise KeyError(f"{path} has no columns {missing}")
+        positions = [header.index(name) for name in names]
+        while True:
+            rows = list(islice(reader, chunk_rows))
+            if not rows:
+                return
+            width = len(header)
+            rows = [row if len(row) == width else (row + [""] * width)[:width] for row in rows]
+            cells = list(zip(*rows))
+            labels = list(cells[0])
+            values = np.empty((len(rows), len(names)))
+            for out_idx, position in enumerate(positions):
+                values[:, out_idx] = _parse_floats(cells[position])
+            yield TimeSeriesFrame(_parse_timestamps(labels), values, names, labels)
@@ -0,0 +1,337 @@
+"""
+Headless batch rendering of per-device metric plots.
+
+Calling :func:`plot_metric_timeseries` once per metric costs a new pyplot
+figure, a full-resolution line and a ``tight_layout`` pass each time, all in
+one process. :func:`render_metric_report` instead copies the frame once, in
+timestamp order, into a :mod:`multiprocessing.shared_memory` block (one
+contiguous row per metric; on Python 3.7 each worker gets a pickled copy),
+lets a pool of pyplot-free workers attach to it by name, and has each worker
+draw every plot it is given on a single reused figure. Plots are grouped by
+device (``npu{id}_chip{chip}`` prefixes, see ``flatten_device_metrics``) on an
+``index.html`` page, and a timing breakdown shows whether loading, copying,
+downsampling (``prepare``), updating artists (``draw``) or rasterizing and
+encoding (``save``) dominated.
+
+Run ``python -m monitoring.analysis.report PAYLOADS... --output DIR`` to load
+payload files (or ``--store DIR``) and render them in one go.
+"""
+import argparse
+import html
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: no cover - Python 3.7; workers get pickled copies
+    shared_memory = None  # type: ignore[assignment]
+
+from monitoring.analysis.dashboard import PayloadTailer
+from monitoring.analysis.downsample import downsample
+from monitoring.analysis.timeseries import TimeSeriesFrame
+from monitoring.analysis.visualize import draw_metric_series
+from monitoring.data_collection.collect_npu import split_device_metric
+from monitoring.storage.telemetry_store import TelemetryStore
+
+__all__ = [
+    "REPORT_FORMATS",
+    "split_device_metric",
+    "ReportResult",
+    "render_metric_report",
+    "load_report_frame",
+]
+
+REPORT_FORMATS = ("png", "svg")
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_.-]+")
+_PHASES = ("prepare", "draw", "save")
+# Per-process rendering state, set up once by ``_init_worker``.
+_WORKER: Dict[str, Any] = {}
+
+
+@dataclass
+class ReportResult:
+    """Where a report was written and how long each stage took."""
+
+    output_dir: Path
+    index_path: Path
+    plots: Dict[str, Path] = field(default_factory=dict)
+    timing: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def bottleneck(self) -> str:
+        """The stage with the largest share of the time spent."""
+        stages = {
+            "load": self.timing.get("load_seconds", 0.0),
+            "share": self.timing.get("share_seconds", 0.0),
+            "index": self.timing.get("index_seconds", 0.0),
+        }
+        # Worker phases run concurrently; divide by the pool size to compare
+        # them with wall-clock stages.
+        workers = max(1.0, self.timing.get("workers", 1.0))
+        for phase in _PHASES:
+            stages[phase] = self.timing.get(f"{phase}_seconds", 0.0) / workers
+        return max(stages, key=stages.__getitem__)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "output_dir": str(self.output_dir),
+            "index": str(self.index_path),
+            "plots": len(self.plots),
+            "bottleneck": self.bottleneck,
+            "timing": dict(self.timing),
+        }
+
+
+def _is_positional(frame: TimeSeriesFrame) -> bool:
+    # ``TimeSeriesFrame.from_iterator`` falls back to sample positions (and
+    # keeps the raw labels) when timestamps do not parse.
+    return frame.labels is not None and bool(
+        np.array_equal(frame.timestamps, np.arange(len(frame), dtype=np.float64))
+    )
+
+
+def _init_worker(
+    shm_name: Optional[str],
+    shape: Tuple[int, int],
+    matrix: Optional[np.ndarray],
+    columns: Sequence[str],
+    labels: Optional[Sequence[str]],
+    fmt: str,
+    max_points: int,
+    figsize: Tuple[float, float],
+    dpi: int,
+) -> None:
+    # A bare Figure renders PNG/SVG through the Agg/SVG canvases directly,
+    # without pyplot or a GUI backend.
+    from matplotlib.figure import Figure
+
+    if shm_name is not None:
+        block = shared_memory.SharedMemory(name=shm_name)
+        _WORKER["shm"] = block
+        matrix = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    fig.subplots_adjust(left=0.1, right=0.98, bottom=0.2, top=0.95)
+    _WORKER.update(
+        matrix=matrix,
+        columns=list(columns),
+        labels=list(labels) if labels is not None else None,
+        fmt=fmt,
+        max_points=max_points,
+        fig=fig,
+        ax=fig.add_subplot(),
+        line=None,
+    )
+
+
+def _render_plots(tasks: Sequence[Tuple[int, str]]) -> List[Tuple[float, float, float]]:
+    """Draw metric row ``index`` of the shared matrix to ``path`` for each task."""
+    matrix = _WORKER["matrix"]
+    labels = _WORKER["labels"]
+    fig, ax = _WORKER["fig"], _WORKER["ax"]
+    timings: List[Tuple[float, float, float]] = []
+    for index, path in tasks:
+        started = time.perf_counter()
+        x, y = matrix[0], matrix[index + 1]
+        if x.size > _WORKER["max_points"]:
+            x, y = downsample(x, y, _WORKER["max_points"])
+        prepared = time.perf_counter()
+        _WORKER["line"] = draw_metric_series(
+            ax, x, y, _WORKER["columns"][index], labels=labels, line=_WORKER["line"]
+        )
+        drawn = time.perf_counter()
+        fig.savefig(path, format=_WORKER["fmt"])
+        timings.append((prepared - started, drawn - prepared, time.perf_counter() - drawn))
+    return timings
+
+
+def _write_index(
+    output_dir: Path, plots: Dict[str, Path], title: str, timing: Dict[str, float]
+) -> Path:
+    groups: Dict[str, List[Tuple[str, Path]]] = {}
+    for name, path in plots.items():
+        device, metric = split_device_metric(name)
+        groups.setdefault(device, []).append((metric, path))
+    parts = [
+        "<!DOCTYPE html>",
+        '<html><head><meta charset="utf-8">',
+        f"<title>{html.escape(title)}</title>",
+        "<style>body{font-family:sans-serif}figure{display:inline-block;margin:4px}"
+        "img{width:480px}</style>",
+        f"</head><body><h1>{html.escape(title)}</h1>",
+        f"<p>{len(plots)} plots, rendered in {timing.get('render_seconds', 0.0):.2f} s "
+        f"by {int(timing.get('workers', 1))} worker(s).</p>",
+    ]
+    for device in sorted(groups):
+        parts.append(f"<h2>{html.escape(device)}</h2>")
+        for metric, path in sorted(groups[device]):
+            src = html.escape(path.relative_to(output_dir).as_posix(), quote=True)
+            parts.append(
+                f'<figure><a href="{src}"><img src="{src}" loading="lazy" '
+                f'alt="{html.escape(metric, quote=True)}"></a>'
+                f"<figcaption>{html.escape(metric)}</figcaption></figure>"
+            )
+    parts.append("</body></html>")
+    index_path = output_dir / "index.html"
+    index_path.write_text("\n".join(parts) + "\n", encoding="utf-8")
+    return index_path
+
+
+def render_metric_report(
+    frame: TimeSeriesFrame,
+    output_dir: Union[Path, str],
+    metrics: Optional[Sequence[str]] = None,
+    fmt: str = "png",
+    workers: Optional[int] = None,
+    max_points: int = 2000,
+    figsize: Tuple[float, float] = (8.0, 4.0),
+    dpi: int = 100,
+    title: str = "NPU metrics report",
+    load_seconds: float = 0.0,
+) -> ReportResult:
+    """Render one plot per metric of ``frame`` into ``output_dir/<device>/`` plus ``index.html``.
+
+    ``workers`` defaults to the CPU count; ``0`` or ``1`` renders in this
+    process. Series longer than ``max_points`` are downsampled with LTTB.
+    ``load_seconds`` (the caller's time to build ``frame``) is only recorded
+    in the timing report, which is also written to ``timing.json``.
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"fmt must be one of {REPORT_FORMATS}")
+    names = list(metrics) if metrics is not None else list(frame.columns)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = (os.cpu_count() or 1) if workers is None else max(1, workers)
+    workers = min(workers, max(1, len(names)))
+    timing: Dict[str, float] = {"load_seconds": load_seconds, "workers": float(workers)}
+
+    plots: Dict[str, Path] = {}
+    tasks: List[Tuple[int, str]] = []
+    for index, name in enumerate(names):
+        device, metric = split_device_metric(name)
+        path = output_dir / _UNSAFE_CHARS.sub("_", device) / f"{_UNSAFE_CHARS.sub('_', metric)}.{fmt}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        plots[name] = path
+        tasks.append((index, str(path)))
+
+    labels = frame.labels if _is_positional(frame) else None
+    shape = (len(names) + 1, len(frame))
+    started = time.perf_counter()
+    block: Optional[Any] = None
+    if workers > 1 and shared_memory is not None:
+        block = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 8))
+        matrix = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+    else:
+        matrix = np.empty(shape)
+    # Row 0 holds the timestamps; each metric gets one contiguous row.
+    # Downsampling assumes sorted x, and payload files arrive in mtime order.
+    order: Any = slice(None)
+    if len(frame) > 1 and not bool(np.all(frame.timestamps[1:] >= frame.timestamps[:-1])):
+        order = np.argsort(frame.timestamps, kind="stable")
+        if labels is not None:
+            labels = [labels[row] for row in order.tolist()]
+    matrix[0] = frame.timestamps[order]
+    for index, name in enumerate(names):
+        matrix[index + 1] = frame.column(name)[order]
+    timing["share_seconds"] = time.perf_counter() - started
+
+    initargs = (
+        block.name if block is not None else None,
+        shape,
+        None if block is not None else matrix,
+        names,
+        labels,
+        fmt,
+        max_points,
+        figsize,
+        dpi,
+    )
+    started = time.perf_counter()
+    totals = dict.fromkeys(_PHASES, 0.0)
+    try:
+        if workers <= 1:
+            _init_worker(*initargs)
+            results = [_render_plots(tasks)]
+        else:
+            # Interleave tasks so every worker gets a similar mix of metrics.
+            batches = [tasks[offset::workers * 4] for offset in range(workers * 4)]
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=initargs
+            ) as pool:
+                results = list(pool.map(_render_plots, [batch for batch in batches if batch]))
+    finally:
+        _WORKER.clear()
+        if block is not None:
+            del matrix
+            block.close()
+            block.unlink()
+    for batch in results:
+        for phases in batch:
+            for phase, seconds in zip(_PHASES, phases):
+                totals[phase] += seconds
+    timing["render_seconds"] = time.perf_counter() - started
+    timing.update({f"{phase}_seconds": seconds for phase, seconds in totals.items()})
+
+    started = time.perf_counter()
+    index_path = _write_index(output_dir, plots, title, timing)
+    timing["index_seconds"] = time.perf_counter() - started
+    result = ReportResult(output_dir, index_path, plots, timing)
+    (output_dir / "timing.json").write_text(json.dumps(result.as_dict(), indent=2) + "\n")
+    return result
+
+
+def load_report_frame(
+    sources: Iterable[Union[Path, str]] = (),
+    store: Optional[Union[Path, str]] = None,
+    start: Optional[Any] = None,
+    end: Optional[Any] = None,
+) -> TimeSeriesFrame:
+    """Build the frame to report on from payload files/globs or a telemetry store."""
+    if store is not None:
+        return TimeSeriesFrame.from_store(TelemetryStore(store), start=start, end=end)
+    payloads = (payload for batch in PayloadTailer(sources).poll() for payload in batch)
+    frame = TimeSeriesFrame.from_iterator(payloads)
+    if start is not None or end is not None:
+        frame = frame.slice_time(start, end)
+    return frame
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Render every metric plot into an HTML report.")
+    parser.add_argument("sources", nargs="*", help="payload files, directories or glob patterns")
+    parser.add_argument("--store", default=None, help="read a TelemetryStore directory instead")
+    parser.add_argument("--output", default="data/reports/metrics", help="report directory")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="png")
+    parser.add_argument("--workers", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--max-points", type=int, default=2000)
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    args = parser.parse_args(argv)
+    if not args.sources and args.store is None:
+        parser.error("give payload sources or --store")
+
+    started = time.perf_counter()
+    frame = load_report_frame(args.sources, args.store, args.start, args.end)
+    load_seconds = time.perf_counter() - started
+    result = render_metric_report(
+        frame,
+        args.output,
+        fmt=args.format,
+        workers=args.workers,
+        max_points=args.max_points,
+        load_seconds=load_seconds,
+    )
+    print(json.dumps(result.as_dict(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,233 @@
+"""NumPy-backed, timestamp-aligned metric frames.
+
+``build_numeric_timeseries`` used to grow one Python list per metric and walk
+every known series for every payload, which is quadratic once hosts report a
+few hundred ``npu-smi`` fields. :class:`TimeSeriesFrame` stores the same data
+as a ``float64`` matrix (samples x metrics, NaN where a sample lacked a metric)
+plus a timestamp vector, built in a single pass over the payloads.
+"""
+import math
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from monitoring.storage.telemetry_store import TelemetryStore, to_epoch_seconds
+
+__all__ = ["numeric_metrics", "TimeSeriesFrame"]
+
+_RESAMPLE_METHODS = ("mean", "min", "max", "last")
+
+
+def numeric_metrics(metrics: Mapping[str, Any]) -> Dict[str, float]:
+    """Numeric fields of a payload's ``metrics`` block (``parsed`` when present)."""
+    parsed = metrics.get("parsed", metrics)
+    return {key: float(value) for key, value in parsed.items() if isinstance(value, (int, float))}
+
+
+class TimeSeriesFrame:
+    """Aligned metric matrix with a timestamp vector.
+
+    ``values[i, j]`` is metric ``columns[j]`` at ``timestamps[i]`` (epoch
+    seconds, or sample positions when the source had no parseable timestamps).
+    ``labels`` keeps the original timestamp strings for display and for the
+    legacy dict-of-lists shape. Row slicing, :meth:`slice_time` and selecting a
+    contiguous run of columns return views that share memory with the parent.
+    """
+
+    def __init__(
+        self,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        columns: Sequence[str],
+        labels: Optional[Sequence[str]] = None,
+    ) -> None:
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2 or values.shape != (timestamps.size, len(columns)):
+            raise ValueError("values must have shape (len(timestamps), len(columns))")
+        self.timestamps = timestamps
+        self.values = values
+        self.columns = list(columns)
+        self._column_index = {name: idx for idx, name in enumerate(self.columns)}
+        self.labels = list(labels) if labels is not None else None
+
+    # ---------------------------------------------------------------- builders
+    @classmethod
+    def from_iterator(cls, payloads: Iterable[Mapping[str, Any]]) -> "TimeSeriesFrame":
+        """Build a frame in one pass from collector payloads (any iterable).
+
+        Values are staged per sample and scattered into the matrix in blocks,
+        so the Python-level work is proportional to the values present rather
+        than to samples x known metrics.
+        """
+        values = np.full((256, 16), np.nan)
+        times: List[float] = []
+        labels: List[str] = []
+        column_index: Dict[str, int] = {}
+        positional = False
+        counts: List[int] = []
+        cols: List[int] = []
+        data: List[float] = []
+        scattered_rows = 0
+
+        def _scatter(matrix: np.ndarray, needed_rows: int) -> np.ndarray:
+            needed_cols = len(column_index)
+            if needed_rows > matrix.shape[0] or needed_cols > matrix.shape[1]:
+                shape = (
+                    max(needed_rows, matrix.shape[0] * 2)
+                    if needed_rows > matrix.shape[0]
+                    else matrix.shape[0],
+                    max(needed_cols, matrix.shape[1] * 2)
+                    if needed_cols > matrix.shape[1]
+                    else matrix.shape[1],
+                )
+                grown = np.full(shape, np.nan)
+                grown[: matrix.shape[0], : matrix.shape[1]] = matrix
+                matrix = grown
+            if data:
+                rows = np.repeat(np.arange(scattered_rows, needed_rows), counts)
+                matrix[rows, cols] = data
+            del counts[:], cols[:], data[:]
+            return matrix
+
+        lookup = column_index.get
+        last_keys: Optional[List[str]] = None
+        last_cols: List[int] = []
+        for row, payload in enumerate(payloads):
+            raw_timestamp = payload.get("timestamp", row)
+            labels.append(str(raw_timestamp))
+            if not positional:
+                try:
+                    times.append(to_epoch_seconds(raw_timestamp))
+                except (TypeError, ValueError):
+                    positional = True
+            numeric = numeric_metrics(payload.get("metrics", {}))
+            keys = list(numeric)
+            if keys != last_keys:
+                # Collectors emit the same fields in the same order almost
+                # every time, so column lookups are reused across samples.
+                last_cols = []
+                for name in keys:
+                    col = lookup(name)
+                    if col is None:
+                        col = column_index[name] = len(column_index)
+                    last_cols.append(col)
+                last_keys = keys
+            counts.append(len(keys))
+            cols.extend(last_cols)
+            data.extend(numeric.values())
+            if len(data) >= 1 << 16:
+                values = _scatter(values, row + 1)
+                scattered_rows = row + 1
+        count = len(labels)
+        values = _scatter(values, count)
+        timestamps = (
+            np.arange(count, dtype=np.float64) if positional else np.asarray(times, dtype=np.float64)
+        )
+        return cls(timestamps, values[:count, : len(column_index)], list(column_index), labels)
+
+    @classmethod
+    def from_payloads(cls, payloads: Sequence[Mapping[str, Any]]) -> "TimeSeriesFrame":
+        return cls.from_iterator(payloads)
+
+    @classmethod
+    def from_columns(
+        cls, timestamps: Sequence[float], columns: Mapping[str, Sequence[float]]
+    ) -> "TimeSeriesFrame":
+        """Build a frame from already-aligned column arrays."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        names = list(columns)
+        values = np.empty((timestamps.size, len(names)))
+        for idx, name in enumerate(names):
+            values[:, idx] = columns[name]
+        return cls(timestamps, values, names)
+
+    @classmethod
+    def from_store(
+        cls,
+        store: TelemetryStore,
+        metrics: Optional[Sequence[str]] = None,
+        start: Optional[Any] = None,
+        end: Optional[Any] = None,
+    ) -> "TimeSeriesFrame":
+        """Read a time range of a :class:`TelemetryStore` into a frame."""
+        names = list(metrics) if metrics is not None else store.metrics
+        timestamps, columns = store.read_many(names, start, end)
+        return cls.from_columns(timestamps, columns)
+
+    # --------------------------------------------------------------- accessors
+    def __len__(self) -> int:
+        return self.timestamps.size
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.values.shape
+
+    def column(self, name: str) -> np.ndarray:
+        """1-D view of one metric."""
+        return self.values[:, self._column_index[name]]
+
+    def __getitem__(self, rows: slice) -> "TimeSeriesFrame":
+        if not isinstance(rows, slice):
+            raise TypeError("TimeSeriesFrame only supports slice indexing; use column()")
+        labels = self.labels[rows] if self.labels is not None else None
+        return TimeSeriesFrame(self.timestamps[rows], self.values[rows], self.columns, labels)
+
+    def select(self, names: Sequence[str]) -> "TimeSeriesFrame":
+        """Frame restricted to ``names``; a view when they are adjacent and in order."""
+        indices = [self._column_index[name] for name in names]
+        if indices and indices == list(range(indices[0], indices[0] + len(indices))):
+            values = self.values[:, indices[0] : indices[0] + len(indices)]
+        else:
+            values = self.values[:, indices]
+        return TimeSeriesFrame(self.timestamps, values, list(names), self.labels)
+
+    def slice_time(self, start: Optional[Any] = None, end: Optional[Any] = None) -> "TimeSeriesFrame":
+        """Rows with ``start <= timestamp <= end``; a view for sorted timestamps."""
+        lower = -math.inf if start is None else to_epoch_seconds(start)
+        upper = math.inf if end is None else to_epoch_seconds(end)
+        if self.timestamps.size < 2 or bool(np.all(self.timestamps[1:] >= self.timestamps[:-1])):
+            lo = int(np.searchsorted(self.timestamps, lower, side="left"))
+            hi = int(np.searchsorted(self.timestamps, upper, side="right"))
+            return self[lo:hi]
+        mask = (self.timestamps >= lower) & (self.timestamps <= upper)
+        labels = [label for label, keep in zip(self.labels, mask) if keep] if self.labels else None
+        return TimeSeriesFrame(self.timestamps[mask], self.values[mask], self.columns, labels)
+
+    def resample(self, interval: float, how: str = "mean") -> "TimeSeriesFrame":
+        """Aggregate rows into ``interval``-second bins (NaNs ignored).
+
+        Timestamps must be sorted. Each output row is stamped with its bin
+        start; empty bins are not emitted.
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if how not in _RESAMPLE_METHODS:
+            raise ValueError(f"how must be one of {_RESAMPLE_METHODS}")
+        if not len(self):
+            return TimeSeriesFrame(self.timestamps, self.values, self.columns)
+        bins = np.floor(self.timestamps / interval)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(bins)) + 1))
+        if how == "last":
+            ends = np.concatenate((starts[1:], [len(self)])) - 1
+            values = self.values[ends]
+        elif how == "mean":
+            present = ~np.isnan(self.values)
+            sums = np.add.reduceat(np.where(present, self.values, 0.0), starts, axis=0)
+            counts = np.add.reduceat(present, starts, axis=0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values = sums / counts
+        elif how == "min":
+            values = np.fmin.reduceat(self.values, starts, axis=0)
+        else:
+            values = np.fmax.reduceat(self.values, starts, axis=0)
+        return TimeSeriesFrame(bins[starts] * interval, values, self.columns)
+
+    # ------------------------------------------------------------ conversions
+    def to_series_dict(self) -> Tuple[List[str], Dict[str, List[Optional[float]]]]:
+        """Convert to the ``(timestamps, {metric: [value or None]})`` legacy shape."""
+        labels = self.labels if self.labels is not None else [str(ts) for ts in self.timestamps.tolist()]
+        series: Dict[str, List[Optional[float]]] = {}
+        for idx, name in enumerate(self.columns):
+            series[name] = [None if value != value else value for value in self.values[:, idx].tolist()]
+        return list(labels), series
@@ -2,30 +2,54 @@
 
 These utilities stay lightweight (matplotlib + optional Gradio) so they can run
 inside MindSpore 1.7.0/CANN 5.1.0 environments without heavy dependencies.
+Matplotlib is imported by the functions that draw, not by this module, so
+importing it (or the ``monitoring.analysis`` package) stays cheap.
 """
 
 import json
+import math
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 
-import matplotlib.pyplot as plt
+import numpy as np
+
+from monitoring.analysis.dashboard import RANGE_PRESETS, DashboardData
+from monitoring.analysis.downsample import downsample
+from monitoring.analysis.timeseries import TimeSeriesFrame
+from monitoring.data_collection.batch_sink import BATCH_SUFFIX, iter_batched_payloads
+from monitoring.storage.telemetry_store import TelemetryStore
+
+if TYPE_CHECKING:  # pragma: no cover
+    from matplotlib.figure import Figure
 
 __all__ = [
     "load_npu_payloads",
     "build_numeric_timeseries",
     "plot_metric_timeseries",
+    "draw_metric_series",
+    "render_dashboard_figure",
     "launch_npu_dashboard",
 ]
 
+# Series longer than this are drawn as plain lines, without per-sample markers.
+_MARKER_LIMIT = 200
+_MAX_TICKS = 8
+_DPI = 100
+
 
 def load_npu_payloads(paths: Iterable[Path]) -> List[Dict[str, Any]]:
     """Load JSON payloads captured by ``collect_npu_smi``.
 
-    Each entry should contain a ``timestamp`` and ``metrics`` block.
+    Each entry should contain a ``timestamp`` and ``metrics`` block. Batch
+    files written by ``BatchedPayloadWriter`` (``.npb``) contribute all of
+    their samples.
     """
 
     payloads: List[Dict[str, Any]] = []
     for path in paths:
+        if Path(path).suffix == BATCH_SUFFIX:
+            payloads.extend(iter_batched_payloads(path))
+            continue
         content = Path(path).read_text()
         try:
             payloads.append(json.loads(content))
@@ -34,70 +58,148 @@ def load_npu_payloads(paths: Iterable[Path]) -> List[Dict[str, Any]]:
     return payloads
 
 
-def _numeric_from_metrics(metrics: Mapping[str, Any]) -> Dict[str, float]:
-    parsed = metrics.get("parsed", metrics)
-    numeric: Dict[str, float] = {}
-    for key, value in parsed.items():
-        if isinstance(value, (int, float)):
-            numeric[key] = float(value)
-    return numeric
-
-
 def build_numeric_timeseries(
     payloads: Sequence[Mapping[str, Any]]
 ) -> Tuple[List[str], Dict[str, List[Optional[float]]]]:
     """Align numeric metrics across a sequence of payloads.
 
     Returns timestamps (string labels) and a dict of metric -> value list.
-    Missing values are filled with ``None`` to keep series aligned.
+    Missing values are filled with ``None`` to keep series aligned. New code
+    should prefer :class:`TimeSeriesFrame` directly; this wrapper keeps the
+    dict-of-lists shape for existing callers.
     """
 
-    timestamps: List[str] = []
-    series: Dict[str, List[Optional[float]]] = {}
+    return TimeSeriesFrame.from_payloads(payloads).to_series_dict()
 
-    for idx, payload in enumerate(payloads):
-        timestamps.append(str(payload.get("timestamp", idx)))
-        metrics = _numeric_from_metrics(payload.get("metrics", {}))
 
-        for metric in metrics:
-            if metric not in series:
-                series[metric] = [None] * idx
+def draw_metric_series(
+    ax, x, y, metric: str, labels: Optional[Sequence[str]] = None, line=None
+):
+    """Plot one series on ``ax`` with a bounded number of ticks; returns the line.
 
-        for metric_name in series:
-            value = metrics.get(metric_name)
-            series[metric_name].append(value)
+    ``x`` is epoch seconds when ``labels`` is ``None`` and sample positions
+    into ``labels`` otherwise. Markers are only drawn for short series.
+    Passing the line returned by an earlier call on the same axes (with the
+    same kind of ``x``) updates it in place, keeping the axis, tick and
+    legend artists, which is much cheaper than clearing the axes.
+    """
+    import matplotlib.dates as mdates
+    from matplotlib.ticker import FuncFormatter, MaxNLocator
 
-    return timestamps, series
+    marker = "o" if len(y) <= _MARKER_LIMIT else None
+    if labels is None:
+        x = (np.asarray(x, dtype=np.float64) * 1e3).astype(np.int64).astype("datetime64[ms]")
+    if line is not None:
+        line.set_data(x, y)
+        line.set_marker(marker or "None")
+        line.set_label(metric)
+        ax.relim()
+        if np.isfinite(np.asarray(y, dtype=np.float64)).any():
+            ax.autoscale_view()
+        else:
+            # Nothing to fit: start from a new axes' limits rather than
+            # whatever the previous series left behind.
+            ax.set_xlim(0.0, 1.0, auto=True)
+            ax.set_ylim(0.0, 1.0, auto=True)
+        ax.set_ylabel(metric)
+        ax.get_legend().get_texts()[0].set_text(metric)
+        return line
+    if labels is None:
+        locator = mdates.AutoDateLocator()
+        ax.xaxis.set_major_locator(locator)
+        ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+        ax.set_xlabel("time (UTC)")
+    else:
+        def _label(position: float, _tick: int) -> str:
+            index = int(round(position))
+            return labels[index] if index == position and 0 <= index < len(labels) else ""
+
+        ax.xaxis.set_major_locator(MaxNLocator(nbins=_MAX_TICKS, integer=True))
+        ax.xaxis.set_major_formatter(FuncFormatter(_label))
+        ax.tick_params(axis="x", labelrotation=35)
+        for tick in ax.get_xticklabels():
+            tick.set_horizontalalignment("right")
+        ax.set_xlabel("sample")
+    (line,) = ax.plot(x, y, marker=marker, markersize=3, linewidth=1, label=metric)
+    ax.set_ylabel(metric)
+    ax.grid(True, linestyle="--", alpha=0.4)
+    ax.legend()
+    return line
 
 
 def plot_metric_timeseries(
     timestamps: Sequence[str],
     series: Mapping[str, Sequence[Optional[float]]],
     metric: str,
+    max_points: int = 2000,
 ):
-    """Render a matplotlib figure for a chosen metric time series."""
+    """Render a matplotlib figure for a chosen metric time series.
 
-    values = series.get(metric, [])
+    Series longer than ``max_points`` are downsampled with LTTB, which keeps
+    spikes visible; tick labels are taken from ``timestamps`` at a handful of
+    evenly spaced positions.
+    """
+    import matplotlib.pyplot as plt
+
+    values = np.array(
+        [math.nan if value is None else value for value in series.get(metric, [])],
+        dtype=np.float64,
+    )
+    positions = np.arange(values.size, dtype=np.float64)
+    if values.size > max_points:
+        positions, values = downsample(positions, values, max_points)
     fig, ax = plt.subplots(figsize=(8, 4))
-    ax.plot(range(len(values)), values, marker="o", label=metric)
-    ax.set_xticks(range(len(timestamps)))
-    ax.set_xticklabels(timestamps, rotation=35, ha="right")
-    ax.set_xlabel("sample")
-    ax.set_ylabel(metric)
-    ax.grid(True, linestyle="--", alpha=0.4)
-    ax.legend()
+    draw_metric_series(ax, positions, values, metric, labels=list(timestamps))
+    fig.tight_layout()
+    return fig
+
+
+def render_dashboard_figure(
+    data: DashboardData,
+    metric: str,
+    start: Optional[Any] = None,
+    end: Optional[Any] = None,
+    width: int = 1200,
+    last_seconds: Optional[float] = None,
+) -> "Figure":
+    """Draw ``metric`` from a :class:`DashboardData` view, downsampled to ``width`` points.
+
+    The figure is built without ``pyplot`` so repeated renders are released
+    with their last reference instead of piling up in pyplot's figure list.
+    """
+    from matplotlib.figure import Figure
+
+    x, y = data.series(metric, start, end, width=width, last_seconds=last_seconds)
+    fig = Figure(figsize=(max(4.0, width / _DPI), 4), dpi=_DPI)
+    ax = fig.add_subplot()
+    if x.size:
+        draw_metric_series(ax, x, y, metric)
+    else:
+        ax.text(0.5, 0.5, "no samples in range", ha="center", va="center", transform=ax.transAxes)
+        ax.set_ylabel(metric)
     fig.tight_layout()
     return fig
 
 
 def launch_npu_dashboard(
-    payload_paths: Sequence[Path], default_metric: Optional[str] = None
+    payload_paths: Iterable[Union[Path, str]] = (),
+    default_metric: Optional[str] = None,
+    store: Optional[Union[TelemetryStore, Path, str]] = None,
+    refresh_seconds: Optional[float] = 5.0,
+    width: int = 1200,
+    method: str = "lttb",
 ):
     """Spin up a small Gradio UI to explore collected NPU metrics.
 
+    ``payload_paths`` are payload files, directories or glob patterns; they
+    are imported into ``store`` (a :class:`TelemetryStore` or its directory,
+    temporary by default) and, unless ``refresh_seconds`` is ``None``, tailed
+    for new samples every ``refresh_seconds``. Plots show at most ``width``
+    points per view, and views are cached per metric and time range.
+
     Example:
         >>> from monitoring.analysis.visualize import launch_npu_dashboard
-        >>> launch_npu_dashboard(Path("data/collected_data").glob("npu*.json"))
+        >>> launch_npu_dashboard(["data/collected_data/npu*.json"])
     """
 
     try:
@@ -107,23 +209,61 @@ def launch_npu_dashboard(
             "Gradio is not installed. Please `pip install gradio` to use the dashboard."
         ) from exc
 
-    payloads = load_npu_payloads(payload_paths)
-    timestamps, series = build_numeric_timeseries(payloads)
-    metrics = sorted(series.keys())
+    data = DashboardData(payload_paths, store=store, method=method)
+    data.refresh()
+    metrics = data.metrics
 
-    if not metrics:
+    if not metrics and not refresh_seconds:
         raise ValueError("No numeric metrics available to visualize.")
 
-    default_metric = default_metric or metrics[0]
+    default_metric = default_metric or (metrics[0] if metrics else None)
 
-    def _plot(selected_metric: str):
-        return plot_metric_timeseries(timestamps, series, selected_metric)
+    def _plot(selected_metric: Optional[str], preset: str, start: str, end: str):
+        if not selected_metric:
+            return None, data.describe()
+        try:
+            fig = render_dashboard_figure(
+                data,
+                selected_metric,
+                start.strip() or None,
+                end.strip() or None,
+                width=width,
+                last_seconds=RANGE_PRESETS.get(preset),
+            )
+        except ValueError as exc:
+            raise gr.Error(f"Invalid time range: {exc}")
+        return fig, data.describe()
+
+    def _tail(selected_metric: Optional[str], preset: str, start: str, end: str):
+        data.refresh()
+        names = data.metrics
+        selected_metric = selected_metric or (names[0] if names else None)
+        fig, status = _plot(selected_metric, preset, start, end)
+        return gr.update(choices=names, value=selected_metric), fig, status
 
     with gr.Blocks() as demo:
         gr.Markdown("## NPU health metrics explorer")
-        dropdown = gr.Dropdown(metrics, value=default_metric, label="Metric")
-        plot = gr.Plot(value=_plot(default_metric))
-        dropdown.change(_plot, inputs=dropdown, outputs=plot)
+        with gr.Row():
+            dropdown = gr.Dropdown(metrics, value=default_metric, label="Metric")
+            preset = gr.Dropdown(list(RANGE_PRESETS), value="all", label="Time range")
+            start_box = gr.Textbox(label="Start (ISO-8601 or epoch)", value="")
+            end_box = gr.Textbox(label="End (ISO-8601 or epoch)", value="")
+        initial_fig, initial_status = _plot(default_metric, "all", "", "")
+        status = gr.Markdown(initial_status)
+        plot = gr.Plot(value=initial_fig)
+        refresh = gr.Button("Refresh")
+
+        inputs = [dropdown, preset, start_box, end_box]
+        for control in (dropdown, preset):
+            control.change(_plot, inputs=inputs, outputs=[plot, status])
+        for box in (start_box, end_box):
+            box.submit(_plot, inputs=inputs, outputs=[plot, status])
+        refresh.click(_tail, inputs=inputs, outputs=[dropdown, plot, status])
+        if refresh_seconds:
+            if hasattr(gr, "Timer"):
+                gr.Timer(refresh_seconds).tick(_tail, inputs=inputs, outputs=[dropdown, plot, status])
+            else:  # Gradio < 4.40 polls through ``every``.
+                demo.load(_tail, inputs=inputs, outputs=[dropdown, plot, status], every=refresh_seconds)
 
     demo.launch()
     return demo
@@ -0,0 +1,44 @@
+"""Collectors for ``npu-smi`` and MindSpore profiler output (imported lazily).
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "batch_sink": [
+            "BATCH_SUFFIX",
+            "BatchedPayloadWriter",
+            "iter_batched_payloads",
+            "tail_batched_payloads",
+        ],
+        "collect_mindspore": [
+            "scan_profiler_tree",
+            "load_manifest",
+            "save_manifest",
+            "manifest_path_for",
+            "summarize_profiler",
+            "collect_mindspore_profiler",
+            "collect_and_compare",
+        ],
+        "collect_npu": [
+            "parse_npu_smi_table",
+            "parse_npu_smi_output",
+            "flatten_device_metrics",
+            "split_device_metric",
+            "utc_timestamp",
+            "build_npu_payload",
+            "collect_npu_smi",
+            "collect_npu_smi_lightweight",
+        ],
+        "fleet": ["CommandTransport", "HostResult", "SweepReport", "FleetCollector"],
+        "op_profile": [
+            "OpStats",
+            "aggregate_op_csv",
+            "aggregate_timeline",
+            "aggregate_profiler_ops",
+            "diff_op_profiles",
+            "diff_profiler_ops",
+        ],
+        "sampler": ["SamplerStats", "RollingLog", "NpuSampler", "iter_sampler_log"],
+    },
+)
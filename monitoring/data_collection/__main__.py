@@ -0,0 +1,55 @@
+"""
+One-shot ``npu-smi`` snapshot for cron-style collection.
+
+``python -m monitoring.data_collection`` writes a single payload and exits.
+It only imports :mod:`monitoring.data_collection.collect_npu` (standard library
+only); the package facades keep NumPy, matplotlib and the analysis stack out
+of the process, so a run costs tens of milliseconds plus ``npu-smi`` itself
+(see ``python -m benchmarks.bench_import_time``). Use
+``python -m monitoring.data_collection.sampler`` for continuous polling.
+"""
+import argparse
+from pathlib import Path
+from typing import Optional, Sequence
+
+from monitoring.data_collection.batch_sink import BATCH_SUFFIX, BatchedPayloadWriter
+from monitoring.data_collection.collect_npu import NPU_SMI_COMMAND, collect_npu_smi, utc_timestamp
+
+
+def _default_destination(directory: Path, timestamp: str) -> Path:
+    # 2026-10-17T01:02:03.456789Z -> npu_20261017T010203_456789.json
+    stamp = timestamp.rstrip("Z").replace("-", "").replace(":", "").replace(".", "_")
+    return directory / f"npu_{stamp}.json"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Collect one npu-smi snapshot and exit.")
+    parser.add_argument(
+        "--output",
+        default="data/collected_data",
+        help=f"JSON file or directory to write to, or a {BATCH_SUFFIX} batch file to append to",
+    )
+    parser.add_argument("--full", action="store_true", help="keep raw output and all parsed fields")
+    parser.add_argument(
+        "--command", nargs=argparse.REMAINDER, help="command to run instead of `npu-smi info`"
+    )
+    args = parser.parse_args(argv)
+
+    output = Path(args.output)
+    command = args.command or NPU_SMI_COMMAND
+    lightweight = not args.full
+    if output.suffix == BATCH_SUFFIX:
+        with BatchedPayloadWriter(output) as writer:
+            collect_npu_smi(writer, lightweight=lightweight, command=command)
+        print(output)
+        return 0
+    if output.suffix != ".json":
+        output = _default_destination(output, utc_timestamp())
+    output.parent.mkdir(parents=True, exist_ok=True)
+    collect_npu_smi(output, lightweight=lightweight, command=command)
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,200 @@
+"""
+Batched, compressed sink for frequent lightweight samples.
+
+``collect_npu_smi_lightweight`` still writes one pretty-printed JSON document
+per sample, repeating every key name each time. :class:`BatchedPayloadWriter`
+buffers samples and appends them as compressed frames: each frame stores the
+key dictionary once, followed by one newline-delimited JSON array of values per
+sample. A frame costs a single ``write`` (plus an optional ``fsync``) no matter
+how many samples it holds.
+
+Frame layout::
+
+    struct "<4sII": magic b"NPB1", sample count, compressed length
+    zlib( '{"fields": [...], "keys": [...]}\\n' + '[timestamp, *fields, *metrics]\\n' * n )
+"""
+import json
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+__all__ = [
+    "BATCH_SUFFIX",
+    "BatchedPayloadWriter",
+    "iter_batched_payloads",
+    "tail_batched_payloads",
+]
+
+BATCH_SUFFIX = ".npb"
+_MAGIC = b"NPB1"
+_HEADER = struct.Struct("<4sII")
+_FSYNC_POLICIES = ("never", "batch", "close")
+
+
+class BatchedPayloadWriter:
+    """Buffer payloads and append them as compressed frames.
+
+    A frame is written once ``max_samples`` payloads are buffered or the oldest
+    buffered payload is ``max_seconds`` old (checked on each :meth:`write`).
+    ``fsync`` is ``"never"``, ``"batch"`` (after every frame) or ``"close"``.
+    """
+
+    def __init__(
+        self,
+        path: Union[Path, str],
+        max_samples: int = 256,
+        max_seconds: float = 10.0,
+        fsync: str = "batch",
+        compression_level: int = 6,
+    ) -> None:
+        if fsync not in _FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {_FSYNC_POLICIES}")
+        if max_samples <= 0:
+            raise ValueError("max_samples must be positive")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_samples = max_samples
+        self.max_seconds = max_seconds
+        self.fsync = fsync
+        self.compression_level = compression_level
+        self._fd: Optional[int] = os.open(
+            str(self.path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644
+        )
+        self._buffer: List[Dict[str, Any]] = []
+        self._oldest = 0.0
+        self.samples_written = 0
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.syscalls = 0
+
+    def write(self, payload: Dict[str, Any]) -> None:
+        if self._fd is None:
+            raise ValueError("write to closed BatchedPayloadWriter")
+        if not self._buffer:
+            self._oldest = time.monotonic()
+        self._buffer.append(payload)
+        if (
+            len(self._buffer) >= self.max_samples
+            or time.monotonic() - self._oldest >= self.max_seconds
+        ):
+            self.flush()
+
+    def _encode(self, payloads: List[Dict[str, Any]]) -> bytes:
+        fields: Dict[str, int] = {}
+        keys: Dict[str, int] = {}
+        for payload in payloads:
+            for name in payload:
+                if name not in ("timestamp", "metrics") and name not in fields:
+                    fields[name] = len(fields)
+            metrics = payload.get("metrics")
+            if isinstance(metrics, dict):
+                for name in metrics:
+                    if name not in keys:
+                        keys[name] = len(keys)
+        lines = [json.dumps({"fields": list(fields), "keys": list(keys)}, separators=(",", ":"))]
+        for payload in payloads:
+            metrics = payload.get("metrics") or {}
+            row: List[Any] = [payload.get("timestamp")]
+            row.extend(payload.get(name) for name in fields)
+            row.extend(metrics.get(name) for name in keys)
+            lines.append(json.dumps(row, separators=(",", ":")))
+        body = zlib.compress(("\n".join(lines) + "\n").encode("utf-8"), self.compression_level)
+        return _HEADER.pack(_MAGIC, len(payloads), len(body)) + body
+
+    def flush(self) -> None:
+        """Write buffered payloads as one frame."""
+        if not self._buffer or self._fd is None:
+            return
+        frame = self._encode(self._buffer)
+        os.write(self._fd, frame)
+        self.syscalls += 1
+        if self.fsync == "batch":
+            os.fsync(self._fd)
+            self.syscalls += 1
+        self.samples_written += len(self._buffer)
+        self.frames_written += 1
+        self.bytes_written += len(frame)
+        self._buffer = []
+
+    def close(self) -> None:
+        if self._fd is None:
+            return
+        self.flush()
+        if self.fsync == "close":
+            os.fsync(self._fd)
+            self.syscalls += 1
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self) -> "BatchedPayloadWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def _decode_frame(body: bytes) -> Iterator[Dict[str, Any]]:
+    lines = zlib.decompress(body).decode("utf-8").splitlines()
+    dictionary = json.loads(lines[0])
+    fields = dictionary["fields"]
+    keys = dictionary["keys"]
+    offset = 1 + len(fields)
+    for line in lines[1:]:
+        row = json.loads(line)
+        payload: Dict[str, Any] = {}
+        for idx, name in enumerate(fields, start=1):
+            if row[idx] is not None:
+                payload[name] = row[idx]
+        payload["timestamp"] = row[0]
+        payload["metrics"] = {
+            name: value
+            for name, value in zip(keys, row[offset:])
+            if value is not None
+        }
+        yield payload
+
+
+def _iter_frames(path: Union[Path, str], offset: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield ``(end offset, compressed body)`` for each complete frame after ``offset``."""
+    with Path(path).open("rb") as handle:
+        handle.seek(offset)
+        while True:
+            header = handle.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            magic, _count, length = _HEADER.unpack(header)
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a batched payload file")
+            body = handle.read(length)
+            if len(body) < length:
+                return
+            offset += _HEADER.size + length
+            yield offset, body
+
+
+def iter_batched_payloads(path: Union[Path, str]) -> Iterator[Dict[str, Any]]:
+    """Yield payload dicts from a batch file, in write order.
+
+    Items have the same shape as the dicts ``load_npu_payloads`` returns;
+    metrics that a sample did not carry are omitted rather than ``None``. A
+    truncated trailing frame (e.g. after a crash) is ignored.
+    """
+    for _end, body in _iter_frames(path, 0):
+        yield from _decode_frame(body)
+
+
+def tail_batched_payloads(
+    path: Union[Path, str], offset: int = 0
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Read the complete frames written after byte ``offset``.
+
+    Returns the payloads and the offset to resume from; a frame still being
+    written is left for the next call.
+    """
+    payloads: List[Dict[str, Any]] = []
+    for offset, body in _iter_frames(path, offset):
+        payloads.extend(_decode_frame(body))
+    return payloads, offset
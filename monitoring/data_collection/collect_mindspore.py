@@ -1,31 +1,177 @@
 """
 MindSpore profiler data collection helper modeled after msprof_analyze utilities.
+
+Profiler dumps can hold hundreds of thousands of files on network storage, so
+the tree is walked with ``os.scandir`` on a thread pool and the result can be
+persisted as a manifest (per directory: mtime plus name -> size/mtime of its
+files). On a rescan, directories whose mtime did not change reuse their cached
+file listing instead of being listed again. Directory mtimes only change when
+entries are added, removed or renamed, so the cached files are still
+``stat``-ed to pick up files that grew or were rewritten in place.
 """
+import hashlib
 import json
+import os
 from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Any, Dict, Iterable, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from monitoring.data_collection.op_profile import diff_profiler_ops
+
+_MANIFEST_VERSION = 1
+DEFAULT_SCAN_WORKERS = 16
+
+DirRecord = Dict[str, Any]
+
+
+def _scan_directory(
+    root: str, rel: str, cached: Optional[DirRecord], skip: Optional[str]
+) -> Tuple[str, DirRecord, bool]:
+    """List one directory unless its cached record is still valid.
 
+    Returns the relative path, the (possibly reused) record and whether the
+    record changed.
+    """
+    path = os.path.join(root, rel) if rel != "." else root
+    mtime_ns = os.stat(path).st_mtime_ns
+    if cached is not None and cached.get("mtime_ns") == mtime_ns:
+        try:
+            current = {}
+            for name in cached["files"]:
+                stat = os.stat(os.path.join(path, name))
+                current[name] = [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            pass  # replaced between the two stats; list the directory again
+        else:
+            if current == cached["files"]:
+                return rel, cached, False
+            return rel, dict(cached, files=current), True
+    files: Dict[str, List[int]] = {}
+    dirs: List[str] = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.name)
+            elif entry.is_file():
+                if skip is not None and entry.path == skip:
+                    continue
+                stat = entry.stat()
+                files[entry.name] = [stat.st_size, stat.st_mtime_ns]
+    return rel, {"mtime_ns": mtime_ns, "files": files, "dirs": sorted(dirs)}, True
 
-def _walk_files(profile_dir: Path) -> Iterable[Path]:
-    for path in profile_dir.rglob("*"):
-        if path.is_file():
-            yield path
+
+def scan_profiler_tree(
+    profile_dir: Union[Path, str],
+    previous: Optional[Dict[str, Any]] = None,
+    max_workers: int = DEFAULT_SCAN_WORKERS,
+    skip_file: Optional[Union[Path, str]] = None,
+) -> Dict[str, Any]:
+    """Walk a profiler directory in parallel and return a manifest.
+
+    ``previous`` is a manifest from an earlier scan of the same tree; its
+    unchanged directories are reused. ``skip_file`` excludes one file (the
+    manifest itself when it is stored inside the tree).
+    """
+    root = os.path.abspath(os.fspath(profile_dir))
+    if not os.path.isdir(root):
+        raise FileNotFoundError(root)
+    cached_dirs: Dict[str, DirRecord] = {}
+    if previous and previous.get("version") == _MANIFEST_VERSION and previous.get("root") == root:
+        cached_dirs = previous.get("dirs", {})
+    skip = os.path.abspath(os.fspath(skip_file)) if skip_file is not None else None
+
+    records: Dict[str, DirRecord] = {}
+    rescanned = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        pending: Set[Future] = {pool.submit(_scan_directory, root, ".", cached_dirs.get("."), skip)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    rel, record, changed = future.result()
+                except FileNotFoundError:
+                    # Directory vanished between listing its parent and scanning it.
+                    continue
+                records[rel] = record
+                rescanned += int(changed)
+                for name in record["dirs"]:
+                    child = name if rel == "." else os.path.join(rel, name)
+                    pending.add(
+                        pool.submit(_scan_directory, root, child, cached_dirs.get(child), skip)
+                    )
+    manifest = {
+        "version": _MANIFEST_VERSION,
+        "root": root,
+        "dirs": records,
+        "rescanned_dirs": rescanned,
+    }
+    manifest["summary"] = _summarize_manifest(manifest)
+    return manifest
 
 
-def summarize_profiler(profile_dir: Union[Path, str]) -> Dict[str, Any]:
-    """Summarize profiler artifacts by counting files and total size."""
-    profile_path = Path(profile_dir)
-    files = list(_walk_files(profile_path))
-    total_size = sum(item.stat().st_size for item in files)
-    by_suffix: Counter[str] = Counter(path.suffix for path in files)
+def _summarize_manifest(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    files = 0
+    total_size = 0
+    by_suffix: Counter = Counter()
+    for record in manifest["dirs"].values():
+        entries = record["files"]
+        files += len(entries)
+        for name, (size, _mtime) in entries.items():
+            total_size += size
+            by_suffix[Path(name).suffix] += 1
     return {
-        "files": len(files),
+        "files": files,
         "total_size_bytes": total_size,
         "by_suffix": dict(by_suffix),
     }
 
 
+def load_manifest(path: Union[Path, str]) -> Optional[Dict[str, Any]]:
+    """Read a persisted manifest, returning ``None`` when absent or unreadable."""
+    try:
+        manifest = json.loads(Path(path).read_text())
+    except (OSError, json.JSONDecodeError):
+        return None
+    if manifest.get("version") != _MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(manifest: Dict[str, Any], path: Union[Path, str]) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, separators=(",", ":")))
+    os.replace(tmp_path, path)
+
+
+def manifest_path_for(profile_dir: Union[Path, str], cache_dir: Union[Path, str]) -> Path:
+    """Location of the cached manifest for ``profile_dir`` inside ``cache_dir``."""
+    root = os.path.abspath(os.fspath(profile_dir))
+    digest = hashlib.sha1(root.encode("utf-8")).hexdigest()[:16]
+    return Path(cache_dir) / f"profiler_{digest}.manifest.json"
+
+
+def summarize_profiler(
+    profile_dir: Union[Path, str],
+    manifest_path: Optional[Union[Path, str]] = None,
+    max_workers: int = DEFAULT_SCAN_WORKERS,
+) -> Dict[str, Any]:
+    """Summarize profiler artifacts by counting files and total size.
+
+    When ``manifest_path`` is given the scan result is persisted there and
+    reused on the next call, so only directories that changed are listed again.
+    """
+    previous = load_manifest(manifest_path) if manifest_path is not None else None
+    manifest = scan_profiler_tree(
+        profile_dir, previous=previous, max_workers=max_workers, skip_file=manifest_path
+    )
+    if manifest_path is not None and (previous is None or manifest["rescanned_dirs"]):
+        save_manifest(manifest, manifest_path)
+    return manifest["summary"]
+
+
 def collect_mindspore_profiler(
     source_dir: Union[Path, str], destination: Union[Path, str]
 ) -> Dict[str, Any]:
@@ -41,10 +187,32 @@ def collect_and_compare(
     baseline_dir: Union[Path, str],
     current_dir: Union[Path, str],
     destination: Union[Path, str],
+    cache_dir: Optional[Union[Path, str]] = None,
+    refresh_baseline: bool = True,
+    max_workers: int = DEFAULT_SCAN_WORKERS,
+    top_ops: int = 0,
 ) -> Dict[str, Any]:
-    """Compare two profiler runs to highlight regressions."""
-    baseline = summarize_profiler(baseline_dir)
-    current = summarize_profiler(current_dir)
+    """Compare two profiler runs to highlight regressions.
+
+    With ``cache_dir`` set, both trees keep a manifest there. The baseline is
+    then revalidated with one ``stat`` per directory; ``refresh_baseline=False``
+    skips even that and reuses the cached baseline summary as-is.
+
+    ``top_ops > 0`` adds an ``operators`` entry listing the most regressed
+    operators (see :func:`diff_profiler_ops`).
+    """
+    baseline: Optional[Dict[str, Any]] = None
+    baseline_manifest = current_manifest = None
+    if cache_dir is not None:
+        baseline_manifest = manifest_path_for(baseline_dir, cache_dir)
+        current_manifest = manifest_path_for(current_dir, cache_dir)
+        if not refresh_baseline:
+            cached = load_manifest(baseline_manifest)
+            if cached is not None:
+                baseline = cached["summary"]
+    if baseline is None:
+        baseline = summarize_profiler(baseline_dir, baseline_manifest, max_workers)
+    current = summarize_profiler(current_dir, current_manifest, max_workers)
     delta_files = current.get("files", 0) - baseline.get("files", 0)
     delta_size = current.get("total_size_bytes", 0) - baseline.get("total_size_bytes", 0)
     comparison: Dict[str, Any] = {
@@ -53,5 +221,7 @@ def collect_and_compare(
         "delta_files": delta_files,
         "delta_bytes": delta_size,
     }
+    if top_ops > 0:
+        comparison["operators"] = diff_profiler_ops(baseline_dir, current_dir, top_n=top_ops)
     Path(destination).write_text(json.dumps(comparison, indent=2))
     return comparison
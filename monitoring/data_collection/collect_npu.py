@@ -4,20 +4,55 @@ Lightweight NPU monitoring inspired by Ascend msprof_analyze tooling.
 """
 import json
 import re
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import subprocess
 
+from monitoring.data_collection.batch_sink import BatchedPayloadWriter
+
+
+_NUMERIC_PREFIX = re.compile(r"([-+]?\d+\.\d+|[-+]?\d+)")
+
+# One NPU block of the `npu-smi info` table is a device row followed by one or
+# more chip rows, e.g. (910B):
+#   | 0     910B              | OK            | 68.4        35          0    / 0    |
+#   | 0                       | 0000:C1:00.0  | 0           1138 / 15039  0 / 32768 |
+# 310P chip rows carry an extra device column ("| 0   0   | 0000:01:00.0 | ...").
+_CHIP_ROW = re.compile(
+    r"^\|\s*(\d+)(?:\s+\d+)?\s*\|\s*([0-9A-Fa-f]{4}:[0-9A-Fa-f]{2}:[0-9A-Fa-f]{2}\.[0-9A-Fa-f])"
+    r"\s*\|([^|]*)\|"
+)
+_DEVICE_ROW = re.compile(r"^\|\s*(\d+)\s+(\S+)\s*\|\s*([^|]*?)\s*\|([^|]*)\|")
+_USAGE_PAIR = re.compile(r"([-+]?\d+(?:\.\d+)?)\s*/\s*([-+]?\d+(?:\.\d+)?)")
+_DEVICE_METRIC = re.compile(r"^(npu\d+_chip\d+)_(.+)$")
+_HOST_DEVICE = "host"
+
+DEVICE_COLUMNS: Tuple[str, ...] = (
+    "device_id",
+    "chip_id",
+    "name",
+    "health",
+    "bus_id",
+    "power_w",
+    "temp_c",
+    "aicore_pct",
+    "memory_used_mb",
+    "memory_total_mb",
+    "hbm_used_mb",
+    "hbm_total_mb",
+)
+_NUMERIC_DEVICE_COLUMNS: Tuple[str, ...] = DEVICE_COLUMNS[5:]
+
 
 def _parse_key_value_line(line: str) -> Tuple[str, Any]:
-    if ":" not in line:
+    if ":" not in line or line[:1] in ("|", "+"):
         return "", None
     key, raw_value = line.split(":", 1)
     key = key.strip().lower().replace(" ", "_")
     value = raw_value.strip()
-    numeric_match = re.match(r"([-+]?\d+\.\d+|[-+]?\d+)", value)
+    numeric_match = _NUMERIC_PREFIX.match(value)
     if numeric_match:
         try:
             value = float(numeric_match.group(1))
@@ -26,7 +61,78 @@ def _parse_key_value_line(line: str) -> Tuple[str, Any]:
     return key, value
 
 
+def _to_float(token: str) -> Optional[float]:
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def parse_npu_smi_table(output: str) -> Dict[str, List[Any]]:
+    """Parse the box-drawn `npu-smi info` table into per-device columns.
+
+    Returns a dict keyed by :data:`DEVICE_COLUMNS` where every list holds one
+    entry per (NPU, chip) pair, so a 1024-device host yields 1024-long columns
+    rather than a flat dict where later devices overwrite earlier ones. Fields
+    printed as ``NA`` (or absent on a given card family) become ``None``.
+    The process table that follows the device table is ignored.
+    """
+    columns: Dict[str, List[Any]] = {name: [] for name in DEVICE_COLUMNS}
+    device_id = name = health = None
+    power = temp = None
+    chip_match = _CHIP_ROW.match
+    device_match = _DEVICE_ROW.match
+    usage_pairs = _USAGE_PAIR.findall
+    for line in output.splitlines():
+        if not line.startswith("|"):
+            continue
+        chip = chip_match(line)
+        if chip is not None:
+            if device_id is None:
+                continue
+            stats = chip.group(3)
+            pairs = usage_pairs(stats)
+            head = stats.split(None, 1)
+            columns["device_id"].append(device_id)
+            columns["chip_id"].append(int(chip.group(1)))
+            columns["name"].append(name)
+            columns["health"].append(health)
+            columns["bus_id"].append(chip.group(2))
+            columns["power_w"].append(power)
+            columns["temp_c"].append(temp)
+            columns["aicore_pct"].append(_to_float(head[0]) if head else None)
+            if pairs:
+                columns["memory_used_mb"].append(float(pairs[0][0]))
+                columns["memory_total_mb"].append(float(pairs[0][1]))
+            else:
+                columns["memory_used_mb"].append(None)
+                columns["memory_total_mb"].append(None)
+            if len(pairs) > 1:
+                columns["hbm_used_mb"].append(float(pairs[-1][0]))
+                columns["hbm_total_mb"].append(float(pairs[-1][1]))
+            else:
+                columns["hbm_used_mb"].append(None)
+                columns["hbm_total_mb"].append(None)
+            continue
+        if "Process id" in line:
+            break
+        device = device_match(line)
+        if device is not None:
+            device_id = int(device.group(1))
+            name = device.group(2)
+            health = device.group(3)
+            readings = device.group(4).split()
+            power = _to_float(readings[0]) if readings else None
+            temp = _to_float(readings[1]) if len(readings) > 1 else None
+    return columns
+
+
 def parse_npu_smi_output(output: str) -> Dict[str, Any]:
+    """Parse `npu-smi` output into ``parsed`` key/value pairs and per-device columns.
+
+    ``devices`` is only present when the output contains the device table (see
+    :func:`parse_npu_smi_table`).
+    """
     metrics: Dict[str, Any] = {"raw": output}
     parsed: List[Tuple[str, Any]] = []
     for line in output.splitlines():
@@ -34,19 +140,82 @@ def parse_npu_smi_output(output: str) -> Dict[str, Any]:
         if key:
             parsed.append((key, value))
     metrics["parsed"] = {key: value for key, value in parsed}
+    devices = parse_npu_smi_table(output)
+    if devices["device_id"]:
+        metrics["devices"] = devices
     return metrics
 
 
+def flatten_device_metrics(devices: Dict[str, List[Any]]) -> Dict[str, float]:
+    """Flatten device columns into ``npu{id}_chip{chip}_{field}`` numeric entries."""
+    flat: Dict[str, float] = {}
+    for row, (device_id, chip_id) in enumerate(zip(devices["device_id"], devices["chip_id"])):
+        prefix = f"npu{device_id}_chip{chip_id}_"
+        for column in _NUMERIC_DEVICE_COLUMNS:
+            value = devices[column][row]
+            if value is not None:
+                flat[prefix + column] = float(value)
+    return flat
+
+
+def split_device_metric(name: str) -> Tuple[str, str]:
+    """Split ``npu0_chip1_temperature_c`` into ``("npu0_chip1", "temperature_c")``.
+
+    Metrics without a device prefix belong to the ``"host"`` group.
+    """
+    match = _DEVICE_METRIC.match(name)
+    if match is None:
+        return _HOST_DEVICE, name
+    return match.group(1), match.group(2)
+
+
 def _prune_numeric_metrics(metrics: Dict[str, Any]) -> Dict[str, float]:
     parsed = metrics.get("parsed", {}) if isinstance(metrics, dict) else {}
     numeric_entries = {}
     for key, value in parsed.items():
         if isinstance(value, (int, float)):
             numeric_entries[key] = float(value)
+    devices = metrics.get("devices") if isinstance(metrics, dict) else None
+    if devices:
+        numeric_entries.update(flatten_device_metrics(devices))
     return numeric_entries
 
 
-def collect_npu_smi(destination: Union[Path, str], lightweight: bool = False) -> Dict[str, Any]:
+NPU_SMI_COMMAND: Tuple[str, ...] = ("npu-smi", "info")
+
+
+def utc_timestamp() -> str:
+    """Return the ISO-8601 UTC timestamp format used by every collector payload."""
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+def build_npu_payload(
+    raw_output: Optional[str], timestamp: str, lightweight: bool = False
+) -> Dict[str, Any]:
+    """Wrap ``npu-smi`` output into the payload schema written by the collectors.
+
+    ``raw_output=None`` means the command could not be run and yields the
+    placeholder record downstream analytics already understand.
+    """
+    if raw_output is None:
+        return {
+            "collector": "npu-smi",
+            "timestamp": timestamp,
+            "metrics": {"error": "npu-smi not available in this environment"},
+        }
+    metrics = parse_npu_smi_output(raw_output)
+    return {
+        "collector": "npu-smi",
+        "timestamp": timestamp,
+        "metrics": metrics if not lightweight else _prune_numeric_metrics(metrics),
+    }
+
+
+def collect_npu_smi(
+    destination: Union[Path, str, BatchedPayloadWriter],
+    lightweight: bool = False,
+    command: Sequence[str] = NPU_SMI_COMMAND,
+) -> Dict[str, Any]:
     """Collect basic NPU stats using `npu-smi info` when available.
 
     If the command is missing, we synthesize a minimal record so downstream
@@ -54,105 +223,35 @@ def collect_npu_smi(destination: Union[Path, str], lightweight: bool = False) ->
 
     Passing ``lightweight=True`` stores only numeric parsed metrics and omits
     the raw command output to keep artifacts small for frequent sampling.
+
+    This is the one-shot path; for continuous polling use
+    :class:`monitoring.data_collection.sampler.NpuSampler`, which keeps a single
+    append-only log instead of one file per sample. ``destination`` may also be
+    a :class:`BatchedPayloadWriter`, in which case the payload is buffered into
+    its next compressed frame instead of written as its own JSON file.
     """
-    destination = Path(destination)
-    command = ["npu-smi", "info"]
-    timestamp = datetime.utcnow().isoformat() + "Z"
+    timestamp = utc_timestamp()
     try:
-        raw_output = subprocess.check_output(command, text=True)
-        metrics = parse_npu_smi_output(raw_output)
-        payload: Dict[str, Any] = {
-            "collector": "npu-smi",
-            "timestamp": timestamp,
-            "metrics": metrics if not lightweight else _prune_numeric_metrics(metrics),
-        }
+        raw_output: Optional[str] = subprocess.check_output(list(command), text=True)
     except (OSError, subprocess.CalledProcessError):
-        payload = {
-            "collector": "npu-smi",
-            "timestamp": timestamp,
-            "metrics": {"error": "npu-smi not available in this environment"},
-        }
-    destination.write_text(json.dumps(payload, indent=2))
+        raw_output = None
+    payload = build_npu_payload(raw_output, timestamp, lightweight=lightweight)
+    if isinstance(destination, BatchedPayloadWriter):
+        destination.write(payload)
+    else:
+        Path(destination).write_text(json.dumps(payload, indent=2))
     return payload
 
 
-def collect_npu_smi_lightweight(destination: Union[Path, str]) -> Dict[str, Any]:
+def collect_npu_smi_lightweight(
+    destination: Union[Path, str, BatchedPayloadWriter]
+) -> Dict[str, Any]:
     """Shortcut for sampling with minimal footprint.
 
     This helper only writes numeric parsed metrics, which is useful when
-    polling frequently or shipping artifacts over constrained links.
+    polling frequently or shipping artifacts over constrained links. Pass a
+    shared :class:`BatchedPayloadWriter` to cut bytes and syscalls per sample
+    further.
     """
 
     return collect_npu_smi(destination, lightweight=True)
-=======
-
-import csv
-import json
-from pathlib import Path
-from statistics import mean
-from typing import Dict, Iterable, List, Mapping, Sequence, Union
-
-__all__ = [
-    "load_metrics",
-    "compute_rollup",
-    "summarize_record",
-    "export_metrics_csv",
-]
-
-
-def load_metrics(path: Union[Path, str]) -> List[float]:
-    data = json.loads(Path(path).read_text())
-    if isinstance(data, list):
-        return [float(item) for item in data]
-    if "metrics" in data:
-        return [float(value) for value in data.get("metrics", [])]
-    if "summary" in data:
-        return [float(value) for value in data["summary"].values()]
-    return []
-
-
-def compute_rollup(metrics: Iterable[float]) -> Dict[str, float]:
-    values = list(metrics)
-    return {
-        "average": mean(values) if values else 0.0,
-        "max": max(values, default=0.0),
-        "min": min(values, default=0.0),
-        "count": float(len(values)),
-    }
-
-
-def summarize_record(path: Union[Path, str]) -> Dict[str, float]:
-    """Convenience wrapper for downstream dashboards."""
-    metrics = load_metrics(path)
-    return compute_rollup(metrics)
-
-
-def export_metrics_csv(
-    metrics: Mapping[str, Sequence[float]], destination: Union[Path, str]
-) -> Path:
-    """Write metric sequences to a CSV file for visualization and sharing.
-
-    The helper is intentionally light-weight so it can be imported directly
-    inside notebooks or MindSpore 1.7.0 monitoring scripts. It also creates the
-    parent directory for the destination file to avoid `FileNotFoundError`
-    surprises when exporting health indicators during fault-injection runs.
-    """
-
-    if not metrics:
-        raise ValueError("No metrics provided for CSV export")
-
-    destination = Path(destination)
-    destination.parent.mkdir(parents=True, exist_ok=True)
-
-    fieldnames = ["timestamp"] + list(metrics.keys())
-    max_len = max((len(series) for series in metrics.values()), default=0)
-    with destination.open("w", newline="") as handle:
-        writer = csv.DictWriter(handle, fieldnames=fieldnames)
-        writer.writeheader()
-        for idx in range(max_len):
-            row = {"timestamp": idx}
-            for name, series in metrics.items():
-                if idx < len(series):
-                    row[name] = series[idx]
-            writer.writerow(row)
-    return destination
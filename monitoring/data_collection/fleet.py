@@ -0,0 +1,250 @@
+"""
+asyncio fan-out collection across many hosts.
+
+The other collectors sample the local machine one call at a time, which cannot
+keep a sub-second cadence over a few hundred nodes. :class:`FleetCollector`
+runs a pluggable per-host transport concurrently under a global concurrency
+limit and per-host timeouts, and hands results to a sink through a bounded
+queue: when the sink falls behind, host tasks keep their concurrency slot
+until their result is queued, so new fetches stall instead of piling up.
+Payloads follow the ``collect_npu_smi`` schema plus a ``host`` field.
+"""
+import asyncio
+import math
+import os
+import signal
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from monitoring.data_collection.collect_npu import build_npu_payload, utc_timestamp
+
+__all__ = [
+    "CommandTransport",
+    "HostResult",
+    "SweepReport",
+    "FleetCollector",
+]
+
+Transport = Callable[[str], Awaitable[str]]
+Sink = Callable[[Dict[str, Any]], Any]
+
+DEFAULT_REMOTE_COMMAND = ("ssh", "-o", "BatchMode=yes", "{host}", "npu-smi", "info")
+
+
+class CommandTransport:
+    """Run one command per host as a local subprocess and return its stdout.
+
+    ``{host}`` in any argument is replaced by the host name, so the default
+    template goes through ``ssh``; tests can use a local script instead.
+    """
+
+    def __init__(self, command_template: Sequence[str] = DEFAULT_REMOTE_COMMAND) -> None:
+        self.command_template = list(command_template)
+
+    async def __call__(self, host: str) -> str:
+        argv = [part.replace("{host}", host) for part in self.command_template]
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        try:
+            stdout, _ = await process.communicate()
+        except asyncio.CancelledError:
+            # Timeouts cancel us; kill the whole process group so grandchildren
+            # (ssh, shells) do not keep the pipe open or linger.
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode or 0, argv)
+        return stdout.decode("utf-8", errors="replace")
+
+
+@dataclass
+class HostResult:
+    host: str
+    latency_seconds: float
+    ok: bool
+    error: Optional[str] = None
+
+
+def _percentile(ordered: Sequence[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = max(0, int(math.ceil(q * len(ordered))) - 1)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+@dataclass
+class SweepReport:
+    """Outcome and latency distribution of one pass over all hosts."""
+
+    started: str
+    duration_seconds: float = 0.0
+    sink_wait_seconds: float = 0.0
+    results: List[HostResult] = field(default_factory=list)
+    # Host -> exception class name for payloads the sink failed to take.
+    sink_errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def failed(self) -> List[str]:
+        return [result.host for result in self.results if not result.ok]
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        ordered = sorted(result.latency_seconds for result in self.results)
+        return {
+            "p50": _percentile(ordered, 0.50),
+            "p95": _percentile(ordered, 0.95),
+            "p99": _percentile(ordered, 0.99),
+            "max": ordered[-1] if ordered else 0.0,
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "started": self.started,
+            "hosts": len(self.results),
+            "ok": len(self.results) - len(self.failed),
+            "failed": self.failed,
+            "timed_out": [r.host for r in self.results if r.error == "timeout"],
+            "duration_seconds": self.duration_seconds,
+            "sink_wait_seconds": self.sink_wait_seconds,
+            "sink_errors": dict(self.sink_errors),
+            "latency_seconds": self.latency_percentiles(),
+        }
+
+
+class FleetCollector:
+    """Collect ``npu-smi`` payloads from many hosts concurrently.
+
+    ``sink`` receives each payload; it may be a coroutine function or a plain
+    callable (run in the default executor so file I/O does not block the
+    loop). Exceptions it raises are recorded in the sweep's ``sink_errors``
+    and do not stop delivery. ``queue_size`` bounds how many payloads may wait
+    for the sink.
+    """
+
+    def __init__(
+        self,
+        hosts: Sequence[str],
+        transport: Optional[Transport] = None,
+        sink: Optional[Sink] = None,
+        concurrency: int = 64,
+        timeout: float = 2.0,
+        queue_size: int = 256,
+        lightweight: bool = True,
+    ) -> None:
+        if concurrency <= 0 or queue_size <= 0:
+            raise ValueError("concurrency and queue_size must be positive")
+        self.hosts = list(hosts)
+        self.transport: Transport = transport or CommandTransport()
+        self.sink = sink
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self.lightweight = lightweight
+
+    async def _deliver(self, payload: Dict[str, Any]) -> None:
+        if self.sink is None:
+            return
+        if asyncio.iscoroutinefunction(self.sink):
+            await self.sink(payload)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, self.sink, payload)
+
+    async def _drain(
+        self, queue: "asyncio.Queue[Optional[Dict[str, Any]]]", report: SweepReport
+    ) -> None:
+        while True:
+            payload = await queue.get()
+            if payload is None:
+                return
+            try:
+                await self._deliver(payload)
+            except Exception as exc:  # a dead consumer would block every host on put()
+                report.sink_errors[payload["host"]] = type(exc).__name__
+
+    async def _collect_host(
+        self,
+        host: str,
+        semaphore: asyncio.Semaphore,
+        queue: "asyncio.Queue[Optional[Dict[str, Any]]]",
+        report: SweepReport,
+    ) -> None:
+        async with semaphore:
+            timestamp = utc_timestamp()
+            started = time.perf_counter()
+            raw_output: Optional[str] = None
+            error: Optional[str] = None
+            try:
+                raw_output = await asyncio.wait_for(self.transport(host), self.timeout)
+            except asyncio.TimeoutError:
+                error = "timeout"
+            except Exception as exc:  # one failing host must not abort the sweep
+                error = type(exc).__name__
+            latency = time.perf_counter() - started
+            try:
+                payload = build_npu_payload(raw_output, timestamp, lightweight=self.lightweight)
+            except Exception as exc:
+                error = error or type(exc).__name__
+                payload = build_npu_payload(None, timestamp, lightweight=self.lightweight)
+            payload["host"] = host
+            report.results.append(HostResult(host, latency, error is None, error))
+            # Hold the concurrency slot until the sink has room: back-pressure.
+            waited = time.perf_counter()
+            await queue.put(payload)
+            report.sink_wait_seconds += time.perf_counter() - waited
+
+    async def sweep(self) -> SweepReport:
+        """Collect every host once and return the sweep's report."""
+        report = SweepReport(started=utc_timestamp())
+        began = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(self.queue_size)
+        consumer = asyncio.ensure_future(self._drain(queue, report))
+        try:
+            await asyncio.gather(
+                *(self._collect_host(host, semaphore, queue, report) for host in self.hosts)
+            )
+            await queue.put(None)
+            await consumer
+        finally:
+            if not consumer.done():
+                consumer.cancel()
+        report.duration_seconds = time.perf_counter() - began
+        return report
+
+    async def run(
+        self,
+        interval: float,
+        sweeps: Optional[int] = None,
+        on_report: Optional[Callable[[SweepReport], Any]] = None,
+    ) -> List[SweepReport]:
+        """Sweep on a fixed cadence; overrunning sweeps start the next one at once.
+
+        Reports are returned only when ``sweeps`` is bounded; long-running
+        callers should consume them through ``on_report``.
+        """
+        loop = asyncio.get_running_loop()
+        origin = loop.time()
+        reports: List[SweepReport] = []
+        slot = 0
+        completed = 0
+        while sweeps is None or completed < sweeps:
+            delay = origin + slot * interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            report = await self.sweep()
+            if on_report is not None:
+                on_report(report)
+            completed += 1
+            if sweeps is not None:
+                reports.append(report)
+            slot = max(slot + 1, int((loop.time() - origin) // interval))
+        return reports
@@ -0,0 +1,230 @@
+"""
+Operator-level aggregation and diffing of MindSpore profiler dumps.
+
+``collect_and_compare`` only sees file counts and bytes, so a single slow
+operator is invisible to it. The helpers here stream the profiler's
+op-summary CSVs (``op_summary_*.csv``, ``aicore_intermediate_*_detail.csv``)
+or, when those are absent, its Chrome-trace timeline JSON files, and keep one
+bounded aggregate per operator: count, total, mean and p99 duration (via a
+quantile sketch). Timelines are decoded one event at a time, so multi-GB files
+are processed without being loaded whole.
+"""
+import csv
+import fnmatch
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from utils.data_preprocessing.json_stream import iter_json_array
+from utils.stream_stats.sketch import QuantileSketch
+
+__all__ = [
+    "OpStats",
+    "aggregate_op_csv",
+    "aggregate_timeline",
+    "aggregate_profiler_ops",
+    "diff_op_profiles",
+    "diff_profiler_ops",
+]
+
+OP_CSV_PATTERNS: Tuple[str, ...] = ("op_summary*.csv", "aicore_intermediate_*_detail.csv")
+TIMELINE_PATTERNS: Tuple[str, ...] = (
+    "ascend_timeline_display_*.json",
+    "msprof*.json",
+    "trace_view.json",
+)
+
+_NAME_COLUMNS = ("op name", "op_name", "full_op_name", "name")
+
+
+@dataclass
+class OpStats:
+    """Bounded-memory duration aggregate for one operator (microseconds)."""
+
+    count: int = 0
+    total_us: float = 0.0
+    sketch: QuantileSketch = field(default_factory=QuantileSketch)
+
+    def add(self, duration_us: float) -> None:
+        self.count += 1
+        self.total_us += duration_us
+        self.sketch.add(duration_us)
+
+    def merge(self, other: "OpStats") -> "OpStats":
+        self.count += other.count
+        self.total_us += other.total_us
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def mean_us(self) -> float:
+        return self.total_us / self.count if self.count else 0.0
+
+    @property
+    def p99_us(self) -> float:
+        return self.sketch.quantile(0.99) or 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "count": float(self.count),
+            "total_us": self.total_us,
+            "mean_us": self.mean_us,
+            "p99_us": self.p99_us,
+        }
+
+
+OpProfile = Dict[str, OpStats]
+
+
+def _duration_column(header: Sequence[str]) -> Tuple[Optional[int], float]:
+    """Locate the duration column and the factor converting it to microseconds."""
+    for idx, raw in enumerate(header):
+        name = raw.strip().lower()
+        if "duration" in name or "execution_time" in name or "execution time" in name:
+            return idx, 1000.0 if "(ms)" in name else 1.0
+    return None, 1.0
+
+
+def aggregate_op_csv(path: Union[Path, str], profile: Optional[OpProfile] = None) -> OpProfile:
+    """Fold one op-summary CSV into ``profile`` row by row."""
+    profile = {} if profile is None else profile
+    with Path(path).open("r", newline="", encoding="utf-8") as handle:
+        reader = csv.reader(handle)
+        header = next(reader, None)
+        if not header:
+            return profile
+        lowered = [column.strip().lower() for column in header]
+        name_idx = next(
+            (lowered.index(candidate) for candidate in _NAME_COLUMNS if candidate in lowered), None
+        )
+        duration_idx, scale = _duration_column(header)
+        if name_idx is None or duration_idx is None:
+            return profile
+        width = max(name_idx, duration_idx)
+        for row in reader:
+            if len(row) <= width:
+                continue
+            try:
+                duration = float(row[duration_idx]) * scale
+            except ValueError:
+                continue
+            name = row[name_idx].strip()
+            stats = profile.get(name)
+            if stats is None:
+                stats = profile[name] = OpStats()
+            stats.add(duration)
+    return profile
+
+
+def _iter_trace_events(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as handle:
+        first = handle.read(1)
+        while first.isspace():
+            first = handle.read(1)
+        handle.seek(0)
+        key = "traceEvents" if first == "{" else None
+        for event in iter_json_array(handle, key=key):
+            if isinstance(event, dict):
+                yield event
+
+
+def aggregate_timeline(
+    path: Union[Path, str], profile: Optional[OpProfile] = None
+) -> OpProfile:
+    """Fold complete (``ph == "X"``) events of a Chrome-trace timeline into ``profile``."""
+    profile = {} if profile is None else profile
+    for event in _iter_trace_events(Path(path)):
+        if event.get("ph") != "X" or "dur" not in event:
+            continue
+        try:
+            duration = float(event["dur"])
+        except (TypeError, ValueError):
+            continue
+        name = str(event.get("name", ""))
+        stats = profile.get(name)
+        if stats is None:
+            stats = profile[name] = OpStats()
+        stats.add(duration)
+    return profile
+
+
+def _matching_files(profile_dir: Path, patterns: Iterable[str]) -> List[Path]:
+    patterns = tuple(patterns)
+    matches: List[Path] = []
+    for dirpath, _dirnames, filenames in os.walk(profile_dir):
+        for filename in filenames:
+            if any(fnmatch.fnmatch(filename, pattern) for pattern in patterns):
+                matches.append(Path(dirpath) / filename)
+    return sorted(matches)
+
+
+def aggregate_profiler_ops(profile_dir: Union[Path, str], source: str = "auto") -> OpProfile:
+    """Build per-operator aggregates for a whole profiler dump.
+
+    ``source`` selects ``"csv"`` (op-summary files), ``"timeline"`` (trace
+    JSON) or ``"auto"``: CSVs when the dump has any, timelines otherwise, so
+    the same kernels are not counted twice.
+    """
+    if source not in ("auto", "csv", "timeline"):
+        raise ValueError(f"Unknown op profile source: {source}")
+    profile_dir = Path(profile_dir)
+    profile: OpProfile = {}
+    csv_files = _matching_files(profile_dir, OP_CSV_PATTERNS) if source != "timeline" else []
+    if csv_files:
+        for path in csv_files:
+            aggregate_op_csv(path, profile)
+        return profile
+    if source != "csv":
+        for path in _matching_files(profile_dir, TIMELINE_PATTERNS):
+            aggregate_timeline(path, profile)
+    return profile
+
+
+def diff_op_profiles(
+    baseline: OpProfile, current: OpProfile, top_n: int = 10, rank_by: str = "total"
+) -> List[Dict[str, Any]]:
+    """Return the ``top_n`` operators whose ``rank_by`` metric regressed the most.
+
+    ``rank_by`` is one of ``"total"``, ``"mean"`` or ``"p99"``. Operators that
+    only exist in the current run count as regressions from zero.
+    """
+    attribute = {"total": "total_us", "mean": "mean_us", "p99": "p99_us"}.get(rank_by)
+    if attribute is None:
+        raise ValueError(f"Unknown rank_by: {rank_by}")
+    empty = OpStats()
+    rows: List[Dict[str, Any]] = []
+    for name, stats in current.items():
+        before = baseline.get(name, empty)
+        delta = getattr(stats, attribute) - getattr(before, attribute)
+        if delta <= 0:
+            continue
+        rows.append(
+            {
+                "op": name,
+                "baseline": before.as_dict(),
+                "current": stats.as_dict(),
+                "delta_total_us": stats.total_us - before.total_us,
+                "delta_mean_us": stats.mean_us - before.mean_us,
+                "delta_p99_us": stats.p99_us - before.p99_us,
+                "mean_ratio": stats.mean_us / before.mean_us if before.mean_us else None,
+                "_rank": delta,
+            }
+        )
+    rows.sort(key=lambda row: row["_rank"], reverse=True)
+    for row in rows:
+        del row["_rank"]
+    return rows[:top_n]
+
+
+def diff_profiler_ops(
+    baseline_dir: Union[Path, str],
+    current_dir: Union[Path, str],
+    top_n: int = 10,
+    rank_by: str = "total",
+    source: str = "auto",
+) -> List[Dict[str, Any]]:
+    """Aggregate two profiler dumps and list their top regressed operators."""
+    baseline = aggregate_profiler_ops(baseline_dir, source=source)
+    current = aggregate_profiler_ops(current_dir, source=source)
+    return diff_op_profiles(baseline, current, top_n=top_n, rank_by=rank_by)
@@ -0,0 +1,316 @@
+"""
+Long-running ``npu-smi`` sampler with a fixed cadence and drift correction.
+
+``collect_npu_smi`` is convenient for one-off snapshots, but polling it at 1 Hz
+creates one pretty-printed JSON file per sample. :class:`NpuSampler` keeps a
+single append-only JSON-lines log open for its whole lifetime, schedules ticks
+on an absolute grid so slow samples do not accumulate drift, and records how
+much time it spends on its own bookkeeping per tick.
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+from monitoring.data_collection.collect_npu import (
+    NPU_SMI_COMMAND,
+    build_npu_payload,
+    utc_timestamp,
+)
+
+__all__ = [
+    "SamplerStats",
+    "RollingLog",
+    "NpuSampler",
+    "iter_sampler_log",
+]
+
+
+@dataclass
+class SamplerStats:
+    """Running counters describing sampler health and self-overhead."""
+
+    ticks: int = 0
+    missed_ticks: int = 0
+    errors: int = 0
+    # Payloads the sink raised on; the sampler keeps its cadence regardless.
+    sink_errors: int = 0
+    last_sink_error: Optional[str] = None
+    command_seconds_total: float = 0.0
+    overhead_seconds_total: float = 0.0
+    overhead_seconds_max: float = 0.0
+    last_overhead_seconds: float = 0.0
+    last_lag_seconds: float = 0.0
+
+    def record(self, command_seconds: float, overhead_seconds: float, lag_seconds: float) -> None:
+        self.ticks += 1
+        self.command_seconds_total += command_seconds
+        self.overhead_seconds_total += overhead_seconds
+        self.overhead_seconds_max = max(self.overhead_seconds_max, overhead_seconds)
+        self.last_overhead_seconds = overhead_seconds
+        self.last_lag_seconds = lag_seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        ticks = self.ticks or 1
+        return {
+            "ticks": float(self.ticks),
+            "missed_ticks": float(self.missed_ticks),
+            "errors": float(self.errors),
+            "sink_errors": float(self.sink_errors),
+            "mean_command_seconds": self.command_seconds_total / ticks,
+            "mean_overhead_seconds": self.overhead_seconds_total / ticks,
+            "max_overhead_seconds": self.overhead_seconds_max,
+            "last_lag_seconds": self.last_lag_seconds,
+        }
+
+
+class RollingLog:
+    """Append-only JSON-lines log rotated by size.
+
+    Rotation follows the ``logging.handlers.RotatingFileHandler`` convention:
+    ``npu.jsonl`` is the live file and ``npu.jsonl.1`` .. ``npu.jsonl.N`` hold
+    older segments, ``.1`` being the most recent one.
+    """
+
+    def __init__(
+        self,
+        path: Union[Path, str],
+        max_bytes: int = 64 * 1024 * 1024,
+        backups: int = 5,
+    ) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle: Optional[IO[bytes]] = None
+        self._size = 0
+        self._open()
+
+    def _open(self) -> None:
+        self._handle = self.path.open("ab")
+        self._size = self._handle.tell()
+
+    def _rotate(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+        if self.backups > 0:
+            for idx in range(self.backups - 1, 0, -1):
+                older = self.path.with_name(f"{self.path.name}.{idx}")
+                if older.exists():
+                    os.replace(older, self.path.with_name(f"{self.path.name}.{idx + 1}"))
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self._open()
+
+    def write(self, payload: Dict[str, Any]) -> int:
+        """Append one payload as a compact JSON line and return its size in bytes."""
+        data = (json.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
+        if self.max_bytes and self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        assert self._handle is not None
+        self._handle.write(data)
+        self._handle.flush()
+        self._size += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+def iter_sampler_log(
+    path: Union[Path, str], include_rotated: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """Yield payloads from a sampler log, oldest first.
+
+    Each item has the same shape as the dicts ``load_npu_payloads`` returns.
+    Truncated trailing lines (e.g. after a crash) are skipped.
+    """
+    path = Path(path)
+    segments: List[Path] = []
+    if include_rotated:
+        rotated = sorted(
+            (
+                candidate
+                for candidate in path.parent.glob(f"{path.name}.*")
+                if candidate.suffix[1:].isdigit()
+            ),
+            key=lambda candidate: int(candidate.suffix[1:]),
+            reverse=True,
+        )
+        segments.extend(rotated)
+    if path.exists():
+        segments.append(path)
+    for segment in segments:
+        with segment.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+class NpuSampler:
+    """Poll ``npu-smi`` (or a stand-in command) on a fixed, drift-corrected cadence.
+
+    Ticks are scheduled at ``start + n * interval`` on the monotonic clock. When
+    a tick overruns, the sampler skips the deadlines it already missed instead of
+    firing them back to back, and counts them in :attr:`stats`.
+
+    ``command`` is any argv whose stdout looks like ``npu-smi info``; tests can
+    point it at a small script. ``sink`` replaces the rolling log when payloads
+    should go elsewhere (for example a batched writer).
+    """
+
+    def __init__(
+        self,
+        log_path: Optional[Union[Path, str]] = None,
+        interval: float = 1.0,
+        command: Sequence[str] = NPU_SMI_COMMAND,
+        lightweight: bool = True,
+        timeout: Optional[float] = None,
+        max_bytes: int = 64 * 1024 * 1024,
+        backups: int = 5,
+        sink: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if log_path is None and sink is None:
+            raise ValueError("Either log_path or sink must be provided")
+        self.interval = float(interval)
+        self.command = list(command)
+        self.lightweight = lightweight
+        self.timeout = timeout if timeout is not None else self.interval
+        self.stats = SamplerStats()
+        self._log: Optional[RollingLog] = None
+        if sink is None:
+            assert log_path is not None
+            self._log = RollingLog(log_path, max_bytes=max_bytes, backups=backups)
+            sink = self._log.write
+        self._sink = sink
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run_command(self) -> Optional[str]:
+        try:
+            completed = subprocess.run(
+                self.command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                timeout=self.timeout,
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            self.stats.errors += 1
+            return None
+        return completed.stdout
+
+    def sample_once(self, lag_seconds: float = 0.0) -> Dict[str, Any]:
+        """Take one sample, hand it to the sink and update :attr:`stats`."""
+        tick_start = time.perf_counter()
+        timestamp = utc_timestamp()
+        command_start = time.perf_counter()
+        raw_output = self._run_command()
+        command_seconds = time.perf_counter() - command_start
+        payload = build_npu_payload(raw_output, timestamp, lightweight=self.lightweight)
+        try:
+            self._sink(payload)
+        except Exception as exc:  # a failing sink must not end the sampling thread
+            self.stats.sink_errors += 1
+            self.stats.last_sink_error = f"{type(exc).__name__}: {exc}"
+        overhead = time.perf_counter() - tick_start - command_seconds
+        self.stats.record(command_seconds, overhead, lag_seconds)
+        return payload
+
+    def run(self, max_ticks: Optional[int] = None) -> SamplerStats:
+        """Sample until :meth:`stop` is called or ``max_ticks`` samples were taken."""
+        self._stop.clear()
+        origin = time.monotonic()
+        slot = 0
+        taken = 0
+        while not self._stop.is_set():
+            deadline = origin + slot * self.interval
+            delay = deadline - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            self.sample_once(lag_seconds=max(0.0, time.monotonic() - deadline))
+            taken += 1
+            if max_ticks is not None and taken >= max_ticks:
+                break
+            # Jump to the next deadline that is still in the future.
+            elapsed_slots = (time.monotonic() - origin) / self.interval
+            next_slot = max(slot + 1, int(math.floor(elapsed_slots)) + 1)
+            self.stats.missed_ticks += next_slot - slot - 1
+            slot = next_slot
+        return self.stats
+
+    def start(self) -> threading.Thread:
+        """Run the sampler on a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="npu-sampler", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: Optional[float] = None) -> SamplerStats:
+        """Stop the background loop (if any) and close the log."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._log is not None:
+            self._log.close()
+        return self.stats
+
+    def __enter__(self) -> "NpuSampler":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Continuously sample npu-smi into a rolling log.")
+    parser.add_argument("--log", default="data/logs/npu_smi.jsonl", help="rolling log path")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between samples")
+    parser.add_argument("--ticks", type=int, default=None, help="stop after N samples")
+    parser.add_argument("--full", action="store_true", help="keep raw output and all parsed fields")
+    parser.add_argument("--max-bytes", type=int, default=64 * 1024 * 1024)
+    parser.add_argument("--backups", type=int, default=5)
+    parser.add_argument(
+        "--command", nargs=argparse.REMAINDER, help="command to run instead of `npu-smi info`"
+    )
+    args = parser.parse_args(argv)
+
+    sampler = NpuSampler(
+        args.log,
+        interval=args.interval,
+        command=args.command or NPU_SMI_COMMAND,
+        lightweight=not args.full,
+        max_bytes=args.max_bytes,
+        backups=args.backups,
+    )
+    try:
+        sampler.run(max_ticks=args.ticks)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stats = sampler.stop()
+    print(json.dumps(stats.as_dict(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,25 @@
+"""In-process collect -> preprocess -> monitor -> detect pipeline (imported lazily).
+
+Run ``python -m monitoring.pipeline`` for the command-line entry point.
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "runner": ["STAGE_KINDS", "Stage", "StageStats", "PipelineReport", "Pipeline"],
+        "stages": [
+            "MetricSample",
+            "iter_npu_smi",
+            "npu_smi_source",
+            "replay_source",
+            "extract_stage",
+            "preprocess_stage",
+            "monitor_stage",
+            "detect_stage",
+            "jsonl_sink",
+            "store_sink",
+            "print_sink",
+        ],
+    },
+)
@@ -0,0 +1,84 @@
+"""
+Run the NPU health pipeline in one process.
+
+``python -m monitoring.pipeline`` polls ``npu-smi`` (or replays captured
+payloads with ``--replay``), scores every metric and prints flagged samples;
+``--log`` and ``--store`` add persistence sinks. Per-stage throughput and
+latency are printed as JSON when the stream ends or on Ctrl+C.
+"""
+import argparse
+import json
+from typing import List, Optional, Sequence
+
+from monitoring.data_collection.collect_npu import NPU_SMI_COMMAND
+from monitoring.pipeline.runner import Pipeline, Stage
+from monitoring.pipeline.stages import (
+    detect_stage,
+    extract_stage,
+    iter_npu_smi,
+    jsonl_sink,
+    monitor_stage,
+    npu_smi_source,
+    preprocess_stage,
+    print_sink,
+    replay_source,
+    store_sink,
+)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Collect, preprocess, monitor and detect NPU metrics in one process."
+    )
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between samples")
+    parser.add_argument("--ticks", type=int, default=None, help="stop after N samples")
+    parser.add_argument(
+        "--replay", nargs="+", default=None, help="payload files, directories or globs to replay"
+    )
+    parser.add_argument("--metrics", nargs="+", default=None, help="only process these metrics")
+    parser.add_argument("--clamp", nargs=2, type=float, metavar=("LOWER", "UPPER"))
+    parser.add_argument("--normalize-window", type=int, default=None)
+    parser.add_argument("--window", type=int, default=30, help="MonitoringModel window size")
+    parser.add_argument("--z", type=float, default=3.0, help="MonitoringModel anomaly z-score")
+    parser.add_argument("--threshold", type=float, default=3.0, help="score that flags a metric")
+    parser.add_argument("--log", default=None, help="append processed samples to this JSON-lines log")
+    parser.add_argument("--store", default=None, help="append processed samples to this TelemetryStore")
+    parser.add_argument("--all", action="store_true", help="print every sample, not only flagged ones")
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--mode", choices=("async", "sync"), default="async")
+    parser.add_argument(
+        "--command", nargs=argparse.REMAINDER, help="command to run instead of `npu-smi info`"
+    )
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        source = replay_source(args.replay)
+    elif args.mode == "async":
+        source = npu_smi_source(args.interval, args.ticks, args.command or NPU_SMI_COMMAND)
+    else:
+        source = iter_npu_smi(args.interval, args.ticks, args.command or NPU_SMI_COMMAND)
+    stages: List[Stage] = [extract_stage(args.metrics)]
+    if args.clamp or args.normalize_window:
+        stages.append(preprocess_stage(args.clamp, args.normalize_window))
+    stages.extend([monitor_stage(args.window, args.z), detect_stage(args.threshold)])
+    if args.log:
+        stages.append(jsonl_sink(args.log))
+    if args.store:
+        stages.append(store_sink(args.store))
+    stages.append(print_sink(only_flagged=not args.all))
+
+    pipeline = Pipeline(source, stages, queue_size=args.queue_size)
+    try:
+        if args.mode == "async":
+            pipeline.run()
+        else:
+            pipeline.run_sync()
+    except KeyboardInterrupt:
+        pass
+    if pipeline.report is not None:
+        print(json.dumps(pipeline.report.as_dict(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
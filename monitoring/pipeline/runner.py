@@ -0,0 +1,395 @@
+"""
+Bounded, instrumented stage runner for in-process telemetry pipelines.
+
+Collection, preprocessing, monitoring and detection used to hand off through
+files: every sample was written as JSON, read back, turned into lists and
+scanned again. :class:`Pipeline` chains the same steps as :class:`Stage`
+objects and passes each item straight from one stage to the next:
+
+* ``run()`` drives the stages as asyncio tasks joined by bounded queues, so a
+  slow stage holds back its producers instead of letting memory grow, and
+  blocking stages (subprocesses, disk) can run in the default executor;
+* ``iter()`` / ``run_sync()`` chain the stages as plain generators, one item
+  at a time, for callers that are not in an event loop.
+
+Every stage records items in and out, errors, time spent working, waiting for
+input and blocked on a full queue, plus a latency sketch; the report also has
+the end-to-end latency from the moment the source produced an item.
+Persistence is just another stage (``kind="sink"``).
+"""
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from utils.stream_stats.sketch import QuantileSketch
+
+__all__ = ["STAGE_KINDS", "Stage", "StageStats", "PipelineReport", "Pipeline"]
+
+STAGE_KINDS = ("map", "flat_map", "sink")
+_ON_ERROR = ("raise", "skip")
+# Marks the end of the stream on every queue.
+_DONE = object()
+
+Source = Union[Iterable[Any], AsyncIterable[Any]]
+_Envelope = Tuple[Any, float]
+
+
+@dataclass
+class Stage:
+    """One processing step.
+
+    ``kind`` decides what ``func(item)`` means: ``"map"`` forwards its return
+    value (``None`` drops the item), ``"flat_map"`` forwards every element of
+    the iterable it returns, and ``"sink"`` consumes the item (for example by
+    writing it somewhere) and forwards it unchanged. ``func`` may be a
+    coroutine function when the pipeline runs under asyncio; ``blocking=True``
+    runs a plain function in the default executor so it does not stall the
+    other stages. ``close`` is called once the stream ends.
+    """
+
+    name: str
+    func: Callable[[Any], Any]
+    kind: str = "map"
+    blocking: bool = False
+    close: Optional[Callable[[], Any]] = None
+
+    def __post_init__(self) -> None:
+        if self.kind not in STAGE_KINDS:
+            raise ValueError(f"kind must be one of {STAGE_KINDS}")
+
+    @property
+    def is_async(self) -> bool:
+        return inspect.iscoroutinefunction(self.func)
+
+
+@dataclass
+class StageStats:
+    """Counters and timings for one stage (or the source)."""
+
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    blocked_seconds: float = 0.0
+    latency: QuantileSketch = field(default_factory=QuantileSketch)
+
+    def record(self, seconds: float) -> None:
+        self.busy_seconds += seconds
+        self.latency.add(seconds)
+
+    def as_dict(self, elapsed: float) -> Dict[str, float]:
+        elapsed = elapsed or 1.0
+        p50 = self.latency.quantile(0.5)
+        p99 = self.latency.quantile(0.99)
+        return {
+            "items_in": float(self.items_in),
+            "items_out": float(self.items_out),
+            "errors": float(self.errors),
+            "throughput_per_second": self.items_in / elapsed,
+            "latency_p50_ms": (p50 or 0.0) * 1e3,
+            "latency_p99_ms": (p99 or 0.0) * 1e3,
+            "busy_seconds": self.busy_seconds,
+            "wait_seconds": self.wait_seconds,
+            "blocked_seconds": self.blocked_seconds,
+            "utilization": self.busy_seconds / elapsed,
+        }
+
+
+@dataclass
+class PipelineReport:
+    """Outcome of one pipeline run."""
+
+    elapsed_seconds: float
+    stages: List[StageStats]
+    end_to_end: QuantileSketch
+    items: int = 0
+    results: Optional[List[Any]] = None
+
+    @property
+    def bottleneck(self) -> Optional[str]:
+        """Name of the stage that spent the most time working."""
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda stats: stats.busy_seconds).name
+
+    def as_dict(self) -> Dict[str, Any]:
+        p50 = self.end_to_end.quantile(0.5)
+        p99 = self.end_to_end.quantile(0.99)
+        return {
+            "elapsed_seconds": self.elapsed_seconds,
+            "items": self.items,
+            "throughput_per_second": self.items / (self.elapsed_seconds or 1.0),
+            "end_to_end_p50_ms": (p50 or 0.0) * 1e3,
+            "end_to_end_p99_ms": (p99 or 0.0) * 1e3,
+            "bottleneck": self.bottleneck,
+            "stages": {stats.name: stats.as_dict(self.elapsed_seconds) for stats in self.stages},
+        }
+
+
+class Pipeline:
+    """Run ``source`` through ``stages`` and report per-stage statistics.
+
+    ``source`` is any iterable or async iterable of items. ``queue_size``
+    bounds every inter-stage queue in asyncio mode. With ``on_error="skip"``
+    an item whose stage raises is counted in that stage's ``errors`` and
+    dropped; the default re-raises and stops the run. ``collect=True`` keeps
+    the items that leave the last stage in :attr:`PipelineReport.results`.
+    """
+
+    def __init__(
+        self,
+        source: Source,
+        stages: Sequence[Stage],
+        queue_size: int = 64,
+        on_error: str = "raise",
+        collect: bool = False,
+        source_blocking: bool = False,
+    ) -> None:
+        if queue_size <= 0:
+            raise ValueError("queue_size must be positive")
+        if on_error not in _ON_ERROR:
+            raise ValueError(f"on_error must be one of {_ON_ERROR}")
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names) or "source" in names:
+            raise ValueError("stage names must be unique and not 'source'")
+        self.source = source
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.on_error = on_error
+        self.collect = collect
+        self.source_blocking = source_blocking
+        self.report: Optional[PipelineReport] = None
+
+    # ------------------------------------------------------------- sync mode
+    def _handle_error(self, stats: StageStats) -> None:
+        stats.errors += 1
+        if self.on_error == "raise":
+            raise
+
+    def _close_stages(self) -> None:
+        for stage in self.stages:
+            if stage.close is not None:
+                stage.close()
+
+    def _iter_source(self, stats: StageStats) -> Iterator[_Envelope]:
+        if hasattr(self.source, "__aiter__"):
+            raise ValueError("async sources need the asyncio runner (Pipeline.run)")
+        iterator = iter(self.source)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            now = time.perf_counter()
+            stats.record(now - started)
+            stats.items_out += 1
+            yield item, now
+
+    def _iter_stage(
+        self, stage: Stage, stats: StageStats, upstream: Iterator[_Envelope]
+    ) -> Iterator[_Envelope]:
+        for item, born in upstream:
+            stats.items_in += 1
+            started = time.perf_counter()
+            try:
+                result = stage.func(item)
+                outputs = _outputs(stage, item, result)
+            except Exception:
+                stats.record(time.perf_counter() - started)
+                self._handle_error(stats)
+                continue
+            stats.record(time.perf_counter() - started)
+            for output in outputs:
+                stats.items_out += 1
+                yield output, born
+
+    def iter(self) -> Iterator[Any]:
+        """Yield the items leaving the last stage; :attr:`report` is set when exhausted."""
+        for stage in self.stages:
+            if stage.is_async:
+                raise ValueError(f"stage {stage.name!r} is a coroutine; use Pipeline.run")
+        source_stats = StageStats("source")
+        stage_stats = [StageStats(stage.name) for stage in self.stages]
+        end_to_end = QuantileSketch()
+        results: Optional[List[Any]] = [] if self.collect else None
+        started = time.perf_counter()
+        stream = self._iter_source(source_stats)
+        for stage, stats in zip(self.stages, stage_stats):
+            stream = self._iter_stage(stage, stats, stream)
+        items = 0
+        try:
+            for item, born in stream:
+                end_to_end.add(time.perf_counter() - born)
+                items += 1
+                if results is not None:
+                    results.append(item)
+                yield item
+        finally:
+            self._close_stages()
+            self.report = PipelineReport(
+                time.perf_counter() - started,
+                [source_stats, *stage_stats],
+                end_to_end,
+                items,
+                results,
+            )
+
+    def run_sync(self) -> PipelineReport:
+        """Run the whole stream as chained generators, without an event loop."""
+        for _item in self.iter():
+            pass
+        assert self.report is not None
+        return self.report
+
+    # ---------------------------------------------------------- asyncio mode
+    def run(self) -> PipelineReport:
+        """Run the stream under a new event loop (see :meth:`run_async`)."""
+        return asyncio.run(self.run_async())
+
+    async def run_async(self) -> PipelineReport:
+        """Run the stages as concurrent tasks joined by bounded queues."""
+        queues: List["asyncio.Queue[Any]"] = [
+            asyncio.Queue(self.queue_size) for _ in range(len(self.stages) + 1)
+        ]
+        source_stats = StageStats("source")
+        stage_stats = [StageStats(stage.name) for stage in self.stages]
+        end_to_end = QuantileSketch()
+        results: Optional[List[Any]] = [] if self.collect else None
+        counter = {"items": 0}
+        started = time.perf_counter()
+
+        async def _drain() -> None:
+            queue = queues[-1]
+            while True:
+                envelope = await queue.get()
+                if envelope is _DONE:
+                    return
+                item, born = envelope
+                end_to_end.add(time.perf_counter() - born)
+                counter["items"] += 1
+                if results is not None:
+                    results.append(item)
+
+        tasks = [asyncio.ensure_future(self._feed(queues[0], source_stats))]
+        for index, (stage, stats) in enumerate(zip(self.stages, stage_stats)):
+            tasks.append(
+                asyncio.ensure_future(self._work(stage, stats, queues[index], queues[index + 1]))
+            )
+        tasks.append(asyncio.ensure_future(_drain()))
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            self._close_stages()
+            self.report = PipelineReport(
+                time.perf_counter() - started,
+                [source_stats, *stage_stats],
+                end_to_end,
+                counter["items"],
+                results,
+            )
+        return self.report
+
+    async def _put(self, queue: "asyncio.Queue[Any]", envelope: Any, stats: StageStats) -> None:
+        if queue.full():
+            started = time.perf_counter()
+            await queue.put(envelope)
+            stats.blocked_seconds += time.perf_counter() - started
+        else:
+            queue.put_nowait(envelope)
+
+    async def _feed(self, queue: "asyncio.Queue[Any]", stats: StageStats) -> None:
+        if hasattr(self.source, "__aiter__"):
+            iterator = self.source.__aiter__()  # type: ignore[union-attr]
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                now = time.perf_counter()
+                stats.record(now - started)
+                stats.items_out += 1
+                await self._put(queue, (item, now), stats)
+        else:
+            loop = asyncio.get_running_loop()
+            iterator = iter(self.source)  # type: ignore[arg-type]
+            while True:
+                started = time.perf_counter()
+                if self.source_blocking:
+                    item = await loop.run_in_executor(None, next, iterator, _DONE)
+                else:
+                    item = next(iterator, _DONE)
+                if item is _DONE:
+                    break
+                now = time.perf_counter()
+                stats.record(now - started)
+                stats.items_out += 1
+                await self._put(queue, (item, now), stats)
+                # Let the stages run between items of an eager source.
+                await asyncio.sleep(0)
+        await queue.put(_DONE)
+
+    async def _work(
+        self,
+        stage: Stage,
+        stats: StageStats,
+        inbox: "asyncio.Queue[Any]",
+        outbox: "asyncio.Queue[Any]",
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            waited = time.perf_counter()
+            envelope = await inbox.get()
+            stats.wait_seconds += time.perf_counter() - waited
+            if envelope is _DONE:
+                await outbox.put(_DONE)
+                return
+            item, born = envelope
+            stats.items_in += 1
+            started = time.perf_counter()
+            try:
+                if stage.is_async:
+                    result = await stage.func(item)
+                elif stage.blocking:
+                    result = await loop.run_in_executor(None, stage.func, item)
+                else:
+                    result = stage.func(item)
+                outputs = _outputs(stage, item, result)
+            except Exception:
+                stats.record(time.perf_counter() - started)
+                self._handle_error(stats)
+                continue
+            stats.record(time.perf_counter() - started)
+            for output in outputs:
+                stats.items_out += 1
+                await self._put(outbox, (output, born), stats)
+
+
+def _outputs(stage: Stage, item: Any, result: Any) -> List[Any]:
+    if stage.kind == "sink":
+        return [item]
+    if stage.kind == "flat_map":
+        return list(result) if result is not None else []
+    return [] if result is None else [result]
@@ -0,0 +1,257 @@
+"""
+Ready-made sources and stages for the NPU health pipeline.
+
+A typical chain is ``npu_smi_source() -> extract -> preprocess -> monitor ->
+detect -> sink``. The transforms wrap the existing building blocks (payload
+parsing from :mod:`monitoring.data_collection.collect_npu`, ``clamp`` and
+``normalize`` from :mod:`utils.data_preprocessing.preprocess`, one
+:class:`MonitoringModel` per metric, ``detect_spikes``) so they work one
+sample at a time; state such as rolling windows lives in the stage closures.
+"""
+import asyncio
+import json
+import math
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from fault_detection.fault_analysis.detection import detect_spikes
+from models.monitoring_model.model import MonitoringModel
+from monitoring.analysis.dashboard import PayloadTailer
+from monitoring.analysis.timeseries import numeric_metrics
+from monitoring.data_collection.collect_npu import NPU_SMI_COMMAND, flatten_device_metrics
+from monitoring.data_collection.sampler import NpuSampler, RollingLog
+from monitoring.pipeline.runner import Stage
+from monitoring.storage.telemetry_store import TelemetryStore
+from utils.data_preprocessing.preprocess import clamp
+from utils.stream_stats.rolling import RollingWindow
+
+__all__ = [
+    "MetricSample",
+    "iter_npu_smi",
+    "npu_smi_source",
+    "replay_source",
+    "extract_stage",
+    "preprocess_stage",
+    "monitor_stage",
+    "detect_stage",
+    "jsonl_sink",
+    "store_sink",
+    "print_sink",
+]
+
+
+@dataclass
+class MetricSample:
+    """Numeric metrics of one payload as they move through the pipeline."""
+
+    timestamp: str
+    values: Dict[str, float]
+    scores: Dict[str, float] = field(default_factory=dict)
+    flagged: List[str] = field(default_factory=list)
+    collector: str = "npu-smi"
+
+    def as_payload(self) -> Dict[str, Any]:
+        """Collector-style payload; ``metrics`` holds the processed values."""
+        payload: Dict[str, Any] = {
+            "collector": self.collector,
+            "timestamp": self.timestamp,
+            "metrics": dict(self.values),
+        }
+        if self.scores:
+            payload["scores"] = dict(self.scores)
+        if self.flagged:
+            payload["flagged"] = list(self.flagged)
+        return payload
+
+
+# ----------------------------------------------------------------- sources
+def _sampler(command: Sequence[str], lightweight: bool, interval: float) -> NpuSampler:
+    return NpuSampler(
+        interval=interval, command=command, lightweight=lightweight, sink=lambda _payload: None
+    )
+
+
+def _next_slot(origin: float, slot: int, interval: float) -> Tuple[int, int]:
+    """Next deadline still in the future and how many were missed (as ``NpuSampler.run``)."""
+    elapsed_slots = (time.monotonic() - origin) / interval
+    next_slot = max(slot + 1, int(math.floor(elapsed_slots)) + 1)
+    return next_slot, next_slot - slot - 1
+
+
+def iter_npu_smi(
+    interval: float = 1.0,
+    ticks: Optional[int] = None,
+    command: Sequence[str] = NPU_SMI_COMMAND,
+    lightweight: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """Yield ``npu-smi`` payloads on a drift-corrected cadence (blocking)."""
+    sampler = _sampler(command, lightweight, interval)
+    origin = time.monotonic()
+    slot = taken = 0
+    while ticks is None or taken < ticks:
+        delay = origin + slot * interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield sampler.sample_once()
+        taken += 1
+        slot, missed = _next_slot(origin, slot, interval)
+        sampler.stats.missed_ticks += missed
+
+
+async def npu_smi_source(
+    interval: float = 1.0,
+    ticks: Optional[int] = None,
+    command: Sequence[str] = NPU_SMI_COMMAND,
+    lightweight: bool = True,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async :func:`iter_npu_smi`: the command runs in the default executor."""
+    sampler = _sampler(command, lightweight, interval)
+    loop = asyncio.get_running_loop()
+    origin = time.monotonic()
+    slot = taken = 0
+    while ticks is None or taken < ticks:
+        delay = origin + slot * interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        yield await loop.run_in_executor(None, sampler.sample_once)
+        taken += 1
+        slot, missed = _next_slot(origin, slot, interval)
+        sampler.stats.missed_ticks += missed
+
+
+def replay_source(paths: Iterable[Union[Path, str]]) -> Iterator[Dict[str, Any]]:
+    """Replay payloads already on disk (files, directories or globs, see :class:`PayloadTailer`)."""
+    for payloads in PayloadTailer(paths).poll():
+        yield from payloads
+
+
+# -------------------------------------------------------------- transforms
+def extract_stage(metrics: Optional[Sequence[str]] = None) -> Stage:
+    """Payload -> :class:`MetricSample` with its numeric metrics.
+
+    Full payloads contribute their ``parsed`` fields and flattened device
+    table; lightweight ones are numeric already. ``metrics`` keeps only the
+    listed names. Placeholder payloads without numbers are dropped.
+    """
+    wanted = set(metrics) if metrics else None
+
+    def _extract(payload: Dict[str, Any]) -> Optional[MetricSample]:
+        block = payload.get("metrics") or {}
+        values = numeric_metrics(block)
+        devices = block.get("devices")
+        if devices:
+            values.update(flatten_device_metrics(devices))
+        if wanted is not None:
+            values = {name: value for name, value in values.items() if name in wanted}
+        if not values:
+            return None
+        return MetricSample(
+            str(payload.get("timestamp", "")), values, collector=payload.get("collector", "npu-smi")
+        )
+
+    return Stage("extract", _extract)
+
+
+def preprocess_stage(
+    clamp_range: Optional[Tuple[float, float]] = None,
+    normalize_window: Optional[int] = None,
+) -> Stage:
+    """Clamp values into ``clamp_range`` and/or min-max normalize them.
+
+    ``normalize`` scales a whole list at once; on a stream each metric is
+    scaled against its last ``normalize_window`` values instead, which is
+    ``normalize(window)[-1]``.
+    """
+    windows: Dict[str, RollingWindow] = {}
+
+    def _preprocess(sample: MetricSample) -> MetricSample:
+        names = list(sample.values)
+        values = [sample.values[name] for name in names]
+        if clamp_range is not None:
+            values = clamp(values, *clamp_range)
+        if normalize_window:
+            scaled = []
+            for name, value in zip(names, values):
+                window = windows.get(name)
+                if window is None:
+                    window = windows[name] = RollingWindow(normalize_window)
+                window.push(value)
+                span = window.max - window.min or 1.0
+                scaled.append((value - window.min) / span)
+            values = scaled
+        sample.values = dict(zip(names, values))
+        return sample
+
+    return Stage("preprocess", _preprocess)
+
+
+def monitor_stage(window_size: int = 5, anomaly_z: float = 3.0) -> Stage:
+    """Score every metric with its own :class:`MonitoringModel`."""
+    monitors: Dict[str, MonitoringModel] = {}
+
+    def _monitor(sample: MetricSample) -> MetricSample:
+        for name, value in sample.values.items():
+            monitor = monitors.get(name)
+            if monitor is None:
+                monitor = monitors[name] = MonitoringModel(window_size, anomaly_z)
+            sample.scores[name] = monitor.update(value)
+        return sample
+
+    return Stage("monitor", _monitor)
+
+
+def detect_stage(threshold: float = 3.0, drop_clean: bool = False) -> Stage:
+    """Flag metrics whose score exceeds ``threshold`` (``detect_spikes`` over the scores).
+
+    With ``drop_clean=True`` only flagged samples continue downstream.
+    """
+
+    def _detect(sample: MetricSample) -> Optional[MetricSample]:
+        names = list(sample.scores)
+        sample.flagged = [names[idx] for idx in detect_spikes(sample.scores.values(), threshold)]
+        if drop_clean and not sample.flagged:
+            return None
+        return sample
+
+    return Stage("detect", _detect)
+
+
+# ------------------------------------------------------------------- sinks
+def _as_payload(item: Any) -> Dict[str, Any]:
+    return item.as_payload() if isinstance(item, MetricSample) else item
+
+
+def jsonl_sink(
+    path: Union[Path, str], max_bytes: int = 64 * 1024 * 1024, backups: int = 5
+) -> Stage:
+    """Append items to a rotating JSON-lines log (``RollingLog``)."""
+    log = RollingLog(path, max_bytes=max_bytes, backups=backups)
+    return Stage(
+        "jsonl_sink", lambda item: log.write(_as_payload(item)), kind="sink", close=log.close
+    )
+
+
+def store_sink(store: Union[TelemetryStore, Path, str]) -> Stage:
+    """Append sample values to a :class:`TelemetryStore`, flushed when the stream ends."""
+    if not isinstance(store, TelemetryStore):
+        store = TelemetryStore(store)
+
+    def _append(item: Any) -> None:
+        payload = _as_payload(item)
+        store.append(payload["timestamp"], numeric_metrics(payload.get("metrics") or {}))
+
+    return Stage("store_sink", _append, kind="sink", close=store.flush)
+
+
+def print_sink(only_flagged: bool = True) -> Stage:
+    """Print items (by default only samples with flagged metrics) as JSON lines."""
+
+    def _print(item: Any) -> None:
+        if only_flagged and isinstance(item, MetricSample) and not item.flagged:
+            return
+        sys.stdout.write(json.dumps(_as_payload(item), separators=(",", ":")) + "\n")
+
+    return Stage("print_sink", _print, kind="sink")
@@ -0,0 +1,16 @@
+"""Chunked on-disk telemetry storage (imported lazily).
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "telemetry_store": [
+            "TelemetryStore",
+            "to_epoch_seconds",
+            "import_payloads",
+            "append_payloads",
+            "import_json_payloads",
+        ],
+    },
+)
@@ -0,0 +1,367 @@
+"""
+Chunked columnar store for collector telemetry.
+
+Every sample used to live in its own JSON file, so loading a week of 1 Hz data
+meant hundreds of thousands of file opens and ``json.loads`` calls. The store
+keeps samples in append-only chunks: one ``.npy`` array per metric plus a sorted
+timestamp array, with a small JSON manifest recording each chunk's time span.
+Range queries only memory-map the chunks that overlap the requested window.
+
+Layout::
+
+    root/
+      manifest.json
+      chunk_000000/ts.npy         float64 epoch seconds, non-decreasing
+      chunk_000000/m00000.npy     float64 values, NaN where a sample lacked the metric
+      ...
+"""
+import json
+import math
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from monitoring.data_collection.collect_npu import flatten_device_metrics
+
+__all__ = [
+    "TelemetryStore",
+    "to_epoch_seconds",
+    "import_payloads",
+    "append_payloads",
+    "import_json_payloads",
+]
+
+_MANIFEST = "manifest.json"
+_FORMAT_VERSION = 1
+
+
+def to_epoch_seconds(value: Any) -> float:
+    """Convert a payload timestamp (epoch number or ISO-8601 string) to epoch seconds.
+
+    Naive ISO strings and the ``...Z`` suffix written by the collectors are
+    treated as UTC.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    if text.endswith("Z"):
+        text = text[:-1]
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _numeric_fields(metrics: Mapping[str, Any]) -> Dict[str, float]:
+    parsed = metrics.get("parsed", metrics)
+    values = {
+        key: float(value)
+        for key, value in parsed.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+    # Full payloads carry the per-chip table next to ``parsed``.
+    devices = metrics.get("devices")
+    if isinstance(devices, Mapping) and devices:
+        values.update(flatten_device_metrics(devices))
+    return values
+
+
+class TelemetryStore:
+    """Append-only, chunked, one-array-per-metric telemetry store.
+
+    Samples are buffered in memory and written as a new chunk every
+    ``chunk_rows`` rows (or on :meth:`flush`/:meth:`close`). Timestamps must be
+    appended in non-decreasing order so each chunk's index stays sorted.
+    """
+
+    def __init__(self, root: Union[Path, str], chunk_rows: int = 65536) -> None:
+        if chunk_rows <= 0:
+            raise ValueError("chunk_rows must be positive")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.chunk_rows = chunk_rows
+        self._metrics: List[str] = []
+        self._metric_index: Dict[str, int] = {}
+        self._chunks: List[Dict[str, Any]] = []
+        self._chunk_starts: List[float] = []
+        self._chunk_ends: List[float] = []
+        self._load_manifest()
+        self._pending_ts: List[float] = []
+        self._pending: Dict[str, List[float]] = {}
+
+    # ------------------------------------------------------------------ manifest
+    def _load_manifest(self) -> None:
+        manifest_path = self.root / _MANIFEST
+        if not manifest_path.exists():
+            return
+        manifest = json.loads(manifest_path.read_text())
+        if manifest.get("version") != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported telemetry store version: {manifest.get('version')}")
+        self._metrics = list(manifest["metrics"])
+        self._metric_index = {name: idx for idx, name in enumerate(self._metrics)}
+        self._chunks = list(manifest["chunks"])
+        self._chunk_starts = [chunk["start"] for chunk in self._chunks]
+        self._chunk_ends = [chunk["end"] for chunk in self._chunks]
+
+    def _write_manifest(self) -> None:
+        manifest = {
+            "version": _FORMAT_VERSION,
+            "metrics": self._metrics,
+            "chunks": self._chunks,
+        }
+        tmp_path = self.root / (_MANIFEST + ".tmp")
+        tmp_path.write_text(json.dumps(manifest, separators=(",", ":")))
+        os.replace(tmp_path, self.root / _MANIFEST)
+
+    # ------------------------------------------------------------------- writing
+    @property
+    def metrics(self) -> List[str]:
+        names = list(self._metrics)
+        names.extend(name for name in self._pending if name not in self._metric_index)
+        return names
+
+    def __len__(self) -> int:
+        return sum(chunk["rows"] for chunk in self._chunks) + len(self._pending_ts)
+
+    def _last_timestamp(self) -> float:
+        if self._pending_ts:
+            return self._pending_ts[-1]
+        if self._chunk_ends:
+            return self._chunk_ends[-1]
+        return -math.inf
+
+    def append(self, timestamp: Any, values: Mapping[str, float]) -> None:
+        """Buffer one sample; ``timestamp`` may be epoch seconds or ISO-8601."""
+        ts = to_epoch_seconds(timestamp)
+        if ts < self._last_timestamp():
+            raise ValueError("Telemetry must be appended in timestamp order")
+        row = len(self._pending_ts)
+        for name, value in values.items():
+            column = self._pending.get(name)
+            if column is None:
+                column = self._pending[name] = []
+            if len(column) < row:
+                column.extend([math.nan] * (row - len(column)))
+            column.append(float(value))
+        self._pending_ts.append(ts)
+        if len(self._pending_ts) >= self.chunk_rows:
+            self.flush()
+
+    def append_many(
+        self, timestamps: Sequence[float], columns: Mapping[str, Sequence[float]]
+    ) -> None:
+        """Append already-columnar data (epoch-second timestamps) in bulk."""
+        ts = np.asarray(timestamps, dtype=np.float64)
+        if ts.size == 0:
+            return
+        if np.any(np.diff(ts) < 0) or ts[0] < self._last_timestamp():
+            raise ValueError("Telemetry must be appended in timestamp order")
+        arrays = {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+        for name, values in arrays.items():
+            if values.shape != ts.shape:
+                raise ValueError(f"Column {name!r} does not match the timestamp length")
+        self.flush()
+        for offset in range(0, ts.size, self.chunk_rows):
+            stop = offset + self.chunk_rows
+            self._write_chunk(
+                ts[offset:stop], {name: values[offset:stop] for name, values in arrays.items()}
+            )
+        self._write_manifest()
+
+    def _write_chunk(self, ts: np.ndarray, columns: Mapping[str, np.ndarray]) -> None:
+        chunk_id = f"chunk_{len(self._chunks):06d}"
+        chunk_dir = self.root / chunk_id
+        chunk_dir.mkdir(exist_ok=True)
+        np.save(chunk_dir / "ts.npy", ts)
+        present: List[int] = []
+        for name, values in columns.items():
+            idx = self._metric_index.get(name)
+            if idx is None:
+                idx = self._metric_index[name] = len(self._metrics)
+                self._metrics.append(name)
+            np.save(chunk_dir / f"m{idx:05d}.npy", values)
+            present.append(idx)
+        self._chunks.append(
+            {
+                "id": chunk_id,
+                "rows": int(ts.size),
+                "start": float(ts[0]),
+                "end": float(ts[-1]),
+                "columns": sorted(present),
+            }
+        )
+        self._chunk_starts.append(float(ts[0]))
+        self._chunk_ends.append(float(ts[-1]))
+
+    def flush(self) -> None:
+        """Write buffered samples as a new chunk and publish it in the manifest."""
+        if not self._pending_ts:
+            return
+        rows = len(self._pending_ts)
+        columns: Dict[str, np.ndarray] = {}
+        for name, values in self._pending.items():
+            if len(values) < rows:
+                values.extend([math.nan] * (rows - len(values)))
+            columns[name] = np.asarray(values, dtype=np.float64)
+        self._write_chunk(np.asarray(self._pending_ts, dtype=np.float64), columns)
+        self._pending_ts = []
+        self._pending = {}
+        self._write_manifest()
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "TelemetryStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------- reading
+    def time_range(self) -> Optional[Tuple[float, float]]:
+        """Return ``(first, last)`` timestamps on disk and in the buffer, if any."""
+        first = self._chunk_starts[0] if self._chunk_starts else None
+        if first is None and self._pending_ts:
+            first = self._pending_ts[0]
+        if first is None:
+            return None
+        return first, self._last_timestamp()
+
+    def _overlapping_chunks(self, start: float, end: float) -> range:
+        # Chunks are appended in time order, so both start and end lists are sorted.
+        first = bisect_left(self._chunk_ends, start)
+        last = bisect_right(self._chunk_starts, end)
+        return range(first, last)
+
+    def _load_column(self, chunk: Mapping[str, Any], name: str) -> np.ndarray:
+        idx = self._metric_index.get(name)
+        if idx is None or idx not in chunk["columns"]:
+            return np.full(chunk["rows"], np.nan)
+        return np.load(self.root / chunk["id"] / f"m{idx:05d}.npy", mmap_mode="r")
+
+    def iter_range(
+        self,
+        metrics: Sequence[str],
+        start: Optional[Any] = None,
+        end: Optional[Any] = None,
+    ) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """Yield ``(timestamps, {metric: values})`` per chunk within ``[start, end]``.
+
+        On-disk chunks are returned as read-only memory-mapped slices, so
+        iterating a large range never holds more than one chunk's pages.
+        """
+        lower = -math.inf if start is None else to_epoch_seconds(start)
+        upper = math.inf if end is None else to_epoch_seconds(end)
+        for chunk_pos in self._overlapping_chunks(lower, upper):
+            chunk = self._chunks[chunk_pos]
+            ts = np.load(self.root / chunk["id"] / "ts.npy", mmap_mode="r")
+            lo = int(np.searchsorted(ts, lower, side="left"))
+            hi = int(np.searchsorted(ts, upper, side="right"))
+            if hi <= lo:
+                continue
+            yield ts[lo:hi], {name: self._load_column(chunk, name)[lo:hi] for name in metrics}
+        if self._pending_ts and self._pending_ts[-1] >= lower and self._pending_ts[0] <= upper:
+            ts = np.asarray(self._pending_ts, dtype=np.float64)
+            lo = int(np.searchsorted(ts, lower, side="left"))
+            hi = int(np.searchsorted(ts, upper, side="right"))
+            if hi > lo:
+                columns: Dict[str, np.ndarray] = {}
+                for name in metrics:
+                    values = np.full(ts.size, np.nan)
+                    pending = self._pending.get(name, [])
+                    values[: len(pending)] = pending
+                    columns[name] = values[lo:hi]
+                yield ts[lo:hi], columns
+
+    def read_many(
+        self,
+        metrics: Sequence[str],
+        start: Optional[Any] = None,
+        end: Optional[Any] = None,
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Return timestamps and one contiguous array per metric for a time range."""
+        parts = list(self.iter_range(metrics, start, end))
+        if not parts:
+            return np.empty(0), {name: np.empty(0) for name in metrics}
+        if len(parts) == 1:
+            ts, columns = parts[0]
+            return np.array(ts), {name: np.array(values) for name, values in columns.items()}
+        ts = np.concatenate([part[0] for part in parts])
+        return ts, {name: np.concatenate([part[1][name] for part in parts]) for name in metrics}
+
+    def read(
+        self, metric: str, start: Optional[Any] = None, end: Optional[Any] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(timestamps, values)`` for one metric within ``[start, end]``."""
+        ts, columns = self.read_many([metric], start, end)
+        return ts, columns[metric]
+
+
+def import_payloads(
+    payloads: Iterable[Mapping[str, Any]], store: TelemetryStore, flush: bool = True
+) -> int:
+    """Append collector payloads to ``store`` and return how many were imported.
+
+    Payloads are sorted by timestamp first. Samples that are not newer than the
+    store's last timestamp are skipped, so re-running an import over the same
+    files is a no-op. Payloads without a usable timestamp are ignored. With
+    ``flush=False`` the samples stay in the store's buffer (still readable)
+    until a full chunk accumulates, which suits frequent small imports.
+    """
+    return _append_records(payloads, store, flush, keep_ties=False)[0]
+
+
+def append_payloads(
+    payloads: Iterable[Mapping[str, Any]], store: TelemetryStore, flush: bool = True
+) -> Tuple[int, int]:
+    """Append payloads from a source that never repeats one; returns ``(appended, late)``.
+
+    Unlike :func:`import_payloads`, samples stamped with the store's last
+    timestamp are kept (another host reporting the same second). Samples older
+    than it cannot enter the time-ordered store; they are counted as ``late``.
+    """
+    return _append_records(payloads, store, flush, keep_ties=True)
+
+
+def _append_records(
+    payloads: Iterable[Mapping[str, Any]], store: TelemetryStore, flush: bool, keep_ties: bool
+) -> Tuple[int, int]:
+    records: List[Tuple[float, Dict[str, float]]] = []
+    for payload in payloads:
+        try:
+            ts = to_epoch_seconds(payload["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        records.append((ts, _numeric_fields(payload.get("metrics", {}))))
+    records.sort(key=lambda record: record[0])
+    last = store.time_range()
+    imported = 0
+    for ts, values in records:
+        if last is not None and (ts < last[1] or (ts == last[1] and not keep_ties)):
+            continue
+        store.append(ts, values)
+        imported += 1
+    if flush:
+        store.flush()
+    return imported, len(records) - imported
+
+
+def import_json_payloads(paths: Iterable[Union[Path, str]], store: TelemetryStore) -> int:
+    """Import the one-JSON-file-per-sample layout written by ``collect_npu_smi``."""
+
+    def _payloads() -> Iterator[Mapping[str, Any]]:
+        for path in paths:
+            try:
+                yield json.loads(Path(path).read_text())
+            except (OSError, json.JSONDecodeError):
+                continue
+
+    return import_payloads(_payloads(), store)
@@ -0,0 +1,7 @@
+"""Shared preprocessing, streaming statistics and model helpers."""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submodules=["data_preprocessing", "lazy_import", "model_utils", "stream_stats"],
+)
@@ -0,0 +1,11 @@
+"""Series preprocessing and streaming JSON readers (imported lazily).
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "json_stream": ["iter_json_array"],
+        "preprocess": ["normalize", "clamp", "sliding_window"],
+    },
+)
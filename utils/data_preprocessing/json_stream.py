@@ -0,0 +1,150 @@
+"""Incremental JSON readers for files too large to ``json.loads`` at once.
+
+Profiler timelines and metric dumps are a single top-level array (optionally
+nested under one key of a top-level object). The reader below decodes one
+array element at a time from a bounded text buffer, so memory depends on the
+largest element rather than on the file size.
+"""
+import json
+import re
+from pathlib import Path
+from typing import IO, Any, Iterator, Optional, Union
+
+__all__ = ["iter_json_array"]
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DELIMITERS = frozenset(" \t\n\r,]}:")
+_SEPARATOR = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+
+
+class _Buffer:
+    def __init__(self, handle: IO[str], chunk_size: int) -> None:
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, minimum: int = 0) -> bool:
+        """Read another chunk (at least ``minimum`` chars); ``False`` at EOF."""
+        if self.eof:
+            return False
+        if self.pos > len(self.text) // 2:
+            self.text = self.text[self.pos :]
+            self.pos = 0
+        chunk = self.handle.read(max(self.chunk_size, minimum))
+        if not chunk:
+            self.eof = True
+            return False
+        self.text += chunk
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at EOF)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found!r}")
+        self.pos += 1
+
+    def decode(self, decoder: json.JSONDecoder) -> Any:
+        self.peek()
+        grow = self.chunk_size
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill(grow):
+                    raise
+                grow *= 2
+                continue
+            # A scalar cut at a chunk boundary may decode as a shorter value
+            # (e.g. "12" of "123" or "-1" of "-1.5"), so only trust it when
+            # the next character ends a JSON value.
+            if not self.eof and (end >= len(self.text) or self.text[end] not in _DELIMITERS):
+                if self.fill(grow):
+                    continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(
+    source: Union[Path, str, IO[str]],
+    key: Optional[str] = None,
+    chunk_size: int = 1 << 20,
+    missing_ok: bool = True,
+) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time.
+
+    When the document is an object, the array stored under ``key`` is streamed
+    instead (other values are decoded and discarded). If the key is missing,
+    nothing is yielded, or ``KeyError`` is raised when ``missing_ok=False``.
+    """
+    if isinstance(source, (str, Path)):
+        with Path(source).open("r", encoding="utf-8") as handle:
+            yield from iter_json_array(
+                handle, key=key, chunk_size=chunk_size, missing_ok=missing_ok
+            )
+        return
+
+    buffer = _Buffer(source, chunk_size)
+    decoder = json.JSONDecoder()
+    first = buffer.peek()
+    if first == "{":
+        buffer.pos += 1
+        while True:
+            if buffer.peek() == "}":
+                if not missing_ok:
+                    raise KeyError(key)
+                return
+            name = buffer.decode(decoder)
+            buffer.expect(":")
+            if name == key and buffer.peek() == "[":
+                break
+            buffer.decode(decoder)
+            if buffer.peek() == ",":
+                buffer.pos += 1
+    buffer.expect("[")
+    if buffer.peek() == "]":
+        buffer.pos += 1
+        return
+    scan = decoder.scan_once
+    separator_at = _SEPARATOR.match
+    while True:
+        # Fast path: decode every complete element already in the buffer
+        # without per-element method calls.
+        text = buffer.text
+        pos = buffer.pos
+        limit = len(text)
+        while True:
+            try:
+                value, end = scan(text, pos)
+            except (StopIteration, json.JSONDecodeError):
+                break
+            if end >= limit and not buffer.eof:
+                break
+            match = separator_at(text, end)
+            if match is None or (match.end() >= limit and not buffer.eof):
+                break
+            yield value
+            pos = match.end()
+            if match.group(1) == "]":
+                buffer.pos = pos
+                return
+        buffer.pos = pos
+        # Slow path: one element that straddles a chunk boundary (or is malformed).
+        yield buffer.decode(decoder)
+        separator = buffer.peek()
+        buffer.pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Malformed JSON array: unexpected {separator!r}")
+        buffer.peek()
@@ -0,0 +1,60 @@
+"""
+PEP 562 lazy attribute loading for package facades.
+
+Package ``__init__`` modules use :func:`attach` to expose their submodules and
+the public names of those submodules without importing any of them up front:
+``import monitoring.analysis`` stays cheap, and the first access to
+``monitoring.analysis.TimeSeriesFrame`` imports ``timeseries`` (and NumPy)
+only then. Resolved attributes are stored on the package, so each name goes
+through ``__getattr__`` once.
+"""
+import importlib
+import sys
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+__all__ = ["attach"]
+
+
+def attach(
+    package_name: str,
+    submodules: Iterable[str] = (),
+    submod_attrs: Optional[Mapping[str, Sequence[str]]] = None,
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]], List[str]]:
+    """Build ``(__getattr__, __dir__, __all__)`` for the package ``package_name``.
+
+    ``submodules`` are exposed as attributes; ``submod_attrs`` maps a
+    submodule to the names it exports through the package (its submodules are
+    exposed too). A name may only come from one place, and must not shadow a
+    submodule, since importing that submodule would rebind the attribute.
+    """
+    modules = set(submodules)
+    attr_to_module: Dict[str, str] = {}
+    for module, names in (submod_attrs or {}).items():
+        modules.add(module)
+        for name in names:
+            if name in attr_to_module:
+                raise ValueError(
+                    f"{package_name}: {name!r} exported by both "
+                    f"{attr_to_module[name]!r} and {module!r}"
+                )
+            attr_to_module[name] = module
+    shadowed = modules.intersection(attr_to_module)
+    if shadowed:
+        raise ValueError(f"{package_name}: exports shadow submodules {sorted(shadowed)}")
+    exported = sorted(modules | set(attr_to_module))
+
+    def __getattr__(name: str) -> Any:
+        module = attr_to_module.get(name)
+        if module is not None:
+            value = getattr(importlib.import_module(f"{package_name}.{module}"), name)
+        elif name in modules:
+            value = importlib.import_module(f"{package_name}.{name}")
+        else:
+            raise AttributeError(f"module {package_name!r} has no attribute {name!r}")
+        setattr(sys.modules[package_name], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package_name])) | set(exported))
+
+    return __getattr__, __dir__, list(exported)
@@ -0,0 +1,17 @@
+"""Model loading helpers (imported lazily).
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "model_loader": ["INFERENCE_BACKENDS", "ModelLoader"],
+        "registry": [
+            "ModelRegistry",
+            "RegistryKey",
+            "RegistryStats",
+            "default_registry",
+            "file_digest",
+        ],
+    },
+)
@@ -1,28 +1,76 @@
 """Model loader utilities for both main and monitoring models."""
 from importlib import import_module
 from pathlib import Path
-from typing import Any, Type, Union
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional, Tuple, Type, Union
+
+if TYPE_CHECKING:
+    from utils.model_utils.registry import ModelRegistry
+
+# Inference backends: each class takes the weights path (plus backend
+# options) and provides load_weights(), predict(list), predict_batch(array,
+# out=None) and freeze().
+INFERENCE_BACKENDS: Dict[str, Tuple[str, str]] = {
+    "python": ("models.main_model.model", "MainModel"),
+    "onnxruntime": ("models.onnx_models.model", "OnnxModel"),
+}
 
 
 class ModelLoader:
     def __init__(
-        self, module_path: str, class_name: str, weights_path: Union[Path, str]
+        self,
+        module_path: str,
+        class_name: str,
+        weights_path: Union[Path, str],
+        registry: Optional["ModelRegistry"] = None,
+        options: Optional[Mapping[str, Any]] = None,
     ):
         self.module_path = module_path
         self.class_name = class_name
         self.weights_path = Path(weights_path)
+        self.registry = registry
+        self.options: Dict[str, Any] = dict(options or {})
+        self._model_cls: Optional[Type[Any]] = None
+
+    @classmethod
+    def for_backend(
+        cls,
+        backend: str,
+        weights_path: Union[Path, str],
+        registry: Optional["ModelRegistry"] = None,
+        **options: Any,
+    ) -> "ModelLoader":
+        """Loader for one of :data:`INFERENCE_BACKENDS`; ``options`` go to its constructor."""
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"backend must be one of {tuple(INFERENCE_BACKENDS)}")
+        module_path, class_name = INFERENCE_BACKENDS[backend]
+        return cls(module_path, class_name, weights_path, registry=registry, options=options)
 
     def _resolve_class(self) -> Type[Any]:
-        module = import_module(self.module_path)
-        return getattr(module, self.class_name)
+        if self._model_cls is None:
+            module = import_module(self.module_path)
+            self._model_cls = getattr(module, self.class_name)
+        return self._model_cls
 
     def load(self) -> Any:
+        """Build and load a new, private model instance."""
         model_cls = self._resolve_class()
-        instance = model_cls(self.weights_path)
+        instance = model_cls(self.weights_path, **self.options)
         if hasattr(instance, "load_weights"):
             instance.load_weights()
         return instance
 
+    def shared(self) -> Any:
+        """The shared, read-only instance for the current weights contents.
+
+        Comes from ``registry`` (the process-wide default registry if none was
+        given), so the file is loaded once per content hash; use :meth:`load`
+        for an instance you intend to modify.
+        """
+        from utils.model_utils.registry import default_registry
+
+        registry = self.registry if self.registry is not None else default_registry()
+        return registry.get(self)
+
     def exists(self) -> bool:
         """Quick check to validate that weights are present on disk."""
         return self.weights_path.exists()
@@ -0,0 +1,284 @@
+"""
+Process-wide registry of loaded models keyed by weights content.
+
+Fault campaigns, monitors and benchmarks often load the same weights file
+over and over. :class:`ModelRegistry` loads each ``(module, class, weights
+digest, options)`` once and hands every caller the same instance, frozen read-only
+when the model supports it (``freeze()``). A file is re-hashed only when its
+``stat`` signature (inode, size, mtime) changes, so a hit costs one
+``os.stat``; if the new contents hash differently, the entries built from the
+old contents are dropped and the next request loads the new ones. Entries
+are evicted least-recently-used once their estimated size (the model's
+``nbytes`` if it has one, else the weights file size) exceeds ``max_bytes``.
+
+Concurrent requests for the same key wait for a single load. In a forked
+child the registry keeps the parent's entries (shared copy-on-write) but
+starts with fresh locks and no in-flight loads.
+"""
+import hashlib
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from utils.model_utils.model_loader import ModelLoader
+
+__all__ = ["ModelRegistry", "RegistryKey", "RegistryStats", "default_registry", "file_digest"]
+
+_Stamp = Tuple[int, int, int]
+
+
+def _absolute(path: Union[Path, str]) -> Path:
+    # Cheaper than Path.resolve() on every hit; symlinked aliases of one file
+    # still share entries through the content digest.
+    return Path(os.path.abspath(path))
+
+
+def _stamp(path: Path) -> _Stamp:
+    stat = path.stat()
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def file_digest(path: Union[Path, str], chunk_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file, read ``chunk_size`` bytes at a time."""
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as handle:
+        for block in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _canonical_options(options: Dict[str, Any]) -> str:
+    """Hashable, order-independent form of loader options (nested lists/dicts allowed)."""
+    try:
+        return json.dumps(options, sort_keys=True, default=repr, separators=(",", ":"))
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"model options cannot be used as a registry key: {exc}") from exc
+
+
+@dataclass(frozen=True)
+class RegistryKey:
+    module_path: str
+    class_name: str
+    digest: str
+    options: str = "{}"
+
+
+@dataclass
+class RegistryStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    hashed: int = 0
+    bytes: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+@dataclass
+class _Entry:
+    model: Any
+    path: Path
+    nbytes: int
+
+
+class ModelRegistry:
+    """Shared, LRU-bounded cache of loaded models.
+
+    ``get`` takes a :class:`ModelLoader` and returns the shared instance for
+    the current contents of its weights file. Two loaders whose files have
+    identical contents share one instance. ``freeze=False`` skips freezing
+    (callers then must not modify the shared models).
+    """
+
+    def __init__(self, max_bytes: int = 512 << 20, freeze: bool = True) -> None:
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.max_bytes = max_bytes
+        self.freeze = freeze
+        self.stats = RegistryStats()
+        self._entries: "OrderedDict[RegistryKey, _Entry]" = OrderedDict()
+        self._digests: Dict[Path, Tuple[_Stamp, str]] = {}
+        self._reset_locks()
+        _REGISTRIES.add(self)
+
+    def _reset_locks(self) -> None:
+        self._lock = threading.Lock()
+        self._loading: Dict[RegistryKey, "Future[Any]"] = {}
+        self._hashing: Dict[Tuple[Path, _Stamp], "Future[str]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> List[RegistryKey]:
+        """Cached keys, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+    # ---------------------------------------------------------------- lookups
+    def digest(self, weights_path: Union[Path, str]) -> str:
+        """Content digest of ``weights_path``, re-hashed only when the file changed."""
+        path = _absolute(weights_path)
+        stamp = _stamp(path)
+        with self._lock:
+            cached = self._digests.get(path)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+            pending = self._hashing.get((path, stamp))
+            owner = pending is None
+            if owner:
+                pending = self._hashing[path, stamp] = Future()
+        assert pending is not None
+        if not owner:
+            return pending.result()
+        try:
+            digest = file_digest(path)
+        except BaseException as exc:
+            with self._lock:
+                self._hashing.pop((path, stamp), None)
+            pending.set_exception(exc)
+            raise
+        with self._lock:
+            self._hashing.pop((path, stamp), None)
+            self.stats.hashed += 1
+            previous = self._digests.get(path)
+            self._digests[path] = (stamp, digest)
+            if previous is not None and previous[1] != digest:
+                self._drop(path, keep=digest)
+        pending.set_result(digest)
+        return digest
+
+    def get(self, loader: "ModelLoader") -> Any:
+        """The shared model for ``loader``, loading it on first use."""
+        path = _absolute(loader.weights_path)
+        key = RegistryKey(
+            loader.module_path,
+            loader.class_name,
+            self.digest(path),
+            _canonical_options(loader.options),
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry.model
+            pending = self._loading.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._loading[key] = Future()
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+        assert pending is not None
+        if not owner:
+            return pending.result()
+        try:
+            model = loader.load()
+            if self.freeze and callable(getattr(model, "freeze", None)):
+                model.freeze()
+            nbytes = getattr(model, "nbytes", None)
+            if not isinstance(nbytes, int):
+                nbytes = path.stat().st_size
+        except BaseException as exc:
+            with self._lock:
+                self._loading.pop(key, None)
+            pending.set_exception(exc)
+            raise
+        with self._lock:
+            self._loading.pop(key, None)
+            # Only cache what still matches the file; it may have changed mid-load.
+            current = self._digests.get(path)
+            if current is None or current[1] == key.digest:
+                self._entries[key] = _Entry(model, path, nbytes)
+                self.stats.bytes += nbytes
+                self._evict()
+        pending.set_result(model)
+        return model
+
+    def warm(self, loaders: Iterable["ModelLoader"], background: bool = True) -> "Future[List[Any]]":
+        """Load ``loaders`` ahead of use; the future holds the models in order.
+
+        With ``background=True`` the loads run on a daemon thread and this
+        returns at once; callers that ask for the same models meanwhile wait
+        for the in-flight loads instead of repeating them.
+        """
+        loaders = list(loaders)
+        future: "Future[List[Any]]" = Future()
+
+        def _run() -> None:
+            try:
+                future.set_result([self.get(loader) for loader in loaders])
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        if background:
+            threading.Thread(target=_run, name="model-registry-warm", daemon=True).start()
+        else:
+            _run()
+        return future
+
+    # ----------------------------------------------------------- invalidation
+    def invalidate(self, weights_path: Optional[Union[Path, str]] = None) -> int:
+        """Drop the entries loaded from ``weights_path`` (all entries if ``None``)."""
+        with self._lock:
+            if weights_path is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._digests.clear()
+                self.stats.bytes = 0
+                self.stats.invalidations += dropped
+                return dropped
+            path = _absolute(weights_path)
+            self._digests.pop(path, None)
+            return self._drop(path)
+
+    def _drop(self, path: Path, keep: Optional[str] = None) -> int:
+        stale = [
+            key for key, entry in self._entries.items() if entry.path == path and key.digest != keep
+        ]
+        for key in stale:
+            self.stats.bytes -= self._entries.pop(key).nbytes
+        self.stats.invalidations += len(stale)
+        return len(stale)
+
+    def _evict(self) -> None:
+        # The newest entry always stays, even if it alone exceeds the budget.
+        while self.stats.bytes > self.max_bytes and len(self._entries) > 1:
+            _key, entry = self._entries.popitem(last=False)
+            self.stats.bytes -= entry.nbytes
+            self.stats.evictions += 1
+
+
+_REGISTRIES: "weakref.WeakSet[ModelRegistry]" = weakref.WeakSet()
+_DEFAULT: Optional[ModelRegistry] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_registry() -> ModelRegistry:
+    """The process-wide registry used by :meth:`ModelLoader.shared`."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = ModelRegistry()
+        return _DEFAULT
+
+
+def _after_fork_in_child() -> None:
+    # Locks held by other parent threads at fork time would never be released.
+    global _DEFAULT_LOCK
+    _DEFAULT_LOCK = threading.Lock()
+    for registry in list(_REGISTRIES):
+        registry._reset_locks()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
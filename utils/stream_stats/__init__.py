@@ -0,0 +1,19 @@
+"""One-pass and sliding-window statistics (imported lazily).
+"""
+from utils.lazy_import import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    submod_attrs={
+        "accumulator": ["StreamingStats"],
+        "rolling": [
+            "RollingWindow",
+            "rolling_mean",
+            "rolling_var",
+            "rolling_std",
+            "rolling_min",
+            "rolling_max",
+        ],
+        "sketch": ["QuantileSketch"],
+    },
+)
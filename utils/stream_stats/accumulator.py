@@ -0,0 +1,178 @@
+"""One-pass, mergeable summary statistics.
+
+``statistics.mean`` converts every value to an exact fraction and needs the
+whole series in memory. :class:`StreamingStats` keeps count, mean and the sum
+of squared deviations with Welford's update, exact min/max and a
+:class:`QuantileSketch` for approximate percentiles, so arbitrarily long
+streams are summarized in constant memory. Partial aggregates from different
+files, processes or nodes combine with :meth:`StreamingStats.merge`
+(Chan et al.'s parallel variance formula). NaNs are skipped; infinities
+count towards ``count``, min/max and the percentiles but not the mean and
+variance, which summarize the finite values.
+"""
+import math
+from itertools import islice
+from typing import Any, Dict, Iterable, Optional
+
+from utils.stream_stats.sketch import QuantileSketch
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy ships with MindSpore
+    np = None  # type: ignore[assignment]
+
+_BLOCK = 1 << 16
+
+__all__ = ["StreamingStats"]
+
+
+class StreamingStats:
+    """Count, mean, variance, min, max and p50/p95/p99 over a stream."""
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        self.count = 0
+        self.finite = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def add(self, value: float) -> None:
+        value = float(value)
+        if value != value:  # NaN
+            return
+        self.count += 1
+        if value - value == 0.0:  # finite
+            self.finite += 1
+            delta = value - self.mean
+            self.mean += delta / self.finite
+            self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.sketch.add(value)
+
+    def extend(self, values: Iterable[float]) -> "StreamingStats":
+        """Fold ``values`` in.
+
+        With NumPy available, the stream is consumed in fixed-size blocks that
+        are summarized vectorized and merged, so memory stays bounded.
+        """
+        if np is None:
+            for value in values:
+                self.add(value)
+            return self
+        if hasattr(values, "dtype"):
+            self._extend_array(values)
+            return self
+        iterator = iter(values)
+        while True:
+            block = np.fromiter(islice(iterator, _BLOCK), dtype=np.float64)
+            if not block.size:
+                return self
+            self._extend_array(block)
+
+    def _extend_array(self, values: Any) -> None:
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        batch = StreamingStats(self.sketch.relative_accuracy)
+        batch.count = int(values.size)
+        finite = values[np.isfinite(values)]
+        batch.finite = int(finite.size)
+        if finite.size:
+            batch.mean = float(finite.mean())
+            batch._m2 = float(np.square(finite - batch.mean).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        batch.sketch.add_array(values)
+        self.merge(batch)
+
+    def merge(self, other: "StreamingStats") -> "StreamingStats":
+        """Fold another partial aggregate into this one and return ``self``."""
+        if other.count == 0:
+            return self
+        if self.finite == 0:
+            self.finite, self.mean, self._m2 = other.finite, other.mean, other._m2
+        elif other.finite:
+            total = self.finite + other.finite
+            delta = other.mean - self.mean
+            self.mean += delta * other.finite / total
+            self._m2 += other._m2 + delta * delta * self.finite * other.finite / total
+            self.finite = total
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the finite values (matches ``statistics.pvariance``)."""
+        return self._m2 / self.finite if self.finite else 0.0
+
+    @property
+    def sample_variance(self) -> float:
+        return self._m2 / (self.finite - 1) if self.finite > 1 else 0.0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.sketch.quantile(q)
+
+    def as_rollup(self) -> Dict[str, float]:
+        """Summary in the ``compute_rollup`` shape (zeros for an empty stream)."""
+        if not self.count:
+            return {
+                "average": 0.0,
+                "max": 0.0,
+                "min": 0.0,
+                "count": 0.0,
+                "variance": 0.0,
+                "stddev": 0.0,
+                "p50": 0.0,
+                "p95": 0.0,
+                "p99": 0.0,
+            }
+        return {
+            "average": self.mean,
+            "max": self.max,
+            "min": self.min,
+            "count": float(self.count),
+            "variance": self.variance,
+            "stddev": self.stddev,
+            "p50": self.sketch.quantile(0.50) or 0.0,
+            "p95": self.sketch.quantile(0.95) or 0.0,
+            "p99": self.sketch.quantile(0.99) or 0.0,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly state for shipping partial aggregates between nodes."""
+        return {
+            "count": self.count,
+            "finite": self.finite,
+            "mean": self.mean,
+            "m2": self._m2,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "StreamingStats":
+        sketch = QuantileSketch.from_dict(state["sketch"])
+        stats = cls(sketch.relative_accuracy)
+        stats.sketch = sketch
+        stats.count = state["count"]
+        stats.finite = state.get("finite", state["count"])
+        stats.mean = state["mean"]
+        stats._m2 = state["m2"]
+        if state["count"]:
+            stats.min = state["min"]
+            stats.max = state["max"]
+        return stats
@@ -0,0 +1,293 @@
+"""Sliding-window statistics shared by the monitors and the analysis helpers.
+
+Two interchangeable paths are provided:
+
+* :class:`RollingWindow` updates mean, variance, min and max in O(1)
+  amortized time per sample. Mean and variance use the sliding form of
+  Welford's update (add the new sample and retire the evicted one in a single
+  step) on samples shifted by a recent window mean, so a large common offset
+  does not eat the digits of a small spread; min and max come from monotonic
+  deques. The moments are recomputed exactly every few windows, as soon as
+  the variance collapses far below the level it recently had (a level shift
+  or spike leaving the window), when the offset from the shift dwarfs the
+  spread, and when the update overflows. While the window holds magnitudes
+  whose squares could overflow, mean and deviation are computed exactly from
+  the window, scaled by its largest magnitude.
+* :func:`rolling_mean`, :func:`rolling_var`, :func:`rolling_std`,
+  :func:`rolling_min` and :func:`rolling_max` compute the same statistics over
+  a whole NumPy array at once. Moments come from cumulative sums taken block
+  by block around a local shift; windows whose variance is too small to trust
+  after that subtraction are recomputed directly from strided views. Min and
+  max use the van Herk/Gil-Werman block scan, O(n) for any window size.
+
+Both paths follow ``rolling_average``'s convention: until ``window`` samples
+have been seen, statistics cover the shorter prefix that is available.
+"""
+import math
+from collections import deque
+from typing import Deque, Optional, Sequence, Tuple
+
+import numpy as np
+
+__all__ = [
+    "RollingWindow",
+    "rolling_mean",
+    "rolling_var",
+    "rolling_std",
+    "rolling_min",
+    "rolling_max",
+]
+
+# Exact recompute cadence, in windows' worth of pushes.
+_REFRESH_WINDOWS = 8
+# Recompute once the sum of squared deviations falls below this fraction of
+# the largest value it held since the last recompute (streaming), or of the
+# block's shifted sum of squares (batch).
+_CANCELLATION_RATIO = 1e-6
+_EXACT_ROWS_BYTES = 1 << 24
+# Above this magnitude squared deviations may overflow; use the scaled exact path.
+_HUGE = 1e150
+
+
+class RollingWindow:
+    """Fixed-size sliding window with O(1) mean, variance, min and max."""
+
+    def __init__(self, size: int) -> None:
+        if size <= 0:
+            raise ValueError("window size must be positive")
+        self.size = size
+        self.values: Deque[float] = deque(maxlen=size)
+        # _mean is the mean of (value - _shift); _m2 its sum of squared deviations.
+        self._shift = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._stale = False
+        self._huge = False
+        self._m2_peak = 0.0
+        self._index = 0
+        self._since_refresh = 0
+        self._min: Deque[Tuple[int, float]] = deque()
+        self._max: Deque[Tuple[int, float]] = deque()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.size
+
+    def push(self, value: float) -> Optional[float]:
+        """Add ``value`` and return the sample it evicted, if any."""
+        value = float(value)
+        evicted: Optional[float] = None
+        if len(self.values) == self.size:
+            evicted = self.values[0]
+        if not self.values:
+            self._shift = value if -_HUGE <= value <= _HUGE else 0.0
+        self.values.append(value)
+
+        index = self._index
+        self._index += 1
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((index, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((index, value))
+        oldest = index - self.size
+        if self._min[0][0] <= oldest:
+            self._min.popleft()
+        if self._max[0][0] <= oldest:
+            self._max.popleft()
+
+        self._huge = not (-_HUGE <= self._min[0][1] and self._max[0][1] <= _HUGE)
+        if self._huge:
+            # Moments come from _exact_moments until the huge samples leave.
+            self._stale = True
+            return evicted
+        if self._stale:
+            self._refresh()
+            return evicted
+        shifted = value - self._shift
+        if evicted is not None:
+            retired = evicted - self._shift
+            old_mean = self._mean
+            self._mean += (shifted - retired) / self.size
+            self._m2 += (shifted - retired) * (shifted - self._mean + retired - old_mean)
+        else:
+            delta = shifted - self._mean
+            self._mean += delta / len(self.values)
+            self._m2 += delta * (shifted - self._mean)
+
+        self._since_refresh += 1
+        if self._m2 > self._m2_peak:
+            self._m2_peak = self._m2
+        if (
+            not self._m2 < math.inf  # overflowed (or NaN)
+            or self._m2 < self._m2_peak * _CANCELLATION_RATIO
+            or self._mean * self._mean * len(self.values) * _CANCELLATION_RATIO > self._m2
+            or self._since_refresh >= _REFRESH_WINDOWS * self.size
+        ):
+            self._refresh()
+        return evicted
+
+    def _refresh(self) -> None:
+        count = len(self.values)
+        shift = math.fsum(self.values) / count
+        # The rounded mean is only the new origin; the shifted mean keeps the
+        # digits it lost (samples near the shift subtract exactly).
+        shifted = [value - shift for value in self.values]
+        mean = math.fsum(shifted) / count
+        self._shift = shift
+        self._mean = mean
+        self._m2 = self._m2_peak = math.fsum((value - mean) ** 2 for value in shifted)
+        self._since_refresh = 0
+        self._stale = False
+
+    def _exact_moments(self) -> Tuple[float, float]:
+        """Mean and population deviation of the window, scaled against overflow."""
+        count = len(self.values)
+        scale = max(-self._min[0][1], self._max[0][1])
+        if not math.isfinite(scale):
+            mean = sum(self.values) / count
+            return mean, math.sqrt(sum((value - mean) ** 2 for value in self.values) / count)
+        scaled = [value / scale for value in self.values]
+        mean = math.fsum(scaled) / count
+        spread = math.fsum((value - mean) ** 2 for value in scaled) / count
+        return mean * scale, math.sqrt(spread) * scale
+
+    @property
+    def mean(self) -> float:
+        if not self.values:
+            return 0.0
+        if self._huge:
+            return self._exact_moments()[0]
+        return self._shift + self._mean
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the current window (``statistics.pvariance``)."""
+        if len(self.values) < 2 or self._max[0][1] == self._min[0][1]:
+            return 0.0
+        if self._huge:
+            return self._exact_moments()[1] ** 2
+        return max(self._m2, 0.0) / len(self.values)
+
+    @property
+    def std(self) -> float:
+        if self._huge and len(self.values) >= 2 and self._max[0][1] != self._min[0][1]:
+            return self._exact_moments()[1]
+        return self.variance ** 0.5
+
+    @property
+    def min(self) -> float:
+        return self._min[0][1] if self._min else 0.0
+
+    @property
+    def max(self) -> float:
+        return self._max[0][1] if self._max else 0.0
+
+
+def _as_array(values: Sequence[float]) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64).ravel()
+
+
+def _rolling_moments(
+    values: np.ndarray, window: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Per-position window count, mean, sum of squared deviations and a mask
+    of positions where that sum lost too many digits to cancellation."""
+    length = values.size
+    counts = np.minimum(np.arange(1, length + 1), window).astype(np.float64)
+    means = np.empty(length)
+    m2 = np.empty(length)
+    suspect = np.zeros(length, dtype=bool)
+    block = max(8 * window, 1 << 16)
+    for start in range(0, length, block):
+        stop = min(start + block, length)
+        origin = max(0, start - window + 1)
+        segment = values[origin:stop]
+        shift = segment.mean()
+        shifted = segment - shift
+        sums = np.concatenate(([0.0], np.cumsum(shifted)))
+        squares = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+        positions = np.arange(start, stop)
+        ends = positions - origin + 1
+        begins = np.maximum(positions - window + 1, 0) - origin
+        n = counts[start:stop]
+        window_sums = sums[ends] - sums[begins]
+        local_means = window_sums / n
+        means[start:stop] = local_means + shift
+        block_m2 = squares[ends] - squares[begins] - window_sums * local_means
+        suspect[start:stop] = block_m2 < squares[-1] * _CANCELLATION_RATIO
+        m2[start:stop] = np.maximum(block_m2, 0.0)
+    return counts, means, m2, suspect
+
+
+def _exact_m2(values: np.ndarray, window: int, positions: np.ndarray) -> np.ndarray:
+    """Sum of squared deviations for the windows ending at ``positions``."""
+    padded = np.concatenate((np.full(window - 1, np.nan), values))
+    views = np.lib.stride_tricks.sliding_window_view(padded, window)
+    out = np.empty(positions.size)
+    step = max(1, _EXACT_ROWS_BYTES // (8 * window))
+    for start in range(0, positions.size, step):
+        rows = views[positions[start : start + step]]
+        centred = rows - np.nanmean(rows, axis=1, keepdims=True)
+        out[start : start + step] = np.nansum(centred * centred, axis=1)
+    return out
+
+
+def rolling_mean(values: Sequence[float], window: int) -> np.ndarray:
+    """Vectorized trailing-window mean."""
+    array = _as_array(values)
+    if not array.size:
+        return array
+    return _rolling_moments(array, max(1, window))[1]
+
+
+def rolling_var(values: Sequence[float], window: int) -> np.ndarray:
+    """Vectorized trailing-window population variance."""
+    array = _as_array(values)
+    window = max(1, window)
+    if window == 1 or not array.size:
+        return np.zeros(array.size)
+    counts, _means, m2, suspect = _rolling_moments(array, window)
+    # Windows holding a single distinct value are exact zeros, as in RollingWindow.
+    constant = rolling_max(array, window) == rolling_min(array, window)
+    m2[constant] = 0.0
+    suspect &= ~constant
+    if suspect.any():
+        positions = np.flatnonzero(suspect)
+        m2[positions] = _exact_m2(array, window, positions)
+    return m2 / counts
+
+
+def rolling_std(values: Sequence[float], window: int) -> np.ndarray:
+    """Vectorized trailing-window population standard deviation."""
+    return np.sqrt(rolling_var(values, window))
+
+
+def _rolling_extreme(values: Sequence[float], window: int, ufunc: np.ufunc, fill: float) -> np.ndarray:
+    array = _as_array(values)
+    window = max(1, window)
+    if window == 1 or not array.size:
+        return array.copy()
+    length = array.size
+    blocks = -(-(length + window - 1) // window)
+    padded = np.full(blocks * window, fill)
+    padded[window - 1 : window - 1 + length] = array
+    padded = padded.reshape(blocks, window)
+    # Window [j, j + window) = tail of j's block + head of the next block.
+    prefix = ufunc.accumulate(padded, axis=1).ravel()
+    suffix = ufunc.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+    return ufunc(suffix[:length], prefix[window - 1 : window - 1 + length])
+
+
+def rolling_min(values: Sequence[float], window: int) -> np.ndarray:
+    """Vectorized trailing-window minimum."""
+    return _rolling_extreme(values, window, np.minimum, np.inf)
+
+
+def rolling_max(values: Sequence[float], window: int) -> np.ndarray:
+    """Vectorized trailing-window maximum."""
+    return _rolling_extreme(values, window, np.maximum, -np.inf)
@@ -0,0 +1,194 @@
+"""Mergeable quantile sketch with a relative-error guarantee.
+
+The sketch follows the DDSketch construction: values are mapped to
+logarithmically spaced buckets ``gamma ** (k - 1) < |v| <= gamma ** k`` so any
+quantile estimate is within ``relative_accuracy`` of a true sample value.
+Memory depends on the dynamic range of the data, not on the number of samples,
+and two sketches built with the same accuracy merge by adding bucket counts.
+NaNs are skipped; infinities are counted apart from the buckets and rank
+below (``-inf``) or above (``inf``) every finite value.
+"""
+import math
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy ships with MindSpore
+    np = None  # type: ignore[assignment]
+
+__all__ = ["QuantileSketch"]
+
+_MIN_INDEXABLE = 1e-12
+
+
+class QuantileSketch:
+    """Streaming, mergeable quantile estimator (DDSketch-style log buckets)."""
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048) -> None:
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive: Dict[int, float] = {}
+        self._negative: Dict[int, float] = {}
+        self._zero = 0.0
+        self._neg_inf = 0.0
+        self._pos_inf = 0.0
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, magnitude: float) -> int:
+        return int(math.ceil(math.log(magnitude) / self._log_gamma))
+
+    def _value(self, key: int) -> float:
+        return 2.0 * self._gamma ** key / (self._gamma + 1.0)
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        if value != value:  # NaN
+            return
+        if value == math.inf:
+            self._pos_inf += weight
+        elif value == -math.inf:
+            self._neg_inf += weight
+        elif value > _MIN_INDEXABLE:
+            key = self._key(value)
+            self._positive[key] = self._positive.get(key, 0.0) + weight
+            if len(self._positive) > self.max_buckets:
+                self._collapse(self._positive)
+        elif value < -_MIN_INDEXABLE:
+            key = self._key(-value)
+            self._negative[key] = self._negative.get(key, 0.0) + weight
+            if len(self._negative) > self.max_buckets:
+                self._collapse(self._negative)
+        else:
+            self._zero += weight
+        self.count += weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def extend(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def add_array(self, values: Any) -> None:
+        """Vectorized :meth:`add` for a NumPy array (NaNs are skipped)."""
+        if np is None:
+            self.extend(values)
+            return
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        finite = values[np.isfinite(values)]
+        if finite.size < values.size:
+            positive = float(np.count_nonzero(values == math.inf))
+            self._pos_inf += positive
+            self._neg_inf += values.size - finite.size - positive
+        for sign, buckets in ((1.0, self._positive), (-1.0, self._negative)):
+            magnitudes = finite[sign * finite > _MIN_INDEXABLE] * sign
+            if magnitudes.size:
+                keys, counts = np.unique(
+                    np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64),
+                    return_counts=True,
+                )
+                for key, count in zip(keys.tolist(), counts.tolist()):
+                    buckets[key] = buckets.get(key, 0.0) + count
+                if len(buckets) > self.max_buckets:
+                    self._collapse(buckets)
+        self._zero += float(np.count_nonzero(np.abs(finite) <= _MIN_INDEXABLE))
+        self.count += float(values.size)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def _collapse(self, buckets: Dict[int, float]) -> None:
+        # Fold the smallest-magnitude buckets together; high quantiles of
+        # latencies and metrics are what callers care about.
+        keys = sorted(buckets)
+        excess = len(keys) - self.max_buckets
+        target = keys[excess]
+        for key in keys[:excess]:
+            buckets[target] += buckets.pop(key)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Fold ``other`` into this sketch in place and return ``self``."""
+        if abs(other._gamma - self._gamma) > 1e-12:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other._positive.items():
+            self._positive[key] = self._positive.get(key, 0.0) + count
+        for key, count in other._negative.items():
+            self._negative[key] = self._negative.get(key, 0.0) + count
+        if len(self._positive) > self.max_buckets:
+            self._collapse(self._positive)
+        if len(self._negative) > self.max_buckets:
+            self._collapse(self._negative)
+        self._zero += other._zero
+        self._neg_inf += other._neg_inf
+        self._pos_inf += other._pos_inf
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the ``q``-quantile (``0 <= q <= 1``); ``None`` when empty."""
+        if self.count <= 0:
+            return None
+        if not 0.0 <= q <= 1.0:
+            raise ValueError("q must be in [0, 1]")
+        rank = math.floor(q * (self.count - 1) + 0.5)
+        seen = self._neg_inf
+        if seen > rank:
+            return -math.inf
+        estimate: Optional[float] = None
+        for key in sorted(self._negative, reverse=True):
+            seen += self._negative[key]
+            if seen > rank:
+                estimate = -self._value(key)
+                break
+        if estimate is None:
+            seen += self._zero
+            if seen > rank:
+                estimate = 0.0
+        if estimate is None:
+            for key in sorted(self._positive):
+                seen += self._positive[key]
+                if seen > rank:
+                    estimate = self._value(key)
+                    break
+        if estimate is None:
+            estimate = self.max
+        return min(max(estimate, self.min), self.max)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly state so partial sketches can cross process boundaries."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_buckets": self.max_buckets,
+            "positive": {str(key): count for key, count in self._positive.items()},
+            "negative": {str(key): count for key, count in self._negative.items()},
+            "zero": self._zero,
+            "neg_inf": self._neg_inf,
+            "pos_inf": self._pos_inf,
+            "count": self.count,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(state["relative_accuracy"], state.get("max_buckets", 2048))
+        sketch._positive = {int(key): count for key, count in state["positive"].items()}
+        sketch._negative = {int(key): count for key, count in state["negative"].items()}
+        sketch._zero = state["zero"]
+        sketch._neg_inf = state.get("neg_inf", 0.0)
+        sketch._pos_inf = state.get("pos_inf", 0.0)
+        sketch.count = state["count"]
+        if state.get("min") is not None:
+            sketch.min = state["min"]
+            sketch.max = state["max"]
+        return sketch